@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+"""
+Benchmark category creation.
+
+Folders used to be pre-created for every day from 2015 to 2040 when a
+category was saved (about 9,800 get_or_create queries). With lazy folder
+materialization creating a category is a single INSERT no matter how many
+categories or files already exist.
+"""
+
+from common import test_database, timer, report
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from filemanager.models import Department, Category
+
+
+def run(categories=50):
+    department = Department.objects.create(code='LAB', name='Laboratory')
+    rows = []
+    for i in range(categories):
+        results = {}
+        with CaptureQueriesContext(connection) as queries, timer('create', results):
+            Category.objects.create(name=f'Category {i}', department=department)
+        if i in (0, categories // 2, categories - 1):
+            rows.append((f'category #{i + 1}', f"{results['create'] * 1000:.2f} ms, {len(queries)} queries"))
+    report('Category creation', rows)
+
+
+if __name__ == '__main__':
+    with test_database():
+        run()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+Benchmark file listing pagination: Paginator (COUNT + OFFSET) versus keyset cursors.
+
+Builds a department with --rows medical files (500,000 by default) and times
+fetching the first and the last page of --per-page files both ways, as
+get_files_by_date does.
+
+    python benchmarks/bench_pagination.py --rows 500000 --per-page 100
+"""
+
+import argparse
+import statistics
+from datetime import timedelta
+
+from common import test_database, timer, report
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+
+from filemanager.models import Department, Category, User, MedicalFile
+from filemanager.services.folder_service import FolderService
+from filemanager.services.pagination_service import PaginationService
+
+
+def populate(rows, batch_size=5000):
+    department = Department.objects.create(code='LAB', name='Laboratory')
+    user = User.objects.create_user(username='bench', password='bench', department=department)
+    categories = [Category.objects.create(name=f'Category {i}', department=department) for i in range(5)]
+    folders = [FolderService.get_date_folder(category, 2025, 8, 21) for category in categories]
+    now = timezone.now()
+
+    # Spread uploads over time instead of stamping every row with now()
+    uploaded_at = MedicalFile._meta.get_field('uploaded_at')
+    uploaded_at.auto_now_add = False
+    try:
+        for start in range(0, rows, batch_size):
+            batch = []
+            for i in range(start, min(start + batch_size, rows)):
+                index = i % len(categories)
+                batch.append(MedicalFile(
+                    name=f'scan_{i}.pdf',
+                    file=f'medical_files/bench/{i}.pdf',
+                    uploaded_by=user,
+                    file_type='PDF',
+                    size=1000,
+                    date_folder=folders[index],
+                    category=categories[index],
+                    uploaded_at=now - timedelta(seconds=i),
+                ))
+            with transaction.atomic():
+                MedicalFile.objects.bulk_create(batch)
+    finally:
+        uploaded_at.auto_now_add = True
+    return department
+
+
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        result = {}
+        with timer('run', result):
+            fn()
+        timings.append(result['run'])
+    return statistics.median(timings) * 1000
+
+
+def run(rows, per_page):
+    results = {}
+    with timer('populate', results):
+        department = populate(rows)
+
+    files = MedicalFile.objects.filter(category__department=department).select_related('uploaded_by', 'category')
+    last_page = max(1, -(-rows // per_page))
+
+    def offset_page(number):
+        paginator = Paginator(files.order_by('-uploaded_at'), per_page)
+        return list(paginator.page(number)), paginator.num_pages
+
+    # The cursor a client holds after walking to the page before the last one
+    anchor = files.order_by('-uploaded_at', '-id')[(last_page - 1) * per_page - 1] if last_page > 1 else None
+    deep_cursor = PaginationService.encode_cursor({
+        'f': 'uploaded_at', 'desc': True, 'v': anchor.uploaded_at.isoformat(), 'id': anchor.pk, 'd': 'next',
+    }) if anchor else None
+
+    rows_out = [
+        ('populate', f"{results['populate']:.1f} s"),
+        ('Paginator page 1', f"{best_of(lambda: offset_page(1)):8.1f} ms"),
+        (f'Paginator page {last_page:,}', f"{best_of(lambda: offset_page(last_page)):8.1f} ms"),
+        ('keyset page 1', f"{best_of(lambda: PaginationService.paginate(files, None, per_page)):8.1f} ms"),
+        (f'keyset page {last_page:,}', f"{best_of(lambda: PaginationService.paginate(files, deep_cursor, per_page)):8.1f} ms"),
+        ('estimated total', f"{best_of(lambda: PaginationService.estimated_total(files)):8.1f} ms"),
+    ]
+    report(f'Listing {rows:,} files, {per_page} per page', rows_out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--per-page', type=int, default=100)
+    args = parser.parse_args()
+    with test_database():
+        run(args.rows, args.per_page)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Benchmark peak memory and time of assembling multi-page scans into one PDF.
+
+Writes --pages scanned pages (A4 at 150 DPI, JPEG) to a temporary directory,
+both as JPEG files and as one-page PDFs like scan artifacts, then assembles
+them in a fresh process per method and reports how far each raised the
+process's peak RSS:
+
+  reportlab-jpeg  the old create_pdf_from_images: decode, re-encode, draw into a BytesIO
+  assembler-jpeg  PdfAssembler.add_jpeg, streaming JPEG pages to the output file
+  pypdf-pdf       the old finalize_scan merge: PdfWriter.append every page, then write
+  assembler-pdf   PdfAssembler.add_pdf, streaming scan PDFs to the output file
+
+    python benchmarks/bench_pdf_assembly.py --pages 100
+"""
+
+import argparse
+import io
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filemanager.utils.pdf_assembler import PdfAssembler  # noqa: E402
+
+PAGE_SIZE = (1240, 1754)  # A4 at 150 DPI
+METHODS = {
+    'reportlab-jpeg': 'create_pdf_from_images (reportlab, JPEG pages)',
+    'assembler-jpeg': 'PdfAssembler.add_jpeg (JPEG pages)',
+    'pypdf-pdf': 'PdfWriter.append (one-page PDFs)',
+    'assembler-pdf': 'PdfAssembler.add_pdf (one-page PDFs)',
+}
+
+
+def write_pages(directory, pages):
+    """Write noisy page scans as JPEGs and as one-page scan PDFs"""
+    from PIL import Image
+
+    for number in range(pages):
+        noise = Image.effect_noise(PAGE_SIZE, 40 + number % 20)
+        page = Image.merge('RGB', (noise, noise.rotate(90, expand=False), noise))
+        jpeg = os.path.join(directory, f'{number:04d}.jpg')
+        page.save(jpeg, 'JPEG', quality=85, dpi=(150, 150))
+        with open(os.path.join(directory, f'{number:04d}.pdf'), 'wb') as output:
+            with PdfAssembler(output) as assembler:
+                assembler.add_jpeg(jpeg)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def assemble(method, directory):
+    """Assemble every page with one method into directory/out.pdf"""
+    kind = 'jpg' if method.endswith('jpeg') else 'pdf'
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(f'.{kind}'))
+    output_path = os.path.join(directory, 'out.pdf')
+
+    if method == 'reportlab-jpeg':
+        # What create_pdf_from_images did: every page decoded, re-encoded and drawn into one BytesIO
+        from PIL import Image
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        for path in paths:
+            with Image.open(path) as image:
+                encoded = io.BytesIO()
+                image.convert('RGB').save(encoded, format='JPEG', quality=85)
+            encoded.seek(0)
+            pdf.drawInlineImage(Image.open(encoded), 0, 0, width=A4[0], height=A4[1])
+            pdf.showPage()
+        pdf.save()
+        with open(output_path, 'wb') as output:
+            output.write(buffer.getvalue())
+    elif method == 'pypdf-pdf':
+        from pypdf import PdfReader, PdfWriter
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(PdfReader(path))
+        with open(output_path, 'wb') as output:
+            writer.write(output)
+    else:
+        with open(output_path, 'wb') as output, PdfAssembler(output) as assembler:
+            for path in paths:
+                if kind == 'jpg':
+                    assembler.add_jpeg(path)
+                else:
+                    assembler.add_pdf(path)
+    return output_path
+
+
+def child(method, directory):
+    """Run one assembly and print 'peak_growth_mb seconds output_mb'"""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    output_path = assemble(method, directory)
+    elapsed = time.perf_counter() - start
+    print(f"{peak_rss_mb() - baseline:.1f} {elapsed:.2f} {os.path.getsize(output_path) / 1024 / 1024:.1f}")
+
+
+def run(pages):
+    from common import report
+
+    directory = tempfile.mkdtemp(prefix='bench_pdf_')
+    try:
+        write_pages(directory, pages)
+        input_mb = sum(
+            os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.endswith('.jpg')
+        ) / 1024 / 1024
+        rows = []
+        for method, label in METHODS.items():
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', method, '--dir', directory],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            growth, elapsed, size = output[-3:]
+            rows.append((label, f"peak RSS +{float(growth):8.1f} MB, {float(elapsed):6.2f} s, {size} MB PDF"))
+            os.remove(os.path.join(directory, 'out.pdf'))
+        report(f'Assembling {pages} pages ({input_mb:.0f} MB of JPEG)', rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--child', choices=METHODS)
+    parser.add_argument('--dir')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.dir)
+    else:
+        run(args.pages)
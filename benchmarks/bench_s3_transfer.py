@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark S3StorageService transfer throughput against thread count.
+
+Uploads a --size-mb file (256 MB by default) with multipart uploads, then
+reads it back with parallel ranged GETs, once per --threads value. Point
+--endpoint-url at a MinIO server or an S3-compatible gateway; without it a
+moto server is started in a subprocess (pip install "moto[server]"). A
+local stand-in has almost no per-request latency, so scaling is flatter
+than against real S3, where each part waits on a network round trip.
+
+    python benchmarks/bench_s3_transfer.py --size-mb 256 --threads 1,2,4,8,16
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from common import timer, report
+
+from django.core.files import File
+from django.test import override_settings
+
+from filemanager.services.storage_service import S3StorageService
+
+CHUNK = 4 * 1024 * 1024
+
+
+def start_moto():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'moto.server', '-p', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    endpoint = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(endpoint, timeout=1)
+            return server, endpoint
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("moto server did not start")
+
+
+def run(size_mb, threads, endpoint, bucket, part_mb):
+    size = size_mb * 1024 * 1024
+    server = None
+    if not endpoint:
+        server, endpoint = start_moto()
+
+    source = f'/tmp/bench_s3_{os.getpid()}.bin'
+    with open(source, 'wb') as handle:
+        block = os.urandom(CHUNK)
+        for start in range(0, size, CHUNK):
+            handle.write(block[:min(CHUNK, size - start)])
+
+    credentials = {
+        'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'testing'),
+        'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'testing'),
+        'AWS_STORAGE_BUCKET_NAME': bucket,
+        'AWS_S3_REGION_NAME': 'us-east-1',
+        'AWS_S3_ENDPOINT_URL': endpoint,
+        'AWS_S3_MULTIPART_THRESHOLD': part_mb * 1024 * 1024,
+        'AWS_S3_PART_SIZE': part_mb * 1024 * 1024,
+    }
+    rows = []
+    try:
+        for count in threads:
+            with override_settings(AWS_S3_MAX_CONCURRENCY=count, **credentials):
+                service = S3StorageService()
+                try:
+                    service.s3_client.create_bucket(Bucket=bucket)
+                except service.s3_client.exceptions.BucketAlreadyOwnedByYou:
+                    pass
+
+                results = {}
+                with open(source, 'rb') as handle, timer('upload', results):
+                    path = service.upload_file(File(handle, name='scan.bin'))['path']
+                with timer('download', results):
+                    received = sum(len(chunk) for chunk in service.iter_file(path))
+                assert received == size
+                service.delete_file(path)
+
+            rows.append((f'{count:2d} threads', f"upload {size_mb / results['upload']:8.1f} MB/s, "
+                                                 f"download {size_mb / results['download']:8.1f} MB/s"))
+        report(f'S3 transfers of a {size_mb} MB file in {part_mb} MB parts ({endpoint})', rows)
+    finally:
+        os.remove(source)
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--part-mb', type=int, default=8)
+    parser.add_argument('--threads', default='1,2,4,8,16')
+    parser.add_argument('--endpoint-url', help="S3-compatible endpoint; defaults to a local moto server")
+    parser.add_argument('--bucket', default='bench-transfers')
+    args = parser.parse_args()
+    run(args.size_mb, [int(count) for count in args.threads.split(',')], args.endpoint_url, args.bucket, args.part_mb)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark scanned page processing throughput, per stage and across worker processes.
+
+Generates --pages A4 pages of ruled text at --dpi, each a little skewed, and
+runs them through utils.scan_pipeline (decode, downsample to --target-dpi,
+deskew, convert, compress) for each color mode: first stage by stage in this
+process, then with process pools of 1 to --workers workers. Throughput is
+reported in pages per second and per core used, alongside the input and
+output sizes.
+
+    python benchmarks/bench_scan_pipeline.py --pages 16 --dpi 300 --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from common import report
+
+from PIL import Image, ImageDraw
+
+from filemanager.utils import scan_pipeline
+
+
+def make_page(number, dpi):
+    """A JPEG of an A4 page of text lines, rotated by up to 1.5 degrees"""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('RGB', (width, height), (250, 248, 240))
+    draw = ImageDraw.Draw(image)
+    line = dpi // 6
+    for y in range(dpi, height - dpi, line):
+        for x in range(dpi, width - dpi, dpi // 3):
+            # Word-sized blocks of ink with gaps, like a printed form
+            if (x // (dpi // 3) * 7 + y // line * 3 + number) % 5:
+                draw.rectangle([x, y, x + dpi // 4, y + line // 3], fill=(25, 25, 40))
+    image = image.rotate((number % 7 - 3) / 2, Image.BICUBIC, fillcolor=(250, 248, 240))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90, dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def stage_times(page, options):
+    """Seconds spent in each stage of one page"""
+    times = {}
+    start = time.perf_counter()
+    image, dpi = scan_pipeline.decode(page, target_dpi=options['target_dpi'])
+    if options['mode'] != 'color':
+        image = scan_pipeline.convert(image, 'gray')
+    times['decode'] = time.perf_counter() - start
+    start = time.perf_counter()
+    image, dpi = scan_pipeline.downsample(image, dpi, options['target_dpi'])
+    times['downsample'] = time.perf_counter() - start
+    start = time.perf_counter()
+    image, _ = scan_pipeline.deskew(image)
+    times['deskew'] = time.perf_counter() - start
+    start = time.perf_counter()
+    image = scan_pipeline.convert(image, options['mode'])
+    times['convert'] = time.perf_counter() - start
+    start = time.perf_counter()
+    encoded = scan_pipeline.compress(image, dpi, options['jpeg_quality'])
+    times['compress'] = time.perf_counter() - start
+    return times, len(encoded.data)
+
+
+def run(args):
+    pages = [make_page(number, args.dpi) for number in range(args.pages)]
+    input_bytes = sum(len(page) for page in pages)
+    cores = os.cpu_count() or 1
+
+    for mode in ('bilevel', 'gray', 'color'):
+        options = {'mode': mode, 'target_dpi': args.target_dpi, 'deskew': True, 'jpeg_quality': 75}
+        totals = {}
+        output_bytes = 0
+        for page in pages:
+            times, size = stage_times(page, options)
+            output_bytes += size
+            for stage, seconds in times.items():
+                totals[stage] = totals.get(stage, 0) + seconds
+        rows = [(stage, f"{seconds / len(pages) * 1000:8.1f} ms/page") for stage, seconds in totals.items()]
+        serial = sum(totals.values())
+        rows.append(('in process', f"{len(pages) / serial:6.2f} pages/s"))
+
+        jobs = [(page, options) for page in pages]
+        for workers in range(1, args.workers + 1):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(int, range(workers)))  # Start the workers before timing
+                start = time.perf_counter()
+                for _ in scan_pipeline.process_pages(jobs, executor, window=workers * 2):
+                    pass
+                elapsed = time.perf_counter() - start
+            used = min(workers, cores)
+            rows.append((
+                f'{workers} worker process(es)',
+                f"{len(pages) / elapsed:6.2f} pages/s, {len(pages) / elapsed / used:6.2f} pages/s per core",
+            ))
+        rows.append(('size', f"{input_bytes / 1024 / 1024:6.1f} MB in, {output_bytes / 1024 / 1024:6.2f} MB out"))
+        report(f'{mode}: {args.pages} A4 pages at {args.dpi} dpi -> {args.target_dpi} dpi, deskewed, {cores} cores', rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=16)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--target-dpi', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    run(parser.parse_args())
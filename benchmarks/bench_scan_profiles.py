@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Benchmark stored scan sizes with adaptive compression profiles versus full-color PDFs.
+
+Generates --pages color scans at --dpi of each kind of page: clinical forms
+(printed text, ruled boxes, blue-pen handwriting), mixed pages (a form with
+a photo) and photos. Each page is stored three ways: as scan_document used
+to (Image.convert('RGB').save(..., 'PDF')), as the scanner's JPEG copied
+into the PDF, and through the pipeline's 'auto' mode. Reports bytes per
+category and how many times smaller the profiles are.
+
+    python benchmarks/bench_scan_profiles.py --pages 4 --dpi 300
+"""
+
+import argparse
+import time
+from io import BytesIO
+
+from common import report
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from filemanager.utils import scan_pipeline
+from filemanager.utils.pdf_assembler import PdfAssembler
+
+PAPER = (250, 248, 240)
+
+
+def make_form(number, dpi):
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new('RGB', (width, height), PAPER)
+    draw = ImageDraw.Draw(image)
+    line = dpi // 6
+    for row, y in enumerate(range(dpi, height - dpi, line)):
+        if row % 6 == 0:
+            draw.rectangle([dpi * 0.8, y - line // 4, width - dpi * 0.8, y + line * 5], outline=(20, 20, 20), width=max(1, dpi // 100))
+        for column, x in enumerate(range(dpi, width // 2, dpi // 3)):
+            if (column * 7 + row * 3 + number) % 5:
+                draw.rectangle([x, y, x + dpi // 4, y + line // 3], fill=(25, 25, 40))
+        if (row + number) % 3 == 0:
+            # Handwritten answer in blue ballpoint
+            x = width // 2 + dpi // 4
+            points = [(x + step * dpi // 10, y + line // 4 + (step * 13 + row) % 7 * dpi // 100) for step in range(25)]
+            draw.line(points, fill=(30, 50, 150), width=max(1, dpi // 100))
+    return image
+
+
+def make_photo(number, width, height):
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        draw.line([(0, y), (width, y)], fill=(110 + 90 * y // height, 80 + 60 * y // height, 60 + number * 20))
+    for blob in range(12):
+        left, top = width * ((blob * 5 + number) % 11) // 11, height * ((blob * 7) % 9) // 9
+        size = min(width, height) // (3 + blob % 4)
+        draw.ellipse([left, top, left + size, top + size], fill=(30 * blob % 256, 200 - 15 * blob, 90 + 10 * blob))
+    return image.filter(ImageFilter.GaussianBlur(max(1, width // 300)))
+
+
+def make_page(kind, number, dpi):
+    if kind == 'photo':
+        return make_photo(number, int(8.27 * dpi), int(11.69 * dpi))
+    image = make_form(number, dpi)
+    if kind == 'mixed':
+        image.paste(make_photo(number, dpi * 3, dpi * 2), (image.width // 2 - dpi, image.height // 3))
+    return image
+
+
+def run(args):
+    rows = []
+    totals = {'old': 0, 'jpeg': 0, 'auto': 0}
+    seconds = 0.0
+    for kind in ('text', 'mixed', 'photo'):
+        sizes = {'old': 0, 'jpeg': 0, 'auto': 0}
+        categories = []
+        for number in range(args.pages):
+            image = make_page(kind, number, args.dpi)
+            scan = BytesIO()
+            image.save(scan, 'JPEG', quality=90, dpi=(args.dpi, args.dpi))
+
+            old = BytesIO()
+            image.convert('RGB').save(old, 'PDF', resolution=100.0)
+            sizes['old'] += len(old.getvalue())
+
+            passthrough = BytesIO()
+            with PdfAssembler(passthrough) as assembler:
+                assembler.add_jpeg(BytesIO(scan.getvalue()))
+            sizes['jpeg'] += len(passthrough.getvalue())
+
+            start = time.perf_counter()
+            page = scan_pipeline.process_page((scan.getvalue(), {'mode': 'auto', 'target_dpi': 300}))
+            seconds += time.perf_counter() - start
+            profiled = BytesIO()
+            with PdfAssembler(profiled) as assembler:
+                assembler.add_encoded(page)
+            sizes['auto'] += len(profiled.getvalue())
+            categories.append(page.category)
+
+        for key in totals:
+            totals[key] += sizes[key]
+        rows.append((
+            f'{kind} pages (classified {", ".join(sorted(set(categories)))})',
+            f"RGB PDF {sizes['old'] / 1024:9.0f} KB, scanner JPEG {sizes['jpeg'] / 1024:9.0f} KB, "
+            f"profile {sizes['auto'] / 1024:8.0f} KB: {sizes['old'] / sizes['auto']:5.1f}x / "
+            f"{sizes['jpeg'] / sizes['auto']:5.1f}x smaller",
+        ))
+    rows.append((
+        'all pages',
+        f"RGB PDF {totals['old'] / 1024:9.0f} KB, scanner JPEG {totals['jpeg'] / 1024:9.0f} KB, "
+        f"profile {totals['auto'] / 1024:8.0f} KB: {totals['old'] / totals['auto']:5.1f}x / "
+        f"{totals['jpeg'] / totals['auto']:5.1f}x smaller",
+    ))
+    rows.append(('classify + compress', f"{seconds / (args.pages * 3) * 1000:.0f} ms/page"))
+    report(f'{args.pages} color scans of each kind at {args.dpi} dpi', rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--dpi', type=int, default=300)
+    run(parser.parse_args())
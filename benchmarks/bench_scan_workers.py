@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Benchmark web worker starvation: scanning inside requests versus the scanner worker pool.
+
+Simulates a server with --web-threads request threads and --scanners fake
+scanners. --clients users each scan --pages pages on a shared scanner while
+other users load pages (a cheap request every 20 ms). With scans inside
+requests, each scan holds a request thread for the scan plus any busy
+retries; with ScannerWorkerPool a scan request only queues a job and the
+client polls it. Reports how long the scans took and how long the page
+loads waited.
+
+    python benchmarks/bench_scan_workers.py --clients 8 --scanners 2
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import report
+
+from filemanager.services.scan_job_service import ScannerWorkerPool
+from filemanager.services.scanner_service import FakeScannerService, ScannerBusyError
+
+PAGE_LOAD_SECONDS = 0.005
+POLL_SECONDS = 0.002
+BUSY_RETRIES = 5
+
+
+def scan_in_request(scanner_service, scanner_id, path, retry_delay):
+    """What scan_document used to do in the request thread"""
+    device = scanner_service.open_device(scanner_id)
+    try:
+        for attempt in range(BUSY_RETRIES + 1):
+            try:
+                device.scan(path, dpi=50)
+                return True
+            except ScannerBusyError:
+                if attempt == BUSY_RETRIES:
+                    return False
+                time.sleep(retry_delay)
+    finally:
+        device.close()
+
+
+def run(mode, args):
+    scanner_service = FakeScannerService(devices=args.scanners, scan_seconds=args.scan_seconds, page_inches=(1, 1))
+    web = ThreadPoolExecutor(max_workers=args.web_threads)
+    directory = tempfile.mkdtemp(prefix='bench_scan_')
+    done = {}
+    failed = []
+
+    def run_job(device, job_id):
+        device.scan(os.path.join(directory, f'{job_id}.jpg'), dpi=50)
+        done[job_id].set()
+
+    def fail_job(job_id, error):
+        failed.append(job_id)
+        done[job_id].set()
+
+    pool = ScannerWorkerPool(scanner_service, run_job, fail_job, idle_timeout=5)
+
+    def client(number):
+        scanner_id = number % args.scanners + 1
+        for page in range(args.pages):
+            job_id = f'{number}-{page}'
+            path = os.path.join(directory, f'{job_id}.jpg')
+            if mode == 'request':
+                if not web.submit(scan_in_request, scanner_service, scanner_id, path, args.retry_delay).result():
+                    failed.append(job_id)
+            else:
+                done[job_id] = threading.Event()
+                web.submit(pool.submit, scanner_id, job_id).result()
+                while not done[job_id].is_set():
+                    web.submit(time.sleep, POLL_SECONDS).result()
+                    done[job_id].wait(args.poll_interval)
+
+    page_loads = []
+
+    def page_load_traffic(stop):
+        while not stop.is_set():
+            submitted = time.perf_counter()
+            future = web.submit(time.sleep, PAGE_LOAD_SECONDS)
+            future.add_done_callback(lambda _, submitted=submitted: page_loads.append(time.perf_counter() - submitted))
+            time.sleep(0.02)
+
+    stop = threading.Event()
+    traffic = threading.Thread(target=page_load_traffic, args=(stop,))
+    traffic.start()
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(number,)) for number in range(args.clients)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    traffic.join()
+    web.shutdown()
+    pool.stop()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    page_loads.sort()
+    return (
+        f"scans {elapsed:6.2f} s ({len(failed)} failed, {scanner_service.busy_errors} busy refusals), "
+        f"page load wait p50 {statistics.median(page_loads) * 1000:7.1f} ms, "
+        f"p95 {page_loads[int(len(page_loads) * 0.95)] * 1000:7.1f} ms"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--scanners', type=int, default=2)
+    parser.add_argument('--web-threads', type=int, default=4)
+    parser.add_argument('--scan-seconds', type=float, default=0.5)
+    parser.add_argument('--retry-delay', type=float, default=0.7, help='busy retry wait (7 s in production)')
+    parser.add_argument('--poll-interval', type=float, default=0.1)
+    args = parser.parse_args()
+
+    report(
+        f'{args.clients} clients x {args.pages} pages on {args.scanners} scanners, {args.web_threads} request threads',
+        [
+            ('scan inside the request', run('request', args)),
+            ('ScannerWorkerPool + polling', run('pool', args)),
+        ],
+    )
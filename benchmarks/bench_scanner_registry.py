@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Benchmark get_scanners latency with and without the scanner registry cache.
+
+Uses the fake scanner backend with --list-ms of enumeration cost (WIA takes
+hundreds of milliseconds to enumerate devices) and calls the view
+--requests times, first forcing an enumeration per request as get_scanners
+used to, then serving the cached list.
+
+    python benchmarks/bench_scanner_registry.py --requests 20 --list-ms 300
+"""
+
+import argparse
+import time
+
+from common import report, timer
+
+from django.test import RequestFactory, override_settings
+
+from filemanager.services.scanner_service import ScannerFactory, ScannerRegistry
+from filemanager.views import get_scanners
+
+
+def run(requests, list_seconds):
+    results = {}
+    fake = {'devices': 2, 'list_seconds': list_seconds}
+    factory = RequestFactory()
+    with override_settings(SCANNER_BACKEND='fake', SCANNER_FAKE_OPTIONS=fake):
+        ScannerFactory.reset()
+        ScannerRegistry.reset()
+        for label, params in [('enumerate per request', {'refresh': '1'}), ('registry cache', {})]:
+            latencies = []
+            with timer(label, results):
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = get_scanners(factory.get('/get_scanners/', params))
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.content
+            latencies.sort()
+            results[label] = (results[label], latencies[len(latencies) // 2], latencies[-1])
+        enumerations = ScannerFactory.get_scanner_service().enumerations
+        ScannerRegistry.reset()
+        ScannerFactory.reset()
+
+    report(
+        f'{requests} get_scanners requests, {list_seconds * 1000:.0f} ms per enumeration ({enumerations} enumerations)',
+        [
+            (label, f"total {total:6.2f} s, p50 {p50 * 1000:7.2f} ms, max {worst * 1000:7.2f} ms")
+            for label, (total, p50, worst) in results.items()
+        ],
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--list-ms', type=int, default=300)
+    args = parser.parse_args()
+    run(args.requests, args.list_ms / 1000)
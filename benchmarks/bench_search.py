@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Benchmark file search: chained icontains (LIKE '%x%') versus the full-text index.
+
+Builds a department with --rows medical files (1,000,000 by default), indexes
+them and times the search_files query for a few terms through both paths.
+
+    python benchmarks/bench_search.py --rows 1000000
+"""
+
+import argparse
+import random
+from datetime import timedelta
+
+from common import test_database, timer, report
+
+from django.db import transaction
+from django.utils import timezone
+
+from filemanager.models import Department, Category, User, MedicalFile
+from filemanager.services.folder_service import FolderService
+from filemanager.services.search_service import SearchFactory, LikeSearchService
+
+WORDS = [
+    'referral', 'letter', 'lab', 'report', 'haemoglobin', 'malaria', 'xray', 'chest', 'discharge',
+    'summary', 'consent', 'form', 'ultrasound', 'scan', 'prescription', 'vitals', 'chart', 'triage',
+    'culture', 'sensitivity', 'biopsy', 'histology', 'immunisation', 'record', 'antenatal', 'card',
+]
+QUERIES = ['histology', 'malaria lab', 'ultra', 'zzzz']
+
+
+def populate(rows, batch_size=5000):
+    department = Department.objects.create(code='LAB', name='Laboratory')
+    user = User.objects.create_user(username='bench', password='bench', department=department)
+    categories = [Category.objects.create(name=f'Category {i}', department=department) for i in range(5)]
+    folders = [FolderService.get_date_folder(category, 2025, 8, 21) for category in categories]
+    now = timezone.now()
+    rng = random.Random(42)
+
+    for start in range(0, rows, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, rows)):
+            index = i % len(categories)
+            batch.append(MedicalFile(
+                name=f"{'_'.join(rng.sample(WORDS, 3))}_{i}.pdf",
+                file=f'medical_files/bench/{i}.pdf',
+                uploaded_by=user,
+                file_type='PDF',
+                description=' '.join(rng.sample(WORDS, 8)),
+                size=1000,
+                date_folder=folders[index],
+                category=categories[index],
+                uploaded_at=now - timedelta(minutes=i),
+            ))
+        with transaction.atomic():
+            MedicalFile.objects.bulk_create(batch)
+    return department
+
+
+def run(rows):
+    results = {}
+    with timer('populate', results):
+        department = populate(rows)
+    with timer('index', results):
+        with transaction.atomic():
+            SearchFactory.get_search_service().rebuild()
+
+    base = MedicalFile.objects.filter(category__department=department).order_by('-uploaded_at')
+    fts = SearchFactory.get_search_service()
+    paths = [
+        ('LIKE', lambda query: LikeSearchService().filter(base, query)),
+        ('FTS', lambda query: fts.filter(base, query)),
+        ('FTS ranked', lambda query: fts.filter(base, query, rank=True).order_by('-search_rank')),
+    ]
+    rows_out = [
+        ('populate', f"{results['populate']:.1f} s"),
+        ('build index', f"{results['index']:.1f} s"),
+    ]
+    for query in QUERIES + [str(rows // 2)]:
+        for label, search in paths:
+            timings = {}
+            with timer('page', timings):
+                page = list(search(query)[:50])
+            with timer('count', timings):
+                total = search(query).count()
+            rows_out.append((
+                f'{label:10} {query!r}',
+                f"first page {timings['page'] * 1000:8.1f} ms, count {timings['count'] * 1000:8.1f} ms "
+                f"({total} matches, {len(page)} returned)"
+            ))
+    report(f'Search over {rows:,} files', rows_out)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    with test_database():
+        run(args.rows)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Benchmark LocalStorageService.upload_file: hash-after-write versus the single-pass hashing tee.
+
+Writes a --size-mb file (1 GB by default) and uploads it to a temporary
+MEDIA_ROOT both ways, reporting throughput and how many bytes were read
+from the source. The old path is the previous FileService flow: an MD5
+pass for the duplicate check, the write, then another MD5 pass for the
+result. Repeated reads are served from the page cache here, so on cold
+disks or network-backed files the gap is larger.
+
+    python benchmarks/bench_storage_hashing.py --size-mb 1024
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+
+from common import timer, report
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from filemanager.services.storage_service import LocalStorageService
+
+CHUNK = 4 * 1024 * 1024
+
+
+class CountingFile(File):
+    """File that counts the bytes read from it (File.chunks reads through read())"""
+
+    def __init__(self, handle, name):
+        super().__init__(handle, name)
+        self.bytes_read = 0
+
+    def read(self, *args):
+        data = self.file.read(*args)
+        self.bytes_read += len(data)
+        return data
+
+
+def write_source(path, size):
+    with open(path, 'wb') as handle:
+        block = os.urandom(CHUNK)
+        for start in range(0, size, CHUNK):
+            handle.write(block[:min(CHUNK, size - start)])
+
+
+def hash_after_write(service, file):
+    checksum = service.calculate_checksum(file)  # FileService duplicate check
+    file.seek(0)
+    path = default_storage.save(f"files/bench/{file.name}", file)
+    return path, service.calculate_checksum(file), checksum
+
+
+def run(size_mb):
+    size = size_mb * 1024 * 1024
+    directory = tempfile.mkdtemp(prefix='bench_hashing_')
+    source = os.path.join(directory, 'source.bin')
+    service = LocalStorageService()
+    rows = []
+    try:
+        write_source(source, size)
+        for label, upload in [('hash after write (old)', lambda f: hash_after_write(service, f)),
+                              ('hashing tee (new)', service.upload_file)]:
+            media_root = os.path.join(directory, 'media')
+            with override_settings(MEDIA_ROOT=media_root), open(source, 'rb') as handle:
+                file = CountingFile(handle, 'scan.bin')
+                results = {}
+                with timer('upload', results):
+                    upload(file)
+            shutil.rmtree(media_root, ignore_errors=True)
+            rows.append((label, f"{size_mb / results['upload']:8.1f} MB/s, "
+                                f"{file.bytes_read / size:.0f}x the file read ({results['upload']:.2f} s)"))
+        report(f'Uploading a {size_mb} MB file to local storage', rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=1024)
+    args = parser.parse_args()
+    run(args.size_mb)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Benchmark storage tier migration: local disk freed and read latency per tier.
+
+Stores --files files of --size-kb each in a temporary MEDIA_ROOT, half of
+them text-like reports (which gzip well) and half JPEG-like random bytes
+(which do not), ages them past the STORAGE_TIERS policy and migrates them
+to warm and then cold. The cold tier is the 'local' storage service here, so
+its latency is the floor of a real object store's. Reports the migration
+rate, the local disk each tier takes, and the time to read a whole file and
+a 64 KB range at the end of one in each tier.
+
+    python benchmarks/bench_storage_tiers.py --files 40 --size-kb 2048
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from common import report, test_database, timer
+
+from django.test import override_settings
+from django.utils import timezone
+
+from filemanager.models import Blob, Category, Department, User
+from filemanager.services.download_service import DownloadService
+from filemanager.services.folder_service import FolderService
+from filemanager.services.tier_service import TierService
+from filemanager.services.upload_service import UploadService
+
+RANGE = 64 * 1024
+
+
+def make_content(number, size):
+    if number % 2:
+        return os.urandom(size)  # Already compressed, like JPEG or DICOM pixel data
+    line = f'patient {number} lab result: haemoglobin 13.{number % 10} g/dL, reference 12-16\n'.encode()
+    return (line * (size // len(line) + 1))[:size]
+
+
+def local_bytes(blobs):
+    return sum(TierService._local_size(blob) for blob in blobs)
+
+
+def read_times(blob, repeat=5):
+    """Median seconds to read the whole blob and its last RANGE bytes"""
+    whole, tail = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with TierService.open(blob) as handle:
+            while handle.read(1024 * 1024):
+                pass
+        whole.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        handle = TierService.open(blob)
+        DownloadService._skip(handle, blob.size - RANGE)
+        handle.read(RANGE)
+        handle.close()
+        tail.append(time.perf_counter() - start)
+    return sorted(whole)[repeat // 2], sorted(tail)[repeat // 2]
+
+
+def run(args):
+    size = args.size_kb * 1024
+    media_root = tempfile.mkdtemp(prefix='bench_tiers_')
+    settings = override_settings(MEDIA_ROOT=media_root, TASK_BACKEND='inline', STORAGE_COLD_BACKEND='local')
+    try:
+        with settings, test_database():
+            department = Department.objects.create(code='LAB', name='Laboratory')
+            category = Category.objects.create(name='Lab Results', department=department)
+            user = User.objects.create_user(username='bench', password='bench', department=department)
+            date_folder = FolderService.get_date_folder(category, 2025, 8, 1)
+            for number in range(args.files):
+                UploadService.store_stream(
+                    BytesIO(make_content(number, size)), f'file{number}.dat', uploaded_by=user,
+                    file_type='OTH', date_folder=date_folder, category=category,
+                )
+
+            rows, reads, results = [], [], {}
+            for tier, age_days in (('hot', 0), ('warm', 100), ('cold', 400)):
+                counts = None
+                if tier != 'hot':
+                    Blob.objects.update(created_at=timezone.now() - timedelta(days=age_days), last_accessed=None)
+                    with timer(tier, results):
+                        counts = TierService.migrate(batch_size=args.files)
+                summary = f"{local_bytes(Blob.objects.all()) / 1024 / 1024:8.1f} MB on local disk"
+                if counts:
+                    summary += (
+                        f", {counts[tier]} moved at {args.files * size / 1024 / 1024 / results[tier]:6.1f} MB/s, "
+                        f"{counts['freed'] / 1024 / 1024:.1f} MB freed"
+                    )
+                rows.append((tier, summary))
+
+                for kind, name in (('text', 'file0.dat'), ('binary', 'file1.dat')):
+                    whole, tail = read_times(Blob.objects.get(medical_files__name=name))
+                    reads.append((
+                        f'{tier} {kind}',
+                        f"whole file {whole * 1000:7.1f} ms, last {RANGE // 1024} KB {tail * 1000:7.1f} ms",
+                    ))
+            report(f'{args.files} files of {args.size_kb} KB, half compressible', rows)
+            report('Read latency per tier (median of 5)', reads)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--size-kb', type=int, default=2048)
+    run(parser.parse_args())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Benchmark peak memory per upload: base64-in-JSON upload_file_api versus stream_upload_api.
+
+Writes a --size-mb file (100 MB by default) and the request bodies for each
+path to a temporary directory, then runs every upload in a fresh process
+that reads its body from disk like a WSGI server would, and reports how far
+the upload raised the process's peak RSS.
+
+    python benchmarks/bench_upload_memory.py --size-mb 100
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+CHUNK = 3 * 1024 * 1024  # A multiple of 3 so base64 chunks concatenate cleanly
+BOUNDARY = 'BenchBoundary'
+METADATA = {'category': 'Scans', 'year': '2025', 'month': '8', 'date': '21'}
+MODES = {
+    'json': ('/api/upload/', 'application/json', ''),
+    'raw': ('/api/upload/stream/', 'application/pdf', urlencode({**METADATA, 'filename': 'scan.pdf'})),
+    'multipart': ('/api/upload/stream/', f'multipart/form-data; boundary={BOUNDARY}', ''),
+}
+
+
+def write_payloads(directory, size):
+    """Write the raw file plus a JSON and a multipart request body carrying it"""
+    raw = os.path.join(directory, 'raw')
+    with open(raw, 'wb') as handle:
+        for start in range(0, size, CHUNK):
+            handle.write(os.urandom(min(CHUNK, size - start)))
+
+    with open(os.path.join(directory, 'json'), 'wb') as out, open(raw, 'rb') as source:
+        header = {**METADATA, 'filename': 'scan.pdf', 'mimetype': 'application/pdf', 'filesize': size}
+        out.write(json.dumps(header)[:-1].encode() + b', "fileContent": "')
+        for chunk in iter(lambda: source.read(CHUNK), b''):
+            out.write(base64.b64encode(chunk))
+        out.write(b'"}')
+
+    with open(os.path.join(directory, 'multipart'), 'wb') as out, open(raw, 'rb') as source:
+        for name, value in METADATA.items():
+            out.write(
+                f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            )
+        out.write(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="scan.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n'.encode()
+        )
+        shutil.copyfileobj(source, out, CHUNK)
+        out.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, directory):
+    """Run one upload through the view and print 'peak_growth_mb seconds status'"""
+    from common import test_database
+
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.test import override_settings
+
+    from filemanager.models import Department, Category, User
+    from filemanager.views import stream_upload_api, upload_file_api
+
+    path, content_type, query = MODES[mode]
+    body = os.path.join(directory, mode)
+    # DATA_UPLOAD_MAX_MEMORY_SIZE would reject the JSON body outright; lift it to measure the cost
+    settings = override_settings(MEDIA_ROOT=os.path.join(directory, 'media'), DATA_UPLOAD_MAX_MEMORY_SIZE=None)
+    with test_database(), settings:
+        department = Department.objects.create(code='RADIOLOGY', name='Radiology')
+        Category.objects.create(name='Scans', department=department)
+        user = User.objects.create_user(username='bench', password='bench', department=department)
+
+        with open(body, 'rb') as stream:
+            request = WSGIRequest({
+                'REQUEST_METHOD': 'POST',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'CONTENT_TYPE': content_type,
+                'CONTENT_LENGTH': str(os.path.getsize(body)),
+                'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80',
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': stream,
+            })
+            request.user = user
+            view = upload_file_api if mode == 'json' else stream_upload_api
+
+            baseline = peak_rss_mb()
+            start = time.perf_counter()
+            response = view(request)
+            elapsed = time.perf_counter() - start
+            print(f"{peak_rss_mb() - baseline:.1f} {elapsed:.2f} {response.status_code}")
+
+
+def run(size_mb):
+    from common import report
+
+    directory = tempfile.mkdtemp(prefix='bench_upload_')
+    try:
+        write_payloads(directory, size_mb * 1024 * 1024)
+        rows = []
+        for mode, label in [('json', 'upload_file_api (base64 JSON)'),
+                            ('raw', 'stream_upload_api (raw body)'),
+                            ('multipart', 'stream_upload_api (multipart)')]:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--dir', directory],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            growth, elapsed, status = output[-3:]
+            rows.append((label, f"peak RSS +{float(growth):8.1f} MB, {float(elapsed):6.2f} s, HTTP {status}"))
+            shutil.rmtree(os.path.join(directory, 'media'), ignore_errors=True)
+        report(f'Uploading a {size_mb} MB file', rows)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size-mb', type=int, default=100)
+    parser.add_argument('--child', choices=MODES)
+    parser.add_argument('--dir')
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.dir)
+    else:
+        run(args.size_mb)
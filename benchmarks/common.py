@@ -0,0 +1,52 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Each benchmark runs against a throwaway test database so it never touches
+db.sqlite3. Run them from the project root, e.g.:
+
+    python benchmarks/bench_category_creation.py
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'file.settings')
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def test_database():
+    """Create a fresh, migrated test database for the duration of the block"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer(label, results):
+    """Record the wall-clock time of the block in results[label]"""
+    start = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - start
+
+
+def report(title, rows):
+    """Print a simple two-column result table"""
+    print(f"\n{title}")
+    print('-' * len(title))
+    width = max(len(str(label)) for label, _ in rows)
+    for label, value in rows:
+        print(f"{str(label).ljust(width)}  {value}")
@@ -0,0 +1,11 @@
+# Celery app for TASK_BACKEND='celery'. Run one worker per task queue so the
+# concurrency of each stays bounded, e.g.
+#   celery -A file.celery worker -Q extraction -c 1
+import os
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'file.settings')
+
+app = Celery('file')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -23,8 +23,39 @@ ALLOWED_FILE_EXTENSIONS = [
     'zip', 'rar', '7z', 'tar', 'gz'
 ]
 
+# Folder tree settings: year/month/date folders are created lazily on first
+# upload, browse views show this year range virtually
+FOLDER_START_YEAR = 2015
+FOLDER_END_YEAR = 2040
+
 # Default storage backend ('local', 'aws_s3', 'gcp', 'azure')
 DEFAULT_FILE_STORAGE_BACKEND = config('DEFAULT_FILE_STORAGE_BACKEND', default='local')
+# Storage tiers of stored contents: 'hot' files sit in MEDIA_ROOT as uploaded,
+# 'warm' ones are gzipped beside them and 'cold' ones are moved to the
+# STORAGE_COLD_BACKEND (same choices as above; unset, nothing goes cold).
+# Contents older than age_days and not downloaded for idle_days move down a
+# tier in background batches every STORAGE_TIER_INTERVAL seconds; a download
+# of a warm or cold file promotes it back to hot with STORAGE_TIER_PROMOTE_ON_READ.
+STORAGE_COLD_BACKEND = config('STORAGE_COLD_BACKEND', default='')
+STORAGE_TIERS = {
+    'warm': {'age_days': 90, 'idle_days': 30},
+    'cold': {'age_days': 365, 'idle_days': 180},
+}
+STORAGE_TIER_BATCH_SIZE = 100
+STORAGE_TIER_INTERVAL = 60 * 60  # 1 hour
+STORAGE_TIER_PROMOTE_ON_READ = config('STORAGE_TIER_PROMOTE_ON_READ', default=True, cast=bool)
+STORAGE_WARM_COMPRESSLEVEL = 6
+# StorageFactory shares one client per backend per process: the HTTP connections
+# it keeps per host, and how often (seconds) a shared client is health-checked
+STORAGE_MAX_CONNECTIONS = config('STORAGE_MAX_CONNECTIONS', default=20, cast=int)
+STORAGE_HEALTH_CHECK_INTERVAL = config('STORAGE_HEALTH_CHECK_INTERVAL', default=60, cast=int)
+# Bytes a storage download holds in memory at a time while streaming
+STORAGE_STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB
+# File downloads: 'nginx' (X-Accel-Redirect to an internal location aliased to
+# MEDIA_ROOT under FILE_DOWNLOAD_ACCEL_PREFIX) or 'apache' (X-Sendfile, also lighttpd)
+# hand the transfer to the web server; unset, Django streams the file itself.
+FILE_DOWNLOAD_OFFLOAD = config('FILE_DOWNLOAD_OFFLOAD', default=None)
+FILE_DOWNLOAD_ACCEL_PREFIX = config('FILE_DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
 
 AUTH_USER_MODEL = 'filemanager.User'
 # Media files configuration
@@ -72,7 +103,7 @@ WSGI_APPLICATION = 'file.wsgi.application'
 
 
 # AWS S3 Configuration
-if DEFAULT_FILE_STORAGE_BACKEND == 'aws_s3':
+if 'aws_s3' in (DEFAULT_FILE_STORAGE_BACKEND, STORAGE_COLD_BACKEND):
     AWS_ACCESS_KEY_ID = config('AWS_ACCESS_KEY_ID')
     AWS_SECRET_ACCESS_KEY = config('AWS_SECRET_ACCESS_KEY')
     AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME')
@@ -83,15 +114,22 @@ if DEFAULT_FILE_STORAGE_BACKEND == 'aws_s3':
         'CacheControl': 'max-age=86400',
     }
     AWS_S3_FILE_OVERWRITE = False
+    AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default=None)  # e.g. a MinIO server
+
+# S3 transfers: uploads above the threshold go up as parallel multipart parts and
+# downloads are fetched as parallel ranged GETs of AWS_S3_PART_SIZE bytes.
+AWS_S3_MULTIPART_THRESHOLD = config('AWS_S3_MULTIPART_THRESHOLD', default=16 * 1024 * 1024, cast=int)
+AWS_S3_PART_SIZE = config('AWS_S3_PART_SIZE', default=8 * 1024 * 1024, cast=int)
+AWS_S3_MAX_CONCURRENCY = config('AWS_S3_MAX_CONCURRENCY', default=8, cast=int)
 
 # Google Cloud Storage Configuration
-if DEFAULT_FILE_STORAGE_BACKEND == 'gcp':
+if 'gcp' in (DEFAULT_FILE_STORAGE_BACKEND, STORAGE_COLD_BACKEND):
     GCP_STORAGE_BUCKET_NAME = config('GCP_STORAGE_BUCKET_NAME')
     # Set GOOGLE_APPLICATION_CREDENTIALS environment variable
     # or use service account JSON file
 
 # Azure Blob Storage Configuration
-if DEFAULT_FILE_STORAGE_BACKEND == 'azure':
+if 'azure' in (DEFAULT_FILE_STORAGE_BACKEND, STORAGE_COLD_BACKEND):
     AZURE_ACCOUNT_NAME = config('AZURE_ACCOUNT_NAME')
     AZURE_ACCOUNT_KEY = config('AZURE_ACCOUNT_KEY')
     AZURE_CONTAINER = config('AZURE_CONTAINER', default='files')
@@ -103,14 +141,32 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
-# Celery configuration for async tasks
-CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+# Celery configuration for async tasks; leave the broker unset to use the local task engine
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='')
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 TIME_ZONE = 'UTC'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ACKS_LATE = True  # A task lost with its worker is redelivered
+
+# Background tasks (filemanager/tasks.py): 'celery' sends them to the broker,
+# 'local' queues them in a SQLite file drained by threads in each process (or
+# by `manage.py run_tasks` when TASK_LOCAL_AUTOSTART is off), 'inline' runs
+# them in the caller. TASK_QUEUES caps how many tasks of each queue run at once
+# across all local workers; with Celery, start one worker per queue with -c.
+TASK_BACKEND = config('TASK_BACKEND', default='celery' if CELERY_BROKER_URL else 'local')
+TASK_QUEUE_PATH = config('TASK_QUEUE_PATH', default=os.path.join(BASE_DIR, 'task_queue.sqlite3'))
+TASK_LOCAL_AUTOSTART = config('TASK_LOCAL_AUTOSTART', default=True, cast=bool)
+TASK_POLL_INTERVAL = 1.0  # Seconds between checks for delayed or other processes' tasks
+TASK_QUEUES = {
+    'default': 2,
+    'extraction': 1,
+    'thumbnails': 2,
+    'stats': 1,
+    'storage': 1,
+}
 
 # Authentication settings
 LOGIN_URL = '/login/'
@@ -130,6 +186,73 @@ CACHES = {
     }
 }
 
+# Dashboard stats are cached per department and invalidated on file changes;
+# the TTL only bounds how long the 7-day recent uploads list can age
+DASHBOARD_STATS_CACHE_TIMEOUT = 300
+DASHBOARD_STATS_LOCK_TIMEOUT = 10
+
+# PDF text extraction: uploads are queued on the 'extraction' task queue, which
+# parses them in a process pool and adds the text to the search index
+TEXT_EXTRACTION_WORKERS = config('TEXT_EXTRACTION_WORKERS', default=2, cast=int)
+TEXT_EXTRACTION_MAX_CHARS = 100000
+
+# Renditions: downscaled images and PDF first pages for listings, rendered in a
+# process pool and stored next to the blobs. The least recently used are
+# deleted once they take more than RENDITION_CACHE_MAX_BYTES.
+RENDITION_SIZES = {'thumb': 256, 'preview': 1024}  # Longest side in pixels
+RENDITION_FORMAT = 'WEBP'  # JPEG is used if Pillow was built without WebP
+RENDITION_QUALITY = 80
+RENDITION_WORKERS = config('RENDITION_WORKERS', default=2, cast=int)
+RENDITION_CACHE_MAX_BYTES = config('RENDITION_CACHE_MAX_BYTES', default=1024 * 1024 * 1024, cast=int)  # 1GB
+RENDITION_TIMEOUT = 30  # Seconds a request waits for a rendition rendered on demand
+
+# Resumable uploads: chunks are written into a part file per session. Keep the
+# directory on the same filesystem as MEDIA_ROOT so completion is a rename.
+RESUMABLE_UPLOAD_DIR = config('RESUMABLE_UPLOAD_DIR', default=os.path.join(BASE_DIR, 'upload_sessions'))
+RESUMABLE_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+RESUMABLE_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024  # 64MB
+RESUMABLE_UPLOAD_TTL = 24 * 60 * 60  # Seconds an idle session is kept
+
+# Scans are kept as artifacts until they are uploaded; abandoned ones are
+# deleted SCAN_ARTIFACT_TTL seconds after they were made
+SCAN_ARTIFACT_DIR = config('SCAN_ARTIFACT_DIR', default=os.path.join(BASE_DIR, 'scan_artifacts'))
+SCAN_ARTIFACT_TTL = 2 * 60 * 60
+
+# Scanners: SCANNER_BACKEND picks the device layer, 'wia' (Windows Image
+# Acquisition) or 'fake' (simulated, see SCANNER_FAKE_OPTIONS). The scanner
+# list is cached in each process and reloaded in the background when it is
+# SCANNER_REGISTRY_TTL seconds old, on hot-plug and on device errors. Each scanner
+# gets a worker thread that runs its scan jobs in order and exits after
+# SCANNER_IDLE_TIMEOUT idle seconds; a busy device is retried
+# SCANNER_BUSY_RETRIES times, SCANNER_BUSY_RETRY_DELAY seconds apart. Clients
+# poll a job every SCAN_JOB_POLL_INTERVAL seconds and give up on it after
+# SCAN_JOB_TIMEOUT.
+SCANNER_BACKEND = config('SCANNER_BACKEND', default='wia')
+SCANNER_FAKE_OPTIONS = {'devices': 2, 'scan_seconds': 1.0}
+SCANNER_REGISTRY_TTL = 5 * 60
+SCANNER_IDLE_TIMEOUT = 5 * 60
+SCANNER_BUSY_RETRIES = 5
+SCANNER_BUSY_RETRY_DELAY = 7
+SCAN_JOB_POLL_INTERVAL = 1.0
+SCAN_JOB_TIMEOUT = 10 * 60
+
+# Scanned pages are processed in a pool of SCAN_PROCESSING_WORKERS processes
+# (0 processes them in the scanner's thread): downsampled to SCAN_TARGET_DPI,
+# deskewed when asked, then stored as CCITT G4 (black and white) or JPEG at
+# SCAN_JPEG_QUALITY. Color and grayscale pages are classified as text, mixed
+# or photo and stored with that entry of SCAN_PROFILES, which may set mode
+# (color, gray or bilevel; by default color only for pages with color),
+# target_dpi (only ever lowered) and jpeg_quality. `manage.py
+# scan_compression_report` shows the bytes each category saves.
+SCAN_PROCESSING_WORKERS = config('SCAN_PROCESSING_WORKERS', default=2, cast=int)
+SCAN_TARGET_DPI = 300
+SCAN_JPEG_QUALITY = 75
+SCAN_PROFILES = {
+    'text': {'mode': 'bilevel', 'target_dpi': 300},
+    'mixed': {'target_dpi': 200, 'jpeg_quality': 60},
+    'photo': {'target_dpi': 200, 'jpeg_quality': 75},
+}
+
 # Logging configuration
 LOGGING = {
     'version': 1,
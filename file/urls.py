@@ -14,10 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+import os
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib import admin
+from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,6 +26,9 @@ urlpatterns = [
     path('', include('filemanager.urls')),
 ]
 
-# Serve media files during development
+# MedicalFile contents (blobs/, medical_files/) are never served directly, even in
+# development: they go through the permission-checked filemanager download_file view.
+# FileDocument uploads and scans live under files/ and keep their media URLs in
+# development; production serves that prefix from the web server.
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(f'{settings.MEDIA_URL}files/', document_root=os.path.join(settings.MEDIA_ROOT, 'files'))
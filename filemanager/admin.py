@@ -53,19 +53,19 @@ class UserSessionAdmin(admin.ModelAdmin):
 
 # Category Admin
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'department')
+    list_display = ('name', 'department', 'file_count', 'total_bytes')
     list_filter = ('department',)
     search_fields = ('name', 'department__name')
 
 # Year Folder Admin
 class YearFolderAdmin(admin.ModelAdmin):
-    list_display = ('year', 'category')
+    list_display = ('year', 'category', 'file_count', 'total_bytes')
     list_filter = ('category', 'year')
     search_fields = ('category__name', 'year')
 
 # Month Folder Admin
 class MonthFolderAdmin(admin.ModelAdmin):
-    list_display = ('get_month_display', 'year_folder')
+    list_display = ('get_month_display', 'year_folder', 'file_count', 'total_bytes')
     list_filter = ('year_folder__category', 'year_folder__year', 'month')
     search_fields = ('year_folder__category__name',)
     
@@ -75,7 +75,7 @@ class MonthFolderAdmin(admin.ModelAdmin):
 
 # Date Folder Admin
 class DateFolderAdmin(admin.ModelAdmin):
-    list_display = ('date', 'month_folder')
+    list_display = ('date', 'month_folder', 'file_count', 'total_bytes')
     list_filter = ('month_folder__year_folder__year', 'month_folder__month')
     search_fields = ('month_folder__year_folder__category__name',)
 
@@ -5,9 +5,5 @@ class FilemanagerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'filemanager'
 
-class CoreConfig(AppConfig):  # or your app name
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'filemanager'
-
     def ready(self):
-        import filemanager.signals 
\ No newline at end of file
+        import filemanager.signals
@@ -0,0 +1,62 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from ...models import Blob, MedicalFile
+from ...services.blob_service import BlobService
+
+
+class Command(BaseCommand):
+    help = "Move files stored before the blob store onto shared SHA-256 blobs, deleting duplicate copies"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Files loaded per database round trip"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Hash the files and report the space that would be reclaimed without changing anything"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+        files = MedicalFile.objects.filter(blob__isnull=True).order_by('id').only('id', 'file')
+        seen = set(Blob.objects.values_list('checksum', flat=True)) if dry_run else None
+        totals = {'files': 0, 'duplicates': 0, 'missing': 0, 'reclaimed': 0}
+
+        last_id = 0
+        while True:
+            batch = list(files.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for medical_file in batch:
+                totals['files'] += 1
+                if not medical_file.file.name or not default_storage.exists(medical_file.file.name):
+                    totals['missing'] += 1
+                    continue
+
+                if dry_run:
+                    checksum, size = BlobService.storage_checksum(medical_file.file.name)
+                    if checksum in seen:
+                        totals['duplicates'] += 1
+                        totals['reclaimed'] += size
+                    seen.add(checksum)
+                    continue
+
+                reclaimed = BlobService.migrate_file(medical_file)
+                if reclaimed:
+                    totals['duplicates'] += 1
+                    totals['reclaimed'] += reclaimed
+
+            self.stdout.write(
+                f"Up to file {last_id}: {totals['files']} scanned, {totals['duplicates']} duplicates, "
+                f"{totals['missing']} missing from storage"
+            )
+
+        verb = "Would reclaim" if dry_run else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['reclaimed'] / (1024 * 1024):.1f} MB from {totals['duplicates']} duplicate copies "
+            f"across {totals['files']} files ({totals['missing']} missing from storage)"
+        ))
@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from ...services.text_extraction_service import TextExtractionService
+
+
+class Command(BaseCommand):
+    help = "Extract the text layer of PDF files into the search index, skipping files whose checksum is unchanged"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Number of extraction processes (default: all cores)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Files handed to the pool per database round trip"
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Re-extract files even when their checksum is unchanged"
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        chunksize = max(1, batch_size // (workers * 4))
+        totals = {'extracted': 0, 'unchanged': 0, 'failed': 0}
+        files = TextExtractionService.pdf_files().order_by('id').values_list('id', flat=True)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            last_id = 0
+            while True:
+                file_ids = list(files.filter(id__gt=last_id)[:batch_size])
+                if not file_ids:
+                    break
+                last_id = file_ids[-1]
+
+                jobs = TextExtractionService.jobs(file_ids, force=options['force'])
+                counts = TextExtractionService.run(jobs, executor, chunksize=chunksize)
+                for key, value in counts.items():
+                    totals[key] += value
+                totals['failed'] += len(file_ids) - len(jobs)  # Missing from storage
+                self.stdout.write(
+                    f"Up to file {last_id}: {totals['extracted']} extracted, "
+                    f"{totals['unchanged']} unchanged, {totals['failed']} unreadable"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Extracted {totals['extracted']} files with {workers} workers "
+            f"({totals['unchanged']} unchanged, {totals['failed']} unreadable)"
+        ))
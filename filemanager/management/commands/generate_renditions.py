@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from ...models import MedicalFile
+from ...services.rendition_service import IMAGE_EXTENSIONS, RenditionService
+
+
+class Command(BaseCommand):
+    help = "Render the missing thumbnails and previews of image and PDF files, then evict down to RENDITION_CACHE_MAX_BYTES"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Number of rendering processes (default: all cores)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help="Files handed to the pool per database round trip"
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = max(1, options['batch_size'])
+        renderable = Q(file_type__in=['IMG', 'PDF']) | Q(file__iendswith='.pdf')
+        for extension in IMAGE_EXTENSIONS:
+            renderable |= Q(file__iendswith=extension)
+        files = MedicalFile.objects.filter(renderable).exclude(checksum='').order_by('id').only('file', 'file_type', 'checksum')
+
+        stored = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            last_id = 0
+            while True:
+                batch = list(files.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                stored += RenditionService.run(RenditionService.jobs(batch), executor)
+                self.stdout.write(f"Up to file {last_id}: {stored} renditions stored")
+
+        stats = RenditionService.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} renditions with {workers} workers; the cache holds {stats['renditions']} "
+            f"renditions, {stats['bytes']} of {stats['max_bytes']} bytes"
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from ...services.tier_service import TierService
+
+
+class Command(BaseCommand):
+    help = "Move stored contents due for the warm or cold storage tier (STORAGE_TIERS) there now"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help="Blobs moved per batch"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        totals = {'warm': 0, 'cold': 0, 'failed': 0, 'freed': 0}
+
+        while True:
+            counts = TierService.migrate(batch_size)
+            for key, value in counts.items():
+                totals[key] += value
+            handled = counts['warm'] + counts['cold'] + counts['failed']
+            if handled:
+                self.stdout.write(
+                    f"{totals['warm']} moved to warm, {totals['cold']} moved to cold, {totals['failed']} failed"
+                )
+            # Failed blobs stay due, so a batch of nothing but failures would come back forever
+            if handled < batch_size or counts['failed'] == handled:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Freed {totals['freed'] / (1024 * 1024):.1f} MB of local disk by moving "
+            f"{totals['warm'] + totals['cold']} blobs"
+        ))
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...services.scan_artifact_service import ScanArtifactService
+
+
+class Command(BaseCommand):
+    help = "Remove scans that were not uploaded within SCAN_ARTIFACT_TTL, with their files"
+
+    def handle(self, *args, **options):
+        purged = ScanArtifactService.purge_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {purged} scans older than {settings.SCAN_ARTIFACT_TTL} seconds"
+        ))
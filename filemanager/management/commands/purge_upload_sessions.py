@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from ...services.resumable_upload_service import ResumableUploadService
+
+
+class Command(BaseCommand):
+    help = "Remove resumable upload sessions idle for longer than RESUMABLE_UPLOAD_TTL, with their part files"
+
+    def handle(self, *args, **options):
+        purged = ResumableUploadService.purge_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {purged} upload sessions idle for more than {settings.RESUMABLE_UPLOAD_TTL} seconds"
+        ))
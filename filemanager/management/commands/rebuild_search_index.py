@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ...services.search_service import SearchFactory
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for all medical files"
+
+    def handle(self, *args, **options):
+        search_service = SearchFactory.get_search_service()
+        with transaction.atomic():
+            indexed = search_service.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} files with {search_service.__class__.__name__}"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from ...models import Category, YearFolder, MonthFolder, DateFolder
+from ...services.folder_service import FolderService
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized file_count/total_bytes counters on categories and folders"
+
+    def handle(self, *args, **options):
+        FolderService.recount()
+
+        for model in (Category, YearFolder, MonthFolder, DateFolder):
+            self.stdout.write(f"Recounted {model.objects.count()} {model._meta.verbose_name_plural}")
+        self.stdout.write(self.style.SUCCESS("Folder counters rebuilt"))
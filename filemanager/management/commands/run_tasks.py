@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...tasks import LocalTaskEngine, configured_queues
+
+
+class Command(BaseCommand):
+    help = "Run background tasks from the local task queue (TASK_BACKEND='local') until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues',
+            help="Comma-separated queues to work on (default: all of TASK_QUEUES)"
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help="Show queued, running and failed task counts and the latest failures, then exit"
+        )
+
+    def handle(self, *args, **options):
+        queues = configured_queues()
+        if options['queues']:
+            names = [name.strip() for name in options['queues'].split(',') if name.strip()]
+            unknown = set(names) - set(queues)
+            if unknown:
+                raise CommandError(f"Unknown queues: {', '.join(sorted(unknown))}")
+            queues = {name: queues[name] for name in names}
+
+        engine = LocalTaskEngine(settings.TASK_QUEUE_PATH, queues, settings.TASK_POLL_INTERVAL)
+        if options['status']:
+            for queue, counts in sorted(engine.queue.counts().items()):
+                summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+                self.stdout.write(f"{queue}: {summary}")
+            for failure in engine.queue.failed(limit=10):
+                self.stdout.write(
+                    f"#{failure['id']} {failure['name']} failed after {failure['attempts']} attempts: "
+                    f"{failure['last_error']}"
+                )
+            return
+
+        self.stdout.write(f"Running tasks from {', '.join(engine.queues)} (Ctrl-C to stop)")
+        engine.start()
+        try:
+            engine._thread.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping, waiting for running tasks to finish")
+            engine.stop()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from ...services.scan_processing_service import ScanProcessingService
+
+
+class Command(BaseCommand):
+    help = "Report the bytes saved by compressing scanned pages, per content category"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Only count pages scanned in the last DAYS days"
+        )
+
+    def handle(self, *args, **options):
+        rows = ScanProcessingService.report(options['days'])
+        if not rows:
+            self.stdout.write("No scanned pages recorded")
+            return
+
+        self.stdout.write(f"{'Category':<14}{'Pages':>8}{'Scanned MB':>12}{'Stored MB':>11}{'Saved MB':>10}{'Ratio':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['category'] or 'unclassified':<14}{row['pages']:>8}{row['scanned'] / (1024 * 1024):>12.1f}"
+                f"{row['stored'] / (1024 * 1024):>11.1f}{row['saved'] / (1024 * 1024):>10.1f}{row['ratio']:>7.1f}x"
+            )
+        scanned = sum(row['scanned'] for row in rows)
+        stored = sum(row['stored'] for row in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {(scanned - stored) / (1024 * 1024):.1f} MB of {scanned / (1024 * 1024):.1f} MB scanned "
+            f"({scanned / max(stored, 1):.1f}x smaller)"
+        ))
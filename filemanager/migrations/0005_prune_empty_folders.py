@@ -0,0 +1,25 @@
+# Folders are now materialized lazily on first upload, so the rows that used to
+# be pre-created for every day from 2015 to 2040 can be dropped when empty.
+
+from django.db import migrations
+
+
+def prune_empty_folders(apps, schema_editor):
+    YearFolder = apps.get_model('filemanager', 'YearFolder')
+    MonthFolder = apps.get_model('filemanager', 'MonthFolder')
+    DateFolder = apps.get_model('filemanager', 'DateFolder')
+
+    DateFolder.objects.filter(medical_files__isnull=True).delete()
+    MonthFolder.objects.filter(date_folders__isnull=True).delete()
+    YearFolder.objects.filter(month_folders__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0004_alter_usersession_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_empty_folders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _total(queryset, group_field, value):
+    return Coalesce(Subquery(
+        queryset.filter(**{group_field: OuterRef('pk')})
+        .order_by()
+        .values(group_field)
+        .annotate(total=value)
+        .values('total')
+    ), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Category = apps.get_model('filemanager', 'Category')
+    YearFolder = apps.get_model('filemanager', 'YearFolder')
+    MonthFolder = apps.get_model('filemanager', 'MonthFolder')
+    DateFolder = apps.get_model('filemanager', 'DateFolder')
+    MedicalFile = apps.get_model('filemanager', 'MedicalFile')
+
+    files = MedicalFile.objects.all()
+    DateFolder.objects.update(
+        file_count=_total(files, 'date_folder', Count('id')),
+        total_bytes=_total(files, 'date_folder', Sum('size')),
+    )
+    MonthFolder.objects.update(
+        file_count=_total(DateFolder.objects.all(), 'month_folder', Sum('file_count')),
+        total_bytes=_total(DateFolder.objects.all(), 'month_folder', Sum('total_bytes')),
+    )
+    YearFolder.objects.update(
+        file_count=_total(MonthFolder.objects.all(), 'year_folder', Sum('file_count')),
+        total_bytes=_total(MonthFolder.objects.all(), 'year_folder', Sum('total_bytes')),
+    )
+    Category.objects.update(
+        file_count=_total(files, 'category', Count('id')),
+        total_bytes=_total(files, 'category', Sum('size')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0005_prune_empty_folders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datefolder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='datefolder',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthfolder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='monthfolder',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='yearfolder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='yearfolder',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Full-text index over MedicalFile name, description, category and uploader:
+# an FTS5 virtual table on SQLite, a tsvector table with a GIN index on
+# PostgreSQL. Other engines fall back to icontains lookups.
+
+from django.db import migrations
+
+SQLITE_TABLE = 'filemanager_medicalfile_fts'
+POSTGRES_TABLE = 'filemanager_medicalfile_search'
+
+SOURCE_SELECT = """
+    SELECT f.id, f.name, f.description, COALESCE(c.name, ''),
+           TRIM(COALESCE(u.username, '') || ' ' || COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, ''))
+    FROM filemanager_medicalfile f
+    LEFT JOIN filemanager_category c ON c.id = f.category_id
+    LEFT JOIN filemanager_user u ON u.id = f.uploaded_by_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+            f"name, description, category, uploader, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category, uploader) {SOURCE_SELECT}"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {POSTGRES_TABLE} ("
+            f"file_id bigint PRIMARY KEY REFERENCES filemanager_medicalfile (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            f"name text NOT NULL, description text NOT NULL, category text NOT NULL, uploader text NOT NULL, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {POSTGRES_TABLE}_document_idx ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (file_id, name, description, category, uploader, document) "
+            f"SELECT id, name, description, category, uploader, "
+            f"setweight(to_tsvector('simple', name), 'A') || setweight(to_tsvector('simple', category), 'B') || "
+            f"setweight(to_tsvector('simple', description), 'C') || setweight(to_tsvector('simple', uploader), 'D') "
+            f"FROM ({SOURCE_SELECT}) AS source (id, name, description, category, uploader)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0006_folder_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
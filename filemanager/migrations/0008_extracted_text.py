@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The search index gains a content column for extracted PDF text. FTS5 tables
+# cannot be altered, so on SQLite the table is recreated and repopulated; the
+# content column starts empty and is filled by the extract_pdf_text command.
+
+SQLITE_TABLE = 'filemanager_medicalfile_fts'
+POSTGRES_TABLE = 'filemanager_medicalfile_search'
+
+SOURCE_SELECT = """
+    SELECT f.id, f.name, f.description, COALESCE(c.name, ''),
+           TRIM(COALESCE(u.username, '') || ' ' || COALESCE(u.first_name, '') || ' ' || COALESCE(u.last_name, ''))
+    FROM filemanager_medicalfile f
+    LEFT JOIN filemanager_category c ON c.id = f.category_id
+    LEFT JOIN filemanager_user u ON u.id = f.uploaded_by_id
+"""
+
+
+def recreate_sqlite_index(schema_editor, columns):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+        f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {SQLITE_TABLE} (rowid, name, description, category, uploader) {SOURCE_SELECT}"
+    )
+
+
+def add_content_column(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        recreate_sqlite_index(schema_editor, ['name', 'description', 'category', 'uploader', 'content'])
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"ALTER TABLE {POSTGRES_TABLE} ADD COLUMN content text NOT NULL DEFAULT ''")
+
+
+def remove_content_column(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        recreate_sqlite_index(schema_editor, ['name', 'description', 'category', 'uploader'])
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"ALTER TABLE {POSTGRES_TABLE} DROP COLUMN content")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractedText',
+            fields=[
+                ('medical_file', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='extracted_text', serialize=False, to='filemanager.medicalfile')),
+                ('checksum', models.CharField(max_length=64)),
+                ('content', models.BinaryField(blank=True)),
+                ('char_count', models.PositiveIntegerField(default=0)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(add_content_column, remove_content_column),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0008_extracted_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalfile',
+            index=models.Index(fields=['uploaded_at', 'id'], name='medicalfile_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalfile',
+            index=models.Index(fields=['category', 'uploaded_at', 'id'], name='medicalfile_cat_uploaded_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0009_file_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalfile',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0015_scan_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scanjob',
+            name='deskew',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0016_scan_job_deskew'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanPageStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, choices=[('text', 'Text document'), ('mixed', 'Mixed'), ('photo', 'Photo')], max_length=10)),
+                ('scanned_size', models.PositiveBigIntegerField()),
+                ('stored_size', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
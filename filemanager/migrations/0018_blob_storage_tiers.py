@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('filemanager', '0017_scan_page_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='last_accessed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='stored_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='stored_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='tier',
+            field=models.CharField(choices=[('hot', 'Hot (local)'), ('warm', 'Warm (compressed local)'), ('cold', 'Cold (object store)')], default='hot', max_length=4),
+        ),
+        migrations.AddIndex(
+            model_name='blob',
+            index=models.Index(fields=['tier', 'created_at'], name='blob_tier_created_idx'),
+        ),
+    ]
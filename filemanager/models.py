@@ -1,4 +1,6 @@
-from django.db import models
+import uuid
+import zlib
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -89,14 +91,33 @@ class UserSession(models.Model):
             return f"{self.user.username}: {login_time_str} to {logout_time_str}"
         return f"{self.user.username}: {login_time_str} (Active)"
 
-class Category(models.Model):
+class FileCounters(models.Model):
+    """Denormalized file_count/total_bytes, kept in sync by the MedicalFile signals"""
+    COUNTER_FIELDS = ('file_count', 'total_bytes')
+
+    file_count = models.PositiveIntegerField(default=0)
+    total_bytes = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Counters only change through F() updates; don't write back stale in-memory values
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+class Category(FileCounters):
     name = models.CharField(max_length=100)
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='categories')
 
     def __str__(self):
         return f"{self.name} ({self.department})"
 
-class YearFolder(models.Model):
+class YearFolder(FileCounters):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='year_folders')
     year = models.PositiveIntegerField()
 
@@ -107,7 +128,7 @@ class YearFolder(models.Model):
     def __str__(self):
         return f"{self.year} - {self.category}"
 
-class MonthFolder(models.Model):
+class MonthFolder(FileCounters):
     MONTH_CHOICES = [
         (1, 'January'), (2, 'February'), (3, 'March'), (4, 'April'),
         (5, 'May'), (6, 'June'), (7, 'July'), (8, 'August'),
@@ -123,7 +144,7 @@ class MonthFolder(models.Model):
     def __str__(self):
         return f"{self.get_month_display()} {self.year_folder.year}"
 
-class DateFolder(models.Model):
+class DateFolder(FileCounters):
     month_folder = models.ForeignKey(MonthFolder, on_delete=models.CASCADE, related_name='date_folders')
     date = models.PositiveSmallIntegerField()  # Day of month (1-31)
     full_date = models.DateField(null=True, blank=True)  # Add this field to store the complete date
@@ -135,6 +156,43 @@ class DateFolder(models.Model):
     def __str__(self):
         return f"{self.date:02d}-{self.month_folder.month:02d}-{self.month_folder.year_folder.year}"
 
+class Blob(models.Model):
+    """One stored copy of a file's contents, keyed by SHA-256.
+
+    MedicalFile rows with identical contents share a blob; ref_count is the
+    number of rows pointing at it and the stored file is deleted when it
+    drops to zero.
+
+    Blobs start in the hot tier, at file in the default storage. TierService
+    moves ones that go unread to the warm tier (gzip-compressed beside it)
+    and the cold tier (STORAGE_COLD_BACKEND); stored_name is then where the
+    copy is in that tier's storage. file keeps the hot name throughout.
+    """
+    TIER_CHOICES = [
+        ('hot', 'Hot (local)'),
+        ('warm', 'Warm (compressed local)'),
+        ('cold', 'Cold (object store)'),
+    ]
+
+    checksum = models.CharField(max_length=64, primary_key=True)  # SHA-256 hex
+    file = models.FileField(upload_to='blobs/', max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    tier = models.CharField(max_length=4, choices=TIER_CHOICES, default='hot')
+    stored_name = models.CharField(max_length=255, blank=True)  # Blank in the hot tier
+    stored_size = models.PositiveBigIntegerField(null=True, blank=True)  # Bytes of a warm or cold copy
+    last_accessed = models.DateTimeField(null=True, blank=True)  # Last download, at most TOUCH_INTERVAL stale
+
+    class Meta:
+        indexes = [
+            # Tier migration scans each tier oldest first
+            models.Index(fields=['tier', 'created_at'], name='blob_tier_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.checksum} ({self.ref_count} refs)"
+
 class MedicalFile(models.Model):
     FILE_TYPES = [
         ('PDF', 'PDF Document'),
@@ -155,9 +213,216 @@ class MedicalFile(models.Model):
     description = models.TextField(blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
     size = models.PositiveIntegerField()  # in bytes
+    checksum = models.CharField(max_length=64, blank=True)  # SHA-256 hex, empty for files stored before it was recorded
+    # Shared content; file names the blob's stored file. Null until dedupe_media migrates older files
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='medical_files')
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Keyset pagination on (uploaded_at, id), overall and per category
+            models.Index(fields=['uploaded_at', 'id'], name='medicalfile_uploaded_idx'),
+            models.Index(fields=['category', 'uploaded_at', 'id'], name='medicalfile_cat_uploaded_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Keep the row and the folder counters updated by the signals in one transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_file_type_display()})"
+
+class Rendition(models.Model):
+    """Downscaled image of a file's first page, shared by every file with the same contents.
+
+    Renditions are a cache keyed by the source checksum: they are deleted
+    least recently used first once their total size passes
+    RENDITION_CACHE_MAX_BYTES. A blank file records that the source has
+    nothing to render, so it is not tried again.
+    """
+    checksum = models.CharField(max_length=64)  # SHA-256 hex of the source contents
+    size = models.CharField(max_length=16)  # Key of RENDITION_SIZES
+    file = models.FileField(upload_to='blobs/', max_length=255, blank=True)
+    bytes = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['checksum', 'size'], name='rendition_checksum_size_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.checksum} {self.size}"
+
+class ExtractedText(models.Model):
+    """Text layer extracted from a PDF MedicalFile, stored zlib-compressed.
+
+    The checksum is the SHA-256 of the file contents the text was taken from,
+    so re-extraction only happens when the file changes.
+    """
+    medical_file = models.OneToOneField(
+        MedicalFile, on_delete=models.CASCADE, primary_key=True, related_name='extracted_text'
+    )
+    checksum = models.CharField(max_length=64)
+    content = models.BinaryField(blank=True)
+    char_count = models.PositiveIntegerField(default=0)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def compress(text):
+        return zlib.compress(text.encode('utf-8')) if text else b''
+
+    @staticmethod
+    def decompress(content):
+        return zlib.decompress(content).decode('utf-8') if content else ''
+
+    @property
+    def text(self):
+        return self.decompress(self.content)
+
+    def __str__(self):
+        return f"Text of {self.medical_file_id} ({self.char_count} chars)"
+
+
+class UploadSession(models.Model):
+    """A resumable upload: chunks are written into a part file until the session is completed"""
+    STATUS_CHOICES = [
+        ('active', 'Receiving chunks'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    mimetype = models.CharField(max_length=100, blank=True)
+    description = models.TextField(blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    folder_date = models.DateField()
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True)  # Expected SHA-256, verified on completion if given
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    medical_file = models.ForeignKey(MedicalFile, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """Expected byte length of chunk `index`; only the last chunk may be short"""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+
+class UploadChunk(models.Model):
+    """A chunk of an UploadSession that has been fully written to the part file"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    offset = models.PositiveBigIntegerField()
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['index']
+        unique_together = ('session', 'index')
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.session_id}"
+
+class ScanArtifact(models.Model):
+    """A scanned page or assembled scan kept server-side until it is uploaded or expires.
+
+    The client refers to scans by id while it adds pages, previews and
+    uploads, so the bytes never travel back and forth as base64.
+    """
+    KIND_CHOICES = [
+        ('page', 'Scanned page'),
+        ('document', 'Assembled document'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scan_artifacts')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='page')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/pdf')
+    size = models.PositiveBigIntegerField()
+    checksum = models.CharField(max_length=64)  # SHA-256 hex
+    page_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.get_kind_display()})"
+
+
+class ScanJob(models.Model):
+    """A scan request handed to the worker thread of its scanner.
+
+    The request that submits a scan returns at once with the job id; the
+    client polls the job until it is done, when it names the page's
+    ScanArtifact, or has failed.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('scanning', 'Scanning'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='scan_jobs')
+    scanner_id = models.PositiveIntegerField()
+    dpi = models.PositiveIntegerField(default=300)
+    color_mode = models.CharField(max_length=20, default='Color')
+    deskew = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    artifact = models.ForeignKey(ScanArtifact, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def __str__(self):
+        return f"Scan on scanner {self.scanner_id} ({self.get_status_display()})"
+
+
+class ScanPageStat(models.Model):
+    """Size of a processed scan page before and after compression, for the savings report.
+
+    category is the compression profile the page was classified as; it is
+    blank for pages scanned in black and white, which are not classified.
+    """
+    CATEGORY_CHOICES = [
+        ('text', 'Text document'),
+        ('mixed', 'Mixed'),
+        ('photo', 'Photo'),
+    ]
+
+    category = models.CharField(max_length=10, choices=CATEGORY_CHOICES, blank=True)
+    scanned_size = models.PositiveBigIntegerField()  # Bytes the scanner delivered
+    stored_size = models.PositiveBigIntegerField()  # Bytes of the compressed page image
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     def __str__(self):
-        return f"{self.name} ({self.get_file_type_display()})"
\ No newline at end of file
+        return f"{self.category or 'unclassified'} page: {self.scanned_size} -> {self.stored_size} bytes"
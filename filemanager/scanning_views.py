@@ -1,10 +1,9 @@
 # PDF Scanning Views
-import io
+import tempfile
 import uuid
-from PIL import Image
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import A4
 import base64
+import binascii
 import json
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
@@ -12,10 +11,13 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.http import JsonResponse
 from django.contrib import messages
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.core.files.storage import default_storage
 from .models import FileDocument, FileFolder, FileCategory
 from .services.file_service import FileService
+from .services.scan_processing_service import ScanProcessingService
+
+SPOOL_MAX_SIZE = 10 * 1024 * 1024  # Larger documents spill to disk while being assembled
 
 
 class DocumentScannerView(LoginRequiredMixin, View):
@@ -43,7 +45,7 @@ class DocumentScannerView(LoginRequiredMixin, View):
                 return JsonResponse({'success': False, 'error': 'No images provided'})
             
             # Generate PDF from scanned images
-            pdf_buffer = self.create_pdf_from_images(images_data)
+            pdf_file = self.create_pdf_from_images(images_data)
             
             # Create file record
             folder = None
@@ -70,13 +72,13 @@ class DocumentScannerView(LoginRequiredMixin, View):
                 category=category,
                 file_type='application/pdf',
                 file_extension='.pdf',
-                file_size=len(pdf_buffer.getvalue()),
+                file_size=pdf_file.size,
                 storage_backend='local'
             )
             
             # Save PDF file
             file_path = f"files/{request.user.id}/scanned/{file_doc.id}.pdf"
-            file_name = default_storage.save(file_path, ContentFile(pdf_buffer.getvalue()))
+            file_name = default_storage.save(file_path, pdf_file)
             file_doc.file.name = file_name
             file_doc.save()
             
@@ -102,61 +104,41 @@ class DocumentScannerView(LoginRequiredMixin, View):
             return JsonResponse({'success': False, 'error': str(e)})
     
     def create_pdf_from_images(self, images_data):
-        """Convert base64 image data to PDF"""
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=A4)
+        """Convert base64 image data to a PDF file, fitting each image on an A4 page.
+
+        Each image is one job for the scan processing pool (downsample,
+        compress by content profile), so the pages of a document are
+        cleaned up in parallel and streamed, in order, into a temporary
+        file; the returned File is positioned at 0.
+        """
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
         page_width, page_height = A4
-        
-        for i, image_data in enumerate(images_data):
-            if i > 0:  # Add new page for subsequent images
-                pdf.showPage()
-            
-            try:
+        options = ScanProcessingService.options()
+        scanned_sizes = []
+
+        def jobs():
+            for i, image_data in enumerate(images_data):
                 # Remove data URL prefix if present
                 if ',' in image_data:
                     image_data = image_data.split(',')[1]
-                
-                # Decode base64 image
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Calculate scaling to fit page
-                img_width, img_height = image.size
-                scale_x = page_width / img_width
-                scale_y = page_height / img_height
-                scale = min(scale_x, scale_y) * 0.9  # 90% of page size for margins
-                
-                new_width = img_width * scale
-                new_height = img_height * scale
-                
-                # Center image on page
-                x_offset = (page_width - new_width) / 2
-                y_offset = (page_height - new_height) / 2
-                
-                # Save image temporarily
-                img_buffer = io.BytesIO()
-                image.save(img_buffer, format='JPEG', quality=85)
-                img_buffer.seek(0)
-                
-                # Draw image on PDF
-                pdf.drawInlineImage(
-                    img_buffer,
-                    x_offset, y_offset,
-                    width=new_width,
-                    height=new_height
-                )
-                
-            except Exception as e:
-                # If image processing fails, add a text note
-                pdf.drawString(50, page_height - 50, f"Error processing image {i+1}: {str(e)}")
-        
-        pdf.save()
-        buffer.seek(0)
-        return buffer
+                try:
+                    source = base64.b64decode(image_data)
+                except binascii.Error as e:
+                    raise ValueError(f"image {i+1} is not valid base64: {str(e)}")
+                scanned_sizes.append(len(source))
+                yield source, options
+
+        try:
+            pages = ScanProcessingService.assemble(
+                output, jobs(), page_size=A4, margin=min(page_width, page_height) * 0.05
+            )
+        except Exception as e:
+            output.close()
+            raise ValueError(f"Error processing scanned images: {str(e)}")
+        ScanProcessingService.record(scanned_sizes, pages)
+
+        output.seek(0)
+        return File(output, name='scan.pdf')
 
 
 class ScanHistoryView(LoginRequiredMixin, View):
@@ -189,7 +171,7 @@ def quick_scan_api(request):
         
         # Create quick scan PDF
         scanner_view = DocumentScannerView()
-        pdf_buffer = scanner_view.create_pdf_from_images([image_data])
+        pdf_file = scanner_view.create_pdf_from_images([image_data])
         
         # Create temporary file
         quick_scan_name = f"QuickScan_{uuid.uuid4().hex[:8]}.pdf"
@@ -201,13 +183,13 @@ def quick_scan_api(request):
             owner=request.user,
             file_type='application/pdf',
             file_extension='.pdf',
-            file_size=len(pdf_buffer.getvalue()),
+            file_size=pdf_file.size,
             storage_backend='local'
         )
         
         # Save file
         file_path = f"files/{request.user.id}/quick_scans/{file_doc.id}.pdf"
-        file_name = default_storage.save(file_path, ContentFile(pdf_buffer.getvalue()))
+        file_name = default_storage.save(file_path, pdf_file)
         file_doc.file.name = file_name
         file_doc.save()
         
@@ -0,0 +1,127 @@
+# services/blob_service.py
+import hashlib
+import logging
+import os
+import re
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from ..models import Blob, MedicalFile
+from .tier_service import TierService
+
+logger = logging.getLogger(__name__)
+
+
+class BlobService:
+    """Service class for the content-addressed, reference-counted blob store.
+
+    Contents are stored once under blobs/<sha[:2]>/<sha[2:4]>/<sha>.<ext>,
+    keeping the extension of the first upload so type checks, mimetypes and
+    web server offload see it; storing bytes that are already present only
+    bumps the blob's ref_count.
+    """
+
+    @staticmethod
+    def blob_name(checksum, filename=''):
+        """Storage name of a blob, with the extension of filename when it has a plain one"""
+        extension = os.path.splitext(filename)[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,10}', extension):
+            extension = ''
+        return f"blobs/{checksum[:2]}/{checksum[2:4]}/{checksum}{extension}"
+
+    @staticmethod
+    def acquire(checksum):
+        """Take a reference to an existing blob; returns None if there is none"""
+        if Blob.objects.filter(pk=checksum).update(ref_count=F('ref_count') + 1):
+            return Blob.objects.get(pk=checksum)
+        return None
+
+    @staticmethod
+    def store(content, checksum, size, filename=''):
+        """Return (blob, created) for content with the given SHA-256, holding one new reference.
+
+        The content is only written when no blob has this checksum yet. A
+        blob created by a concurrent upload of the same bytes wins; our copy
+        is then discarded.
+        """
+        blob = BlobService.acquire(checksum)
+        if blob:
+            return blob, False
+
+        name = default_storage.save(BlobService.blob_name(checksum, filename), content)
+        try:
+            with transaction.atomic():
+                blob = Blob.objects.create(checksum=checksum, file=name, size=size, ref_count=1)
+        except IntegrityError:
+            default_storage.delete(name)
+            blob = BlobService.acquire(checksum)
+            if blob is None:
+                raise
+            return blob, False
+        return blob, True
+
+    @staticmethod
+    def adopt(name, checksum, size):
+        """Return (blob, created) for an already stored file, holding one new reference.
+
+        The file becomes the blob in place when its contents are new;
+        otherwise the caller should repoint to the existing blob's file.
+        """
+        blob = BlobService.acquire(checksum)
+        if blob:
+            return blob, False
+        try:
+            with transaction.atomic():
+                return Blob.objects.create(checksum=checksum, file=name, size=size, ref_count=1), True
+        except IntegrityError:
+            return BlobService.acquire(checksum), False
+
+    @staticmethod
+    def storage_checksum(name):
+        """Return (sha256, size) of a stored file, streamed from storage"""
+        digest = hashlib.sha256()
+        size = 0
+        with default_storage.open(name, 'rb') as handle:
+            for chunk in handle.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), size
+
+    @staticmethod
+    def migrate_file(medical_file):
+        """Move a MedicalFile stored before the blob store onto a blob.
+
+        The first file with given contents becomes the blob in place; later
+        copies are repointed at it and their own stored file is deleted.
+        Returns the number of bytes reclaimed.
+        """
+        name = medical_file.file.name
+        checksum, size = BlobService.storage_checksum(name)
+        with transaction.atomic():
+            blob, created = BlobService.adopt(name, checksum, size)
+            MedicalFile.objects.filter(pk=medical_file.pk).update(blob=blob, file=blob.file.name, checksum=checksum)
+            if created or blob.file.name == name:
+                return 0
+            if MedicalFile.objects.filter(file=name, blob__isnull=True).exists():
+                return 0  # Another unmigrated row still points at this copy
+            transaction.on_commit(lambda: BlobService._delete_stored(name))
+        return size
+
+    @staticmethod
+    def release(checksum):
+        """Drop one reference; the blob and its stored file go when none remain"""
+        with transaction.atomic():
+            Blob.objects.filter(pk=checksum, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            blob = Blob.objects.select_for_update().filter(pk=checksum, ref_count=0).first()
+            if blob is None:
+                return
+            blob.delete()
+        # Remove the copy, in whichever tier it is, only once the row is gone for good
+        TierService.delete(blob)
+
+    @staticmethod
+    def _delete_stored(name):
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            logger.warning(f"Could not delete blob file {name}: {e}")
@@ -0,0 +1,186 @@
+# services/download_service.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from .tier_service import TierService
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class DownloadService:
+    """Service class for serving stored MedicalFiles over HTTP.
+
+    Answers conditional requests with 304, single byte ranges with 206, and
+    when FILE_DOWNLOAD_OFFLOAD is set leaves the transfer to the web server
+    (nginx X-Accel-Redirect, Apache/lighttpd X-Sendfile). Otherwise whole
+    files go out through FileResponse, which uses the server's
+    wsgi.file_wrapper (sendfile) when it has one. Files whose blob was
+    moved to the warm or cold tier are streamed from there.
+    """
+
+    @staticmethod
+    def etag(medical_file):
+        """Strong ETag from the content checksum; a weak one from size and upload time for older files"""
+        if medical_file.checksum:
+            return f'"{medical_file.checksum}"'
+        return f'W/"{medical_file.size}-{int(medical_file.uploaded_at.timestamp())}"'
+
+    @staticmethod
+    def parse_range(header, size):
+        """Return (start, end) inclusive for a single satisfiable range header.
+
+        Returns None when the whole file should be sent (no header, several
+        ranges or an unparseable header, which servers may ignore) and
+        raises ValueError when the range cannot be satisfied.
+        """
+        match = RANGE_RE.match(header.replace(' ', '')) if header else None
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        else:
+            start, end = max(0, size - int(last)), size - 1  # The final N bytes
+        if start >= size or end < start:
+            raise ValueError(f"Range not satisfiable for {size} bytes")
+        return start, end
+
+    @staticmethod
+    def if_range_matches(request, etag, last_modified):
+        """Whether an If-Range precondition (if any) still allows a partial response"""
+        if_range = request.headers.get('If-Range')
+        if not if_range:
+            return True
+        if if_range.startswith(('"', 'W/')):
+            return if_range == etag and not etag.startswith('W/')  # Strong comparison only
+        return parse_http_date_safe(if_range) == int(last_modified)
+
+    @staticmethod
+    def response(request, medical_file, as_attachment=False):
+        """Build the download response for a file the caller may read"""
+        etag = DownloadService.etag(medical_file)
+        last_modified = medical_file.uploaded_at.timestamp()
+        not_modified = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            not_modified['Last-Modified'] = http_date(last_modified)
+            return not_modified
+
+        name = medical_file.file.name
+        filename = medical_file.name or os.path.basename(name)
+        content_type = mimetypes.guess_type(filename)[0] or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+        blob = medical_file.blob if medical_file.blob_id else None
+        if blob is not None:
+            TierService.touch(blob)
+        # Warm copies that did not compress are still at the hot name
+        tiered = blob is not None and bool(blob.stored_name)
+
+        offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+        if offload and not tiered:
+            # The web server reads the file and handles Range itself
+            response = HttpResponse(content_type=content_type)
+            if offload == 'nginx':
+                response['X-Accel-Redirect'] = quote(settings.FILE_DOWNLOAD_ACCEL_PREFIX + name)
+            else:
+                response['X-Sendfile'] = medical_file.file.path
+        else:
+            size = blob.size if tiered else medical_file.file.size
+            try:
+                byte_range = DownloadService.parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            if byte_range and not DownloadService.if_range_matches(request, etag, last_modified):
+                byte_range = None
+            if tiered:
+                response = DownloadService._tiered_response(blob, byte_range, size, content_type)
+            else:
+                response = DownloadService._file_response(medical_file, byte_range, size, content_type)
+
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'  # Revalidate: access is checked per request
+        response['X-Content-Type-Options'] = 'nosniff'
+        return response
+
+    @staticmethod
+    def _file_response(medical_file, byte_range, size, content_type):
+        handle = medical_file.file.storage.open(medical_file.file.name, 'rb')
+        if byte_range is None:
+            return FileResponse(handle, content_type=content_type)
+
+        start, end = byte_range
+        handle.seek(start)
+        if end == size - 1:
+            # Open-ended ranges (video seeking) still go out through FileResponse,
+            # which sizes the response from the current file position
+            response = FileResponse(handle, content_type=content_type, status=206)
+        else:
+            response = StreamingHttpResponse(
+                DownloadService._read_range(handle, end - start + 1), content_type=content_type, status=206
+            )
+            response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
+
+    @staticmethod
+    def _tiered_response(blob, byte_range, size, content_type):
+        """Stream a warm (gzip) or cold (object store) copy; ranges are reached by reading up to them"""
+        handle = TierService.open(blob)
+        start, end = byte_range or (0, size - 1)
+        try:
+            DownloadService._skip(handle, start)
+        except Exception:
+            DownloadService._close(handle)
+            raise
+        response = StreamingHttpResponse(
+            DownloadService._read_range(handle, end - start + 1), content_type=content_type,
+            status=206 if byte_range else 200,
+        )
+        response['Content-Length'] = str(end - start + 1)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return response
+
+    @staticmethod
+    def _close(handle):
+        """Close a storage stream; some SDK downloaders (Azure's) have nothing to close"""
+        close = getattr(handle, 'close', None)
+        if close is not None:
+            close()
+
+    @staticmethod
+    def _skip(handle, offset):
+        if offset and getattr(handle, 'seekable', lambda: False)():
+            handle.seek(offset)
+            return
+        while offset > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, offset))
+            if not chunk:
+                break
+            offset -= len(chunk)
+
+    @staticmethod
+    def _read_range(handle, length):
+        try:
+            while length > 0:
+                chunk = handle.read(min(STREAM_CHUNK_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+        finally:
+            DownloadService._close(handle)
@@ -56,21 +56,20 @@ class FileService:
         # Validate file
         self.validate_file(file)
         
+        # Upload to storage; the checksums are computed while the file streams to the backend
+        upload_result = self.storage_service.upload_file(file)
+        
         # Check for duplicate files (by checksum)
-        checksum = self.storage_service.calculate_checksum(file)
         existing_file = FileDocument.objects.filter(
-            checksum=checksum, 
+            checksum=upload_result['checksum'], 
             owner=user, 
             is_active=True
         ).first()
         
         if existing_file:
+            self.storage_service.delete_file(upload_result['path'])
             raise ValidationError("This file already exists in your library")
         
-        # Upload to storage
-        file.seek(0)  # Reset file pointer after checksum calculation
-        upload_result = self.storage_service.upload_file(file)
-        
         # Create database record
         file_doc = FileDocument.objects.create(
             name=name or file.name,
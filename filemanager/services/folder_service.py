@@ -0,0 +1,165 @@
+# services/folder_service.py
+import calendar
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from ..models import Category, YearFolder, MonthFolder, DateFolder, MedicalFile
+
+
+class FolderService:
+    """Service class for the category -> year -> month -> date folder tree.
+
+    Folder rows are materialized lazily: a YearFolder, MonthFolder and
+    DateFolder only exist once a file has been stored in them. Browse views
+    fill the remaining periods in virtually with a file count of zero.
+    """
+
+    @staticmethod
+    @transaction.atomic
+    def get_date_folder(category, year, month, day):
+        """Return the DateFolder for a day, creating missing folders on first use"""
+        full_date = date(int(year), int(month), int(day))  # Raises ValueError for invalid dates
+
+        year_folder, _ = YearFolder.objects.get_or_create(category=category, year=full_date.year)
+        month_folder, _ = MonthFolder.objects.get_or_create(year_folder=year_folder, month=full_date.month)
+        date_folder, _ = DateFolder.objects.get_or_create(
+            month_folder=month_folder,
+            date=full_date.day,
+            defaults={'full_date': full_date}
+        )
+        return date_folder
+
+    @staticmethod
+    def apply_delta(date_folder_id, category_id, files, size):
+        """Add files/size (negative to subtract) to a date folder, its parents and the file's category.
+
+        Callers run inside the transaction that creates, moves or deletes
+        the MedicalFile row, so the counters never drift from the file table.
+        """
+        if not files and not size:
+            return
+
+        changes = {'file_count': F('file_count') + files, 'total_bytes': F('total_bytes') + size}
+        folder = (
+            DateFolder.objects
+            .filter(pk=date_folder_id)
+            .values('month_folder_id', 'month_folder__year_folder_id')
+            .first()
+        )
+        if folder:
+            DateFolder.objects.filter(pk=date_folder_id).update(**changes)
+            MonthFolder.objects.filter(pk=folder['month_folder_id']).update(**changes)
+            YearFolder.objects.filter(pk=folder['month_folder__year_folder_id']).update(**changes)
+        if category_id:
+            Category.objects.filter(pk=category_id).update(**changes)
+
+    @staticmethod
+    @transaction.atomic
+    def recount():
+        """Rebuild every folder and category counter from the file table"""
+        def total(queryset, group_field, value):
+            return Coalesce(Subquery(
+                queryset.filter(**{group_field: OuterRef('pk')})
+                .order_by()
+                .values(group_field)
+                .annotate(total=value)
+                .values('total')
+            ), 0)
+
+        files = MedicalFile.objects.all()
+        DateFolder.objects.update(
+            file_count=total(files, 'date_folder', Count('id')),
+            total_bytes=total(files, 'date_folder', Sum('size')),
+        )
+        MonthFolder.objects.update(
+            file_count=total(DateFolder.objects.all(), 'month_folder', Sum('file_count')),
+            total_bytes=total(DateFolder.objects.all(), 'month_folder', Sum('total_bytes')),
+        )
+        YearFolder.objects.update(
+            file_count=total(MonthFolder.objects.all(), 'year_folder', Sum('file_count')),
+            total_bytes=total(MonthFolder.objects.all(), 'year_folder', Sum('total_bytes')),
+        )
+        Category.objects.update(
+            file_count=total(files, 'category', Count('id')),
+            total_bytes=total(files, 'category', Sum('size')),
+        )
+
+    @staticmethod
+    def build_tree(categories):
+        """Build {category: {year: {month: [day, ...]}}} with the days that hold files.
+
+        Every category, browsable year and month is present, periods without
+        folders filled in virtually with no days, so the tree can be
+        navigated as if every folder existed. The days come from a single
+        query over the date folder counters folded into the tree in one
+        pass. Keys are zero-padded strings, newest first.
+        """
+        rows = (
+            DateFolder.objects
+            .filter(
+                month_folder__year_folder__category__in=categories,
+                file_count__gt=0,
+            )
+            .values_list(
+                'month_folder__year_folder__category__name',
+                'month_folder__year_folder__year',
+                'month_folder__month',
+                'date',
+            )
+            .order_by(
+                'month_folder__year_folder__category_id',
+                '-month_folder__year_folder__year',
+                '-month_folder__month',
+                '-date',
+            )
+        )
+
+        days = {}
+        file_years = {}
+        for category_name, year, month, day in rows:
+            days.setdefault((category_name, year, month), []).append(str(day).zfill(2))
+            file_years.setdefault(category_name, set()).add(year)
+
+        structure = {}
+        for name in categories.order_by('id').values_list('name', flat=True):
+            # Years outside FOLDER_START_YEAR..FOLDER_END_YEAR still show up when they hold files
+            years = sorted(set(FolderService.year_range()) | file_years.get(name, set()), reverse=True)
+            structure[name] = {
+                str(year): {str(month).zfill(2): days.get((name, year, month), []) for month in range(12, 0, -1)}
+                for year in years
+            }
+        return structure
+
+    @staticmethod
+    def year_range():
+        """Years shown by the browse views, newest first"""
+        start_year = getattr(settings, 'FOLDER_START_YEAR', 2015)
+        end_year = getattr(settings, 'FOLDER_END_YEAR', 2040)
+        return range(end_year, start_year - 1, -1)
+
+    @staticmethod
+    def virtual_years(file_counts):
+        """Every browsable year with its file count, given {year: count} for materialized folders"""
+        return [
+            {'year': year, 'file_count': file_counts.get(year, 0)}
+            for year in FolderService.year_range()
+        ]
+
+    @staticmethod
+    def virtual_months(file_counts):
+        """All twelve months with their file counts, given {month: count}"""
+        return [
+            {'month': month, 'month_name': calendar.month_name[month], 'file_count': file_counts.get(month, 0)}
+            for month in range(1, 13)
+        ]
+
+    @staticmethod
+    def virtual_days(year, month, file_counts):
+        """Every day of the month with its file count, given {day: count}"""
+        num_days = calendar.monthrange(year, month)[1]
+        return [
+            {'date': day, 'day': day, 'file_count': file_counts.get(day, 0)}
+            for day in range(1, num_days + 1)
+        ]
@@ -0,0 +1,160 @@
+# services/pagination_service.py
+import base64
+import binascii
+import json
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+class PaginationService:
+    """Keyset (cursor) pagination for the file listing APIs.
+
+    Pages are ordered on (field, id) and each cursor carries the key of the
+    row it continues from, so a page is one indexed range scan however deep
+    it is. Cursors are opaque base64 strings; there is no total COUNT(*),
+    callers ask for estimated_total() when they want one.
+    """
+
+    DEFAULT_PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 100
+    ESTIMATE_CAP = 10000
+
+    @staticmethod
+    def page_size(value, default=DEFAULT_PAGE_SIZE):
+        """Parse a per_page request value, clamped to 1..MAX_PAGE_SIZE"""
+        try:
+            size = int(value)
+        except (TypeError, ValueError):
+            return default
+        return max(1, min(size, PaginationService.MAX_PAGE_SIZE))
+
+    @staticmethod
+    def paginate(queryset, cursor=None, per_page=DEFAULT_PAGE_SIZE, field='uploaded_at', descending=True):
+        """Return one page of queryset ordered by (field, id).
+
+        Returns {'items', 'next_cursor', 'previous_cursor', 'has_next',
+        'has_previous'}. Raises ValueError for a malformed cursor or one
+        issued for a different ordering.
+        """
+        backwards = False
+        if cursor:
+            state = PaginationService.decode_cursor(cursor)
+            if state.get('f') != field or state.get('desc') != descending or not isinstance(state.get('id'), int):
+                raise ValueError("Cursor does not match this ordering")
+            backwards = state.get('d') == 'previous'
+            try:
+                value = queryset.model._meta.get_field(field).to_python(state['v'])
+            except (FieldDoesNotExist, ValidationError) as e:
+                raise ValueError(f"Invalid cursor: {e}")
+
+            # Walking backwards flips the scan direction; the page is reversed afterwards.
+            # The leading inclusive bound gives the index a range to seek to.
+            lookup = 'lt' if descending != backwards else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value}) | Q(**{f'id__{lookup}': state['id']}),
+            )
+
+        if descending != backwards:
+            queryset = queryset.order_by(f'-{field}', '-id')
+        else:
+            queryset = queryset.order_by(field, 'id')
+
+        # Page the primary keys first so the range scan stays on the index, then
+        # load the rows (with their select_related joins) by primary key
+        keys = list(queryset.values_list('pk', flat=True)[:per_page + 1])
+        has_more = len(keys) > per_page
+        keys = keys[:per_page]
+        if backwards:
+            keys.reverse()
+        rows = queryset.in_bulk(keys) if keys else {}
+        items = [rows[key] for key in keys if key in rows]
+
+        has_next = has_more if not backwards else True
+        has_previous = bool(cursor) if not backwards else has_more
+
+        def cursor_for(item, direction):
+            return PaginationService.encode_cursor({
+                'f': field,
+                'desc': descending,
+                'v': PaginationService._key_value(item, field),
+                'id': item.pk,
+                'd': direction,
+            })
+
+        return {
+            'items': items,
+            'next_cursor': cursor_for(items[-1], 'next') if items and has_next else None,
+            'previous_cursor': cursor_for(items[0], 'previous') if items and has_previous else None,
+            'has_next': has_next,
+            'has_previous': has_previous,
+        }
+
+    @staticmethod
+    def paginate_ranked(queryset, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+        """Page an already ordered queryset by offset.
+
+        For relevance ordering, whose computed score cannot be used as a
+        keyset; the offset is bounded by the number of matches.
+        """
+        offset = 0
+        if cursor:
+            state = PaginationService.decode_cursor(cursor)
+            if state.get('f') != 'rank' or not isinstance(state.get('o'), int) or state['o'] < 0:
+                raise ValueError("Cursor does not match this ordering")
+            offset = state['o']
+
+        items = list(queryset[offset:offset + per_page + 1])
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        return {
+            'items': items,
+            'next_cursor': PaginationService.encode_cursor({'f': 'rank', 'o': offset + per_page}) if has_next else None,
+            'previous_cursor': (
+                PaginationService.encode_cursor({'f': 'rank', 'o': max(0, offset - per_page)}) if offset else None
+            ),
+            'has_next': has_next,
+            'has_previous': offset > 0,
+        }
+
+    @staticmethod
+    def estimated_total(queryset, cap=ESTIMATE_CAP):
+        """Approximate number of rows without an exact COUNT(*).
+
+        Uses the planner's row estimate on PostgreSQL and a count capped at
+        `cap` rows elsewhere. Returns {'count': n, 'exact': bool}.
+        """
+        queryset = queryset.order_by()
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return {'count': int(plan[0]['Plan']['Plan Rows']), 'exact': False}
+
+        count = queryset[:cap].count()
+        return {'count': count, 'exact': count < cap}
+
+    @staticmethod
+    def encode_cursor(state):
+        payload = json.dumps(state, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            state = json.loads(payload)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Invalid cursor: {e}")
+        if not isinstance(state, dict):
+            raise ValueError("Invalid cursor")
+        return state
+
+    @staticmethod
+    def _key_value(item, field):
+        value = getattr(item, field)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
@@ -0,0 +1,283 @@
+# services/rendition_service.py
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.urls import reverse
+from django.utils import timezone
+from PIL import features
+from ..models import Blob, MedicalFile, Rendition
+from ..utils.renditions import render_renditions
+from .blob_service import BlobService
+from .tier_service import TierService
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+TOUCH_INTERVAL = timedelta(hours=1)  # How stale last_used may get before a read rewrites it
+
+
+class RenditionPending(Exception):
+    """A rendition is still being rendered; it is stored by a background run"""
+
+
+class RenditionService:
+    """Service class for thumbnails and previews of image and PDF files.
+
+    Renditions are keyed by the SHA-256 of the source, so identical uploads
+    share them and a rendition URL (which carries the checksum) always
+    names the same image, letting browsers cache it for good. Sources are
+    decoded in pool processes; only the parent process touches storage and
+    the database.
+    """
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def image_format():
+        image_format = getattr(settings, 'RENDITION_FORMAT', 'WEBP').upper()
+        if image_format == 'WEBP' and not features.check('webp'):
+            return 'JPEG'
+        return image_format
+
+    @staticmethod
+    def is_pdf(medical_file):
+        return medical_file.file_type == 'PDF' or medical_file.file.name.lower().endswith('.pdf')
+
+    @staticmethod
+    def renderable(medical_file):
+        """Whether a file can have renditions: an image or a PDF whose checksum is recorded"""
+        return bool(medical_file.checksum) and (
+            RenditionService.is_pdf(medical_file)
+            or medical_file.file_type == 'IMG'
+            or medical_file.file.name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+
+    @staticmethod
+    def url(medical_file, size='thumb'):
+        """URL of a file's rendition, or None for files that cannot have one"""
+        if not RenditionService.renderable(medical_file):
+            return None
+        return reverse('file_rendition', args=[medical_file.id, size, medical_file.checksum[:16]])
+
+    @staticmethod
+    def rendition_name(checksum, size, image_format):
+        """Stored next to the blob: blobs/<sha[:2]>/<sha[2:4]>/<sha>.<size>.<ext>"""
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        return f"{BlobService.blob_name(checksum)}.{size}.{extension}"
+
+    @staticmethod
+    def jobs(medical_files, sizes=None):
+        """Build render jobs for the missing renditions of files, one per distinct contents.
+
+        Pass the jobs to run(), or release their paths with TierService.release().
+        """
+        all_sizes = settings.RENDITION_SIZES
+        sizes = sizes or list(all_sizes)
+        sources = {
+            medical_file.checksum: medical_file
+            for medical_file in medical_files
+            if RenditionService.renderable(medical_file)
+        }
+        present = set(
+            Rendition.objects
+            .filter(checksum__in=list(sources), size__in=sizes)
+            .values_list('checksum', 'size')
+        )
+        blobs = Blob.objects.in_bulk(list(sources))
+        image_format = RenditionService.image_format()
+        quality = getattr(settings, 'RENDITION_QUALITY', 80)
+
+        jobs = []
+        for checksum, medical_file in sources.items():
+            missing = [(size, all_sizes[size]) for size in sizes if (checksum, size) not in present]
+            if not missing:
+                continue
+            # Warm and cold blobs are staged to a temporary file, which run() and get() release
+            path = TierService.local_path(blobs.get(checksum), medical_file.file.name)
+            if path is None:
+                continue
+            jobs.append((checksum, path, RenditionService.is_pdf(medical_file), missing, image_format, quality))
+        return jobs
+
+    @staticmethod
+    def run(jobs, executor=None):
+        """Render the given jobs, in executor if one is passed, and store the results.
+
+        Returns the number of renditions stored.
+        """
+        results = executor.map(render_renditions, jobs) if executor else map(render_renditions, jobs)
+        sizes = {job[0]: [size for size, _ in job[3]] for job in jobs}
+        stored = 0
+        try:
+            for result in results:
+                if result is not None:
+                    stored += len(RenditionService.save(result[0], result[1], sizes[result[0]]))
+        finally:
+            for job in jobs:
+                TierService.release(job[1])
+        if stored:
+            RenditionService.evict()
+        return stored
+
+    @staticmethod
+    def generate(file_ids, executor=None):
+        """Render and store the missing renditions of the given files"""
+        medical_files = MedicalFile.objects.filter(id__in=file_ids).only('file', 'file_type', 'checksum')
+        return RenditionService.run(RenditionService.jobs(medical_files), executor)
+
+    @staticmethod
+    def save(checksum, renditions, sizes):
+        """Store rendered (size, data, width, height) tuples; sizes left without one are recorded as blank.
+
+        Returns the Rendition rows, keeping the row of a concurrent render
+        of the same contents if there was one.
+        """
+        image_format = RenditionService.image_format()
+        rendered = {rendition[0]: rendition for rendition in renditions}
+        now = timezone.now()
+        rows = []
+        for size in sizes:
+            _, data, width, height = rendered.get(size, (size, b'', 0, 0))
+            name = ''
+            if data:
+                name = default_storage.save(
+                    RenditionService.rendition_name(checksum, size, image_format), ContentFile(data)
+                )
+            try:
+                with transaction.atomic():
+                    row = Rendition.objects.create(
+                        checksum=checksum, size=size, file=name, bytes=len(data),
+                        width=width, height=height, last_used=now,
+                    )
+            except IntegrityError:
+                row = Rendition.objects.get(checksum=checksum, size=size)
+                if name and name != row.file.name:
+                    RenditionService._delete_stored([name])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def get(medical_file, size, timeout=None):
+        """Return the file's Rendition of a size, rendering it in the pool if it is missing.
+
+        Returns None when the file cannot have one: not an image or PDF, or
+        its source is missing. Raises RenditionPending when the
+        render did not finish within timeout (RENDITION_TIMEOUT by default)
+        seconds or the pool died; the caller should queue generate_renditions.
+        """
+        if not RenditionService.renderable(medical_file):
+            return None
+        rendition = Rendition.objects.filter(checksum=medical_file.checksum, size=size).first()
+        if rendition is not None:
+            RenditionService.touch(rendition)
+            return rendition
+
+        jobs = RenditionService.jobs([medical_file], [size])
+        if not jobs:
+            # Rendered meanwhile, or a source that is missing
+            return Rendition.objects.filter(checksum=medical_file.checksum, size=size).first()
+        timeout = timeout if timeout is not None else getattr(settings, 'RENDITION_TIMEOUT', 30)
+        try:
+            result = RenditionService.pool().submit(render_renditions, jobs[0]).result(timeout=timeout)
+        except TimeoutError:
+            logger.warning(f"Rendering {size} of file {medical_file.id} took over {timeout}s")
+            raise RenditionPending(f"Rendering {size} of file {medical_file.id} is taking a while")
+        except BrokenProcessPool as e:
+            logger.error(f"Rendition pool died, it will be restarted: {e}")
+            RenditionService.reset_pool()
+            raise RenditionPending(f"Rendering {size} of file {medical_file.id} was interrupted")
+        finally:
+            # A render still running may lose its copy; the queued background run stages its own
+            TierService.release(jobs[0][1])
+        if result is None:
+            return None  # The source file is missing
+        rows = RenditionService.save(result[0], result[1], [size])
+        RenditionService.evict()
+        return rows[0]
+
+    @staticmethod
+    def touch(rendition):
+        """Mark a rendition as used, writing at most once per TOUCH_INTERVAL"""
+        now = timezone.now()
+        if rendition.last_used < now - TOUCH_INTERVAL:
+            Rendition.objects.filter(pk=rendition.pk).update(last_used=now)
+            rendition.last_used = now
+
+    @staticmethod
+    def evict(max_bytes=None):
+        """Delete least recently used renditions until they fit in max_bytes; returns how many went.
+
+        Blank rows take no space and are kept, so unrenderable files are not
+        retried.
+        """
+        if max_bytes is None:
+            max_bytes = getattr(settings, 'RENDITION_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+        total = Rendition.objects.aggregate(total=Sum('bytes'))['total'] or 0
+        excess = total - max_bytes
+        if excess <= 0:
+            return 0
+
+        evicted = []
+        for pk, name, size in (
+            Rendition.objects.filter(bytes__gt=0).order_by('last_used', 'pk').values_list('pk', 'file', 'bytes').iterator()
+        ):
+            evicted.append((pk, name))
+            excess -= size
+            if excess <= 0:
+                break
+        with transaction.atomic():
+            Rendition.objects.filter(pk__in=[pk for pk, _ in evicted]).delete()
+            names = [name for _, name in evicted]
+            transaction.on_commit(lambda: RenditionService._delete_stored(names))
+        logger.info(f"Evicted {len(evicted)} renditions to fit the {max_bytes} byte cache")
+        return len(evicted)
+
+    @staticmethod
+    def purge(checksum):
+        """Delete every rendition of some contents, e.g. once their blob is gone"""
+        names = list(Rendition.objects.filter(checksum=checksum).exclude(file='').values_list('file', flat=True))
+        Rendition.objects.filter(checksum=checksum).delete()
+        if names:
+            transaction.on_commit(lambda: RenditionService._delete_stored(names))
+
+    @staticmethod
+    def stats():
+        """Return the rendition cache's size against its limit"""
+        totals = Rendition.objects.filter(bytes__gt=0).aggregate(total=Sum('bytes'))
+        return {
+            'renditions': Rendition.objects.filter(bytes__gt=0).count(),
+            'bytes': totals['total'] or 0,
+            'max_bytes': getattr(settings, 'RENDITION_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+        }
+
+    @classmethod
+    def pool(cls):
+        """Shared process pool for rendering"""
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ProcessPoolExecutor(max_workers=getattr(settings, 'RENDITION_WORKERS', 2))
+            return cls._pool
+
+    @classmethod
+    def reset_pool(cls):
+        """Drop the shared pool after a worker crash; the next pool() call starts a fresh one"""
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+
+    @staticmethod
+    def _delete_stored(names):
+        for name in names:
+            try:
+                default_storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete rendition {name}: {e}")
@@ -0,0 +1,209 @@
+# services/resumable_upload_service.py
+import hashlib
+import logging
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import UploadSession, UploadChunk
+from ..utils.helpers import file_checksum
+from .folder_service import FolderService
+from .upload_service import UploadService
+
+logger = logging.getLogger(__name__)
+
+WRITE_BLOCK_SIZE = 64 * 1024
+
+
+class ResumableUploadService:
+    """Service class for resumable chunked uploads.
+
+    A session preallocates a part file of the final size and every chunk is
+    written straight to its offset, so chunks can arrive in any order or in
+    parallel and completion needs no concatenation: the part file is renamed
+    into storage. A chunk is only recorded once it is fully on disk; sessions
+    and their part files survive worker restarts.
+    """
+
+    @staticmethod
+    def part_path(session):
+        return os.path.join(settings.RESUMABLE_UPLOAD_DIR, f"{session.id}.part")
+
+    @staticmethod
+    def create_session(user, category, folder_date, filename, size, chunk_size=None,
+                       mimetype='', description='', checksum=''):
+        """Start an upload of `size` bytes; raises ValueError for invalid parameters"""
+        filename = os.path.basename(filename or '')
+        if not filename:
+            raise ValueError("A filename is required")
+        size = int(size)
+        if size <= 0:
+            raise ValueError("size must be a positive number of bytes")
+        if size > settings.MAX_FILE_SIZE:
+            raise ValueError(f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB")
+        chunk_size = int(chunk_size or settings.RESUMABLE_UPLOAD_CHUNK_SIZE)
+        if not 0 < chunk_size <= settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 and {settings.RESUMABLE_UPLOAD_MAX_CHUNK_SIZE} bytes")
+        checksum = (checksum or '').lower()
+        if checksum and not re.fullmatch(r'[0-9a-f]{64}', checksum):
+            raise ValueError("checksum must be a hex SHA-256 digest")
+
+        session = UploadSession.objects.create(
+            user=user,
+            filename=filename,
+            mimetype=mimetype or '',
+            description=description or '',
+            category=category,
+            folder_date=folder_date,
+            size=size,
+            chunk_size=chunk_size,
+            checksum=checksum,
+        )
+        try:
+            os.makedirs(settings.RESUMABLE_UPLOAD_DIR, exist_ok=True)
+            with open(ResumableUploadService.part_path(session), 'wb') as handle:
+                handle.truncate(size)  # Sparse where the filesystem supports it
+        except OSError:
+            # e.g. ENOSPC or EFBIG: keep neither the session nor a partly allocated file
+            session.delete()
+            try:
+                os.remove(ResumableUploadService.part_path(session))
+            except OSError:
+                pass
+            raise
+        return session
+
+    @staticmethod
+    def write_chunk(session, index, stream, checksum=None):
+        """Write chunk `index` from a stream to its offset in the part file.
+
+        The chunk must be exactly session.chunk_length(index) bytes and, when
+        a checksum is given, match its SHA-256. Re-sending a chunk overwrites
+        it, so it counts as missing until the new bytes are fully written.
+        Raises ValueError otherwise; the chunk is left unrecorded in that case.
+        """
+        if session.status != 'active':
+            raise ValueError("Upload session is not accepting chunks")
+        if not 0 <= index < session.chunk_count:
+            raise ValueError(f"Chunk index must be between 0 and {session.chunk_count - 1}")
+
+        expected = session.chunk_length(index)
+        offset = index * session.chunk_size
+        digest = hashlib.sha256()
+        written = 0
+        # The old bytes are overwritten from the first block on
+        UploadChunk.objects.filter(session=session, index=index).delete()
+        try:
+            with open(ResumableUploadService.part_path(session), 'r+b') as handle:
+                handle.seek(offset)
+                while written < expected:
+                    data = stream.read(min(WRITE_BLOCK_SIZE, expected - written))
+                    if not data:
+                        break
+                    handle.write(data)
+                    digest.update(data)
+                    written += len(data)
+                if written != expected or stream.read(1):
+                    raise ValueError(f"Chunk {index} must be exactly {expected} bytes")
+                if checksum and digest.hexdigest() != checksum.lower():
+                    raise ValueError(f"Chunk {index} does not match its checksum")
+                handle.flush()
+                os.fsync(handle.fileno())
+        except FileNotFoundError:
+            raise ValueError("Upload session data is missing")
+
+        UploadChunk.objects.update_or_create(
+            session=session, index=index, defaults={'offset': offset, 'size': expected}
+        )
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+
+    @staticmethod
+    def status(session):
+        """Describe which chunks and byte ranges have been received"""
+        received = list(session.chunks.order_by('index').values_list('index', 'offset', 'size'))
+        received_indexes = {index for index, _, _ in received}
+
+        # Merge adjacent chunks into [start, end) byte ranges
+        ranges = []
+        for _, offset, size in received:
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = offset + size
+            else:
+                ranges.append([offset, offset + size])
+
+        return {
+            'upload_id': str(session.id),
+            'status': session.status,
+            'filename': session.filename,
+            'size': session.size,
+            'chunk_size': session.chunk_size,
+            'chunk_count': session.chunk_count,
+            'bytes_received': sum(size for _, _, size in received),
+            'received_chunks': sorted(received_indexes),
+            'missing_chunks': [index for index in range(session.chunk_count) if index not in received_indexes],
+            'received_ranges': ranges,
+            'file_id': session.medical_file_id,
+        }
+
+    @staticmethod
+    def complete(session):
+        """Move the assembled file into storage and create its MedicalFile.
+
+        Completing an already completed session returns the same file, or
+        None once that file has been deleted. Raises ValueError while chunks are missing or if the file does not
+        match the checksum given when the session was created.
+        """
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if session.status == 'complete':
+                return session.medical_file  # Null once the file is deleted
+
+            received = session.chunks.count()
+            if received < session.chunk_count:
+                raise ValueError(f"{session.chunk_count - received} chunks are still missing")
+
+            path = ResumableUploadService.part_path(session)
+            checksum = file_checksum(path)
+            if session.checksum and checksum != session.checksum:
+                raise ValueError("The assembled file does not match the expected checksum")
+
+            date_folder = FolderService.get_date_folder(
+                session.category, session.folder_date.year, session.folder_date.month, session.folder_date.day
+            )
+            medical_file = UploadService.store_file(
+                path,
+                session.filename,
+                checksum,
+                uploaded_by=session.user,
+                file_type=UploadService.detect_file_type(session.mimetype, session.filename),
+                description=session.description,
+                date_folder=date_folder,
+                category=session.category,
+            )
+            session.status = 'complete'
+            session.medical_file = medical_file
+            session.save(update_fields=['status', 'medical_file', 'updated_at'])
+            session.chunks.all().delete()
+
+        logger.info(f"Completed upload session {session.id} as file {medical_file.id}")
+        return medical_file
+
+    @staticmethod
+    def abort(session):
+        """Discard a session and its part file"""
+        try:
+            os.remove(ResumableUploadService.part_path(session))
+        except FileNotFoundError:
+            pass
+        session.delete()
+
+    @staticmethod
+    def purge_expired(now=None):
+        """Abort sessions idle for longer than RESUMABLE_UPLOAD_TTL and drop old completed ones"""
+        cutoff = (now or timezone.now()) - timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL)
+        expired = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+        for session in expired:
+            ResumableUploadService.abort(session)
+        return len(expired)
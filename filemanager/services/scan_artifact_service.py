@@ -0,0 +1,146 @@
+# services/scan_artifact_service.py
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import ScanArtifact
+from ..utils.helpers import file_checksum
+from ..utils.pdf_assembler import PdfAssembler
+from .upload_service import UploadService
+
+logger = logging.getLogger(__name__)
+
+
+class ScanArtifactService:
+    """Service class for scans kept server-side between scanning and upload.
+
+    Each scanned page becomes an artifact owned by the user who scanned
+    it; pages are merged and uploaded by id. Uploading consumes the
+    artifact's file (it is moved into the blob store), and artifacts that
+    are never uploaded are removed by purge_expired once SCAN_ARTIFACT_TTL
+    has passed.
+    """
+
+    @staticmethod
+    def path(artifact):
+        return os.path.join(settings.SCAN_ARTIFACT_DIR, str(artifact.id))
+
+    @staticmethod
+    def temp_path(suffix=''):
+        """A fresh path in the artifact directory, on the same filesystem so create() is a rename"""
+        os.makedirs(settings.SCAN_ARTIFACT_DIR, exist_ok=True)
+        return os.path.join(settings.SCAN_ARTIFACT_DIR, f"tmp-{uuid.uuid4().hex}{suffix}")
+
+    @staticmethod
+    def create(user, path, filename, kind='page', page_count=1, content_type='application/pdf'):
+        """Turn a finished file into an artifact of `user`; the file is moved, not copied"""
+        artifact = ScanArtifact(
+            user=user,
+            kind=kind,
+            filename=os.path.basename(filename),
+            content_type=content_type,
+            size=os.path.getsize(path),
+            checksum=file_checksum(path),
+            page_count=page_count,
+            expires_at=timezone.now() + timedelta(seconds=settings.SCAN_ARTIFACT_TTL),
+        )
+        os.replace(path, ScanArtifactService.path(artifact))
+        try:
+            artifact.save()
+        except Exception:
+            os.remove(ScanArtifactService.path(artifact))
+            raise
+        return artifact
+
+    @staticmethod
+    def get_many(user, artifact_ids):
+        """The user's unexpired artifacts, in the order of artifact_ids.
+
+        Raises ScanArtifact.DoesNotExist if any is missing, belongs to
+        someone else, has expired or is not a valid id.
+        """
+        try:
+            ids = [uuid.UUID(str(artifact_id)) for artifact_id in artifact_ids]
+        except ValueError:
+            raise ScanArtifact.DoesNotExist("Invalid scan id")
+        artifacts = ScanArtifact.objects.filter(id__in=ids, user=user, expires_at__gt=timezone.now()).in_bulk()
+        missing = [str(artifact_id) for artifact_id in ids if artifact_id not in artifacts]
+        if missing:
+            raise ScanArtifact.DoesNotExist(f"Scans not found or expired: {', '.join(missing)}")
+        return [artifacts[artifact_id] for artifact_id in ids]
+
+    @staticmethod
+    def get(user, artifact_id):
+        return ScanArtifactService.get_many(user, [artifact_id])[0]
+
+    @staticmethod
+    def merge(user, artifacts, filename):
+        """Assemble PDF artifacts, in order, into a new document artifact; the pages are kept.
+
+        Pages are streamed into the output one at a time with their JPEG
+        data copied as is, so a long batch scan is never held in memory.
+        """
+        output_path = ScanArtifactService.temp_path('.pdf')
+        try:
+            with open(output_path, 'wb') as output:
+                assembler = PdfAssembler(output)
+                for artifact in artifacts:
+                    assembler.add_pdf(ScanArtifactService.path(artifact))
+                assembler.close()
+        except Exception:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        return ScanArtifactService.create(
+            user, output_path, filename, kind='document', page_count=assembler.page_count
+        )
+
+    @staticmethod
+    def upload(user, artifacts, filename=None, **fields):
+        """Store artifacts as one MedicalFile, merging several first, and consume them"""
+        if len(artifacts) > 1:
+            document = ScanArtifactService.merge(user, artifacts, filename or artifacts[0].filename)
+        else:
+            document = artifacts[0]
+        medical_file = UploadService.store_file(
+            ScanArtifactService.path(document),
+            os.path.basename(filename or document.filename),
+            document.checksum,
+            **fields,
+        )
+        ScanArtifactService.discard(*artifacts, document)
+        return medical_file
+
+    @staticmethod
+    def discard(*artifacts):
+        """Delete artifacts and their files"""
+        ids = {artifact.id for artifact in artifacts}
+        ScanArtifact.objects.filter(id__in=ids).delete()
+        for artifact_id in ids:
+            path = os.path.join(settings.SCAN_ARTIFACT_DIR, str(artifact_id))
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def purge_expired():
+        """Delete expired artifacts, and files left in the directory by interrupted scans; returns how many rows went"""
+        expired = list(ScanArtifact.objects.filter(expires_at__lte=timezone.now()))
+        with transaction.atomic():
+            ScanArtifactService.discard(*expired)
+
+        # Files with no row: temp files of crashed scans and merges
+        cutoff = time.time() - settings.SCAN_ARTIFACT_TTL
+        known = {str(artifact_id) for artifact_id in ScanArtifact.objects.values_list('id', flat=True)}
+        directory = settings.SCAN_ARTIFACT_DIR
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            path = os.path.join(directory, name)
+            try:
+                if name not in known and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove stale scan file {path}: {e}")
+        return len(expired)
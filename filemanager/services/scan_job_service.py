@@ -0,0 +1,253 @@
+# services/scan_job_service.py
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from ..models import ScanJob
+from .scan_artifact_service import ScanArtifactService
+from .scan_processing_service import ScanProcessingService
+from .scanner_service import ScannerBusyError, ScannerError, ScannerFactory, ScannerRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ScanJobService:
+    """Service class for scans run by the scanner workers instead of request threads.
+
+    submit() records a job and hands it to the worker thread of its
+    scanner; the worker scans the page, retrying while the device is busy,
+    and stores it as a ScanArtifact the client then refers to. With
+    TASK_BACKEND 'inline' the scan runs in the caller instead.
+    """
+
+    @staticmethod
+    def submit(user, scanner_id, dpi=300, color_mode='Color', deskew=False):
+        job = ScanJob.objects.create(
+            user=user, scanner_id=scanner_id, dpi=dpi, color_mode=color_mode, deskew=deskew
+        )
+        if getattr(settings, 'TASK_BACKEND', 'local') == 'inline':
+            ScanJobService.run_inline(job.id, scanner_id)
+            job.refresh_from_db()
+        else:
+            transaction.on_commit(lambda: ScannerWorkerPool.instance().submit(scanner_id, job.id))
+        return job
+
+    @staticmethod
+    def get(user, job_id):
+        """The user's job; raises ScanJob.DoesNotExist.
+
+        A job still unfinished SCAN_JOB_TIMEOUT seconds after submission
+        (its worker's process died, say) is marked failed.
+        """
+        try:
+            job = ScanJob.objects.select_related('artifact').get(id=uuid.UUID(str(job_id)), user=user)
+        except ValueError:
+            raise ScanJob.DoesNotExist("Invalid scan job id")
+        if not job.finished and job.created_at < timezone.now() - timedelta(seconds=settings.SCAN_JOB_TIMEOUT):
+            ScanJobService.fail(job.id, "Scan timed out")
+            job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def run(device, job_id):
+        """Scan a job's page on an open device into a new artifact.
+
+        The job records the outcome, unless get() has meanwhile failed it for
+        taking too long; the artifact is discarded then. Device errors other
+        than a busy device that outlasted the retries are re-raised so the
+        worker reconnects.
+        """
+        started = ScanJob.objects.filter(id=job_id, status='queued').update(
+            status='scanning', started_at=timezone.now()
+        )
+        if not started:
+            return  # Timed out or already run
+        job = ScanJob.objects.select_related('user').get(id=job_id)
+
+        image_path = ScanArtifactService.temp_path('.img')
+        pdf_path = ScanArtifactService.temp_path('.pdf')
+        try:
+            retries = settings.SCANNER_BUSY_RETRIES
+            for attempt in range(1, retries + 2):
+                job.attempts = attempt
+                try:
+                    device.scan(image_path, dpi=job.dpi, color_mode=job.color_mode)
+                    break
+                except ScannerBusyError:
+                    if attempt > retries:
+                        raise
+                    logger.warning(f"Scanner {job.scanner_id} busy, retrying scan (attempt {attempt})...")
+                    time.sleep(settings.SCANNER_BUSY_RETRY_DELAY)
+
+            # Clean the page up (downsample, deskew, compress by its content
+            # profile) in the processing pool and wrap it in a one-page PDF
+            options = ScanProcessingService.options(job.color_mode, job.dpi, job.deskew)
+            with open(pdf_path, 'wb') as output:
+                pages = ScanProcessingService.assemble(output, [(image_path, options)])
+            ScanProcessingService.record([os.path.getsize(image_path)], pages)
+
+            job.artifact = ScanArtifactService.create(
+                job.user, pdf_path, f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+            )
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"Scan job {job.id} on scanner {job.scanner_id} failed: {e}", exc_info=not isinstance(e, ScannerError))
+            job.status = 'failed'
+            job.error = str(e)
+            if isinstance(e, ScannerError) and not isinstance(e, ScannerBusyError):
+                raise
+        finally:
+            finished = ScanJob.objects.filter(id=job.id, status='scanning').update(
+                status=job.status, attempts=job.attempts, error=job.error, artifact=job.artifact,
+                finished_at=timezone.now(),
+            )
+            if not finished and job.artifact is not None:
+                # Already reported failed to the client: nobody will upload this scan
+                logger.warning(f"Scan job {job.id} finished after it timed out, discarding its scan")
+                ScanArtifactService.discard(job.artifact)
+            for path in (image_path, pdf_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def run_inline(job_id, scanner_id):
+        """Open the scanner, run one job and close it, all in the calling thread"""
+        service = ScannerFactory.get_scanner_service()
+        with service.session():
+            try:
+                device = service.open_device(scanner_id)
+            except ScannerError as e:
+                ScanJobService.fail(job_id, str(e))
+                return
+            try:
+                ScanJobService.run(device, job_id)
+            except ScannerError:
+                pass  # Recorded on the job
+            finally:
+                device.close()
+
+    @staticmethod
+    def fail(job_id, error):
+        """Mark an unfinished job failed"""
+        ScanJob.objects.filter(id=job_id, status__in=['queued', 'scanning']).update(
+            status='failed', error=error, finished_at=timezone.now()
+        )
+
+    @staticmethod
+    def purge_finished():
+        """Delete jobs finished more than SCAN_ARTIFACT_TTL ago; their artifacts have expired by then"""
+        cutoff = timezone.now() - timedelta(seconds=settings.SCAN_ARTIFACT_TTL)
+        return ScanJob.objects.filter(finished_at__lt=cutoff).delete()[0]
+
+
+class ScannerWorkerPool:
+    """One owner thread per scanner, running that scanner's jobs in submission order.
+
+    A scanner's thread starts with its first job, keeps the device open
+    (and, for WIA, its COM apartment) across jobs and exits once idle for
+    idle_timeout seconds. Scanners work in parallel, and a busy or slow
+    device only holds up its own queue. Device failures are reported to
+    on_device_error, which the shared pool points at the scanner registry.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, scanner_service, run_job, fail_job, idle_timeout=300, on_device_error=None):
+        self.scanner_service = scanner_service
+        self.run_job = run_job
+        self.fail_job = fail_job
+        self.idle_timeout = idle_timeout
+        self.on_device_error = on_device_error
+        self._queues = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def instance(cls):
+        """The pool of this process, for the configured scanner backend"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    ScannerFactory.get_scanner_service(),
+                    ScanJobService.run,
+                    ScanJobService.fail,
+                    settings.SCANNER_IDLE_TIMEOUT,
+                    # A scanner that fails may have been unplugged
+                    on_device_error=lambda scanner_id: ScannerRegistry.instance().invalidate(),
+                )
+            return cls._instance
+
+    def submit(self, scanner_id, job_id):
+        """Queue a job on its scanner's thread, starting the thread if it is not running"""
+        with self._lock:
+            jobs = self._queues.setdefault(scanner_id, queue.Queue())
+            jobs.put(job_id)
+            thread = self._threads.get(scanner_id)
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=self._own, args=(scanner_id, jobs), name=f'scanner-{scanner_id}', daemon=True
+                )
+                self._threads[scanner_id] = thread
+                thread.start()
+
+    def pending(self):
+        """{scanner_id: jobs waiting}, the running ones excluded"""
+        with self._lock:
+            return {scanner_id: jobs.qsize() for scanner_id, jobs in self._queues.items()}
+
+    def stop(self):
+        """Let each thread finish the jobs queued so far, then exit"""
+        with self._lock:
+            threads = list(self._threads.items())
+            for scanner_id, _ in threads:
+                self._queues[scanner_id].put(None)
+        for _, thread in threads:
+            thread.join()
+
+    def _own(self, scanner_id, jobs):
+        device = None
+        with self.scanner_service.session():
+            try:
+                while True:
+                    try:
+                        job_id = jobs.get(timeout=self.idle_timeout)
+                    except queue.Empty:
+                        with self._lock:
+                            if jobs.empty():
+                                del self._threads[scanner_id]
+                                return
+                        continue
+                    if job_id is None:
+                        return
+
+                    try:
+                        if device is None:
+                            device = self.scanner_service.open_device(scanner_id)
+                        self.run_job(device, job_id)
+                    except Exception as e:
+                        logger.warning(f"Scanner {scanner_id} failed, reconnecting for the next job: {e}")
+                        try:
+                            self.fail_job(job_id, str(e))
+                        except Exception as fail_error:
+                            logger.error(f"Could not record failure of scan job {job_id}: {fail_error}")
+                        if device is not None:
+                            device.close()
+                            device = None
+                        if self.on_device_error is not None:
+                            self.on_device_error(scanner_id)
+                    finally:
+                        # The thread may idle for long; don't hold a database connection
+                        connection.close()
+            finally:
+                if device is not None:
+                    device.close()
+                with self._lock:
+                    if self._threads.get(scanner_id) is threading.current_thread():
+                        del self._threads[scanner_id]
@@ -0,0 +1,112 @@
+# services/scan_processing_service.py
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+from ..models import ScanPageStat
+from ..utils.pdf_assembler import PdfAssembler
+from ..utils.scan_pipeline import PROFILES, process_pages
+
+logger = logging.getLogger(__name__)
+
+# Scanner color modes (WIA intents) and the pipeline mode each is stored in:
+# color and grayscale pages are classified and compressed by their profile
+COLOR_MODES = {'Color': 'auto', 'Grayscale': 'auto', 'BlackAndWhite': 'bilevel'}
+
+
+class ScanProcessingService:
+    """Service class for cleaning up scanned pages before they are stored.
+
+    Each page runs through the stages of utils.scan_pipeline (decode,
+    downsample to SCAN_TARGET_DPI, deskew, color conversion, compression:
+    CCITT G4 for black and white, JPEG for the rest) in a shared process
+    pool, several pages at a time, and is streamed into a PDF in order.
+    Color and grayscale pages are classified as text, mixed or photo and
+    stored with that profile of SCAN_PROFILES; the bytes each saves are
+    recorded for report().
+    """
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def options(color_mode='Color', dpi=None, deskew=False):
+        """Pipeline options for a page scanned in a color mode at dpi"""
+        return {
+            'mode': COLOR_MODES.get(color_mode, 'color'),
+            'dpi': dpi,
+            'target_dpi': getattr(settings, 'SCAN_TARGET_DPI', 300),
+            'deskew': deskew,
+            'jpeg_quality': getattr(settings, 'SCAN_JPEG_QUALITY', 75),
+            'profiles': getattr(settings, 'SCAN_PROFILES', PROFILES),
+        }
+
+    @classmethod
+    def pool(cls):
+        """Shared process pool for page processing"""
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ProcessPoolExecutor(max_workers=getattr(settings, 'SCAN_PROCESSING_WORKERS', 2))
+            return cls._pool
+
+    @classmethod
+    def reset_pool(cls):
+        """Drop the shared pool after a worker crash; the next pool() call starts a fresh one"""
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+
+    @staticmethod
+    def executor():
+        """The pool pages are processed in, or None to process them in the calling thread"""
+        if getattr(settings, 'TASK_BACKEND', 'local') == 'inline' or not getattr(settings, 'SCAN_PROCESSING_WORKERS', 2):
+            return None
+        return ScanProcessingService.pool()
+
+    @staticmethod
+    def assemble(output, jobs, **assembler_options):
+        """Process (source, options) page jobs and write them, in order, as a PDF to output.
+
+        Sources are paths or bytes (they are sent to pool processes). Jobs
+        are consumed lazily, a few pages ahead of the one being written.
+        Returns the (category, stored bytes) of each page.
+        """
+        assembler = PdfAssembler(output, **assembler_options)
+        pages = []
+        try:
+            for page in process_pages(jobs, ScanProcessingService.executor()):
+                assembler.add_encoded(page)
+                pages.append((page.category, len(page.data)))
+        except BrokenProcessPool as e:
+            logger.error(f"Scan processing pool died, it will be restarted: {e}")
+            ScanProcessingService.reset_pool()
+            raise
+        assembler.close()
+        return pages
+
+    @staticmethod
+    def record(scanned_sizes, pages):
+        """Record the scanned size of each page next to what assemble() stored it in"""
+        ScanPageStat.objects.bulk_create([
+            ScanPageStat(category=category or '', scanned_size=scanned_size, stored_size=stored_size)
+            for scanned_size, (category, stored_size) in zip(scanned_sizes, pages)
+        ])
+
+    @staticmethod
+    def report(days=None):
+        """Pages, bytes scanned, stored and saved per category, over the last days or all time"""
+        stats = ScanPageStat.objects.all()
+        if days is not None:
+            stats = stats.filter(created_at__gte=timezone.now() - timedelta(days=days))
+        rows = stats.values('category').annotate(
+            pages=Count('id'), scanned=Sum('scanned_size'), stored=Sum('stored_size')
+        ).order_by('category')
+        return [
+            {**row, 'saved': row['scanned'] - row['stored'], 'ratio': row['scanned'] / max(row['stored'], 1)}
+            for row in rows
+        ]
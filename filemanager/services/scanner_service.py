@@ -0,0 +1,393 @@
+# services/scanner_service.py
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from PIL import Image, ImageDraw
+
+# Windows Image Acquisition is only needed by the backend that uses it
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:
+    pythoncom = None
+
+logger = logging.getLogger(__name__)
+
+WIA_DEVICE_TYPE_SCANNER = 1
+WIA_ERROR_BUSY = -2145320954  # 0x80210006
+WIA_INTENTS = {'Color': 1, 'Grayscale': 2, 'BlackAndWhite': 4}
+WIA_EVENT_DEVICE_CONNECTED = '{A28BBADE-64B6-11D2-A231-00C04FA31809}'
+WIA_EVENT_DEVICE_DISCONNECTED = '{143E4E83-6497-11D2-A231-00C04FA31809}'
+
+
+class ScannerError(Exception):
+    """A scanner could not be reached or failed to scan"""
+
+
+class ScannerBusyError(ScannerError):
+    """The scanner is in use by someone else; the scan can be retried"""
+
+
+class BaseScannerService:
+    """Device layer driven by the scanner workers (see ScannerWorkerPool).
+
+    A worker thread enters session() once, opens its scanner with
+    open_device() and scans pages with the device until it fails or the
+    worker idles out. Implementations may assume a device is only used
+    from the thread that opened it.
+    """
+
+    def session(self):
+        """Per-thread setup (and teardown) the backend needs around device use"""
+        return nullcontext()
+
+    def list_devices(self):
+        """Return the attached scanners as [{'id', 'name', 'description'}]"""
+        raise NotImplementedError
+
+    def open_device(self, scanner_id):
+        """Connect to a scanner by id; raises ScannerError if it cannot be reached"""
+        raise NotImplementedError
+
+    def watch(self, callback):
+        """Call callback() whenever a scanner is plugged in or removed.
+
+        Returns a threading.Event that stops watching when set, or None if
+        the backend cannot report hot-plug events.
+        """
+        return None
+
+
+class BaseScannerDevice:
+    def scan(self, path, dpi=300, color_mode='Color'):
+        """Scan one page into an image file at path.
+
+        Raises ScannerBusyError when the device is in use and ScannerError
+        for other failures.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the device"""
+
+
+class WIAScannerService(BaseScannerService):
+    """Scanners attached to this Windows machine, through Windows Image Acquisition"""
+
+    def __init__(self):
+        if pythoncom is None:
+            raise ImproperlyConfigured("The wia scanner backend requires the pywin32 package")
+
+    @contextmanager
+    def session(self):
+        pythoncom.CoInitialize()
+        try:
+            yield
+        finally:
+            pythoncom.CoUninitialize()
+
+    def list_devices(self):
+        with self.session():
+            try:
+                devices = win32com.client.Dispatch("WIA.DeviceManager").DeviceInfos
+                scanners = []
+                for i in range(1, devices.Count + 1):
+                    device = devices.Item(i)
+                    if device.Type == WIA_DEVICE_TYPE_SCANNER:
+                        scanners.append({
+                            'id': i,
+                            'name': device.Properties.Item("Name").Value,
+                            'description': device.Properties.Item("Description").Value
+                                if device.Properties.Exists("Description") else ""
+                        })
+                return scanners
+            except pythoncom.com_error as e:
+                raise wia_error(e)
+
+    def open_device(self, scanner_id):
+        try:
+            devices = win32com.client.Dispatch("WIA.DeviceManager").DeviceInfos
+            if devices.Count < scanner_id:
+                raise ScannerError(f"Scanner ID {scanner_id} not found")
+            return WIAScannerDevice(devices.Item(scanner_id).Connect())
+        except pythoncom.com_error as e:
+            raise wia_error(e)
+
+    def watch(self, callback):
+        stopped = threading.Event()
+
+        class DeviceEvents:
+            def OnEvent(self, event_id, device_id, item_id):
+                callback()
+
+        def pump():
+            # WIA delivers events to the apartment that registered for them
+            with self.session():
+                try:
+                    manager = win32com.client.DispatchWithEvents("WIA.DeviceManager", DeviceEvents)
+                    for event_id in (WIA_EVENT_DEVICE_CONNECTED, WIA_EVENT_DEVICE_DISCONNECTED):
+                        manager.RegisterEvent(event_id, '*')
+                except pythoncom.com_error as e:
+                    logger.warning(f"Scanner hot-plug events unavailable: {wia_error(e)}")
+                    return
+                while not stopped.wait(0.5):
+                    pythoncom.PumpWaitingMessages()
+
+        threading.Thread(target=pump, name='wia-events', daemon=True).start()
+        return stopped
+
+
+class WIAScannerDevice(BaseScannerDevice):
+    def __init__(self, device):
+        self.device = device
+        self.item = device.Items.Item(1)
+
+    def scan(self, path, dpi=300, color_mode='Color'):
+        try:
+            self.item.Properties.Item("Horizontal Resolution").Value = dpi
+            self.item.Properties.Item("Vertical Resolution").Value = dpi
+            self.item.Properties.Item("Current Intent").Value = WIA_INTENTS.get(color_mode, WIA_INTENTS['Color'])
+        except Exception as config_error:
+            logger.warning(f"Scanner config error: {config_error}")
+
+        try:
+            self.item.Transfer().SaveFile(path)
+        except pythoncom.com_error as e:
+            raise wia_error(e)
+
+    def close(self):
+        # Dropping the references releases the COM objects
+        self.item = None
+        self.device = None
+
+
+def wia_error(error):
+    """Translate a COM error into ScannerBusyError or ScannerError"""
+    message = error.excepinfo[2] if error.excepinfo and error.excepinfo[2] else str(error)
+    codes = {error.hresult, error.excepinfo[5] if error.excepinfo else None}
+    if WIA_ERROR_BUSY in codes or 'device is busy' in message.lower():
+        return ScannerBusyError(f"WIA device is busy: {message}")
+    return ScannerError(f"Scanner communication error: {message}")
+
+
+class FakeScannerService(BaseScannerService):
+    """Simulated scanners for development, tests and benchmarks where WIA is unavailable.
+
+    Pages are A4 sheets of grey "text" lines. Scans take scan_seconds.
+    Like real devices, a scanner scans one page at a time: a scan started
+    while another is running fails with ScannerBusyError, as do the first
+    busy_scans scans of each device. busy_errors counts the refusals.
+    Listing devices takes list_seconds, like a COM enumeration, and is
+    counted in enumerations; plug() simulates hot-plugging.
+    """
+
+    def __init__(self, devices=2, scan_seconds=0.0, busy_scans=0, page_inches=(8.27, 11.69), list_seconds=0.0):
+        self.devices = devices
+        self.list_seconds = list_seconds
+        self.enumerations = 0
+        self._watchers = []
+        self.scan_seconds = scan_seconds
+        self.busy_scans = busy_scans
+        self.page_inches = page_inches
+        self.scans = 0
+        self.busy_errors = 0
+        self._scanning = set()
+        self._busy_left = {}
+        self._lock = threading.Lock()
+
+    def list_devices(self):
+        time.sleep(self.list_seconds)
+        with self._lock:
+            self.enumerations += 1
+        return [
+            {'id': i, 'name': f'Fake Scanner {i}', 'description': 'Simulated scanner'}
+            for i in range(1, self.devices + 1)
+        ]
+
+    def watch(self, callback):
+        self._watchers.append(callback)
+        return threading.Event()
+
+    def plug(self, devices):
+        """Change how many scanners are attached and send the hot-plug event"""
+        self.devices = devices
+        for callback in self._watchers:
+            callback()
+
+    def open_device(self, scanner_id):
+        if not 1 <= scanner_id <= self.devices:
+            raise ScannerError(f"Scanner ID {scanner_id} not found")
+        return FakeScannerDevice(self, scanner_id)
+
+
+class FakeScannerDevice(BaseScannerDevice):
+    def __init__(self, service, scanner_id):
+        self.service = service
+        self.scanner_id = scanner_id
+
+    def scan(self, path, dpi=300, color_mode='Color'):
+        service = self.service
+        with service._lock:
+            busy_left = service._busy_left.setdefault(self.scanner_id, service.busy_scans)
+            if busy_left or self.scanner_id in service._scanning:
+                service._busy_left[self.scanner_id] = max(0, busy_left - 1)
+                service.busy_errors += 1
+                raise ScannerBusyError("WIA device is busy")
+            service._scanning.add(self.scanner_id)
+        try:
+            time.sleep(self.service.scan_seconds)
+            width, height = (round(inches * dpi) for inches in self.service.page_inches)
+            image = Image.new('L' if color_mode in ('Grayscale', 'BlackAndWhite') else 'RGB', (width, height), 'white')
+            draw = ImageDraw.Draw(image)
+            line_height = max(1, dpi // 6)
+            for top in range(dpi, height - dpi, line_height * 2):
+                draw.rectangle([dpi, top, width - dpi, top + line_height // 2], fill='gray')
+            image.save(path, 'JPEG', quality=85, dpi=(dpi, dpi))
+        finally:
+            with service._lock:
+                service._scanning.discard(self.scanner_id)
+                service.scans += 1
+
+
+class ScannerRegistry:
+    """The attached scanners, enumerated once and then served from memory.
+
+    Listing scanners through WIA takes hundreds of milliseconds, so the
+    first call loads the list and later calls return it at once. Once it is
+    ttl seconds old it is still served while a background thread reloads
+    it; hot-plug events from the backend and device errors reported with
+    invalidate() start the same reload. A failed reload keeps the last
+    list.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, scanner_service, ttl=300):
+        self.scanner_service = scanner_service
+        self.ttl = ttl
+        self.last_error = None
+        self._devices = None
+        self._loaded_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._watch = scanner_service.watch(self.invalidate)
+
+    @classmethod
+    def instance(cls):
+        """The registry of this process, for the configured scanner backend"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(ScannerFactory.get_scanner_service(), settings.SCANNER_REGISTRY_TTL)
+            return cls._instance
+
+    @classmethod
+    def reset(cls):
+        """Drop the shared registry, e.g. after switching backends"""
+        with cls._instance_lock:
+            if cls._instance is not None:
+                cls._instance.close()
+            cls._instance = None
+
+    def devices(self):
+        """The attached scanners as list_devices() returns them.
+
+        Only the first call waits for an enumeration; raises ScannerError
+        if that fails.
+        """
+        with self._lock:
+            devices = self._devices
+            stale = time.monotonic() - self._loaded_at >= self.ttl
+        if devices is None:
+            return self.refresh()
+        if stale:
+            self.refresh_async()
+        return list(devices)
+
+    def get(self, scanner_id):
+        """A scanner by id, or None"""
+        return next((device for device in self.devices() if device['id'] == scanner_id), None)
+
+    def refresh(self):
+        """Enumerate the scanners now and return the new list"""
+        with self._load_lock:
+            try:
+                devices = self.scanner_service.list_devices()
+            except Exception as e:
+                with self._lock:
+                    self.last_error = str(e)
+                    # Wait another ttl before retrying in the background
+                    self._loaded_at = time.monotonic()
+                    devices = self._devices
+                if devices is None:
+                    raise
+                logger.warning(f"Reloading the scanner list failed, keeping the last one: {e}")
+                return list(devices)
+            with self._lock:
+                self._devices = devices
+                self._loaded_at = time.monotonic()
+                self.last_error = None
+            return list(devices)
+
+    def refresh_async(self):
+        """Reload the list in a background thread unless a reload is already running"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def reload():
+            try:
+                self.refresh()
+            except Exception:
+                pass  # Recorded in last_error
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=reload, name='scanner-registry', daemon=True).start()
+
+    def invalidate(self):
+        """The set of scanners may have changed (hot-plug, device error): reload in the background"""
+        self.refresh_async()
+
+    def close(self):
+        """Stop watching for hot-plug events"""
+        if self._watch is not None:
+            self._watch.set()
+
+
+class ScannerFactory:
+    """Factory class handing out the process's scanner service for SCANNER_BACKEND.
+
+    A backend's constructor arguments come from SCANNER_<BACKEND>_OPTIONS,
+    e.g. SCANNER_FAKE_OPTIONS = {'devices': 4, 'scan_seconds': 2}.
+    """
+
+    services = {
+        'wia': WIAScannerService,
+        'fake': FakeScannerService,
+    }
+    _instances = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_scanner_service(cls, backend=None):
+        backend = backend or settings.SCANNER_BACKEND
+        service_class = cls.services.get(backend)
+        if not service_class:
+            raise ValueError(f"Unsupported scanner backend: {backend}")
+        with cls._lock:
+            if backend not in cls._instances:
+                cls._instances[backend] = service_class(**getattr(settings, f'SCANNER_{backend.upper()}_OPTIONS', {}))
+            return cls._instances[backend]
+
+    @classmethod
+    def reset(cls):
+        """Drop the shared services, e.g. after changing their options"""
+        with cls._lock:
+            cls._instances.clear()
@@ -0,0 +1,277 @@
+# services/search_service.py
+import re
+from django.db import connection
+from django.db.models import Q, Value, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from ..models import MedicalFile, ExtractedText
+
+# Markers wrapped around matches by the database; swapped for <mark> tags after escaping
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+
+class BaseSearchService:
+    """Full-text search over MedicalFile name, description, category, uploader and extracted PDF text"""
+
+    table_name = 'filemanager_medicalfile_fts'
+    batch_size = 500
+    max_terms = 16
+
+    def filter(self, queryset, query, rank=False):
+        """Restrict a MedicalFile queryset to matches.
+
+        With rank=True the rows also carry search_rank (higher is better) for
+        relevance ordering; leave it off when sorting by another column.
+        """
+        raise NotImplementedError
+
+    def highlight(self, file_ids, query):
+        """Return {file_id: {'name': html, 'description': html, 'content': html}} with matches wrapped in <mark>"""
+        return {}
+
+    def index_files(self, file_ids):
+        """Add or refresh the index entries for the given files"""
+        pass
+
+    def remove_files(self, file_ids):
+        """Drop the index entries for the given files"""
+        pass
+
+    def rebuild(self):
+        """Re-index every file, returning the number of indexed files"""
+        self.clear()
+        indexed, last_id = 0, 0
+        while True:
+            file_ids = list(
+                MedicalFile.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not file_ids:
+                return indexed
+            self.index_files(file_ids)
+            indexed += len(file_ids)
+            last_id = file_ids[-1]
+
+    def clear(self):
+        pass
+
+    def no_matches(self, queryset, rank=False):
+        queryset = queryset.none()
+        if rank:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+    def terms(self, query):
+        """Split a user query into lowercase word terms"""
+        return re.findall(r'\w+', query.lower())[:self.max_terms]
+
+    def documents(self, file_ids):
+        """Yield (id, name, description, category, uploader, content) rows for indexing"""
+        rows = MedicalFile.objects.filter(id__in=file_ids).values_list(
+            'id', 'name', 'description', 'category__name',
+            'uploaded_by__username', 'uploaded_by__first_name', 'uploaded_by__last_name',
+            'extracted_text__content',
+        )
+        for file_id, name, description, category, username, first_name, last_name, content in rows:
+            uploader = ' '.join(part for part in (username, first_name, last_name) if part)
+            yield file_id, name or '', description or '', category or '', uploader, ExtractedText.decompress(content)
+
+    def render_highlight(self, text):
+        """Escape highlighted text and turn the match markers into <mark> tags"""
+        return escape(text or '').replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+    def _chunks(self, values):
+        values = list(values)
+        for start in range(0, len(values), self.batch_size):
+            yield values[start:start + self.batch_size]
+
+
+class LikeSearchService(BaseSearchService):
+    """Fallback for databases without a full-text index: chained icontains lookups"""
+
+    def filter(self, queryset, query, rank=False):
+        queryset = queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(uploaded_by__username__icontains=query) |
+            Q(category__name__icontains=query)
+        )
+        if rank:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+
+class SQLiteSearchService(BaseSearchService):
+    """SQLite FTS5 virtual table keyed by MedicalFile id (rowid)"""
+
+    def match_expression(self, query):
+        # Quote every term and prefix-match it, e.g. 'lab res' -> '"lab"* "res"*'
+        return ' '.join(f'"{term}"*' for term in self.terms(query))
+
+    def filter(self, queryset, query, rank=False):
+        match = self.match_expression(query)
+        if not match:
+            return self.no_matches(queryset, rank)
+
+        if rank:
+            # Join the index so FTS5 computes bm25 once per match
+            # (weights: name, description, category, uploader, content)
+            file_table = MedicalFile._meta.db_table
+            return queryset.extra(
+                tables=[self.table_name],
+                where=[f'{self.table_name}.rowid = {file_table}.id', f'{self.table_name} MATCH %s'],
+                params=[match],
+                select={'search_rank': f'-bm25({self.table_name}, 10.0, 2.0, 5.0, 1.0, 1.0)'},
+            )
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {self.table_name} WHERE {self.table_name} MATCH %s', [match])
+        )
+
+    def highlight(self, file_ids, query):
+        match = self.match_expression(query)
+        if not match:
+            return {}
+
+        results = {}
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(file_ids):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f"SELECT rowid, highlight({self.table_name}, 0, %s, %s), "
+                    f"snippet({self.table_name}, 1, %s, %s, '...', 16), "
+                    f"snippet({self.table_name}, 4, %s, %s, '...', 16) "
+                    f"FROM {self.table_name} WHERE {self.table_name} MATCH %s AND rowid IN ({placeholders})",
+                    [HIGHLIGHT_START, HIGHLIGHT_END] * 3 + [match, *chunk]
+                )
+                for file_id, name, description, content in cursor.fetchall():
+                    results[file_id] = {
+                        'name': self.render_highlight(name),
+                        'description': self.render_highlight(description),
+                        'content': self.render_highlight(content),
+                    }
+        return results
+
+    def index_files(self, file_ids):
+        for chunk in self._chunks(file_ids):
+            self.remove_files(chunk)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {self.table_name} (rowid, name, description, category, uploader, content) '
+                    f'VALUES (%s, %s, %s, %s, %s, %s)',
+                    list(self.documents(chunk))
+                )
+
+    def remove_files(self, file_ids):
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(file_ids):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f'DELETE FROM {self.table_name} WHERE rowid IN ({placeholders})', chunk)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table_name}')
+
+
+class PostgresSearchService(BaseSearchService):
+    """PostgreSQL table holding a weighted tsvector per MedicalFile, with a GIN index"""
+
+    table_name = 'filemanager_medicalfile_search'
+
+    def match_expression(self, query):
+        # Prefix-match every term, e.g. 'lab res' -> 'lab:* & res:*'
+        return ' & '.join(f'{term}:*' for term in self.terms(query))
+
+    def filter(self, queryset, query, rank=False):
+        match = self.match_expression(query)
+        if not match:
+            return self.no_matches(queryset, rank)
+
+        if rank:
+            file_table = MedicalFile._meta.db_table
+            return queryset.extra(
+                tables=[self.table_name],
+                where=[
+                    f'{self.table_name}.file_id = {file_table}.id',
+                    f"{self.table_name}.document @@ to_tsquery('simple', %s)",
+                ],
+                params=[match],
+                select={'search_rank': f"ts_rank({self.table_name}.document, to_tsquery('simple', %s))"},
+                select_params=[match],
+            )
+        return queryset.filter(
+            id__in=RawSQL(
+                f"SELECT file_id FROM {self.table_name} WHERE document @@ to_tsquery('simple', %s)", [match]
+            )
+        )
+
+    def highlight(self, file_ids, query):
+        match = self.match_expression(query)
+        if not match:
+            return {}
+
+        options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, HighlightAll=true'
+        snippet_options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords=16'
+        results = {}
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(file_ids):
+                cursor.execute(
+                    f"SELECT file_id, ts_headline('simple', name, to_tsquery('simple', %s), %s), "
+                    f"ts_headline('simple', description, to_tsquery('simple', %s), %s), "
+                    f"ts_headline('simple', content, to_tsquery('simple', %s), %s) "
+                    f"FROM {self.table_name} WHERE file_id = ANY(%s)",
+                    [match, options, match, snippet_options, match, snippet_options, chunk]
+                )
+                for file_id, name, description, content in cursor.fetchall():
+                    results[file_id] = {
+                        'name': self.render_highlight(name),
+                        'description': self.render_highlight(description),
+                        'content': self.render_highlight(content),
+                    }
+        return results
+
+    def index_files(self, file_ids):
+        for chunk in self._chunks(file_ids):
+            self._upsert(chunk)
+
+    def _upsert(self, file_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} (file_id, name, description, category, uploader, content, document) "
+                f"VALUES (%s, %s, %s, %s, %s, %s, "
+                f"setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                f"setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'D') || "
+                f"setweight(to_tsvector('simple', %s), 'D')) "
+                f"ON CONFLICT (file_id) DO UPDATE SET name = EXCLUDED.name, description = EXCLUDED.description, "
+                f"category = EXCLUDED.category, uploader = EXCLUDED.uploader, content = EXCLUDED.content, "
+                f"document = EXCLUDED.document",
+                [
+                    (file_id, name, description, category, uploader, content,
+                     name, category, description, uploader, content)
+                    for file_id, name, description, category, uploader, content in self.documents(file_ids)
+                ]
+            )
+
+    def remove_files(self, file_ids):
+        with connection.cursor() as cursor:
+            for chunk in self._chunks(file_ids):
+                cursor.execute(f'DELETE FROM {self.table_name} WHERE file_id = ANY(%s)', [chunk])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.table_name}')
+
+
+class SearchFactory:
+    """Factory class to get the search service for the database engine in use"""
+
+    @staticmethod
+    def get_search_service(vendor=None):
+        services = {
+            'sqlite': SQLiteSearchService,
+            'postgresql': PostgresSearchService,
+        }
+
+        service_class = services.get(vendor or connection.vendor, LikeSearchService)
+        return service_class()
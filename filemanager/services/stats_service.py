@@ -0,0 +1,167 @@
+# services/stats_service.py
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from ..models import Category, MedicalFile
+
+logger = logging.getLogger(__name__)
+
+
+class StatsService:
+    """Service class for the dashboard statistics"""
+
+    CACHE_PREFIX = 'dashboard_stats'
+    ALL_DEPARTMENTS = 'all'
+
+    @staticmethod
+    def get_stats(categories, recent_days=7, recent_limit=10):
+        """Return category, total and recent-upload statistics for a set of categories.
+
+        Per-category counts come from the materialized counters in a single
+        query and the totals are summed from that same result; recent uploads
+        are one select_related query. Pass recent_days=None to list the most
+        recent uploads regardless of age.
+        """
+        category_rows = list(
+            categories
+            .order_by('id')
+            .values('id', 'name', 'department__name', 'file_count', 'total_bytes')
+        )
+
+        recent_uploads = (
+            MedicalFile.objects
+            .filter(category__in=[row['id'] for row in category_rows])
+            .select_related('category', 'uploaded_by')
+            .order_by('-uploaded_at')
+        )
+        if recent_days is not None:
+            recent_uploads = recent_uploads.filter(
+                uploaded_at__gte=timezone.now() - timedelta(days=recent_days)
+            )
+
+        return {
+            'category_stats': [
+                {
+                    'name': row['name'],
+                    'description': row['department__name'] or '',
+                    'file_count': row['file_count'],
+                    'total_bytes': row['total_bytes'],
+                }
+                for row in category_rows
+            ],
+            'category_count': len(category_rows),
+            'total_files': sum(row['file_count'] for row in category_rows),
+            'storage_used': sum(row['total_bytes'] for row in category_rows),
+            'recent_uploads': list(recent_uploads[:recent_limit]),
+        }
+
+    @staticmethod
+    def cache_scope(user):
+        """Cache scope for a user: staff share one entry, everyone else is per department"""
+        if user.is_staff:
+            return StatsService.ALL_DEPARTMENTS
+        return f"department:{user.department_id}"
+
+    @staticmethod
+    def get_cached_stats(categories, scope):
+        """Return get_stats(categories) through the cache, recomputing at most once per scope.
+
+        Entries are versioned per scope and invalidated by the MedicalFile
+        signals. On a miss only the request holding the recompute lock runs
+        the queries; concurrent requests wait for its result instead of all
+        hitting the database at once. If the cache is unreachable the stats
+        are computed directly.
+        """
+        timeout = getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 300)
+        lock_timeout = getattr(settings, 'DASHBOARD_STATS_LOCK_TIMEOUT', 10)
+
+        try:
+            key = StatsService._cache_key(scope)
+            stats = cache.get(key)
+            if stats is not None:
+                StatsService._count('hits')
+                return stats
+
+            StatsService._count('misses')
+            lock_key = f"{key}:lock"
+            if cache.add(lock_key, 1, lock_timeout):
+                try:
+                    stats = StatsService.get_stats(categories)
+                    cache.set(key, stats, timeout)
+                finally:
+                    cache.delete(lock_key)
+                return stats
+
+            # Another request is recomputing this scope; wait for its result
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                stats = cache.get(key)
+                if stats is not None:
+                    return stats
+                if cache.get(lock_key) is None:
+                    break
+        except Exception as e:
+            logger.warning(f"Dashboard stats cache unavailable: {e}")
+
+        return StatsService.get_stats(categories)
+
+    @staticmethod
+    def invalidate(department_ids):
+        """Drop cached stats for the given departments and the staff-wide scope"""
+        scopes = [StatsService.ALL_DEPARTMENTS]
+        scopes += [f"department:{department_id}" for department_id in set(department_ids) if department_id]
+        try:
+            for scope in scopes:
+                version_key = f"{StatsService.CACHE_PREFIX}:version:{scope}"
+                if not cache.add(version_key, 1, None):
+                    cache.incr(version_key)
+        except Exception as e:
+            logger.warning(f"Could not invalidate dashboard stats cache: {e}")
+
+    @staticmethod
+    def refresh(department_id=None):
+        """Recompute the cached stats of a department, or the staff-wide scope for None, if they were invalidated"""
+        if department_id is None:
+            categories, scope = Category.objects.all(), StatsService.ALL_DEPARTMENTS
+        else:
+            categories, scope = Category.objects.filter(department_id=department_id), f"department:{department_id}"
+        try:
+            key = StatsService._cache_key(scope)
+            if cache.get(key) is None:
+                cache.set(key, StatsService.get_stats(categories), getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 300))
+        except Exception as e:
+            logger.warning(f"Could not refresh dashboard stats cache: {e}")
+
+    @staticmethod
+    def cache_counters():
+        """Return the dashboard stats cache hit/miss counters"""
+        try:
+            counters = cache.get_many([
+                f"{StatsService.CACHE_PREFIX}:hits",
+                f"{StatsService.CACHE_PREFIX}:misses",
+            ])
+        except Exception as e:
+            logger.warning(f"Dashboard stats cache unavailable: {e}")
+            counters = {}
+        hits = counters.get(f"{StatsService.CACHE_PREFIX}:hits", 0)
+        misses = counters.get(f"{StatsService.CACHE_PREFIX}:misses", 0)
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    @staticmethod
+    def _cache_key(scope):
+        version = cache.get_or_set(f"{StatsService.CACHE_PREFIX}:version:{scope}", 1, None)
+        return f"{StatsService.CACHE_PREFIX}:{scope}:v{version}"
+
+    @staticmethod
+    def _count(counter):
+        counter_key = f"{StatsService.CACHE_PREFIX}:{counter}"
+        if not cache.add(counter_key, 1, None):
+            cache.incr(counter_key)
@@ -1,20 +1,102 @@
 # services/storage_service.py
-import boto3
-from google.cloud import storage as gcs
-from azure.storage.blob import BlobServiceClient
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from ..utils.helpers import HashingReader
 import hashlib
+import logging
+import threading
+import time
 import uuid
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# Cloud SDKs are only needed by the backend that uses them
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+except ImportError:
+    boto3 = None
+try:
+    from google.cloud import storage as gcs
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    gcs = None
+try:
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.storage.blob import BlobServiceClient
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    BlobServiceClient = None
+
+logger = logging.getLogger(__name__)
+
+def require_sdk(module, package, backend):
+    if module is None:
+        raise ImproperlyConfigured(f"The {backend} storage backend requires the {package} package")
+
+def pool_stats(pool_managers):
+    """Sum the urllib3 connection pool counters of a client's pool managers"""
+    stats = {'hosts': 0, 'max_connections': 0, 'in_use': 0, 'requests': 0, 'connections_opened': 0}
+    for manager in pool_managers:
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            # The queue holds a slot per idle or not yet opened connection
+            stats['hosts'] += 1
+            stats['max_connections'] += pool.pool.maxsize
+            stats['in_use'] += max(0, pool.pool.maxsize - pool.pool.qsize())
+            stats['requests'] += pool.num_requests
+            stats['connections_opened'] += pool.num_connections
+    requests = stats['requests']
+    stats['reuse_rate'] = round(1 - stats['connections_opened'] / requests, 4) if requests else None
+    return stats
 
 class BaseStorageService:
+    @classmethod
+    def config_key(cls):
+        """Settings the client is built from; StorageFactory shares one service per distinct key"""
+        return ()
+
+    def check_health(self):
+        """Raise if the backend cannot be reached"""
+
+    def connection_pools(self):
+        """urllib3 pool managers behind the client, for StorageFactory.pool_stats"""
+        return []
+
     def upload_file(self, file, path=None):
         raise NotImplementedError
     
     def download_file(self, file_path):
+        """Return a readable file-like stream of the stored file; nothing is read up front"""
         raise NotImplementedError
+
+    def iter_file(self, file_path, chunk_size=None):
+        """Yield the stored file in chunks, holding at most about one chunk in memory.
+
+        chunk_size defaults to STORAGE_STREAM_CHUNK_SIZE; backends that fetch
+        in parts of their own size may yield those instead. The result can be
+        handed straight to a StreamingHttpResponse; the stream is closed when
+        the iterator is exhausted or closed.
+        """
+        chunk_size = chunk_size or settings.STORAGE_STREAM_CHUNK_SIZE
+        stream = self.download_file(file_path)
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            stream.close()
     
     def delete_file(self, file_path):
         raise NotImplementedError
@@ -29,16 +111,31 @@ class BaseStorageService:
             hash_md5.update(chunk)
         return hash_md5.hexdigest()
 
+    def hashing_reader(self, file):
+        """Wrap file so the upload itself computes its checksums; read it only through the wrapper"""
+        if hasattr(file, 'seek'):
+            file.seek(0)
+        return HashingReader(file, ('md5', 'sha256'))
+
+    def checksums(self, reader):
+        """Digests of everything read through hashing_reader: MD5 as 'checksum' (legacy) and SHA-256"""
+        return {
+            'checksum': reader.hexdigest('md5'),
+            'sha256': reader.hexdigest('sha256'),
+            'size': reader.size,
+        }
+
 class LocalStorageService(BaseStorageService):
     def upload_file(self, file, path=None):
         if not path:
             path = f"files/{uuid.uuid4()}/{file.name}"
         
-        saved_path = default_storage.save(path, file)
+        reader = self.hashing_reader(file)
+        saved_path = default_storage.save(path, File(reader, name=file.name))
         return {
             'path': saved_path,
             'url': default_storage.url(saved_path),
-            'checksum': self.calculate_checksum(file)
+            **self.checksums(reader)
         }
     
     def download_file(self, file_path):
@@ -52,13 +149,40 @@ class LocalStorageService(BaseStorageService):
 
 class S3StorageService(BaseStorageService):
     def __init__(self):
+        require_sdk(boto3, 'boto3', 'aws_s3')
+        self.part_size = settings.AWS_S3_PART_SIZE
+        self.max_concurrency = settings.AWS_S3_MAX_CONCURRENCY
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
+            region_name=settings.AWS_S3_REGION_NAME,
+            endpoint_url=getattr(settings, 'AWS_S3_ENDPOINT_URL', None),
+            # At least one connection per transfer thread, or parallel parts queue for the pool
+            config=BotoConfig(max_pool_connections=max(settings.STORAGE_MAX_CONNECTIONS, self.max_concurrency)),
         )
         self.bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        # Shared by every upload through this service
+        self.transfer_config = TransferConfig(
+            multipart_threshold=settings.AWS_S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=self.part_size,
+            max_concurrency=self.max_concurrency,
+        )
+
+    @classmethod
+    def config_key(cls):
+        return tuple(getattr(settings, name, None) for name in (
+            'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_STORAGE_BUCKET_NAME', 'AWS_S3_REGION_NAME',
+            'AWS_S3_ENDPOINT_URL', 'AWS_S3_MULTIPART_THRESHOLD', 'AWS_S3_PART_SIZE', 'AWS_S3_MAX_CONCURRENCY',
+            'STORAGE_MAX_CONNECTIONS',
+        ))
+
+    def check_health(self):
+        self.s3_client.head_bucket(Bucket=self.bucket_name)
+
+    def connection_pools(self):
+        http_session = self.s3_client._endpoint.http_session
+        return [http_session._manager, *http_session._proxy_managers.values()]
     
     def upload_file(self, file, path=None):
         if not path:
@@ -66,14 +190,16 @@ class S3StorageService(BaseStorageService):
         
         try:
             # Upload file to S3
+            reader = self.hashing_reader(file)
             self.s3_client.upload_fileobj(
-                file, 
+                reader, 
                 self.bucket_name, 
                 path,
                 ExtraArgs={
-                    'ContentType': file.content_type,
+                    'ContentType': getattr(file, 'content_type', None) or 'application/octet-stream',
                     'ServerSideEncryption': 'AES256'
-                }
+                },
+                Config=self.transfer_config
             )
             
             # Generate URL
@@ -82,7 +208,7 @@ class S3StorageService(BaseStorageService):
             return {
                 'path': path,
                 'url': url,
-                'checksum': self.calculate_checksum(file)
+                **self.checksums(reader)
             }
         except Exception as e:
             raise Exception(f"Failed to upload to S3: {str(e)}")
@@ -94,6 +220,67 @@ class S3StorageService(BaseStorageService):
         except Exception as e:
             raise Exception(f"Failed to download from S3: {str(e)}")
     
+    def _byte_ranges(self, file_path):
+        """Return the object's ETag and its (start, end) part ranges, end inclusive"""
+        head = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_path)
+        size = head['ContentLength']
+        ranges = [(start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size)]
+        return head['ETag'], ranges
+
+    def _get_range(self, file_path, etag, start, end):
+        # IfMatch makes a concurrent overwrite fail the download instead of mixing versions
+        return self.s3_client.get_object(
+            Bucket=self.bucket_name, Key=file_path, Range=f"bytes={start}-{end}", IfMatch=etag
+        )['Body']
+
+    def download_to_file(self, file_path, destination):
+        """Download an object into a local file with parallel ranged GETs; returns its size"""
+        try:
+            etag, ranges = self._byte_ranges(file_path)
+            size = ranges[-1][1] + 1 if ranges else 0
+            with open(destination, 'wb') as handle:
+                handle.truncate(size)
+
+            def fetch(byte_range):
+                body = self._get_range(file_path, etag, *byte_range)
+                with open(destination, 'r+b') as handle:
+                    handle.seek(byte_range[0])
+                    for chunk in body.iter_chunks(File.DEFAULT_CHUNK_SIZE):
+                        handle.write(chunk)
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                list(executor.map(fetch, ranges))
+            return size
+        except Exception as e:
+            raise Exception(f"Failed to download from S3: {str(e)}")
+
+    def iter_file(self, file_path, chunk_size=None):
+        """Yield an object's bytes in part_size chunks, fetching up to max_concurrency parts ahead in parallel.
+
+        At most max_concurrency parts of part_size bytes are held in memory.
+        Closing the iterator early cancels the parts not yet fetched.
+        """
+        try:
+            etag, ranges = self._byte_ranges(file_path)
+        except Exception as e:
+            raise Exception(f"Failed to download from S3: {str(e)}")
+
+        def fetch(byte_range):
+            return self._get_range(file_path, etag, *byte_range).read()
+
+        ranges = iter(ranges)
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        pending = deque(executor.submit(fetch, byte_range) for byte_range in islice(ranges, self.max_concurrency))
+        try:
+            while pending:
+                data = pending.popleft().result()
+                next_range = next(ranges, None)
+                if next_range:
+                    pending.append(executor.submit(fetch, next_range))
+                yield data
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
     def delete_file(self, file_path):
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=file_path)
@@ -114,9 +301,23 @@ class S3StorageService(BaseStorageService):
 
 class GCPStorageService(BaseStorageService):
     def __init__(self):
+        require_sdk(gcs, 'google-cloud-storage', 'gcp')
         self.client = gcs.Client()
+        # requests keeps 10 connections per host by default
+        self.adapter = HTTPAdapter(pool_maxsize=settings.STORAGE_MAX_CONNECTIONS)
+        self.client._http.mount('https://', self.adapter)
         self.bucket_name = settings.GCP_STORAGE_BUCKET_NAME
         self.bucket = self.client.bucket(self.bucket_name)
+
+    @classmethod
+    def config_key(cls):
+        return (getattr(settings, 'GCP_STORAGE_BUCKET_NAME', None), settings.STORAGE_MAX_CONNECTIONS)
+
+    def check_health(self):
+        self.bucket.reload()
+
+    def connection_pools(self):
+        return [self.adapter.poolmanager]
     
     def upload_file(self, file, path=None):
         if not path:
@@ -124,12 +325,13 @@ class GCPStorageService(BaseStorageService):
         
         try:
             blob = self.bucket.blob(path)
-            blob.upload_from_file(file, content_type=file.content_type)
+            reader = self.hashing_reader(file)
+            blob.upload_from_file(reader, content_type=file.content_type, size=file.size)
             
             return {
                 'path': path,
                 'url': blob.public_url,
-                'checksum': self.calculate_checksum(file)
+                **self.checksums(reader)
             }
         except Exception as e:
             raise Exception(f"Failed to upload to GCP: {str(e)}")
@@ -137,7 +339,8 @@ class GCPStorageService(BaseStorageService):
     def download_file(self, file_path):
         try:
             blob = self.bucket.blob(file_path)
-            return blob.download_as_bytes()
+            # BlobReader fetches chunk_size ranges on demand
+            return blob.open('rb', chunk_size=settings.STORAGE_STREAM_CHUNK_SIZE)
         except Exception as e:
             raise Exception(f"Failed to download from GCP: {str(e)}")
     
@@ -159,11 +362,32 @@ class GCPStorageService(BaseStorageService):
 
 class AzureStorageService(BaseStorageService):
     def __init__(self):
+        require_sdk(BlobServiceClient, 'azure-storage-blob', 'azure')
+        self.adapter = HTTPAdapter(pool_maxsize=settings.STORAGE_MAX_CONNECTIONS)
+        session = requests.Session()
+        session.mount('https://', self.adapter)
         self.blob_service_client = BlobServiceClient(
             account_url=f"https://{settings.AZURE_ACCOUNT_NAME}.blob.core.windows.net",
-            credential=settings.AZURE_ACCOUNT_KEY
+            credential=settings.AZURE_ACCOUNT_KEY,
+            transport=RequestsTransport(session=session, session_owner=False),
+            # Bound the bytes buffered per download request (defaults: 32MB first, then 4MB)
+            max_single_get_size=settings.STORAGE_STREAM_CHUNK_SIZE,
+            max_chunk_get_size=settings.STORAGE_STREAM_CHUNK_SIZE
         )
         self.container_name = settings.AZURE_CONTAINER
+
+    @classmethod
+    def config_key(cls):
+        return tuple(getattr(settings, name, None) for name in (
+            'AZURE_ACCOUNT_NAME', 'AZURE_ACCOUNT_KEY', 'AZURE_CONTAINER', 'STORAGE_MAX_CONNECTIONS',
+            'STORAGE_STREAM_CHUNK_SIZE',
+        ))
+
+    def check_health(self):
+        self.blob_service_client.get_container_client(self.container_name).get_container_properties()
+
+    def connection_pools(self):
+        return [self.adapter.poolmanager]
     
     def upload_file(self, file, path=None):
         if not path:
@@ -174,14 +398,15 @@ class AzureStorageService(BaseStorageService):
                 container=self.container_name, 
                 blob=path
             )
-            blob_client.upload_blob(file, overwrite=True)
+            reader = self.hashing_reader(file)
+            blob_client.upload_blob(reader, length=file.size, overwrite=True)
             
             url = f"https://{settings.AZURE_ACCOUNT_NAME}.blob.core.windows.net/{self.container_name}/{path}"
             
             return {
                 'path': path,
                 'url': url,
-                'checksum': self.calculate_checksum(file)
+                **self.checksums(reader)
             }
         except Exception as e:
             raise Exception(f"Failed to upload to Azure: {str(e)}")
@@ -192,9 +417,14 @@ class AzureStorageService(BaseStorageService):
                 container=self.container_name, 
                 blob=file_path
             )
-            return blob_client.download_blob().readall()
+            # The downloader fetches max_chunk_get_size ranges as they are read
+            return blob_client.download_blob()
         except Exception as e:
             raise Exception(f"Failed to download from Azure: {str(e)}")
+
+    def iter_file(self, file_path, chunk_size=None):
+        downloader = self.download_file(file_path)
+        yield from downloader.chunks()
     
     def delete_file(self, file_path):
         try:
@@ -212,19 +442,86 @@ class AzureStorageService(BaseStorageService):
         return f"https://{settings.AZURE_ACCOUNT_NAME}.blob.core.windows.net/{self.container_name}/{file_path}"
 
 class StorageFactory:
-    """Factory class to get the appropriate storage service"""
-    
-    @staticmethod
-    def get_storage_service(storage_type='local'):
-        services = {
-            'local': LocalStorageService,
-            'aws_s3': S3StorageService,
-            'gcp': GCPStorageService,
-            'azure': AzureStorageService,
-        }
-        
-        service_class = services.get(storage_type)
+    """Factory class handing out one shared storage service per backend and configuration.
+
+    The SDK clients are thread-safe, so every caller in the process reuses
+    the same client, its connection pool and its resolved credentials. A
+    shared service is health-checked at most every
+    STORAGE_HEALTH_CHECK_INTERVAL seconds when handed out, and rebuilt with
+    fresh connections if the check fails. Clients are built and checked
+    outside the factory lock, so a backend slow to answer only holds up its
+    own callers.
+    """
+
+    services = {
+        'local': LocalStorageService,
+        'aws_s3': S3StorageService,
+        'gcp': GCPStorageService,
+        'azure': AzureStorageService,
+    }
+    _instances = {}
+    _counters = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_storage_service(cls, storage_type='local'):
+        service_class = cls.services.get(storage_type)
         if not service_class:
             raise ValueError(f"Unsupported storage type: {storage_type}")
-        
-        return service_class()
\ No newline at end of file
+
+        config_key = service_class.config_key()
+        check_health = False
+        with cls._lock:
+            counters = cls._counters.setdefault(storage_type, {'handed_out': 0, 'created': 0, 'reconnects': 0})
+            counters['handed_out'] += 1
+            cached_key, service = cls._instances.get(storage_type, (None, None))
+            if service is not None and cached_key != config_key:
+                service = None
+            elif service is not None and time.monotonic() - service.last_health_check >= settings.STORAGE_HEALTH_CHECK_INTERVAL:
+                # Claim the check so concurrent callers don't all run it
+                service.last_health_check = time.monotonic()
+                check_health = True
+
+        if service is None:
+            # Built outside the lock: a slow backend must not hold up callers of the others
+            created = service_class()
+            created.last_health_check = time.monotonic()
+            with cls._lock:
+                cached_key, service = cls._instances.get(storage_type, (None, None))
+                if service is None or cached_key != config_key:
+                    service = created
+                    cls._instances[storage_type] = (config_key, service)
+                    cls._counters[storage_type]['created'] += 1
+            return service  # A concurrent caller's service, if it got there first
+
+        if check_health:
+            try:
+                service.check_health()
+            except Exception as e:
+                logger.warning(f"{storage_type} storage health check failed, reconnecting: {e}")
+                replacement = service_class()
+                replacement.last_health_check = time.monotonic()
+                with cls._lock:
+                    if cls._instances.get(storage_type) == (config_key, service):
+                        cls._instances[storage_type] = (config_key, replacement)
+                        cls._counters[storage_type]['reconnects'] += 1
+                    service = cls._instances[storage_type][1]
+        return service
+
+    @classmethod
+    def reset(cls):
+        """Drop the shared services; the next call builds new clients"""
+        with cls._lock:
+            cls._instances.clear()
+            cls._counters.clear()
+
+    @classmethod
+    def pool_stats(cls):
+        """Per backend: services handed out and created, reconnects, and connection pool occupancy and reuse"""
+        with cls._lock:
+            instances = {storage_type: service for storage_type, (_, service) in cls._instances.items()}
+            counters = {storage_type: dict(values) for storage_type, values in cls._counters.items()}
+        return {
+            storage_type: {**counters.get(storage_type, {}), **pool_stats(service.connection_pools())}
+            for storage_type, service in instances.items()
+        }
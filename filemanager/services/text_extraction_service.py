@@ -0,0 +1,131 @@
+# services/text_extraction_service.py
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from ..models import Blob, MedicalFile, ExtractedText
+from ..utils.pdf_text import extract_pdf_text
+from .search_service import SearchFactory
+from .tier_service import TierService
+
+logger = logging.getLogger(__name__)
+
+
+class TextExtractionService:
+    """Service class for extracting the text layer of PDF files into the search index.
+
+    Files are checksummed and parsed in pool processes; only the parent
+    process touches the database. A file whose checksum matches its stored
+    ExtractedText row is skipped without being parsed.
+    """
+
+    _pool = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def pdf_files():
+        """MedicalFiles that are PDFs, by type or by extension"""
+        return MedicalFile.objects.filter(Q(file_type='PDF') | Q(file__iendswith='.pdf'))
+
+    @staticmethod
+    def jobs(file_ids, force=False):
+        """Build (file_id, path, known_checksum) jobs for the PDFs among file_ids that exist in storage.
+
+        Warm and cold blobs are staged to temporary files; pass the jobs to
+        run(), or release their paths with TierService.release().
+        """
+        rows = list(
+            TextExtractionService.pdf_files()
+            .filter(id__in=file_ids)
+            .values_list('id', 'file', 'blob_id', 'extracted_text__checksum')
+            .order_by('id')
+        )
+        blobs = Blob.objects.in_bulk({blob_id for _, _, blob_id, _ in rows if blob_id})
+        jobs = []
+        for file_id, name, blob_id, checksum in rows:
+            path = TierService.local_path(blobs.get(blob_id), name)
+            if path is not None:
+                jobs.append((file_id, path, None if force else checksum))
+        return jobs
+
+    @staticmethod
+    def run(jobs, executor=None, chunksize=1):
+        """Extract the given jobs, in executor if one is passed, and store the results.
+
+        Returns {'extracted': n, 'unchanged': n, 'failed': n}.
+        """
+        worker = partial(extract_pdf_text, max_chars=getattr(settings, 'TEXT_EXTRACTION_MAX_CHARS', None))
+        if executor is None:
+            results = map(worker, jobs)
+        else:
+            results = executor.map(worker, jobs, chunksize=chunksize)
+
+        counts = {'extracted': 0, 'unchanged': 0, 'failed': 0}
+        extracted = []
+        try:
+            for result in results:
+                if result is None:
+                    counts['failed'] += 1
+                elif result[2] is None:
+                    counts['unchanged'] += 1
+                else:
+                    extracted.append(result)
+        finally:
+            for job in jobs:
+                TierService.release(job[1])
+        counts['extracted'] = TextExtractionService.save_results(extracted)
+        return counts
+
+    @staticmethod
+    @transaction.atomic
+    def save_results(results):
+        """Store (file_id, checksum, text) results and re-index those files; returns the number stored"""
+        # Files can be deleted while their text is being extracted
+        existing = set(
+            MedicalFile.objects.filter(id__in=[file_id for file_id, _, _ in results]).values_list('id', flat=True)
+        )
+        rows = [
+            ExtractedText(
+                medical_file_id=file_id,
+                checksum=checksum,
+                content=ExtractedText.compress(text),
+                char_count=len(text),
+            )
+            for file_id, checksum, text in results
+            if file_id in existing
+        ]
+        if not rows:
+            return 0
+
+        ExtractedText.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['medical_file'],
+            update_fields=['checksum', 'content', 'char_count', 'extracted_at'],
+        )
+        SearchFactory.get_search_service().index_files([row.medical_file_id for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def extract_files(file_ids, executor=None, force=False):
+        """Extract and index the text of the given files, skipping unchanged ones"""
+        return TextExtractionService.run(TextExtractionService.jobs(file_ids, force=force), executor)
+
+    @classmethod
+    def pool(cls):
+        """Shared process pool for extracting uploads in the background"""
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ProcessPoolExecutor(max_workers=getattr(settings, 'TEXT_EXTRACTION_WORKERS', 2))
+            return cls._pool
+
+    @classmethod
+    def reset_pool(cls):
+        """Drop the shared pool after a worker crash; the next pool() call starts a fresh one"""
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
@@ -0,0 +1,306 @@
+# services/tier_service.py
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Blob
+from ..utils.helpers import HashingReader
+from .storage_service import StorageFactory
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('hot', 'warm', 'cold')  # Hottest first
+TOUCH_INTERVAL = timedelta(hours=1)  # How stale last_accessed may get before a read rewrites it
+SPOOL_MAX_SIZE = 16 * 1024 * 1024  # Larger warm copies spill to disk while being compressed
+MIN_WARM_SAVING = 0.1  # Warm copies must be this much smaller than the original to be kept
+STAGING_PREFIX = 'tier-staged-'  # Temporary local copies made by local_path()
+
+
+class TierService:
+    """Service class for moving blobs between storage tiers and reading them in any tier.
+
+    hot: the blob's file in the default storage, as uploaded.
+    warm: a gzip copy beside it (blobs that do not compress stay where they
+    are and are only marked warm).
+    cold: an object in the STORAGE_COLD_BACKEND storage service.
+
+    migrate() moves blobs older than STORAGE_TIERS[tier]['age_days'] and
+    not downloaded for 'idle_days' down a tier, in batches; every copy is
+    checked against the blob's SHA-256 before the old one is deleted. open()
+    reads a blob wherever it is, local_path() gives readers that need a file
+    (pool workers) one, and promote() brings it back to hot.
+    """
+
+    @staticmethod
+    def cold_storage():
+        """The storage service of the cold tier, or None when the tier is off"""
+        backend = getattr(settings, 'STORAGE_COLD_BACKEND', '')
+        return StorageFactory.get_storage_service(backend) if backend else None
+
+    @staticmethod
+    def open(blob):
+        """A readable binary stream of a blob's contents, in whichever tier it is.
+
+        A blob moved by a concurrent migration is looked up again once.
+        """
+        try:
+            return TierService._open(blob)
+        except Exception:
+            current = Blob.objects.filter(pk=blob.pk).first()
+            if current is None or (current.tier, current.stored_name) == (blob.tier, blob.stored_name):
+                raise
+            return TierService._open(current)
+
+    @staticmethod
+    def local_path(blob, name):
+        """Path of a local file with the contents of a stored file named name, or None if they are missing.
+
+        Hot contents are read in place. Warm and cold ones (and any on storage
+        without local paths) are copied to a temporary file, which the caller
+        removes with release() once it has been read.
+        """
+        if blob is None or not blob.stored_name:
+            try:
+                path = default_storage.path(name)
+            except NotImplementedError:
+                path = None
+            if path is not None:
+                return path if os.path.exists(path) else None
+
+        fd, path = tempfile.mkstemp(prefix=STAGING_PREFIX, dir=TierService._staging_dir())
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                stream = TierService.open(blob) if blob is not None else default_storage.open(name, 'rb')
+                with _closing(stream):
+                    shutil.copyfileobj(stream, output, settings.STORAGE_STREAM_CHUNK_SIZE)
+        except Exception as e:
+            logger.warning(f"Could not stage a local copy of {name}: {e}")
+            os.remove(path)
+            return None
+        return path
+
+    @staticmethod
+    def release(path):
+        """Remove a temporary copy made by local_path(); paths of hot files are left alone"""
+        if path and os.path.dirname(path) == TierService._staging_dir() and os.path.basename(path).startswith(STAGING_PREFIX):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def touch(blob):
+        """Record a read of the blob, writing at most once per TOUCH_INTERVAL"""
+        now = timezone.now()
+        if blob.last_accessed is None or blob.last_accessed < now - TOUCH_INTERVAL:
+            Blob.objects.filter(pk=blob.pk).update(last_accessed=now)
+            blob.last_accessed = now
+
+    @staticmethod
+    def candidates(tier, limit, now=None):
+        """Blobs due to move down to tier under the STORAGE_TIERS policy, oldest first"""
+        policy = settings.STORAGE_TIERS.get(tier)
+        if policy is None or (tier == 'cold' and not getattr(settings, 'STORAGE_COLD_BACKEND', '')):
+            return []
+        now = now or timezone.now()
+        idle_since = now - timedelta(days=policy['idle_days'])
+        return list(
+            Blob.objects
+            .filter(
+                tier__in=TIERS[:TIERS.index(tier)],
+                ref_count__gt=0,
+                created_at__lt=now - timedelta(days=policy['age_days']),
+            )
+            .filter(Q(last_accessed__isnull=True) | Q(last_accessed__lt=idle_since))
+            .order_by('created_at')[:limit]
+        )
+
+    @staticmethod
+    def migrate(batch_size=100, now=None):
+        """Move up to batch_size due blobs down a tier, coldest moves first.
+
+        A blob due for cold goes there directly, skipping warm. Returns
+        {'warm': moved, 'cold': moved, 'failed': count, 'freed': bytes
+        no longer on local disk}.
+        """
+        counts = {'warm': 0, 'cold': 0, 'failed': 0, 'freed': 0}
+        for tier in ('cold', 'warm'):
+            remaining = batch_size - counts['warm'] - counts['cold'] - counts['failed']
+            if remaining <= 0:
+                break
+            for blob in TierService.candidates(tier, remaining, now):
+                local_before = TierService._local_size(blob)
+                try:
+                    moved = TierService.move(blob, tier)
+                except Exception as e:
+                    logger.error(f"Could not move blob {blob.checksum} to the {tier} tier: {e}")
+                    counts['failed'] += 1
+                    continue
+                if moved:
+                    counts[tier] += 1
+                    counts['freed'] += local_before - TierService._local_size(moved)
+        return counts
+
+    @staticmethod
+    def move(blob, tier):
+        """Copy a blob into tier, switch the row over and delete the old copy.
+
+        Returns the updated blob, or None when the blob changed tier or was
+        deleted meanwhile (the new copy is then discarded).
+        """
+        if tier == blob.tier:
+            return blob
+        if tier == 'hot':
+            stored_name, stored_size = '', None
+            TierService._write_hot(blob)
+        elif tier == 'warm':
+            stored_name, stored_size = TierService._write_warm(blob)
+        else:
+            stored_name, stored_size = TierService._write_cold(blob)
+
+        old = TierService._location(blob.file.name, blob.tier, blob.stored_name)
+        new = TierService._location(blob.file.name, tier, stored_name)
+        with transaction.atomic():
+            switched = Blob.objects.select_for_update().filter(
+                pk=blob.pk, tier=blob.tier, stored_name=blob.stored_name
+            ).update(tier=tier, stored_name=stored_name, stored_size=stored_size)
+        if not switched:
+            logger.warning(f"Blob {blob.checksum} changed while moving to the {tier} tier, discarding the copy")
+            if new != old:
+                TierService._delete_copy(new)
+            return None
+
+        blob.tier, blob.stored_name, blob.stored_size = tier, stored_name, stored_size
+        if new != old:
+            TierService._delete_copy(old)
+        return blob
+
+    @staticmethod
+    def promote(blob):
+        """Bring a warm or cold blob back to the hot tier; returns the blob as it now is"""
+        return TierService.move(blob, 'hot') or Blob.objects.filter(pk=blob.pk).first()
+
+    @staticmethod
+    def delete(blob):
+        """Delete a blob's stored copy in its current tier, once the transaction commits"""
+        TierService._delete_copy(TierService._location(blob.file.name, blob.tier, blob.stored_name))
+
+    @staticmethod
+    def _open(blob):
+        if blob.tier == 'cold':
+            return TierService.cold_storage().download_file(blob.stored_name)
+        if blob.tier == 'warm' and blob.stored_name:
+            stream = gzip.GzipFile(fileobj=default_storage.open(blob.stored_name, 'rb'), mode='rb')
+            stream.myfileobj = stream.fileobj  # Closed with the GzipFile, as for files it opened itself
+            return stream
+        return default_storage.open(blob.file.name, 'rb')
+
+    @staticmethod
+    def _staging_dir():
+        return os.path.abspath(settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir())
+
+    @staticmethod
+    def _local_size(blob):
+        """Bytes a blob takes on local disk in its tier"""
+        if blob is None or blob.tier == 'cold':
+            return 0
+        return blob.stored_size if blob.tier == 'warm' and blob.stored_name else blob.size
+
+    @staticmethod
+    def _verified(reader, blob):
+        if reader.checksum != blob.checksum or reader.size != blob.size:
+            raise ValueError(f"Contents of blob {blob.checksum} read back as {reader.checksum} ({reader.size} bytes)")
+
+    @staticmethod
+    def _write_hot(blob):
+        name = blob.file.name
+        if blob.tier == 'warm' and not blob.stored_name:
+            return  # Never left its hot place
+        if default_storage.exists(name):
+            default_storage.delete(name)  # A leftover of an interrupted move
+        with _closing(TierService._open(blob)) as stream:
+            reader = HashingReader(stream)
+            saved = default_storage.save(name, File(reader, name=name))
+        try:
+            if saved != name:
+                raise ValueError(f"Blob {blob.checksum} was stored as {saved} instead of {name}")
+            TierService._verified(reader, blob)
+        except Exception:
+            default_storage.delete(saved)
+            raise
+
+    @staticmethod
+    def _write_warm(blob):
+        """gzip the blob beside its hot file; returns (stored_name, stored_size), ('', None) if it does not compress"""
+        level = getattr(settings, 'STORAGE_WARM_COMPRESSLEVEL', 6)
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            with _closing(TierService._open(blob)) as stream:
+                reader = HashingReader(stream)
+                with gzip.GzipFile(fileobj=spool, mode='wb', compresslevel=level, mtime=0) as compressed:
+                    for chunk in iter(lambda: reader.read(settings.STORAGE_STREAM_CHUNK_SIZE), b''):
+                        compressed.write(chunk)
+            TierService._verified(reader, blob)
+            stored_size = spool.tell()
+            if stored_size > blob.size * (1 - MIN_WARM_SAVING):
+                return '', None
+
+            name = f'{blob.file.name}.gz'
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            spool.seek(0)
+            saved = default_storage.save(name, File(spool, name=name))
+        return saved, stored_size
+
+    @staticmethod
+    def _write_cold(blob):
+        """Upload the blob to the cold storage; returns (stored_name, stored_size)"""
+        with _closing(TierService._open(blob)) as stream:
+            upload = File(stream, name=blob.file.name.rsplit('/', 1)[-1])
+            upload.size = blob.size  # Compressed streams cannot seek to their end
+            upload.content_type = 'application/octet-stream'
+            result = TierService.cold_storage().upload_file(upload, f'cold/{blob.file.name}')
+        if result['sha256'] != blob.checksum or result['size'] != blob.size:
+            TierService.cold_storage().delete_file(result['path'])
+            raise ValueError(f"Cold copy of blob {blob.checksum} uploaded as {result['sha256']} ({result['size']} bytes)")
+        return result['path'], blob.size
+
+    @staticmethod
+    def _location(name, tier, stored_name):
+        """(storage, name) of a blob's copy in a tier"""
+        return ('cold', stored_name) if tier == 'cold' else ('local', stored_name or name)
+
+    @staticmethod
+    def _delete_copy(location):
+        storage, name = location
+
+        def delete():
+            try:
+                if storage == 'cold':
+                    TierService.cold_storage().delete_file(name)
+                else:
+                    default_storage.delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete {storage} copy {name}: {e}")
+
+        # Only once the row no longer points at it
+        transaction.on_commit(delete)
+
+
+@contextmanager
+def _closing(stream):
+    """Close a storage stream after use; some SDK downloaders have nothing to close"""
+    try:
+        yield stream
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
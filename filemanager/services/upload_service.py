@@ -0,0 +1,150 @@
+# services/upload_service.py
+import hashlib
+import logging
+import os
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from ..models import MedicalFile
+from ..utils.helpers import HashingReader
+from .blob_service import BlobService
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLarge(Exception):
+    """An upload is larger than MAX_FILE_SIZE; nothing of it is kept"""
+
+    def __init__(self, max_size):
+        super().__init__(f"File size exceeds maximum allowed size of {max_size / (1024*1024):.1f}MB")
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Spool multipart file parts to a temporary file, hashing each chunk as it arrives.
+
+    Nothing is held in memory beyond one chunk, and FileSystemStorage moves
+    the finished temporary file into place instead of copying it. A part
+    growing past MAX_FILE_SIZE raises FileTooLarge, removing what was spooled.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.MAX_FILE_SIZE:
+            self.file.close()  # Deletes the temporary file
+            raise FileTooLarge(settings.MAX_FILE_SIZE)
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.checksum = self._sha256.hexdigest()
+        return uploaded_file
+
+
+class PartFile(File):
+    """A finished file on local disk, handed to storage without being opened.
+
+    FileSystemStorage moves it into place through temporary_file_path()
+    (a rename on the same filesystem); storages that read the content get
+    it streamed from disk.
+    """
+
+    def __init__(self, path, name):
+        super().__init__(None, name)
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    def temporary_file_path(self):
+        return self.path
+
+    def chunks(self, chunk_size=None):
+        with open(self.path, 'rb') as handle:
+            yield from File(handle).chunks(chunk_size)
+
+
+class UploadService:
+    """Service class for storing uploaded files as MedicalFile rows"""
+
+    @staticmethod
+    def detect_file_type(mimetype, filename):
+        """Map a MIME type and file name to a MedicalFile.FILE_TYPES code"""
+        mimetype = (mimetype or '').lower()
+        filename = filename.lower()
+        if 'pdf' in mimetype or filename.endswith('.pdf'):
+            return 'PDF'
+        elif 'word' in mimetype or filename.endswith(('.doc', '.docx')):
+            return 'DOC'
+        elif 'excel' in mimetype or filename.endswith(('.xls', '.xlsx')):
+            return 'XLS'
+        elif 'image' in mimetype or filename.endswith(('.jpg', '.jpeg', '.png', '.gif')):
+            return 'IMG'
+        elif 'video' in mimetype or filename.endswith(('.mp4', '.mov', '.avi')):
+            return 'VID'
+        elif 'audio' in mimetype or filename.endswith(('.mp3', '.wav')):
+            return 'AUD'
+        return 'OTH'
+
+    @staticmethod
+    def store_stream(stream, filename, max_size=None, **fields):
+        """Store a file-like object and create its MedicalFile.
+
+        The content is spooled to a temporary file in File.DEFAULT_CHUNK_SIZE
+        chunks and hashed on the way through, so memory stays flat whatever
+        the file size, then handed to store_file. Raises FileTooLarge as soon
+        as more than max_size bytes have been read. `fields` are the other
+        MedicalFile fields (category, date_folder, uploaded_by, ...).
+        """
+        reader = stream if isinstance(stream, HashingReader) else HashingReader(stream)
+        spool = tempfile.NamedTemporaryFile(suffix='.upload', dir=settings.FILE_UPLOAD_TEMP_DIR, delete=False)
+        try:
+            with spool:
+                for chunk in File(reader).chunks():
+                    if max_size is not None and reader.size > max_size:
+                        raise FileTooLarge(max_size)
+                    spool.write(chunk)
+            return UploadService.store_file(spool.name, filename, reader.checksum, **fields)
+        finally:
+            if os.path.exists(spool.name):
+                os.remove(spool.name)
+
+    @staticmethod
+    def store_upload(uploaded_file, **fields):
+        """Store a file received through HashingFileUploadHandler and create its MedicalFile"""
+        return UploadService._create(
+            uploaded_file.name, uploaded_file, uploaded_file.size, uploaded_file.checksum, fields
+        )
+
+    @staticmethod
+    def store_file(path, filename, checksum, **fields):
+        """Move a complete local file into storage and create its MedicalFile.
+
+        The file is consumed: moved into the blob store, or removed when a
+        blob with the same contents already exists.
+        """
+        content = PartFile(path, filename)
+        medical_file = UploadService._create(filename, content, content.size, checksum, fields)
+        if os.path.exists(path):
+            os.remove(path)
+        return medical_file
+
+    @staticmethod
+    def _create(filename, content, size, checksum, fields):
+        """Create the MedicalFile on the blob holding content, storing it only if its checksum is new"""
+        blob, created = BlobService.store(content, checksum, size, filename)
+        try:
+            with transaction.atomic():
+                medical_file = MedicalFile.objects.create(
+                    name=filename, file=blob.file.name, size=size, checksum=checksum, blob=blob, **fields
+                )
+        except Exception:
+            # Give back the reference, which removes the blob again if it was new
+            BlobService.release(checksum)
+            raise
+        stored = 'stored' if created else 'deduplicated onto existing blob'
+        logger.info(f"Upload {filename} {stored} {blob.file.name} ({size} bytes, sha256 {checksum})")
+        return medical_file
@@ -1,31 +1,137 @@
-from django.db.models.signals import post_save,user_logged_in, user_logged_out
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from datetime import datetime, timedelta
-from .models import Category, YearFolder, MonthFolder, DateFolder
 from django.utils import timezone
-from .models import UserSession
+from django.conf import settings
+from .models import UserSession, MedicalFile, Category, User, Blob, ScanArtifact
+from .services.blob_service import BlobService
+from .services.folder_service import FolderService
+from .services.rendition_service import RenditionService
+from .services.search_service import SearchFactory
+from .services.stats_service import StatsService
+from .tasks import migrate_storage_tiers, process_upload, purge_scan_artifacts, refresh_dashboard_stats
+
+@receiver(pre_save, sender=MedicalFile)
+def remember_file_location(sender, instance, raw=False, **kwargs):
+    """Capture the stored folder, category and size so a move can be counted"""
+    instance._previous_location = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    instance._previous_location = (
+        MedicalFile.objects
+        .filter(pk=instance.pk)
+        .values_list('date_folder_id', 'category_id', 'size')
+        .first()
+    )
+
+@receiver(post_save, sender=MedicalFile)
+def count_saved_file(sender, instance, created, raw=False, **kwargs):
+    """Update folder counters when a file is created, moved or resized"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_location', None)
+    current = (instance.date_folder_id, instance.category_id, instance.size)
+    invalidate_dashboard_stats(instance.category_id, previous[1] if previous else None)
+    if not created and previous == current:
+        return
+    if previous:
+        FolderService.apply_delta(previous[0], previous[1], -1, -previous[2])
+    FolderService.apply_delta(current[0], current[1], 1, current[2])
+
+@receiver(post_delete, sender=MedicalFile)
+def count_deleted_file(sender, instance, **kwargs):
+    """Update folder counters when a file is deleted"""
+    invalidate_dashboard_stats(instance.category_id)
+    FolderService.apply_delta(instance.date_folder_id, instance.category_id, -1, -instance.size)
+
+@receiver(post_save, sender=MedicalFile)
+def index_saved_file(sender, instance, raw=False, **kwargs):
+    """Keep the full-text search entry for a file in sync"""
+    if raw:
+        return
+    SearchFactory.get_search_service().index_files([instance.pk])
+
+@receiver(post_save, sender=MedicalFile)
+def queue_upload_processing(sender, instance, created, raw=False, **kwargs):
+    """Post-process a new file in the background once its row is committed"""
+    if raw or not created:
+        return
+    transaction.on_commit(
+        lambda: process_upload.apply_async((instance.pk,), key=f'process-upload:{instance.pk}')
+    )
+
+@receiver(post_save, sender=Blob)
+def schedule_storage_tier_migration(sender, instance, created, raw=False, **kwargs):
+    """Keep the storage tier migration scheduled while new contents arrive; one run waits at a time"""
+    if raw or not created:
+        return
+    transaction.on_commit(lambda: migrate_storage_tiers.apply_async(
+        key='migrate-storage-tiers', countdown=settings.STORAGE_TIER_INTERVAL
+    ))
+
+@receiver(post_delete, sender=MedicalFile)
+def release_deleted_file_blob(sender, instance, **kwargs):
+    """Drop the deleted file's reference to its shared contents"""
+    if instance.blob_id:
+        BlobService.release(instance.blob_id)
+
+@receiver(post_delete, sender=Blob)
+def purge_blob_renditions(sender, instance, **kwargs):
+    """Delete the thumbnails and previews of contents no file refers to any more"""
+    RenditionService.purge(instance.checksum)
+
+@receiver(post_delete, sender=MedicalFile)
+def unindex_deleted_file(sender, instance, **kwargs):
+    """Drop the full-text search entry of a deleted file"""
+    SearchFactory.get_search_service().remove_files([instance.pk])
+
+@receiver(post_save, sender=ScanArtifact)
+def schedule_scan_artifact_purge(sender, instance, created, raw=False, **kwargs):
+    """Sweep abandoned scans once a new one could have expired; one sweep waits at a time"""
+    if raw or not created:
+        return
+    transaction.on_commit(lambda: purge_scan_artifacts.apply_async(
+        key='purge-scan-artifacts', countdown=settings.SCAN_ARTIFACT_TTL + 60
+    ))
 
 @receiver(post_save, sender=Category)
-def create_folders_for_new_category(sender, instance, created, **kwargs):
-    if not created:
+def reindex_category_files(sender, instance, created, raw=False, **kwargs):
+    """Re-index a category's files so searches see its new name"""
+    if raw or created:
         return
+    file_ids = MedicalFile.objects.filter(category=instance).values_list('id', flat=True)
+    SearchFactory.get_search_service().index_files(file_ids)
 
-    start_year = 2015
-    end_year = 2040
+@receiver(post_save, sender=User)
+def reindex_uploader_files(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Re-index a user's uploads when their name changes"""
+    if raw or created:
+        return
+    if update_fields is not None and not {'username', 'first_name', 'last_name'} & set(update_fields):
+        return
+    file_ids = MedicalFile.objects.filter(uploaded_by=instance).values_list('id', flat=True)
+    SearchFactory.get_search_service().index_files(file_ids)
 
-    for year in range(start_year, end_year + 1):
-        year_folder, _ = YearFolder.objects.get_or_create(category=instance, year=year)
-        for month in range(1, 13):
-            month_folder, _ = MonthFolder.objects.get_or_create(year_folder=year_folder, month=month)
+def invalidate_dashboard_stats(*category_ids):
+    """Drop cached dashboard stats for the files' departments once the change commits"""
+    department_ids = list(
+        Category.objects
+        .filter(pk__in=[category_id for category_id in category_ids if category_id])
+        .values_list('department_id', flat=True)
+    )
+    transaction.on_commit(lambda: refresh_dashboard_stats_later(department_ids))
 
-            # Get total days in that month
-            first_day = datetime(year, month, 1).date()
-            next_month = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1)
-            num_days = (next_month - timedelta(days=1)).day
+def refresh_dashboard_stats_later(department_ids):
+    """Invalidate the departments' stats and recompute them off the request path.
 
-            for day in range(1, num_days + 1):
-                date_obj = datetime(year, month, day).date()
-                DateFolder.objects.get_or_create(month_folder=month_folder, date=date_obj)
+    The short countdown lets a burst of uploads share one recompute.
+    """
+    StatsService.invalidate(department_ids)
+    for department_id in {None, *department_ids}:
+        refresh_dashboard_stats.apply_async(
+            (department_id,), key=f'dashboard-stats:{department_id or "all"}', countdown=1
+        )
 
 @receiver(user_logged_in)
 def on_user_logged_in(sender, request, user, **kwargs):
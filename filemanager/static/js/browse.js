@@ -6,7 +6,7 @@
         date: '',
         search: ''
     };
-    let currentPage = 1;
+    let currentCursor = null;
     let debounceTimer;
 
     // Initialize the file browser when DOM is loaded
@@ -61,7 +61,7 @@
         // Category filter
         document.getElementById('category').addEventListener('change', function() {
             currentFilters.category = this.value;
-            currentPage = 1;
+            currentCursor = null;
             loadFiles();
         });
 
@@ -70,7 +70,7 @@
             currentFilters.year = this.value;
             currentFilters.month = ''; // Reset month when year changes
             currentFilters.date = '';   // Reset date when year changes
-            currentPage = 1;
+            currentCursor = null;
             loadFiles();
         });
 
@@ -78,14 +78,14 @@
         document.getElementById('month').addEventListener('change', function() {
             currentFilters.month = this.value;
             currentFilters.date = ''; // Reset date when month changes
-            currentPage = 1;
+            currentCursor = null;
             loadFiles();
         });
 
         // Date filter
         document.getElementById('date').addEventListener('change', function() {
             currentFilters.date = this.value;
-            currentPage = 1;
+            currentCursor = null;
             loadFiles();
         });
 
@@ -94,21 +94,21 @@
             clearTimeout(debounceTimer);
             debounceTimer = setTimeout(() => {
                 currentFilters.search = this.value.trim();
-                currentPage = 1;
+                currentCursor = null;
                 loadFiles();
             }, 500);
         });
 
         // Apply filters button (redundant but good for UX)
         document.querySelector('.apply-filters').addEventListener('click', function() {
-            currentPage = 1;
+            currentCursor = null;
             loadFiles();
         });
     }
 
     // Main function to load files based on current filters
-    function loadFiles(page = currentPage) {
-        currentPage = page;
+    function loadFiles(cursor = currentCursor) {
+        currentCursor = cursor;
         const params = new URLSearchParams();
         
         // Add all active filters to the request
@@ -121,7 +121,7 @@
             params.append('date', day);
         }
         if (currentFilters.search) params.append('search', currentFilters.search);
-        params.append('page', currentPage);
+        if (currentCursor) params.append('cursor', currentCursor);
         
         showLoadingState();
         
@@ -165,7 +165,9 @@
             <tr>
                 <td>
                     <div class="file-info">
-                        <div class="file-icon">${getFileIcon(file.mimetype)}</div>
+                        <div class="file-icon">${file.thumbnail_url
+                            ? `<img src="${file.thumbnail_url}" class="file-thumbnail" loading="lazy" alt="">`
+                            : getFileIcon(file.mimetype)}</div>
                         <div>
                             <div class="file-name">${file.filename}</div>
                             <div class="file-meta">
@@ -208,48 +210,23 @@
         return '📁';
     }
 
-    // Render pagination controls
+    // Render pagination controls; pages are linked by opaque cursors
     function renderPagination(pagination) {
         const container = document.querySelector('.pagination');
-        if (!pagination || pagination.total_pages <= 1) {
-            container.innerHTML = '';
+        container.innerHTML = '';
+        if (!pagination || (!pagination.has_previous && !pagination.has_next)) {
             return;
         }
-        
-        const { current_page, total_pages } = pagination;
-        container.innerHTML = '';
-        
+
         // Previous button
-        container.appendChild(createPageBtn('❮', current_page > 1, () => loadFiles(current_page - 1)));
-        
-        // Always show first page
-        container.appendChild(createPageBtn(1, current_page === 1, () => loadFiles(1)));
-        
-        // Show ellipsis if needed
-        if (current_page > 3) {
-            container.appendChild(createEllipsis());
-        }
-        
-        // Show current page and neighbors
-        const start = Math.max(2, current_page - 1);
-        const end = Math.min(total_pages - 1, current_page + 1);
-        
-        for (let i = start; i <= end; i++) {
-            container.appendChild(createPageBtn(i, i === current_page, () => loadFiles(i)));
+        if (pagination.has_previous) {
+            container.appendChild(createPageBtn('❮', false, () => loadFiles(pagination.previous_cursor)));
         }
-        
-        // Show ellipsis if needed
-        if (current_page < total_pages - 2) {
-            container.appendChild(createEllipsis());
-        }
-        
-        // Always show last page if different from first
-        if (total_pages > 1) {
-            container.appendChild(createPageBtn(total_pages, current_page === total_pages, () => loadFiles(total_pages)));
-        }
-        
+
         // Next button
-        container.appendChild(createPageBtn('❯', current_page < total_pages, () => loadFiles(current_page + 1)));
+        if (pagination.has_next) {
+            container.appendChild(createPageBtn('❯', false, () => loadFiles(pagination.next_cursor)));
+        }
     }
 
     // Helper to create a pagination button
@@ -261,14 +238,6 @@
         return btn;
     }
 
-    // Helper to create ellipsis for pagination
-    function createEllipsis() {
-        const span = document.createElement('span');
-        span.className = 'page-ellipsis';
-        span.textContent = '...';
-        return span;
-    }
-
     // Show loading state
     function showLoadingState() {
         document.querySelector('tbody').innerHTML = `
@@ -329,7 +298,7 @@
                 btn.closest('tr').remove();
                 // Reload files if this was the last item on the page
                 if (document.querySelectorAll('tbody tr').length === 0) {
-                    loadFiles(Math.max(1, currentPage - 1));
+                    loadFiles(currentCursor);
                 }
             }
         })
@@ -0,0 +1,117 @@
+// Resumable chunked uploads against /api/uploads/.
+// A file is split into chunks that are PUT in parallel and retried on failure.
+// The session id is kept in localStorage, so re-selecting the same file after
+// a dropped connection or a page reload only sends the chunks still missing.
+
+const ResumableUpload = (function () {
+    const PARALLEL_CHUNKS = 3;
+    const MAX_RETRIES = 5;
+    const RETRY_DELAY_MS = 1000;
+
+    function csrfToken() {
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function storageKey(file, metadata) {
+        return ['resumable-upload', file.name, file.size, file.lastModified, metadata.category,
+                metadata.year, metadata.month, metadata.date].join(':');
+    }
+
+    async function request(method, url, body, headers = {}) {
+        const response = await fetch(url, {
+            method,
+            body,
+            credentials: 'same-origin',
+            headers: { 'X-CSRFToken': csrfToken(), ...headers },
+        });
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            const error = new Error(data.error || `Upload failed (HTTP ${response.status})`);
+            error.status = response.status;
+            throw error;
+        }
+        return data;
+    }
+
+    async function sha256(blob) {
+        if (!window.crypto || !window.crypto.subtle) {
+            return null;  // Not available outside secure contexts
+        }
+        const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function resumeOrCreate(baseUrl, file, metadata, key) {
+        const existing = localStorage.getItem(key);
+        if (existing) {
+            try {
+                const status = await request('GET', `${baseUrl}${existing}/`);
+                if (status.status === 'active') {
+                    return status;
+                }
+            } catch (error) {
+                // Expired or removed on the server; start over
+            }
+            localStorage.removeItem(key);
+        }
+
+        const status = await request('POST', baseUrl, JSON.stringify({
+            ...metadata,
+            filename: file.name,
+            size: file.size,
+            mimetype: file.type,
+        }), { 'Content-Type': 'application/json' });
+        localStorage.setItem(key, status.upload_id);
+        return status;
+    }
+
+    async function sendChunk(baseUrl, session, file, index) {
+        const start = index * session.chunk_size;
+        const blob = file.slice(start, Math.min(start + session.chunk_size, file.size));
+        const checksum = await sha256(blob);
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        if (checksum) {
+            headers['X-Chunk-SHA256'] = checksum;
+        }
+
+        for (let attempt = 0; ; attempt++) {
+            try {
+                await request('PUT', `${baseUrl}${session.upload_id}/chunks/${index}/`, blob, headers);
+                return blob.size;
+            } catch (error) {
+                if (attempt >= MAX_RETRIES || (error.status && error.status < 500 && error.status !== 408)) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, RETRY_DELAY_MS * 2 ** attempt));
+            }
+        }
+    }
+
+    /**
+     * Upload `file` with its metadata (category, year, month, date, description).
+     * onProgress receives (bytesSent, totalBytes). Resolves with the completed
+     * upload's response (file_id, file_url, ...).
+     */
+    async function upload(baseUrl, file, metadata, onProgress = () => {}) {
+        const key = storageKey(file, metadata);
+        const session = await resumeOrCreate(baseUrl, file, metadata, key);
+        const pending = [...session.missing_chunks];
+        let sent = session.bytes_received;
+        onProgress(sent, file.size);
+
+        const worker = async () => {
+            while (pending.length) {
+                sent += await sendChunk(baseUrl, session, file, pending.shift());
+                onProgress(sent, file.size);
+            }
+        };
+        await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+
+        const result = await request('POST', `${baseUrl}${session.upload_id}/complete/`);
+        localStorage.removeItem(key);
+        return result;
+    }
+
+    return { upload };
+})();
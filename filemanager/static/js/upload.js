@@ -1,11 +1,37 @@
 // Scanner management
         let availableScanners = [];
+
+        // Scans run on the server's scanner workers: submit the job, then poll
+        // it until it is done (it then describes the scanned page) or failed
+        async function submitScan(formData) {
+            const response = await fetch(SCAN_URL, {
+                method: 'POST',
+                body: formData,
+                headers: {
+                    'X-CSRFToken': getCookie('csrftoken'),
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            });
+            const contentType = response.headers.get('content-type');
+            if (!contentType || !contentType.includes('application/json')) {
+                const errorText = await response.text();
+                throw new Error(`Server returned ${response.status}: ${errorText.substring(0, 100)}`);
+            }
+
+            let job = await response.json();
+            while (job.success && (job.status === 'queued' || job.status === 'scanning')) {
+                await new Promise(resolve => setTimeout(resolve, job.poll_interval_ms || 1000));
+                const status = await fetch(job.status_url, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+                job = await status.json();
+            }
+            return job;
+        }
         // Load available scanners
         function loadScanners() {
         const scannerSelect = document.getElementById('scannerSelect');
         scannerSelect.innerHTML = '<option value="">Loading scanners...</option>';
         
-        fetch(SCAN_URL, {
+        fetch(GET_SCANNERS_URL, {
             method: 'GET',
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
@@ -47,10 +73,7 @@
         }
 
         // Enhanced scan function
-        async function performScan(retryCount = 0) {
-        const MAX_RETRIES = 3;
-        const RETRY_DELAY_MS = 3000; // 3 seconds
-
+        async function performScan() {
         const scanButton = document.getElementById('scanButton');
         scanButton.disabled = true;
         scanButton.innerHTML = '<span class="scanning-animation">🖨️</span> Scanning...';
@@ -64,32 +87,14 @@
             formData.append('multi_page', document.getElementById('multiPageCheck').checked);
             formData.append('csrfmiddlewaretoken', getCookie('csrftoken'));
 
-            const response = await fetch('/scan_document/', {
-                method: 'POST',
-                body: formData,
-                headers: {
-                    'X-Requested-With': 'XMLHttpRequest'
-                }
-            });
-
-            const contentType = response.headers.get('content-type');
-            if (!contentType || !contentType.includes('application/json')) {
-                const errorText = await response.text();
-                throw new Error(`Server returned ${response.status}: ${errorText.substring(0, 100)}`);
-            }
-
-            const result = await response.json();
+            // The server retries a busy scanner itself
+            const result = await submitScan(formData);
 
-            if (!response.ok || !result.success) {
-                if(result.error && result.error.includes('WIA device is busy') && retryCount < MAX_RETRIES) {
-                    // Wait a bit and retry
-                    await new Promise(resolve => setTimeout(resolve, RETRY_DELAY_MS));
-                    return performScan(retryCount + 1);
-                }
+            if (!result.success) {
                 throw new Error(result.error || 'Scan failed with unknown error');
             }
 
-            addScannedDocument(result.image, result.file_name);
+            addScannedDocument(result);
             showMessage('Scan completed successfully', 'success');
 
         } catch (error) {
@@ -255,29 +260,14 @@
                 formData.append('multi_page', document.getElementById('multiPageCheck').checked);
                 formData.append('csrfmiddlewaretoken', getCookie('csrftoken'));
 
-                const response = await fetch(SCAN_URL, {
-                    method: 'POST',
-                    body: formData,
-                    headers: {
-                        'X-Requested-With': 'XMLHttpRequest'
-                    }
-                });
-
-                // Check if response is JSON
-                const contentType = response.headers.get('content-type');
-                if (!contentType || !contentType.includes('application/json')) {
-                    const errorText = await response.text();
-                    throw new Error(`Server returned ${response.status}: ${errorText.substring(0, 100)}`);
-                }
-
-                const result = await response.json();
+                const result = await submitScan(formData);
                 
-                if (!response.ok || !result.success) {
+                if (!result.success) {
                     throw new Error(result.error || 'Scan failed with unknown error');
                 }
                 
                 // Success case
-                addScannedDocument(result.image, result.file_name);
+                addScannedDocument(result);
                 showMessage('Scan completed successfully', 'success');
                 
             } catch (error) {
@@ -311,21 +301,11 @@
             scanButton.innerHTML = '<span class="scanning-animation">🖨️</span> Scanning...';
             
             try {
-                const response = await fetch(SCAN_URL, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'X-CSRFToken': getCookie('csrftoken'),
-                        'X-Requested-With': 'XMLHttpRequest'
-                    },
-                    credentials: 'same-origin'
-                });
-                
-                const result = await response.json();
+                const result = await submitScan(new FormData());
                 
-                if (response.ok && result.success) {
+                if (result.success) {
                     // Add the scanned document to the list
-                    addScannedDocument(result.image, 'scanned_document.pdf');
+                    addScannedDocument(result);
                     showMessage('Scan completed successfully', 'success');
                 } else {
                     throw new Error(result.error || 'Scanning failed');
@@ -343,13 +323,13 @@
         let scannedDocuments = [];
         let currentDocumentIndex = -1;
 
-        function addScannedDocument(imageData, fileName) {
-            const documentId = Date.now();
+        // Scans stay on the server; the page keeps their artifact ids
+        function addScannedDocument(scan) {
             scannedDocuments.push({
-                id: documentId,
-                image: imageData,
-                name: fileName,
-                size: 'Scanned document'
+                id: scan.artifact_id,
+                preview: scan.preview_url,
+                name: scan.file_name,
+                size: formatFileSize(scan.size)
             });
             
             renderScannedDocuments();
@@ -374,7 +354,7 @@
                 docElement.className = `scanned-document ${currentDocumentIndex === index ? 'selected' : ''}`;
                 docElement.innerHTML = `
                     <div class="scanned-document-info">
-                        <img src="${doc.image}" class="scanned-document-preview">
+                        <a href="${doc.preview}" target="_blank" class="scanned-document-preview" title="Preview">📄</a>
                         <div>
                             <div class="scanned-document-name">${doc.name}</div>
                             <div class="scanned-document-size">${doc.size}</div>
@@ -405,12 +385,8 @@
         function selectScannedDocument(index) {
             currentDocumentIndex = index;
             const doc = scannedDocuments[index];
-            function getBase64WithoutPrefix(dataUrl) {
-                // Remove the prefix like "data:application/pdf;base64,"
-                return dataUrl.substring(dataUrl.indexOf(',') + 1);
-            }
             // Update the form fields
-            document.getElementById('scanData').value = getBase64WithoutPrefix(doc.image);
+            setScanArtifacts([doc.id]);
             document.getElementById('scanFileName').value = doc.name;
             
             // Update the file preview
@@ -431,12 +407,24 @@
             });
         }
 
+        // Point the form at scans by id; the server merges several in this order
+        function setScanArtifacts(artifactIds) {
+            document.getElementById('scanData').value = artifactIds[0] || '';
+            document.getElementById('scanPageInputs').innerHTML = artifactIds.slice(1)
+                .map(id => `<input type="hidden" name="scan_artifact_id" value="${id}">`)
+                .join('');
+        }
+
         function deleteScannedDocument(index) {
-            scannedDocuments.splice(index, 1);
+            const [removed] = scannedDocuments.splice(index, 1);
+            fetch(removed.preview, {
+                method: 'DELETE',
+                headers: {'X-CSRFToken': getCookie('csrftoken')}
+            }).catch(error => console.warn('Could not discard scan:', error));
             
             if (scannedDocuments.length === 0) {
                 // No documents left, clear the form
-                document.getElementById('scanData').value = '';
+                setScanArtifacts([]);
                 document.getElementById('scanFileName').value = '';
                 document.getElementById('filePreview').style.display = 'none';
                 document.querySelector('.file-input-text').textContent = 'No file chosen';
@@ -528,9 +516,40 @@
             if (!isValid) {
                 showMessage('Please fill in all required fields', 'error');
                 e.preventDefault();
+                return;
+            }
+
+            const file = fileInput.files[0];
+            if (file && file.size > RESUMABLE_UPLOAD_THRESHOLD) {
+                e.preventDefault();
+                uploadResumable(file);
             }
         });
 
+        // Large files go through the chunked upload API so a dropped connection
+        // only costs the chunks in flight; submitting again resumes the upload
+        async function uploadResumable(file) {
+            const submitButton = document.querySelector('#uploadForm button[type="submit"]');
+            const metadata = {};
+            ['category', 'year', 'month', 'date', 'description'].forEach(field => {
+                const element = document.getElementById(field);
+                metadata[field] = element ? element.value : '';
+            });
+
+            submitButton.disabled = true;
+            try {
+                await ResumableUpload.upload(UPLOAD_SESSIONS_URL, file, metadata, (sent, total) => {
+                    showMessage(`Uploading ${file.name}: ${Math.floor(sent * 100 / total)}%`, 'info');
+                });
+                showMessage('File uploaded successfully', 'success');
+                removeFile.click();
+            } catch (error) {
+                showMessage(`${error.message}. Submit again to resume the upload.`, 'error');
+            } finally {
+                submitButton.disabled = false;
+            }
+        }
+
         // Helper function to get CSRF token
         function getCookie(name) {
             let cookieValue = null;
@@ -579,7 +598,7 @@
             document.getElementById('scannedDocumentsContainer').style.display = 'none';
         });
 
-// Store scanned pages as base64 PDF strings
+// Scanned pages of the current document: {artifact_id, preview_url, file_name, ...}
 let scannedPages = [];
 
 // When "Scan Document Instead" button is clicked - start a new scan and reset pages
@@ -600,43 +619,48 @@ document.getElementById('previewButton').addEventListener('click', () => {
         return;
     }
 
-    // Combine scanned PDFs into one Blob (assuming each page is a base64 PDF)
-    // For simplicity, just show the first page here, or you can enhance with pdf-lib
-    // For now, open first page in new tab
-    const pdfData = scannedPages[0];
-    window.open(pdfData, '_blank');
+    if (scannedPages.length === 1) {
+        window.open(scannedPages[0].preview_url, '_blank');
+        return;
+    }
+
+    // Merge the pages on the server and preview the result
+    const formData = new FormData();
+    scannedPages.forEach(page => formData.append('artifact_ids[]', page.artifact_id));
+    fetch(FINALIZE_SCAN_URL, {
+        method: 'POST',
+        body: formData,
+        headers: {'X-CSRFToken': getCookie('csrftoken')}
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            throw new Error(data.error);
+        }
+        window.open(data.preview_url, '_blank');
+    })
+    .catch(error => alert('Preview failed: ' + error.message));
 });
 
 async function performScanAndAddPage() {
     try {
-        // Call your scan API as usual (adjust fetch to your setup)
         const formData = new FormData();
         formData.append('scanner_id', document.getElementById('scannerSelect').value);
         formData.append('dpi', document.getElementById('dpiSelect').value);
         formData.append('color_mode', document.getElementById('colorModeSelect').value);
         formData.append('auto_deskew', document.getElementById('autoDeskewCheck').checked);
 
-        const response = await fetch(SCAN_URL, {
-            method: 'POST',
-            body: formData,
-            headers: {
-              'X-CSRFToken': getCookie('csrftoken'),
-            },
-        });
-
-        const data = await response.json();
+        const data = await submitScan(formData);
 
         if (!data.success) {
             alert('Scan failed: ' + data.error);
             return;
         }
 
-        // data.image is base64 PDF URI like "data:application/pdf;base64,..."
-        scannedPages.push(data.image);
+        scannedPages.push(data);
 
-        // Update hidden inputs to send combined scanned document on form submit
-        // For now, just store latest scan (single page)
-        document.getElementById('scanData').value = data.image;
+        // The form uploads every page, merged in scan order
+        setScanArtifacts(scannedPages.map(page => page.artifact_id));
         document.getElementById('scanFileName').value = data.file_name;
 
         // Show scanned pages list UI update
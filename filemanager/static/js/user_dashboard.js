@@ -62,6 +62,7 @@
                         // Create and populate the table with results
                         const tableHTML = createResultsTable(data.files);
                         resultsDiv.innerHTML = tableHTML;
+                        renderLoadMore(searchParams, data.pagination);
                     } else {
                         // Show empty state
                         resultsDiv.innerHTML = `
@@ -116,35 +117,70 @@
                         </tr>
                     </thead>
                     <tbody>
-                        ${files.map(file => `
-                            <tr style="border-bottom: 1px solid #f1f5f9;">
-                                <td style="padding: 1rem;">
-                                    <div style="display: flex; align-items: center; gap: 0.5rem;">
-                                        <span style="font-size: 1.25rem;">
-                                            ${getFileIcon(file.file_type)}
-                                        </span>
-                                        <span style="font-weight: 500; color: #1e293b;">${file.name}</span>
-                                    </div>
-                                </td>
-                                <td style="padding: 1rem; color: #64748b;">${file.category}</td>
-                                <td style="padding: 1rem; color: #64748b;">${formatFileSize(file.size)}</td>
-                                <td style="padding: 1rem; color: #64748b;">${formatDate(file.uploaded_at)}</td>
-                                <td style="padding: 1rem;">
-                                    <div style="display: flex; gap: 0.5rem;">
-                                        <a href="${file.url}" target="_blank" 
-                                           style="padding: 0.5rem; background: #1e3a8a; color: white; 
-                                                  border-radius: 6px; text-decoration: none; font-size: 0.875rem;">
-                                            View
-                                        </a>
-                                    </div>
-                                </td>
-                            </tr>
-                        `).join('')}
+                        ${createResultRows(files)}
                     </tbody>
                 </table>
             </div>`;
         }
 
+        function createResultRows(files) {
+            return files.map(file => `
+            <tr style="border-bottom: 1px solid #f1f5f9;">
+                <td style="padding: 1rem;">
+                    <div style="display: flex; align-items: center; gap: 0.5rem;">
+                        <span style="font-size: 1.25rem;">
+                            ${file.thumbnail_url
+                                ? `<img src="${file.thumbnail_url}" loading="lazy" alt=""
+                                        style="width: 32px; height: 32px; object-fit: cover; border-radius: 4px;">`
+                                : getFileIcon(file.file_type)}
+                        </span>
+                        <span style="font-weight: 500; color: #1e293b;">${file.name}</span>
+                    </div>
+                </td>
+                <td style="padding: 1rem; color: #64748b;">${file.category}</td>
+                <td style="padding: 1rem; color: #64748b;">${formatFileSize(file.size)}</td>
+                <td style="padding: 1rem; color: #64748b;">${formatDate(file.uploaded_at)}</td>
+                <td style="padding: 1rem;">
+                    <div style="display: flex; gap: 0.5rem;">
+                        <a href="${file.url}" target="_blank" 
+                           style="padding: 0.5rem; background: #1e3a8a; color: white; 
+                                  border-radius: 6px; text-decoration: none; font-size: 0.875rem;">
+                            View
+                        </a>
+                    </div>
+                </td>
+            </tr>
+        `).join('');
+        }
+
+        // Results are paged by cursor; fetch the next page into the same table
+        function renderLoadMore(searchParams, pagination) {
+            const resultsDiv = document.getElementById('searchResults');
+            const existing = resultsDiv.querySelector('.load-more');
+            if (existing) existing.remove();
+            if (!pagination || !pagination.next_cursor) return;
+
+            const btn = document.createElement('button');
+            btn.className = 'load-more';
+            btn.textContent = 'Load more';
+            btn.style.cssText = 'display: block; margin: 1rem auto; padding: 0.5rem 1.5rem; background: #1e3a8a; color: white; border: none; border-radius: 6px; cursor: pointer;';
+            btn.addEventListener('click', function() {
+                btn.disabled = true;
+                searchParams.set('cursor', pagination.next_cursor);
+                fetch(`/api/search-files/?${searchParams.toString()}`)
+                    .then(response => response.json())
+                    .then(data => {
+                        resultsDiv.querySelector('tbody').insertAdjacentHTML('beforeend', createResultRows(data.files || []));
+                        renderLoadMore(searchParams, data.pagination);
+                    })
+                    .catch(error => {
+                        console.error('Error:', error);
+                        btn.disabled = false;
+                    });
+            });
+            resultsDiv.appendChild(btn);
+        }
+
         function getFileIcon(fileType) {
             const icons = {
                 'PDF': '📄',
@@ -0,0 +1,334 @@
+# tasks.py
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from .models import Blob, MedicalFile, ScanArtifact
+from .services.rendition_service import RenditionService
+from .services.scan_artifact_service import ScanArtifactService
+from .services.scan_job_service import ScanJobService
+from .services.stats_service import StatsService
+from .services.text_extraction_service import TextExtractionService
+from .services.tier_service import TierService
+from .utils.task_queue import SQLiteTaskQueue
+
+logger = logging.getLogger(__name__)
+
+DEDUP_TIMEOUT = 60 * 60  # Bounds how long a lost Celery message can hold its key
+
+_registry = {}
+
+
+class Task:
+    """A function that can run in the background.
+
+    Calling it runs it in the caller; delay() and apply_async() hand it to
+    the configured TASK_BACKEND. Arguments must be JSON serializable.
+    """
+
+    def __init__(self, func, name, queue, max_retries, retry_delay):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.celery_task = None
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.apply_async(args, kwargs)
+
+    def apply_async(self, args=(), kwargs=None, key=None, countdown=0):
+        """Queue a call to run after countdown seconds.
+
+        While a call with the same key is waiting to run, further calls with
+        that key are dropped; one that is already running does not absorb
+        them. Returns the task id, or None when the call was run inline or
+        dropped.
+        """
+        kwargs = kwargs or {}
+        backend = get_backend()
+        if backend == 'inline':
+            self.func(*args, **kwargs)
+            return None
+        if backend == 'celery':
+            return _send_to_celery(self, args, kwargs, key, countdown)
+        return LocalTaskEngine.instance().submit(self, args, kwargs, key, countdown)
+
+
+def task(name=None, queue='default', max_retries=3, retry_delay=5):
+    """Register a function as a background task.
+
+    Failed runs are retried up to max_retries times, waiting retry_delay
+    seconds and doubling the wait after each attempt.
+    """
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', queue, max_retries, retry_delay)
+        _registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_backend():
+    """The task backend in use: 'celery', 'local' or 'inline'"""
+    backend = getattr(settings, 'TASK_BACKEND', 'local')
+    if backend == 'celery' and _celery_app() is None:
+        return 'local'
+    return backend
+
+
+def configured_queues():
+    """{queue: concurrency limit} from TASK_QUEUES; queues it leaves out run one task at a time"""
+    queues = {registered.queue: 1 for registered in _registry.values()}
+    queues.update(getattr(settings, 'TASK_QUEUES', {}))
+    return queues
+
+
+@functools.lru_cache(maxsize=None)
+def _celery_app():
+    try:
+        from file.celery import app
+    except ImportError as e:
+        logger.warning(f"TASK_BACKEND is 'celery' but Celery is unavailable, using the local task engine: {e}")
+        return None
+    for registered in _registry.values():
+        _register_celery_task(app, registered)
+    return app
+
+
+def _dedup_cache_key(key):
+    return f'tasks:dedup:{key}'
+
+
+def _register_celery_task(app, registered):
+    def run(self, *args, dedup_key=None, **kwargs):
+        if dedup_key:
+            # Calls made from now on queue another run
+            cache.delete(_dedup_cache_key(dedup_key))
+        try:
+            return registered.func(*args, **kwargs)
+        except Exception as e:
+            raise self.retry(exc=e, countdown=registered.retry_delay * 2 ** self.request.retries)
+
+    registered.celery_task = app.task(
+        bind=True, name=registered.name, queue=registered.queue, max_retries=registered.max_retries
+    )(run)
+
+
+def _send_to_celery(registered, args, kwargs, key, countdown):
+    if key:
+        try:
+            if not cache.add(_dedup_cache_key(key), 1, DEDUP_TIMEOUT):
+                return None
+        except Exception as e:
+            logger.warning(f"Task dedup cache unavailable, sending {registered.name} anyway: {e}")
+        kwargs = {**kwargs, 'dedup_key': key}
+    return registered.celery_task.apply_async(args, kwargs, countdown=countdown).id
+
+
+class LocalTaskEngine:
+    """Runs tasks queued in a SQLite file on one thread pool per queue.
+
+    A dispatcher thread claims due tasks, never more per queue than its
+    TASK_QUEUES limit counting every process that shares the file, and
+    wakes when a task is queued or finishes. CPU-bound tasks hand their work
+    to a process pool of their own (text extraction does). Tasks left
+    running by a process that died are requeued when the engine starts.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path, queues, poll_interval=1.0):
+        self.queue = SQLiteTaskQueue(path)
+        self.queues = dict(queues)
+        self.poll_interval = poll_interval
+        self._executors = {
+            name: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f'task-{name}')
+            for name, limit in self.queues.items()
+        }
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def instance(cls):
+        """The engine of this process, started on first use unless TASK_LOCAL_AUTOSTART is off"""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(settings.TASK_QUEUE_PATH, configured_queues(), settings.TASK_POLL_INTERVAL)
+                if getattr(settings, 'TASK_LOCAL_AUTOSTART', True):
+                    cls._instance.start()
+            return cls._instance
+
+    def submit(self, registered, args, kwargs, key=None, countdown=0):
+        task_id = self.queue.put(
+            registered.name, registered.queue, args, kwargs,
+            key=key, max_retries=registered.max_retries, delay=countdown,
+        )
+        self._wake.set()
+        return task_id
+
+    def start(self):
+        """Requeue orphaned tasks and start dispatching in a background thread"""
+        if self._thread is not None:
+            return
+        recovered = self.queue.recover()
+        if recovered:
+            logger.warning(f"Requeued {recovered} tasks left running by stopped workers")
+        self._thread = threading.Thread(target=self.run, name='task-dispatcher', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Claim and dispatch tasks until stop() is called"""
+        while not self._stopped.is_set():
+            self._wake.clear()
+            wait = self.poll_interval
+            try:
+                for name, limit in self.queues.items():
+                    for job in self.queue.claim(name, limit):
+                        self._executors[name].submit(self._execute, job)
+                next_run = self.queue.next_run_at(self.queues)
+                if next_run is not None and next_run > time.time():
+                    wait = min(wait, next_run - time.time())
+            except Exception as e:
+                logger.error(f"Task dispatcher error: {e}")
+            self._wake.wait(wait)
+
+    def stop(self, wait=True):
+        """Stop claiming tasks and, if wait, let running ones finish"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+
+    def _execute(self, job):
+        registered = _registry.get(job['name'])
+        try:
+            if registered is None:
+                raise LookupError(f"No task named {job['name']}")
+            registered.func(*job['args'], **job['kwargs'])
+        except Exception as e:
+            delay = registered.retry_delay * 2 ** (job['attempts'] - 1) if registered else 0
+            try:
+                retry = self.queue.fail(job['id'], f'{type(e).__name__}: {e}', delay)
+            except Exception as queue_error:
+                logger.error(f"Could not record failure of task {job['name']} #{job['id']}: {queue_error}")
+                retry = False
+            if retry:
+                logger.warning(f"Task {job['name']} #{job['id']} failed, retrying in {delay}s: {e}")
+            else:
+                logger.error(f"Task {job['name']} #{job['id']} failed after {job['attempts']} attempts: {e}")
+        else:
+            try:
+                self.queue.complete(job['id'])
+            except Exception as e:
+                logger.error(f"Could not mark task {job['name']} #{job['id']} done: {e}")
+        finally:
+            # Each pool thread has its own database connection
+            connection.close()
+            self._wake.set()
+
+
+@task()
+def process_upload(file_id):
+    """Post-process a newly stored file: queue the work its type needs"""
+    medical_file = MedicalFile.objects.filter(pk=file_id).only('file', 'file_type', 'checksum').first()
+    if medical_file is None:
+        return  # Deleted before its turn
+    if RenditionService.is_pdf(medical_file):
+        extract_text.apply_async(([file_id],), key=f'extract-text:{file_id}')
+    if RenditionService.renderable(medical_file):
+        generate_renditions.apply_async(([file_id],), key=f'renditions:{medical_file.checksum}')
+
+
+@task(queue='extraction', max_retries=2, retry_delay=30)
+def extract_text(file_ids):
+    """Extract the text layer of PDFs into the search index"""
+    jobs = TextExtractionService.jobs(file_ids)
+    if not jobs:
+        return
+    # Inline runs parse in the caller; queued ones use the extraction process pool
+    executor = None if get_backend() == 'inline' else TextExtractionService.pool()
+    try:
+        counts = TextExtractionService.run(jobs, executor)
+    except BrokenProcessPool:
+        TextExtractionService.reset_pool()  # The retry gets a fresh pool
+        raise
+    logger.info(f"Text extraction finished: {counts}")
+
+
+@task(queue='thumbnails', max_retries=1, retry_delay=30)
+def generate_renditions(file_ids):
+    """Render the thumbnails and previews of files ahead of the first listing that shows them"""
+    executor = None if get_backend() == 'inline' else RenditionService.pool()
+    try:
+        stored = RenditionService.generate(file_ids, executor)
+    except BrokenProcessPool:
+        RenditionService.reset_pool()
+        raise
+    logger.info(f"Stored {stored} renditions for files {file_ids}")
+
+
+@task()
+def purge_scan_artifacts():
+    """Delete scans that were never uploaded, and old scan jobs"""
+    purged = ScanArtifactService.purge_expired()
+    if purged:
+        logger.info(f"Purged {purged} expired scan artifacts")
+    ScanJobService.purge_finished()
+    # Scans made while this sweep was waiting were absorbed by its key
+    next_expiry = ScanArtifact.objects.order_by('expires_at').values_list('expires_at', flat=True).first()
+    if next_expiry is not None:
+        purge_scan_artifacts.apply_async(
+            key='purge-scan-artifacts', countdown=max(0, (next_expiry - timezone.now()).total_seconds()) + 60
+        )
+
+
+@task(queue='stats', max_retries=1)
+def refresh_dashboard_stats(department_id=None):
+    """Recompute a department's dashboard stats (the staff-wide ones for None) before anyone asks"""
+    StatsService.refresh(department_id)
+
+
+@task(queue='storage', max_retries=1)
+def migrate_storage_tiers():
+    """Move blobs due for a colder storage tier in batches, then schedule the next run"""
+    batch_size = settings.STORAGE_TIER_BATCH_SIZE
+    while True:
+        counts = TierService.migrate(batch_size)
+        handled = counts['warm'] + counts['cold'] + counts['failed']
+        if handled:
+            logger.info(f"Storage tier migration batch: {counts}")
+        # Failed blobs stay due: stop once a batch holds nothing else
+        if handled < batch_size or counts['failed'] == handled:
+            break
+    # Contents stored while this run was waiting were absorbed by its key
+    if get_backend() != 'inline':
+        migrate_storage_tiers.apply_async(key='migrate-storage-tiers', countdown=settings.STORAGE_TIER_INTERVAL)
+
+
+@task(queue='storage', max_retries=1, retry_delay=30)
+def promote_blob(checksum):
+    """Bring a blob that is being read again back to the hot tier"""
+    blob = Blob.objects.filter(pk=checksum).first()
+    if blob is None or blob.tier == 'hot':
+        return
+    tier = blob.tier
+    TierService.promote(blob)
+    logger.info(f"Promoted blob {checksum} from the {tier} tier")
+
+
+if getattr(settings, 'TASK_BACKEND', 'local') == 'celery':
+    _celery_app()  # Workers find the tasks through autodiscovery of this module
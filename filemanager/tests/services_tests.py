@@ -0,0 +1,1272 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
+from pypdf import PdfReader
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    ThreadedMotoServer = None
+from ..models import Department, Category, YearFolder, MonthFolder, DateFolder, MedicalFile, User, ExtractedText, Blob, Rendition, ScanPageStat
+from ..services.folder_service import FolderService
+from ..services.rendition_service import RenditionService
+from ..services.scan_job_service import ScannerWorkerPool
+from ..services.scan_processing_service import ScanProcessingService
+from ..services.scanner_service import FakeScannerService, ScannerError, ScannerRegistry
+from ..services.search_service import SearchFactory, SQLiteSearchService
+from ..services.stats_service import StatsService
+from ..services.storage_service import LocalStorageService, S3StorageService, StorageFactory
+from ..services.text_extraction_service import TextExtractionService
+from ..services.tier_service import TierService
+from ..services.upload_service import UploadService
+from ..utils.pdf_assembler import PdfAssembler
+from ..utils import scan_pipeline
+
+class FolderServiceTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+
+    def test_category_creation_creates_no_folders(self):
+        """Test folders are not pre-created for a new category"""
+        self.assertFalse(YearFolder.objects.filter(category=self.category).exists())
+
+    def test_get_date_folder_materializes_tree(self):
+        """Test the year/month/date folders are created on first use"""
+        date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        self.assertEqual(date_folder.date, 21)
+        self.assertEqual(date_folder.full_date, date(2025, 8, 21))
+        self.assertEqual(date_folder.month_folder.month, 8)
+        self.assertEqual(date_folder.month_folder.year_folder.year, 2025)
+        self.assertEqual(YearFolder.objects.count(), 1)
+        self.assertEqual(MonthFolder.objects.count(), 1)
+        self.assertEqual(DateFolder.objects.count(), 1)
+
+    def test_get_date_folder_reuses_existing_folders(self):
+        """Test a second lookup returns the same folder"""
+        first = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        second = FolderService.get_date_folder(self.category, '2025', '8', '21')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(DateFolder.objects.count(), 1)
+
+    def test_get_date_folder_rejects_invalid_date(self):
+        """Test impossible dates are rejected"""
+        with self.assertRaises(ValueError):
+            FolderService.get_date_folder(self.category, 2025, 2, 30)
+        self.assertFalse(YearFolder.objects.exists())
+
+    def test_virtual_periods_fill_missing_counts(self):
+        """Test empty periods are synthesized with a zero count"""
+        years = FolderService.virtual_years({2025: 3})
+        self.assertEqual(years[0]['year'], 2040)
+        self.assertEqual(years[-1]['year'], 2015)
+        self.assertEqual({y['year']: y['file_count'] for y in years}[2025], 3)
+
+        months = FolderService.virtual_months({8: 2})
+        self.assertEqual(len(months), 12)
+        self.assertEqual(months[7], {'month': 8, 'month_name': 'August', 'file_count': 2})
+
+        days = FolderService.virtual_days(2024, 2, {})
+        self.assertEqual(len(days), 29)
+        self.assertTrue(all(d['file_count'] == 0 for d in days))
+
+class FolderCounterTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+
+    def create_file(self, date_folder, size, category=None):
+        return MedicalFile.objects.create(
+            name='test.pdf',
+            file='medical_files/test.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            size=size,
+            date_folder=date_folder,
+            category=category or self.category
+        )
+
+    def assertCounters(self, obj, file_count, total_bytes):
+        obj.refresh_from_db()
+        self.assertEqual((obj.file_count, obj.total_bytes), (file_count, total_bytes))
+
+    def test_create_updates_every_level(self):
+        """Test a new file is counted on its date, month, year and category"""
+        self.create_file(self.date_folder, 100)
+        self.create_file(self.date_folder, 50)
+        month_folder = self.date_folder.month_folder
+        for obj in (self.date_folder, month_folder, month_folder.year_folder, self.category):
+            self.assertCounters(obj, 2, 150)
+
+    def test_delete_decrements_counters(self):
+        """Test deleting a file removes it from the counters"""
+        medical_file = self.create_file(self.date_folder, 100)
+        self.create_file(self.date_folder, 50)
+        medical_file.delete()
+        self.assertCounters(self.date_folder, 1, 50)
+        self.assertCounters(self.category, 1, 50)
+
+    def test_move_transfers_counters(self):
+        """Test moving a file between folders and categories moves its counts"""
+        other_category = Category.objects.create(name='Other', department=self.department)
+        other_folder = FolderService.get_date_folder(other_category, 2024, 1, 5)
+        medical_file = self.create_file(self.date_folder, 100)
+
+        medical_file.date_folder = other_folder
+        medical_file.category = other_category
+        medical_file.save()
+
+        self.assertCounters(self.date_folder, 0, 0)
+        self.assertCounters(self.date_folder.month_folder.year_folder, 0, 0)
+        self.assertCounters(self.category, 0, 0)
+        self.assertCounters(other_folder, 1, 100)
+        self.assertCounters(other_folder.month_folder.year_folder, 1, 100)
+        self.assertCounters(other_category, 1, 100)
+
+    def test_resave_without_changes_keeps_counters(self):
+        """Test saving an unchanged file does not double count it"""
+        medical_file = self.create_file(self.date_folder, 100)
+        medical_file.description = 'Updated'
+        medical_file.save()
+        self.assertCounters(self.date_folder, 1, 100)
+
+    def test_stale_save_keeps_counters(self):
+        """Test saving an instance loaded before a file was added does not overwrite its counters"""
+        category = Category.objects.get(pk=self.category.pk)
+        self.create_file(self.date_folder, 100)
+
+        category.name = 'Renamed'
+        category.save()
+
+        self.assertCounters(self.category, 1, 100)
+        self.assertEqual(self.category.name, 'Renamed')
+
+    def test_recount_rebuilds_counters(self):
+        """Test recount restores counters after bulk changes that bypass signals"""
+        self.create_file(self.date_folder, 100)
+        DateFolder.objects.update(file_count=0, total_bytes=0)
+        Category.objects.update(file_count=7, total_bytes=7)
+
+        call_command('recount_folders', stdout=StringIO())
+
+        self.assertCounters(self.date_folder, 1, 100)
+        self.assertCounters(self.date_folder.month_folder, 1, 100)
+        self.assertCounters(self.category, 1, 100)
+
+class StatsServiceTests(TestCase):
+    def setUp(self):
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.categories = [
+            Category.objects.create(name=f'Category {i}', department=self.department)
+            for i in range(3)
+        ]
+        for i, category in enumerate(self.categories):
+            date_folder = FolderService.get_date_folder(category, 2025, 8, 21)
+            for _ in range(i + 1):
+                MedicalFile.objects.create(
+                    name=f'{category.name}.pdf',
+                    file='medical_files/test.pdf',
+                    uploaded_by=self.user,
+                    file_type='PDF',
+                    size=100,
+                    date_folder=date_folder,
+                    category=category
+                )
+
+    def test_stats_totals(self):
+        """Test per-category counts and totals"""
+        stats = StatsService.get_stats(Category.objects.all())
+        self.assertEqual(stats['category_count'], 3)
+        self.assertEqual(stats['total_files'], 6)
+        self.assertEqual(stats['storage_used'], 600)
+        self.assertEqual(
+            [(row['name'], row['file_count']) for row in stats['category_stats']],
+            [('Category 0', 1), ('Category 1', 2), ('Category 2', 3)]
+        )
+        self.assertEqual(stats['category_stats'][0]['description'], 'Neonatal Care')
+        self.assertEqual(len(stats['recent_uploads']), 6)
+
+    def test_stats_query_count_is_constant(self):
+        """Test stats cost two queries regardless of the number of categories"""
+        with self.assertNumQueries(2):
+            stats = StatsService.get_stats(Category.objects.all())
+            for upload in stats['recent_uploads']:
+                upload.category.name, upload.uploaded_by.username
+
+    def test_stats_respect_category_filter(self):
+        """Test only the given categories are counted"""
+        stats = StatsService.get_stats(Category.objects.filter(pk=self.categories[0].pk))
+        self.assertEqual(stats['total_files'], 1)
+        self.assertEqual(len(stats['recent_uploads']), 1)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    TASK_BACKEND='inline',
+)
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        self.scope = StatsService.cache_scope(self.user)
+
+    def create_file(self):
+        return MedicalFile.objects.create(
+            name='test.pdf',
+            file='medical_files/test.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            size=100,
+            date_folder=self.date_folder,
+            category=self.category
+        )
+
+    def get_stats(self):
+        return StatsService.get_cached_stats(Category.objects.filter(department=self.department), self.scope)
+
+    def test_second_read_is_a_cache_hit(self):
+        """Test cached stats are served without queries and counted"""
+        self.get_stats()
+        with self.assertNumQueries(0):
+            self.get_stats()
+        self.assertEqual(StatsService.cache_counters(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_file_changes_invalidate_cache(self):
+        """Test uploads and deletes drop the cached entry once committed"""
+        self.assertEqual(self.get_stats()['total_files'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            medical_file = self.create_file()
+        self.assertEqual(self.get_stats()['total_files'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            medical_file.delete()
+        self.assertEqual(self.get_stats()['total_files'], 0)
+
+    def test_staff_scope_is_separate(self):
+        """Test staff and department users get separate cache entries"""
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.assertEqual(StatsService.cache_scope(staff), 'all')
+        self.assertEqual(self.scope, f'department:{self.department.id}')
+
+    def test_concurrent_misses_recompute_once(self):
+        """Test only one of many concurrent misses recomputes the stats"""
+        calls = []
+
+        def slow_stats(categories):
+            calls.append(1)
+            time.sleep(0.2)
+            return {'total_files': 42}
+
+        with patch.object(StatsService, 'get_stats', side_effect=slow_stats):
+            threads = [
+                threading.Thread(target=StatsService.get_cached_stats, args=(None, self.scope))
+                for _ in range(10)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(StatsService.get_cached_stats(None, self.scope), {'total_files': 42})
+
+class SearchServiceTests(TestCase):
+    def setUp(self):
+        self.search_service = SearchFactory.get_search_service()
+        self.department = Department.objects.create(
+            code='LAB',
+            name='Laboratory'
+        )
+        self.category = Category.objects.create(
+            name='Blood Results',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='nurse',
+            password='testpass123',
+            first_name='Grace',
+            last_name='Nakato',
+            department=self.department
+        )
+        self.date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        self.referral = self.create_file('referral_letter.pdf', 'Referral to cardiology clinic')
+        self.lab = self.create_file('lab_report.pdf', 'Haemoglobin <b>low</b>, repeat test')
+
+    def create_file(self, name, description):
+        return MedicalFile.objects.create(
+            name=name,
+            file='medical_files/test.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            description=description,
+            size=100,
+            date_folder=self.date_folder,
+            category=self.category
+        )
+
+    def search(self, query):
+        return list(
+            self.search_service.filter(MedicalFile.objects.all(), query, rank=True)
+            .order_by('-search_rank')
+            .values_list('name', flat=True)
+        )
+
+    def test_uses_fts_on_sqlite(self):
+        self.assertIsInstance(self.search_service, SQLiteSearchService)
+
+    def test_search_matches_every_indexed_field(self):
+        """Test name, description, category and uploader are searchable"""
+        self.assertEqual(self.search('referral'), ['referral_letter.pdf'])
+        self.assertEqual(self.search('haemoglobin'), ['lab_report.pdf'])
+        self.assertEqual(len(self.search('blood')), 2)
+        self.assertEqual(len(self.search('nakato')), 2)
+
+    def test_search_prefix_and_multiple_terms(self):
+        """Test terms are prefix matched and combined with AND"""
+        self.assertEqual(self.search('cardio'), ['referral_letter.pdf'])
+        self.assertEqual(self.search('lab rep'), ['lab_report.pdf'])
+        self.assertEqual(self.search('referral haemo'), [])
+        self.assertEqual(self.search('"*)('), [])
+
+    def test_search_ranks_name_matches_first(self):
+        """Test a name match outranks a description-only match"""
+        self.create_file('clinic_schedule.pdf', 'Weekly rota')
+        self.assertEqual(self.search('clinic')[0], 'clinic_schedule.pdf')
+
+    def test_highlight_escapes_html(self):
+        """Test highlights mark matches and escape stored text"""
+        highlight = self.search_service.highlight([self.lab.id], 'low')[self.lab.id]
+        self.assertIn('<mark>low</mark>', highlight['description'])
+        self.assertIn('&lt;b&gt;', highlight['description'])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test signals keep the index in sync with file, category and user changes"""
+        self.referral.name = 'discharge_summary.pdf'
+        self.referral.save()
+        self.assertEqual(self.search('discharge'), ['discharge_summary.pdf'])
+        self.assertEqual(self.search('referral'), ['discharge_summary.pdf'])  # Still in the description
+
+        self.category.name = 'Haematology'
+        self.category.save()
+        self.assertEqual(len(self.search('haematology')), 2)
+
+        self.user.last_name = 'Apio'
+        self.user.save()
+        self.assertEqual(len(self.search('apio')), 2)
+
+        self.lab.delete()
+        self.assertEqual(self.search('haemoglobin'), [])
+
+    def test_rebuild(self):
+        """Test the index can be rebuilt from the file table"""
+        self.search_service.clear()
+        self.assertEqual(self.search('referral'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('referral'), ['referral_letter.pdf'])
+
+def make_pdf(*lines):
+    """Return the bytes of a one-page PDF with a text layer"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for offset, line in enumerate(lines):
+        pdf.drawString(72, 720 - offset * 20, line)
+    pdf.save()
+    return buffer.getvalue()
+
+@override_settings(TASK_BACKEND='inline')
+class TextExtractionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.search_service = SearchFactory.get_search_service()
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='Scans',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='radiographer',
+            password='testpass123',
+            department=self.department
+        )
+        self.date_folder = FolderService.get_date_folder(self.category, 2025, 8, 7)
+
+    def create_file(self, name, content, file_type='PDF'):
+        return MedicalFile.objects.create(
+            name=name,
+            file=SimpleUploadedFile(name, content, content_type='application/pdf'),
+            uploaded_by=self.user,
+            file_type=file_type,
+            size=len(content),
+            date_folder=self.date_folder,
+            category=self.category
+        )
+
+    def search(self, query):
+        return list(
+            self.search_service.filter(MedicalFile.objects.all(), query)
+            .values_list('name', flat=True)
+        )
+
+    def test_upload_extracts_text_into_index(self):
+        """Test a new PDF's text layer is stored and searchable once committed"""
+        with self.captureOnCommitCallbacks(execute=True):
+            scan = self.create_file('scan_20250807_165849.pdf', make_pdf('Chest X-ray', 'No pneumothorax seen'))
+
+        extracted = ExtractedText.objects.get(medical_file=scan)
+        self.assertIn('pneumothorax', extracted.text)
+        self.assertEqual(extracted.char_count, len(extracted.text))
+        self.assertEqual(self.search('pneumothorax'), ['scan_20250807_165849.pdf'])
+
+        highlight = self.search_service.highlight([scan.id], 'pneumo')[scan.id]
+        self.assertIn('<mark>pneumothorax</mark>', highlight['content'])
+
+    def test_extraction_is_incremental_by_checksum(self):
+        """Test unchanged files are skipped and changed files re-extracted"""
+        scan = self.create_file('scan.pdf', make_pdf('Fracture of left radius'))
+        self.assertEqual(TextExtractionService.extract_files([scan.id])['extracted'], 1)
+        self.assertEqual(
+            TextExtractionService.extract_files([scan.id]),
+            {'extracted': 0, 'unchanged': 1, 'failed': 0}
+        )
+
+        with open(scan.file.path, 'wb') as handle:
+            handle.write(make_pdf('Healed fracture'))
+        self.assertEqual(TextExtractionService.extract_files([scan.id])['extracted'], 1)
+        self.assertEqual(self.search('healed'), ['scan.pdf'])
+        self.assertEqual(self.search('radius'), [])
+
+    def test_unreadable_pdf_is_not_retried(self):
+        """Test a file without a text layer is recorded so it is only retried after changing"""
+        broken = self.create_file('broken.pdf', b'not a pdf')
+        self.assertEqual(TextExtractionService.extract_files([broken.id])['extracted'], 1)
+        self.assertEqual(ExtractedText.objects.get(medical_file=broken).text, '')
+        self.assertEqual(TextExtractionService.extract_files([broken.id])['unchanged'], 1)
+
+    def test_backfill_command(self):
+        """Test the backfill extracts existing PDFs in a process pool and skips other files"""
+        MedicalFile.objects.bulk_create([
+            MedicalFile(
+                name=f'scan_{i}.pdf',
+                file=f'medical_files/scan_{i}.pdf',
+                uploaded_by=self.user,
+                file_type='PDF',
+                size=1,
+                date_folder=self.date_folder,
+                category=self.category
+            )
+            for i in range(3)
+        ])
+        for i in range(3):
+            path = f'{self.media_root}/medical_files/scan_{i}.pdf'
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as handle:
+                handle.write(make_pdf(f'Ultrasound report {i}', 'Gallstones present'))
+        self.create_file('notes.txt', b'plain text', file_type='OTH')
+
+        out = StringIO()
+        call_command('extract_pdf_text', workers=2, batch_size=2, stdout=out)
+        self.assertIn('Extracted 3 files', out.getvalue())
+        self.assertEqual(len(self.search('gallstones')), 3)
+
+        out = StringIO()
+        call_command('extract_pdf_text', workers=2, stdout=out)
+        self.assertIn('Extracted 0 files', out.getvalue())
+        self.assertIn('3 unchanged', out.getvalue())
+
+
+@override_settings(TASK_BACKEND='inline')
+class BlobStoreTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.department = Department.objects.create(
+            code='LAB',
+            name='Laboratory'
+        )
+        self.category = Category.objects.create(
+            name='Lab Results',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='labtech',
+            password='testpass123',
+            department=self.department
+        )
+        self.content = b'%PDF-1.4 referral letter ' * 1000
+
+    def upload(self, day):
+        return UploadService.store_stream(
+            BytesIO(self.content),
+            'referral.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            date_folder=FolderService.get_date_folder(self.category, 2025, 8, day),
+            category=self.category,
+        )
+
+    def stored_files(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.media_root) for name in names]
+
+    def test_identical_uploads_share_one_blob(self):
+        """Test re-uploading the same bytes adds a row and a reference, not a copy"""
+        first = self.upload(1)
+        second = self.upload(2)
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file.name, f'blobs/{first.checksum[:2]}/{first.checksum[2:4]}/{first.checksum}.pdf')
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertEqual(len(self.stored_files()), 1)
+        with second.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total_bytes, 2 * len(self.content))
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        """Test the stored file survives until the last row using it is deleted"""
+        first = self.upload(1)
+        second = self.upload(2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertEqual(len(self.stored_files()), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_dedupe_media_merges_existing_copies(self):
+        """Test the command moves files stored before the blob store onto shared blobs"""
+        date_folder = FolderService.get_date_folder(self.category, 2025, 8, 1)
+        legacy = [
+            MedicalFile.objects.create(
+                name=f'copy{i}.pdf',
+                file=SimpleUploadedFile(f'copy{i}.pdf', self.content),
+                uploaded_by=self.user,
+                file_type='PDF',
+                size=len(self.content),
+                date_folder=date_folder,
+                category=self.category,
+            )
+            for i in range(3)
+        ]
+        self.assertEqual(len(self.stored_files()), 3)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedupe_media', stdout=out)
+
+        self.assertIn('from 2 duplicate copies', out.getvalue())
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(len(self.stored_files()), 1)
+        for medical_file in legacy:
+            medical_file.refresh_from_db()
+            self.assertEqual(medical_file.blob_id, blob.checksum)
+            self.assertEqual(medical_file.file.name, blob.file.name)
+
+
+@override_settings(
+    TASK_BACKEND='inline',
+    STORAGE_COLD_BACKEND='local',
+    STORAGE_TIERS={'warm': {'age_days': 90, 'idle_days': 30}, 'cold': {'age_days': 365, 'idle_days': 180}},
+)
+class StorageTierTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.department = Department.objects.create(code='LAB', name='Laboratory')
+        self.category = Category.objects.create(name='Lab Results', department=self.department)
+        self.user = User.objects.create_user(username='labtech', password='testpass123', department=self.department)
+
+    def upload(self, content, age_days=0, accessed_days=None):
+        medical_file = UploadService.store_stream(
+            BytesIO(content),
+            'report.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            date_folder=FolderService.get_date_folder(self.category, 2025, 8, 1),
+            category=self.category,
+        )
+        now = timezone.now()
+        Blob.objects.filter(pk=medical_file.blob_id).update(
+            created_at=now - timedelta(days=age_days),
+            last_accessed=now - timedelta(days=accessed_days) if accessed_days is not None else None,
+        )
+        return Blob.objects.get(pk=medical_file.blob_id)
+
+    def read(self, blob):
+        with TierService.open(blob) as handle:
+            return handle.read()
+
+    def test_policy_moves_blobs_by_age_and_access(self):
+        """Test old idle blobs go warm or cold while recent or recently read ones stay hot"""
+        contents = [f'report {i} '.encode() * 5000 for i in range(4)]
+        recent = self.upload(contents[0], age_days=10)
+        warm = self.upload(contents[1], age_days=100)
+        cold = self.upload(contents[2], age_days=400, accessed_days=200)
+        read_lately = self.upload(contents[3], age_days=400, accessed_days=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = TierService.migrate(batch_size=10)
+
+        self.assertEqual((counts['warm'], counts['cold'], counts['failed']), (1, 1, 0))
+        tiers = dict(Blob.objects.values_list('checksum', 'tier'))
+        self.assertEqual(tiers[recent.checksum], 'hot')
+        self.assertEqual(tiers[warm.checksum], 'warm')
+        self.assertEqual(tiers[cold.checksum], 'cold')
+        self.assertEqual(tiers[read_lately.checksum], 'hot')
+
+        warm.refresh_from_db()
+        cold.refresh_from_db()
+        self.assertEqual(warm.stored_name, f'{warm.file.name}.gz')
+        self.assertLess(warm.stored_size, warm.size)
+        self.assertFalse(default_storage.exists(warm.file.name))
+        self.assertTrue(cold.stored_name.startswith('cold/'))
+        self.assertFalse(default_storage.exists(cold.file.name))
+        self.assertEqual(counts['freed'], warm.size - warm.stored_size + cold.size)
+        self.assertEqual(self.read(warm), contents[1])
+        self.assertEqual(self.read(cold), contents[2])
+
+    def test_incompressible_blob_stays_in_place_when_warm(self):
+        """Test contents gzip cannot shrink are marked warm without a copy"""
+        blob = self.upload(os.urandom(50000), age_days=100)
+        TierService.move(blob, 'warm')
+
+        blob.refresh_from_db()
+        self.assertEqual((blob.tier, blob.stored_name), ('warm', ''))
+        self.assertTrue(default_storage.exists(blob.file.name))
+
+    def test_promote_and_release(self):
+        """Test a cold blob comes back hot and a released one leaves no copy behind"""
+        content = b'%PDF-1.4 discharge summary ' * 2000
+        blob = self.upload(content, age_days=400)
+        with self.captureOnCommitCallbacks(execute=True):
+            TierService.move(blob, 'cold')
+        cold_name = blob.stored_name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            blob = TierService.promote(blob)
+        self.assertEqual((blob.tier, blob.stored_name), ('hot', ''))
+        self.assertFalse(default_storage.exists(cold_name))
+        with default_storage.open(blob.file.name, 'rb') as handle:
+            self.assertEqual(handle.read(), content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TierService.move(blob, 'warm')
+        with self.captureOnCommitCallbacks(execute=True):
+            MedicalFile.objects.get(blob=blob).delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.stored_name))
+
+    @override_settings(RENDITION_SIZES={'thumb': 64}, RENDITION_FORMAT='JPEG')
+    def test_warm_and_cold_blobs_are_rendered_and_extracted(self):
+        """Test a copy uploaded onto a warm or cold blob gets its text and renditions from a staged copy"""
+        staging = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging, ignore_errors=True)
+        for tier in ('warm', 'cold'):
+            with self.subTest(tier=tier), override_settings(FILE_UPLOAD_TEMP_DIR=staging):
+                buffer = BytesIO()
+                pdf = canvas.Canvas(buffer)
+                pdf.drawImage(ImageReader(BytesIO(make_jpeg(200, 100))), 72, 600, 200, 100)
+                for i in range(30):
+                    pdf.drawString(72, 560 - i * 15, f'{tier} discharge summary line {i}')
+                pdf.save()
+                content = buffer.getvalue()
+                blob = self.upload(content, age_days=400)
+                with self.captureOnCommitCallbacks(execute=True):
+                    blob = TierService.move(blob, tier)
+                self.assertNotEqual(blob.stored_name, '')
+                RenditionService.purge(blob.checksum)
+
+                # Deduplicated onto the moved blob
+                with self.captureOnCommitCallbacks(execute=True):
+                    blob = self.upload(content)
+                medical_file = MedicalFile.objects.filter(blob=blob).latest('id')
+                self.assertEqual(Blob.objects.get(pk=blob.pk).tier, tier)
+                self.assertIn(f'{tier} discharge summary', ExtractedText.objects.get(medical_file=medical_file).text)
+                rendition = Rendition.objects.get(checksum=blob.checksum, size='thumb')
+                self.assertGreater(rendition.bytes, 0)
+                self.assertEqual(os.listdir(staging), [])
+
+    def test_migrate_storage_tiers_command(self):
+        """Test the command moves every due blob in batches"""
+        for i in range(3):
+            self.upload(f'lab result {i} '.encode() * 5000, age_days=100)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('migrate_storage_tiers', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(Blob.objects.filter(tier='warm').count(), 3)
+        self.assertIn('by moving 3 blobs', out.getvalue())
+
+
+def make_jpeg(width, height, color='navy'):
+    """Return the bytes of a solid-colour JPEG"""
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+def make_scanned_pdf(width, height):
+    """Return the bytes of a one-page PDF holding a single page-sized image, as scanners produce"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(width, height))
+    pdf.drawImage(ImageReader(BytesIO(make_jpeg(width, height))), 0, 0, width, height)
+    pdf.save()
+    return buffer.getvalue()
+
+@override_settings(RENDITION_SIZES={'thumb': 64, 'preview': 256}, RENDITION_FORMAT='JPEG', TASK_BACKEND='inline')
+class RenditionServiceTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='Scans',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='radiographer',
+            password='testpass123',
+            department=self.department
+        )
+        self.date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+
+    def upload(self, content, name, file_type):
+        return UploadService.store_stream(
+            BytesIO(content),
+            name,
+            uploaded_by=self.user,
+            file_type=file_type,
+            date_folder=self.date_folder,
+            category=self.category,
+        )
+
+    def test_images_are_downscaled_to_each_size(self):
+        """Test an image gets one rendition per size, stored next to its blob"""
+        medical_file = self.upload(make_jpeg(1200, 800), 'xray.jpg', 'IMG')
+
+        self.assertEqual(RenditionService.generate([medical_file.id]), 2)
+        thumb = Rendition.objects.get(checksum=medical_file.checksum, size='thumb')
+        self.assertEqual((thumb.width, thumb.height), (64, 43))
+        checksum = medical_file.checksum
+        self.assertEqual(thumb.file.name, f"blobs/{checksum[:2]}/{checksum[2:4]}/{checksum}.thumb.jpg")
+        with Image.open(thumb.file.path) as image:
+            self.assertEqual(image.size, (64, 43))
+
+        # Identical contents share the renditions
+        copy = self.upload(make_jpeg(1200, 800), 'xray_copy.jpg', 'IMG')
+        self.assertEqual(RenditionService.generate([copy.id]), 0)
+
+    def test_pdf_first_page_image_is_rendered(self):
+        """Test a scanned PDF's page image becomes its preview and a text-only PDF is recorded as blank"""
+        scan = self.upload(make_scanned_pdf(600, 800), 'scan.pdf', 'PDF')
+        letter = self.upload(make_pdf('Referral letter'), 'letter.pdf', 'PDF')
+
+        RenditionService.generate([scan.id, letter.id])
+
+        preview = Rendition.objects.get(checksum=scan.checksum, size='preview')
+        self.assertEqual((preview.width, preview.height), (192, 256))
+        self.assertFalse(Rendition.objects.get(checksum=letter.checksum, size='preview').file)
+        self.assertEqual(RenditionService.generate([letter.id]), 0)  # Not retried
+
+    def test_least_recently_used_are_evicted(self):
+        """Test eviction removes the oldest renditions, files included, until the cache fits"""
+        old = self.upload(make_jpeg(400, 400, 'red'), 'old.jpg', 'IMG')
+        new = self.upload(make_jpeg(400, 400, 'blue'), 'new.jpg', 'IMG')
+        RenditionService.generate([old.id])
+        RenditionService.generate([new.id])
+        Rendition.objects.filter(checksum=old.checksum).update(last_used=timezone.now() - timedelta(days=1))
+        old_paths = [rendition.file.path for rendition in Rendition.objects.filter(checksum=old.checksum)]
+
+        kept = Rendition.objects.filter(checksum=new.checksum).aggregate(total=Sum('bytes'))['total']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(RenditionService.evict(max_bytes=kept), 2)
+
+        self.assertEqual(set(Rendition.objects.values_list('checksum', flat=True)), {new.checksum})
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+
+    def test_deleting_last_copy_purges_renditions(self):
+        """Test renditions go with the blob of their contents"""
+        medical_file = self.upload(make_jpeg(300, 200), 'photo.jpg', 'IMG')
+        RenditionService.generate([medical_file.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            medical_file.delete()
+
+        self.assertFalse(Rendition.objects.exists())
+        self.assertEqual(
+            [name for _, _, names in os.walk(self.media_root) for name in names], []
+        )
+
+class PdfAssemblerTests(SimpleTestCase):
+    def page_images(self, data):
+        reader = PdfReader(BytesIO(data), strict=True)
+        return reader, [page['/Resources']['/XObject']['/Im0'].get_object() for page in reader.pages]
+
+    def test_jpeg_pages_pass_through(self):
+        """Test JPEG pages are embedded byte for byte and sized from their DPI"""
+        jpeg = make_jpeg(600, 300)
+        output = BytesIO()
+        with PdfAssembler(output) as assembler:
+            assembler.add_jpeg(BytesIO(jpeg), dpi=300)
+            assembler.add_image(Image.new('1', (100, 50), 1), dpi=100)
+
+        reader, images = self.page_images(output.getvalue())
+        self.assertEqual(images[0].get_data(), jpeg)
+        self.assertEqual([float(page.mediabox.width) for page in reader.pages], [144, 72])
+        self.assertEqual(images[1]['/BitsPerComponent'], 1)
+
+    def test_scanned_pdfs_are_copied_without_decoding(self):
+        """Test pages of scanned PDFs keep their JPEG data and size, and other PDFs are refused"""
+        output = BytesIO()
+        assembler = PdfAssembler(output)
+        self.assertEqual(assembler.add_pdf(BytesIO(make_scanned_pdf(200, 100))), 1)
+        self.assertEqual(assembler.add_pdf(BytesIO(make_scanned_pdf(200, 100))), 1)
+        with self.assertRaises(ValueError):
+            assembler.add_pdf(BytesIO(make_pdf('Referral letter')))
+        assembler.close()
+
+        reader, images = self.page_images(output.getvalue())
+        self.assertEqual(len(reader.pages), 2)
+        self.assertEqual(images[0].get_data(), make_jpeg(200, 100))
+        self.assertEqual(images[0]['/Filter'], '/DCTDecode')
+        self.assertEqual((float(reader.pages[1].mediabox.width), float(reader.pages[1].mediabox.height)), (200, 100))
+
+def make_text_page(width, height, angle=0, dpi=300):
+    """JPEG of a page ruled with dark text-like lines, rotated by angle degrees"""
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(height // 8, height - height // 8, max(4, height // 30)):
+        draw.rectangle([width // 8, y, width - width // 8, y + max(1, height // 150)], fill=30)
+    image = image.rotate(angle, Image.BICUBIC, fillcolor=255)
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90, dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+def make_photo(width, height):
+    """JPEG of a smooth color picture"""
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    for y in range(height):
+        draw.line([(0, y), (width, y)], fill=(120 + 80 * y // height, 90 + 60 * y // height, 60))
+    for number in range(6):
+        left, top = width * number // 7, height * (number % 3) // 4
+        draw.ellipse([left, top, left + width // 4, top + height // 4], fill=(40 * number, 200 - 30 * number, 150))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90, dpi=(300, 300))
+    return buffer.getvalue()
+
+class ScanPipelineTests(SimpleTestCase):
+    def test_bilevel_pages_are_stored_as_g4_and_merged_without_decoding(self):
+        """Test black and white pages are CCITT G4 encoded and copied as is between PDFs"""
+        page = scan_pipeline.process_page((make_text_page(600, 800), {'mode': 'bilevel'}))
+        self.assertEqual((page.filter, page.bits, page.width, page.height), ('/CCITTFaxDecode', 1, 600, 800))
+        self.assertLess(len(page.data), 600 * 800 // 8 // 10)
+
+        single, merged = BytesIO(), BytesIO()
+        with PdfAssembler(single) as assembler:
+            assembler.add_encoded(page)
+        with PdfAssembler(merged) as assembler:
+            assembler.add_pdf(BytesIO(single.getvalue()))
+
+        image = PdfReader(BytesIO(merged.getvalue()), strict=True).pages[0]['/Resources']['/XObject']['/Im0'].get_object()
+        self.assertEqual(image._data, page.data)
+        self.assertEqual(image['/DecodeParms']['/Columns'], 600)
+        self.assertTrue(image['/DecodeParms']['/BlackIs1'])
+
+    def test_deskew_levels_skewed_text(self):
+        """Test the detected skew undoes the rotation of a page, and level pages are left alone"""
+        image, _ = scan_pipeline.decode(make_text_page(800, 1000, angle=2))
+        self.assertAlmostEqual(scan_pipeline.detect_skew(image), -2, delta=0.2)
+        level, _ = scan_pipeline.decode(make_text_page(800, 1000))
+        self.assertEqual(scan_pipeline.deskew(level), (level, 0.0))
+
+    def test_auto_mode_compresses_pages_by_content(self):
+        """Test text pages become G4, and pages with pictures JPEG at their profile's resolution"""
+        text = Image.open(BytesIO(make_text_page(600, 800)))
+        mixed = text.convert('RGB')
+        mixed.paste(Image.open(BytesIO(make_photo(200, 150))), (200, 300))
+        buffer = BytesIO()
+        mixed.save(buffer, 'JPEG', quality=90, dpi=(300, 300))
+        pages = [
+            scan_pipeline.process_page((source, {'mode': 'auto', 'target_dpi': 300}))
+            for source in (make_text_page(600, 800), buffer.getvalue(), make_photo(600, 800))
+        ]
+
+        self.assertEqual([page.category for page in pages], ['text', 'mixed', 'photo'])
+        self.assertEqual([page.filter for page in pages], ['/CCITTFaxDecode', '/DCTDecode', '/DCTDecode'])
+        self.assertEqual([page.dpi for page in pages], [300, 200, 200])
+        self.assertEqual(pages[2].color_space, '/DeviceRGB')
+        gray = scan_pipeline.process_page((make_photo(600, 800), {'mode': 'auto', 'profiles': {
+            'photo': {'mode': 'gray', 'jpeg_quality': 50},
+        }}))
+        self.assertEqual((gray.color_space, gray.dpi), ('/DeviceGray', 300))
+
+    def test_pages_are_downsampled_to_the_target_dpi_in_order(self):
+        """Test pages above the target DPI are reduced and come back in submission order"""
+        jobs = [
+            (make_text_page(600 * width, 600, dpi=600), {'mode': 'gray', 'target_dpi': 200})
+            for width in (1, 2, 3)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            pages = list(scan_pipeline.process_pages(jobs, executor, window=2))
+        self.assertEqual([(page.width, page.height, page.dpi) for page in pages], [(200, 200, 200), (400, 200, 200), (600, 200, 200)])
+        self.assertEqual({page.color_space for page in pages}, {'/DeviceGray'})
+
+class ScanProcessingServiceTests(TestCase):
+    def test_savings_are_reported_per_category(self):
+        """Test the bytes scanned and stored for each page add up per category in the report"""
+        output = BytesIO()
+        with self.settings(TASK_BACKEND='inline'):
+            pages = ScanProcessingService.assemble(output, [
+                (make_text_page(600, 800), ScanProcessingService.options('Color')),
+                (make_text_page(600, 800), ScanProcessingService.options('BlackAndWhite')),
+            ])
+        self.assertEqual([category for category, _ in pages], ['text', None])
+        ScanProcessingService.record([50000, 40000], pages)
+        ScanProcessingService.record([90000], [('photo', 30000)])
+
+        report = {row['category']: row for row in ScanProcessingService.report(days=1)}
+        self.assertEqual(report['photo'], {
+            'category': 'photo', 'pages': 1, 'scanned': 90000, 'stored': 30000, 'saved': 60000, 'ratio': 3.0,
+        })
+        self.assertEqual(report['text']['stored'], pages[0][1])
+        self.assertEqual(ScanPageStat.objects.filter(category='').count(), 1)
+
+        out = StringIO()
+        call_command('scan_compression_report', stdout=out)
+        self.assertIn('unclassified', out.getvalue())
+        self.assertIn('photo', out.getvalue())
+
+    @override_settings(TASK_BACKEND='local', SCAN_PROCESSING_WORKERS=2)
+    def test_document_pages_are_processed_in_the_pool_in_order(self):
+        """Test one job per page of a document runs in the pool and comes out in page order on A4"""
+        self.addCleanup(ScanProcessingService.reset_pool)
+        widths = [400, 500, 600, 700]
+        output = BytesIO()
+        pages = ScanProcessingService.assemble(
+            output,
+            ((make_text_page(width, 800), ScanProcessingService.options()) for width in widths),
+            page_size=(595, 842), margin=30,
+        )
+        self.assertEqual(len(pages), 4)
+        reader = PdfReader(BytesIO(output.getvalue()))
+        sizes = [(float(page.mediabox.width), float(page.mediabox.height)) for page in reader.pages]
+        self.assertEqual(sizes, [(595, 842)] * 4)
+        images = [next(iter(page.images)).image.width for page in reader.pages]
+        self.assertEqual(images, sorted(images))
+
+class ScannerWorkerPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.scanner_service = FakeScannerService(devices=2, scan_seconds=0.02, page_inches=(0.5, 0.5))
+        self.runs = []
+        self.failures = []
+        self.pool = ScannerWorkerPool(self.scanner_service, self.run_job, self.fail_job, idle_timeout=5)
+
+    def run_job(self, device, job_id):
+        device.scan(os.path.join(self.directory, f'{job_id}.jpg'), dpi=50)
+        self.runs.append((device.scanner_id, job_id, threading.current_thread().name))
+
+    def fail_job(self, job_id, error):
+        self.failures.append((job_id, error))
+
+    def test_each_scanner_runs_its_jobs_in_order_on_its_own_thread(self):
+        """Test jobs of one scanner run one at a time in order, on one thread per scanner"""
+        for number in range(3):
+            self.pool.submit(1, f'a{number}')
+            self.pool.submit(2, f'b{number}')
+        self.pool.stop()
+
+        for scanner_id, prefix in [(1, 'a'), (2, 'b')]:
+            runs = [run for run in self.runs if run[0] == scanner_id]
+            self.assertEqual([job_id for _, job_id, _ in runs], [f'{prefix}{number}' for number in range(3)])
+            self.assertEqual({thread for _, _, thread in runs}, {f'scanner-{scanner_id}'})
+        self.assertEqual(self.scanner_service.busy_errors, 0)  # Never two scans at once on a device
+
+    def test_unreachable_scanner_fails_its_jobs(self):
+        """Test a job whose scanner cannot be opened is failed without stopping the pool"""
+        self.pool.submit(3, 'lost')
+        self.pool.submit(1, 'kept')
+        self.pool.stop()
+
+        self.assertEqual([job_id for job_id, _ in self.failures], ['lost'])
+        self.assertEqual([job_id for _, job_id, _ in self.runs], ['kept'])
+
+class ScannerRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.scanner_service = FakeScannerService(devices=1)
+        self.registry = ScannerRegistry(self.scanner_service, ttl=60)
+        self.addCleanup(self.registry.close)
+
+    def wait_for_reload(self, enumerations):
+        deadline = time.monotonic() + 5
+        while self.scanner_service.enumerations < enumerations and time.monotonic() < deadline:
+            time.sleep(0.01)
+        while self.registry._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_devices_are_enumerated_once(self):
+        """Test the list is served from memory, then reloaded in the background on hot-plug and expiry"""
+        self.assertEqual([device['id'] for device in self.registry.devices()], [1])
+        self.registry.devices()
+        self.assertEqual(self.scanner_service.enumerations, 1)
+
+        self.scanner_service.plug(2)
+        self.wait_for_reload(2)
+        self.assertEqual([device['name'] for device in self.registry.devices()], ['Fake Scanner 1', 'Fake Scanner 2'])
+
+        self.registry.ttl = 0
+        self.assertEqual(len(self.registry.devices()), 2)  # Served while the reload runs
+        self.wait_for_reload(3)
+        self.assertEqual(self.scanner_service.enumerations, 3)
+
+    def test_failed_reload_keeps_the_last_list(self):
+        """Test a reload error keeps the known scanners, but a first enumeration error is raised"""
+        self.registry.devices()
+        with patch.object(self.scanner_service, 'list_devices', side_effect=ScannerError('WIA stopped')):
+            self.assertEqual(len(self.registry.refresh()), 1)
+            self.assertEqual(self.registry.last_error, 'WIA stopped')
+            with self.assertRaises(ScannerError):
+                ScannerRegistry(self.scanner_service).devices()
+
+class LocalStorageServiceTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def test_upload_hashes_in_a_single_pass(self):
+        """Test upload_file returns MD5 and SHA-256 while reading the file only once"""
+        content = os.urandom(3 * 1024 * 1024 + 17)
+        file = SimpleUploadedFile('scan.bin', content)
+        reads = []
+        original_read = file.file.read
+        file.file.read = lambda *args: reads.append(1) or original_read(*args)
+
+        result = LocalStorageService().upload_file(file)
+
+        self.assertEqual(result['checksum'], hashlib.md5(content).hexdigest())
+        self.assertEqual(result['sha256'], hashlib.sha256(content).hexdigest())
+        self.assertEqual(result['size'], len(content))
+        with default_storage.open(result['path'], 'rb') as handle:
+            self.assertEqual(handle.read(), content)
+        chunk_count = -(-len(content) // File.DEFAULT_CHUNK_SIZE)
+        self.assertLessEqual(len(reads), chunk_count + 1)
+
+    @override_settings(STORAGE_STREAM_CHUNK_SIZE=64 * 1024)
+    def test_iter_file_streams_bounded_chunks(self):
+        """Test downloads stream in chunks no larger than STORAGE_STREAM_CHUNK_SIZE"""
+        content = os.urandom(200 * 1024)
+        service = LocalStorageService()
+        path = service.upload_file(SimpleUploadedFile('video.mp4', content))['path']
+
+        response = StreamingHttpResponse(service.iter_file(path), content_type='video/mp4')
+        chunks = list(response.streaming_content)
+
+        self.assertEqual(b''.join(chunks), content)
+        self.assertEqual(max(len(chunk) for chunk in chunks), 64 * 1024)
+
+
+@skipUnless(mock_aws, "moto is not installed")
+@override_settings(
+    AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing',
+    AWS_STORAGE_BUCKET_NAME='medical-files',
+    AWS_S3_REGION_NAME='us-east-1',
+    AWS_S3_MULTIPART_THRESHOLD=5 * 1024 * 1024,
+    AWS_S3_PART_SIZE=5 * 1024 * 1024,  # The smallest part S3 accepts
+    AWS_S3_MAX_CONCURRENCY=4,
+)
+class S3StorageServiceTests(TestCase):
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+
+        self.service = S3StorageService()
+        self.service.s3_client.create_bucket(Bucket='medical-files')
+        self.content = os.urandom(12 * 1024 * 1024 + 1234)  # Three parts, the last one short
+        self.path = self.service.upload_file(SimpleUploadedFile('scan.bin', self.content))['path']
+
+    def test_large_upload_is_multipart(self):
+        """Test files over the threshold are uploaded in parallel parts and hashed on the way"""
+        head = self.service.s3_client.head_object(Bucket='medical-files', Key=self.path)
+        self.assertTrue(head['ETag'].strip('"').endswith('-3'))
+        self.assertEqual(head['ContentLength'], len(self.content))
+
+    def test_ranged_downloads_reassemble(self):
+        """Test parallel ranged downloads rebuild the object as a stream and as a file"""
+        self.assertEqual(b''.join(self.service.iter_file(self.path)), self.content)
+
+        with tempfile.TemporaryDirectory() as directory:
+            destination = os.path.join(directory, 'scan.bin')
+            self.assertEqual(self.service.download_to_file(self.path, destination), len(self.content))
+            with open(destination, 'rb') as handle:
+                self.assertEqual(handle.read(), self.content)
+
+
+class StorageFactoryTests(TestCase):
+    def setUp(self):
+        StorageFactory.reset()
+        self.addCleanup(StorageFactory.reset)
+
+    def test_services_are_shared(self):
+        """Test the factory hands out one long-lived service per backend"""
+        first = StorageFactory.get_storage_service('local')
+        self.assertIs(StorageFactory.get_storage_service('local'), first)
+        self.assertEqual(StorageFactory.pool_stats()['local']['handed_out'], 2)
+        self.assertEqual(StorageFactory.pool_stats()['local']['created'], 1)
+
+    def test_failed_health_check_reconnects(self):
+        """Test a shared service that fails its health check is replaced"""
+        first = StorageFactory.get_storage_service('local')
+        with override_settings(STORAGE_HEALTH_CHECK_INTERVAL=0), \
+                patch.object(LocalStorageService, 'check_health', side_effect=ConnectionError('gone')):
+            second = StorageFactory.get_storage_service('local')
+
+        self.assertIsNot(second, first)
+        self.assertIs(StorageFactory.get_storage_service('local'), second)
+        self.assertEqual(StorageFactory.pool_stats()['local']['reconnects'], 1)
+
+    def test_slow_backend_does_not_block_others(self):
+        """Test a backend slow to connect holds up neither other backends nor ends up built twice"""
+        release = threading.Event()
+
+        class SlowStorageService(LocalStorageService):
+            def __init__(self):
+                release.wait(10)
+
+        with patch.dict(StorageFactory.services, {'slow': SlowStorageService}), ThreadPoolExecutor(2) as executor:
+            slow = [executor.submit(StorageFactory.get_storage_service, 'slow') for _ in range(2)]
+            time.sleep(0.1)  # Both callers are building a client
+            self.assertIsInstance(StorageFactory.get_storage_service('local'), LocalStorageService)
+            self.assertFalse(any(future.done() for future in slow))
+            release.set()
+            services = [future.result(timeout=10) for future in slow]
+
+        self.assertIs(services[0], services[1])
+        self.assertEqual(StorageFactory.pool_stats()['slow']['created'], 1)
+
+    @skipUnless(ThreadedMotoServer, "moto[server] is not installed")
+    def test_s3_connections_are_reused(self):
+        """Test repeated S3 calls through the factory reuse pooled connections"""
+        # A real HTTP endpoint: mock_aws short-circuits below the connection pool
+        server = ThreadedMotoServer(port=0, verbose=False)
+        werkzeug_logger = logging.getLogger('werkzeug')
+        self.addCleanup(werkzeug_logger.setLevel, werkzeug_logger.level)
+        werkzeug_logger.setLevel(logging.ERROR)
+        server.start()
+        self.addCleanup(server.stop)
+        host, port = server.get_host_and_port()
+
+        with override_settings(
+            AWS_ACCESS_KEY_ID='testing',
+            AWS_SECRET_ACCESS_KEY='testing',
+            AWS_STORAGE_BUCKET_NAME='medical-files',
+            AWS_S3_REGION_NAME='us-east-1',
+            AWS_S3_ENDPOINT_URL=f'http://{host}:{port}',
+        ):
+            StorageFactory.get_storage_service('aws_s3').s3_client.create_bucket(Bucket='medical-files')
+            for _ in range(5):
+                StorageFactory.get_storage_service('aws_s3').upload_file(SimpleUploadedFile('note.txt', b'note'))
+
+        stats = StorageFactory.pool_stats()['aws_s3']
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['requests'], 6)
+        self.assertEqual(stats['connections_opened'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['max_connections'], 20)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import threading
+from django.test import SimpleTestCase, TestCase, override_settings
+from ..models import Department, Category, MedicalFile, User
+from ..services.folder_service import FolderService
+from ..tasks import LocalTaskEngine, task
+from ..utils.task_queue import SQLiteTaskQueue
+
+flaky_calls = []
+flaky_done = threading.Event()
+
+
+@task(name='tests.flaky', max_retries=1, retry_delay=0)
+def flaky(value):
+    """Fails on its first run"""
+    flaky_calls.append(value)
+    if len(flaky_calls) == 1:
+        raise RuntimeError('first attempt fails')
+    flaky_done.set()
+
+
+class TaskQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.queue = SQLiteTaskQueue(os.path.join(self.directory, 'tasks.sqlite3'))
+
+    def test_waiting_calls_are_deduplicated_by_key(self):
+        """Test a key absorbs calls while queued but not once its task is running"""
+        first = self.queue.put('refresh', 'stats', [1], {}, key='stats:1')
+        self.assertEqual(self.queue.put('refresh', 'stats', [1], {}, key='stats:1'), first)
+
+        self.assertEqual([job['id'] for job in self.queue.claim('stats', 1)], [first])
+        second = self.queue.put('refresh', 'stats', [1], {}, key='stats:1')
+        self.assertNotEqual(second, first)
+        self.assertEqual(self.queue.counts(), {'stats': {'queued': 1, 'running': 1}})
+
+    def test_claims_respect_queue_limit(self):
+        """Test no more tasks of a queue run at once than its limit"""
+        for number in range(3):
+            self.queue.put('extract', 'extraction', [number], {})
+
+        jobs = self.queue.claim('extraction', 2)
+        self.assertEqual([job['args'] for job in jobs], [[0], [1]])
+        self.assertEqual(self.queue.claim('extraction', 2), [])
+
+        self.queue.complete(jobs[0]['id'])
+        self.assertEqual([job['args'] for job in self.queue.claim('extraction', 2)], [[2]])
+
+    def test_failed_tasks_retry_then_stop(self):
+        """Test a failing task is requeued until its retries are used up"""
+        task_id = self.queue.put('extract', 'extraction', [], {}, max_retries=1)
+
+        self.queue.claim('extraction', 1)
+        self.assertTrue(self.queue.fail(task_id, 'boom', retry_delay=0))
+        self.assertEqual(self.queue.claim('extraction', 1)[0]['attempts'], 2)
+        self.assertFalse(self.queue.fail(task_id, 'boom again', retry_delay=0))
+
+        self.assertEqual(self.queue.claim('extraction', 1), [])
+        self.assertEqual(self.queue.failed()[0]['last_error'], 'boom again')
+
+    def test_recover_requeues_orphaned_tasks(self):
+        """Test tasks left running by a previous process are queued again"""
+        task_id = self.queue.put('extract', 'extraction', [], {})
+        self.queue.claim('extraction', 1)
+
+        self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual([job['id'] for job in self.queue.claim('extraction', 1)], [task_id])
+
+
+class LocalTaskEngineTests(SimpleTestCase):
+    def test_engine_runs_and_retries_tasks(self):
+        """Test a queued task runs on the engine's threads and is retried after failing"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        flaky_calls.clear()
+        flaky_done.clear()
+
+        engine = LocalTaskEngine(os.path.join(directory, 'tasks.sqlite3'), {'default': 1}, poll_interval=0.05)
+        engine.start()
+        self.addCleanup(engine.stop)
+        engine.submit(flaky, ['scan'], {})
+
+        self.assertTrue(flaky_done.wait(5))
+        self.assertEqual(flaky_calls, ['scan', 'scan'])
+
+
+class TaskSignalTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        queue_override = override_settings(
+            TASK_BACKEND='local',
+            TASK_LOCAL_AUTOSTART=False,
+            TASK_QUEUE_PATH=os.path.join(directory, 'tasks.sqlite3'),
+        )
+        queue_override.enable()
+        self.addCleanup(queue_override.disable)
+        LocalTaskEngine._instance = None
+        self.addCleanup(setattr, LocalTaskEngine, '_instance', None)
+
+        self.department = Department.objects.create(code='LAB', name='Laboratory')
+        self.category = Category.objects.create(name='Lab Results', department=self.department)
+        self.user = User.objects.create_user(username='labtech', password='testpass123', department=self.department)
+
+    def test_uploads_queue_background_work(self):
+        """Test new files queue their post-processing and one stats refresh per scope"""
+        date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(2):
+                MedicalFile.objects.create(
+                    name=f'result_{number}.pdf',
+                    file=f'medical_files/result_{number}.pdf',
+                    uploaded_by=self.user,
+                    file_type='PDF',
+                    size=100,
+                    date_folder=date_folder,
+                    category=self.category
+                )
+
+        counts = LocalTaskEngine.instance().queue.counts()
+        self.assertEqual(counts['default'], {'queued': 2})
+        self.assertEqual(counts['stats'], {'queued': 2})  # The department and the staff-wide scope
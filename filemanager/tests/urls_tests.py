@@ -41,7 +41,17 @@ class URLTests(TestCase):
         url = reverse('scan_document')
         self.assertTrue(callable(resolve(url).func))
 
-    # Removed test_finalize_scan_url_resolves as the endpoint doesn't exist
+    def test_finalize_scan_url_resolves(self):
+        url = reverse('finalize_scan')
+        self.assertTrue(callable(resolve(url).func))
+
+    def test_scan_artifact_url_resolves(self):
+        url = reverse('scan_artifact', args=['00000000-0000-0000-0000-000000000000'])
+        self.assertTrue(callable(resolve(url).func))
+
+    def test_scan_job_url_resolves(self):
+        url = reverse('scan_job', args=['00000000-0000-0000-0000-000000000000'])
+        self.assertTrue(callable(resolve(url).func))
 
     def test_upload_file_api_url_resolves(self):
         url = reverse('upload_file_api')
@@ -59,6 +69,14 @@ class URLTests(TestCase):
         url = reverse('delete_file', args=[1])  # Test with a sample file ID
         self.assertTrue(callable(resolve(url).func))
 
+    def test_download_file_url_resolves(self):
+        url = reverse('download_file', args=[1])
+        self.assertTrue(callable(resolve(url).func))
+
+    def test_file_rendition_url_resolves(self):
+        url = reverse('file_rendition', args=[1, 'thumb', 'abc123'])
+        self.assertTrue(callable(resolve(url).func))
+
     def test_get_user_profile_url_resolves(self):
         url = reverse('get_user_profile')
         self.assertTrue(callable(resolve(url).func))
@@ -1,9 +1,29 @@
-from django.test import TestCase, Client
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+from urllib.parse import urlencode
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from datetime import timedelta
 from django.utils import timezone
-from ..models import Department, Category, YearFolder, MonthFolder, DateFolder, MedicalFile, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from pypdf import PdfReader
+from PIL import Image
+from ..models import Department, Category, YearFolder, MonthFolder, DateFolder, MedicalFile, User, UploadSession, ScanArtifact, ScanJob, ScanPageStat, Blob, Rendition
+from ..services.folder_service import FolderService
+from ..services.rendition_service import RenditionService
+from ..services.scan_artifact_service import ScanArtifactService
+from ..services.scan_job_service import ScanJobService
+from ..services.scanner_service import ScannerFactory, ScannerRegistry
+from ..services.search_service import SearchFactory
+from ..services.tier_service import TierService
+from ..services.upload_service import FileTooLarge, UploadService
 from ..views import LoginView 
 from ..models import Department, Category, YearFolder, MonthFolder, DateFolder, MedicalFile, User
 
@@ -156,6 +176,107 @@ class FileUploadViewTests(TestCase):
         self.assertContains(response, 'Successfully uploaded the file')
         self.assertTrue(MedicalFile.objects.filter(name='test.pdf').exists())
 
+class StreamUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.client = Client()
+        self.upload_url = reverse('stream_upload_api')
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='Scans',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.content = b'%PDF-1.4 scan ' * 20000  # Spans several read chunks
+
+    def metadata(self, **extra):
+        return {'category': self.category.name, 'year': '2025', 'month': '8', 'date': '21', **extra}
+
+    def assert_stored(self, response, name):
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        medical_file = MedicalFile.objects.get(pk=data['file_id'])
+        self.assertEqual(data['checksum'], hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(medical_file.checksum, data['checksum'])
+        self.assertEqual(medical_file.size, len(self.content))
+        self.assertEqual(medical_file.name, name)
+        self.assertEqual(medical_file.file_type, 'PDF')
+        with medical_file.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total_bytes, len(self.content))
+
+    def test_raw_body_upload(self):
+        """Test a raw request body is streamed to storage with metadata from the query string"""
+        response = self.client.put(
+            f"{self.upload_url}?{urlencode(self.metadata(filename='scan.pdf'))}",
+            data=self.content,
+            content_type='application/pdf'
+        )
+        self.assert_stored(response, 'scan.pdf')
+
+    def test_multipart_upload(self):
+        """Test a multipart file part is spooled to disk and hashed"""
+        response = self.client.post(self.upload_url, {
+            'file': SimpleUploadedFile('scan.pdf', self.content, content_type='application/pdf'),
+            **self.metadata(description='Chest X-ray'),
+        })
+        self.assert_stored(response, 'scan.pdf')
+        self.assertEqual(MedicalFile.objects.get().description, 'Chest X-ray')
+
+    def test_upload_rejects_bad_requests(self):
+        url = f"{self.upload_url}?{urlencode(self.metadata())}"
+        self.assertEqual(self.client.put(url, data=self.content, content_type='application/pdf').status_code, 400)
+
+        other = Category.objects.create(
+            name='Other',
+            department=Department.objects.create(code='LAB', name='Laboratory')
+        )
+        url = f"{self.upload_url}?{urlencode(self.metadata(filename='scan.pdf', category=other.name))}"
+        self.assertEqual(self.client.put(url, data=self.content, content_type='application/pdf').status_code, 403)
+        self.assertFalse(MedicalFile.objects.exists())
+
+        self.client.logout()
+        self.assertEqual(self.client.put(url, data=self.content, content_type='application/pdf').status_code, 401)
+
+    def test_oversized_uploads_are_refused(self):
+        """Test raw and multipart uploads over MAX_FILE_SIZE answer 413 and leave nothing behind"""
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir, ignore_errors=True)
+        with override_settings(MAX_FILE_SIZE=len(self.content) - 1, FILE_UPLOAD_TEMP_DIR=spool_dir):
+            response = self.client.put(
+                f"{self.upload_url}?{urlencode(self.metadata(filename='scan.pdf'))}",
+                data=self.content,
+                content_type='application/pdf'
+            )
+            self.assertEqual(response.status_code, 413)
+
+            response = self.client.post(self.upload_url, {
+                'file': SimpleUploadedFile('scan.pdf', self.content, content_type='application/pdf'),
+                **self.metadata(),
+            })
+            self.assertEqual(response.status_code, 413)
+
+            # A body longer than its Content-Length claimed is cut off while streaming
+            with self.assertRaises(FileTooLarge):
+                UploadService.store_stream(BytesIO(self.content), 'scan.pdf', max_size=len(self.content) - 1)
+
+        self.assertFalse(MedicalFile.objects.exists())
+        self.assertEqual(os.listdir(spool_dir), [])
+
 class UserProfileTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -231,6 +352,13 @@ class FileSearchTests(TestCase):
         self.assertEqual(len(data['files']), 1)
         self.assertEqual(data['files'][0]['name'], 'searchable.pdf')
 
+    def test_search_returns_highlight(self):
+        response = self.client.get(f'{self.search_url}?query=search&sortBy=relevance')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['files']), 1)
+        self.assertEqual(data['files'][0]['highlight']['name'], '<mark>searchable</mark>.pdf')
+
     def test_search_by_date_range(self):
         response = self.client.get(f'{self.search_url}?dateRange=today')
         self.assertEqual(response.status_code, 200)
@@ -245,3 +373,808 @@ class FileSearchTests(TestCase):
         self.assertTrue(data['success'])
         self.assertEqual(len(data['files']), 1)
         self.assertEqual(data['files'][0]['file_type'], 'PDF')
+
+class UserBrowserTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+        year_folder = YearFolder.objects.create(category=self.category, year=2025)
+        month_folder = MonthFolder.objects.create(year_folder=year_folder, month=8)
+        date_folder = DateFolder.objects.create(month_folder=month_folder, date=21)
+        MedicalFile.objects.create(
+            name='test.pdf',
+            file=SimpleUploadedFile("test.pdf", b"file_content"),
+            uploaded_by=self.user,
+            file_type='PDF',
+            size=1000,
+            date_folder=date_folder,
+            category=self.category
+        )
+
+    def test_years_view_shows_virtual_years(self):
+        response = self.client.get(reverse('user_browser'))
+        self.assertEqual(response.status_code, 200)
+        years = {y['year']: y['file_count'] for y in response.context['years_data']}
+        self.assertEqual(years[2025], 1)
+        self.assertEqual(years[2016], 0)
+
+    def test_days_view_shows_every_day_of_month(self):
+        response = self.client.get(reverse('user_browser_month', kwargs={'year': 2025, 'month': 8}))
+        self.assertEqual(response.status_code, 200)
+        days = {d['day']: d['file_count'] for d in response.context['days_data']}
+        self.assertEqual(len(days), 31)
+        self.assertEqual(days[21], 1)
+        self.assertEqual(days[1], 0)
+
+class FileStructureTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.structure_url = reverse('get_file_structure')
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def add_file(self, category, year, month, day):
+        year_folder, _ = YearFolder.objects.get_or_create(category=category, year=year)
+        month_folder, _ = MonthFolder.objects.get_or_create(year_folder=year_folder, month=month)
+        date_folder, _ = DateFolder.objects.get_or_create(month_folder=month_folder, date=day)
+        return MedicalFile.objects.create(
+            name='test.pdf',
+            file='medical_files/test.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            size=1000,
+            date_folder=date_folder,
+            category=category
+        )
+
+    def get_structure(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.structure_url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['structure'], len(queries)
+
+    @override_settings(FOLDER_START_YEAR=2023, FOLDER_END_YEAR=2025)
+    def test_structure_lists_days_with_files(self):
+        category = Category.objects.create(name='Test Category', department=self.department)
+        Category.objects.create(name='Empty Category', department=self.department)
+        self.add_file(category, 2025, 8, 21)
+        self.add_file(category, 2025, 8, 3)
+        self.add_file(category, 2024, 12, 1)
+        # Years outside the browsable range are kept in order when they hold files
+        self.add_file(category, 2027, 1, 5)
+        self.add_file(category, 2021, 6, 30)
+        YearFolder.objects.create(category=category, year=2020)  # Empty folders are omitted
+
+        structure, _ = self.get_structure()
+        self.assertEqual(list(structure), ['Test Category', 'Empty Category'])
+        self.assertEqual(list(structure['Test Category']), ['2027', '2025', '2024', '2023', '2021'])
+        self.assertEqual(list(structure['Empty Category']), ['2025', '2024', '2023'])
+        self.assertEqual(structure['Test Category']['2021']['06'], ['30'])
+        self.assertEqual(list(structure['Test Category']['2025']), [f'{month:02d}' for month in range(12, 0, -1)])
+        self.assertEqual(structure['Test Category']['2025']['08'], ['21', '03'])
+        self.assertEqual(structure['Test Category']['2024']['12'], ['01'])
+        # Periods without files are there to navigate into, with no days
+        self.assertEqual(structure['Test Category']['2023']['01'], [])
+        self.assertEqual(structure['Empty Category']['2025']['08'], [])
+        days = sum(len(days) for year in structure['Test Category'].values() for days in year.values())
+        self.assertEqual(days, 5)
+
+    def test_structure_query_count_is_constant(self):
+        category = Category.objects.create(name='Small', department=self.department)
+        self.add_file(category, 2025, 8, 21)
+        _, small_tree_queries = self.get_structure()
+
+        for i in range(5):
+            category = Category.objects.create(name=f'Category {i}', department=self.department)
+            for year in range(2018, 2026):
+                for month in (1, 6, 12):
+                    self.add_file(category, year, month, 10 + i)
+        structure, large_tree_queries = self.get_structure()
+
+        self.assertEqual(len(structure), 6)
+        self.assertEqual(small_tree_queries, large_tree_queries)
+        # Session load/save, user, department, the category names and the single tree query
+        self.assertEqual(large_tree_queries, 8)
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.stats_url = reverse('dashboard_stats')
+        self.department = Department.objects.create(
+            code='NEONATAL',
+            name='Neonatal Care'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+        year_folder = YearFolder.objects.create(category=self.category, year=2025)
+        month_folder = MonthFolder.objects.create(year_folder=year_folder, month=8)
+        date_folder = DateFolder.objects.create(month_folder=month_folder, date=21)
+        MedicalFile.objects.create(
+            name='test.pdf',
+            file='medical_files/test.pdf',
+            uploaded_by=self.user,
+            file_type='PDF',
+            size=2048,
+            date_folder=date_folder,
+            category=self.category
+        )
+
+    def test_dashboard_stats_returns_counts(self):
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total_files'], 1)
+        self.assertEqual(data['category_count'], 1)
+        self.assertEqual(data['storage_used'], '2.0 KB')
+        self.assertEqual(data['category_stats'][0]['file_count'], 1)
+        self.assertEqual(data['recent_uploads'][0]['name'], 'test.pdf')
+
+class FilePaginationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='LAB',
+            name='Laboratory'
+        )
+        self.category = Category.objects.create(
+            name='Test Category',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+        date_folder = FolderService.get_date_folder(self.category, 2025, 8, 21)
+        MedicalFile.objects.bulk_create([
+            MedicalFile(
+                name=f'report_{i:02d}.pdf',
+                file=f'medical_files/report_{i:02d}.pdf',
+                uploaded_by=self.user,
+                file_type='PDF',
+                size=100 + i,
+                date_folder=date_folder,
+                category=self.category
+            )
+            for i in range(25)
+        ])
+        # Pairs of files share an upload time so the id tie-breaker is exercised
+        base = timezone.now() - timedelta(days=1)
+        for i, file in enumerate(MedicalFile.objects.order_by('id')):
+            MedicalFile.objects.filter(pk=file.pk).update(uploaded_at=base + timedelta(minutes=i // 2))
+        self.newest_first = list(MedicalFile.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+        SearchFactory.get_search_service().rebuild()  # bulk_create skips the indexing signals
+
+    def walk(self, url, params):
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(data)
+            cursor = data['pagination']['next_cursor']
+            if not cursor:
+                return pages
+
+    def test_browse_walks_every_file_once(self):
+        """Test cursors walk all files newest first without gaps or repeats"""
+        pages = self.walk(reverse('get_files_by_date'), {'per_page': 10})
+        self.assertEqual([len(page['files']) for page in pages], [10, 10, 5])
+        self.assertEqual([file['id'] for page in pages for file in page['files']], self.newest_first)
+        self.assertFalse(pages[0]['pagination']['has_previous'])
+        self.assertFalse(pages[-1]['pagination']['has_next'])
+
+    def test_browse_previous_cursor_returns_previous_page(self):
+        pages = self.walk(reverse('get_files_by_date'), {'per_page': 10})
+        response = self.client.get(reverse('get_files_by_date'), {
+            'per_page': 10, 'cursor': pages[2]['pagination']['previous_cursor']
+        })
+        self.assertEqual(response.json()['files'], pages[1]['files'])
+
+    def test_deep_pages_use_constant_queries(self):
+        """Test a page deep in the listing costs the same queries as the first, with no COUNT"""
+        url = reverse('get_files_by_date')
+        pages = self.walk(url, {'per_page': 5})
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url, {'per_page': 5})
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(url, {'per_page': 5, 'cursor': pages[-2]['pagination']['next_cursor']})
+        self.assertEqual(len(first), len(deep))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in deep.captured_queries))
+
+    def test_estimated_total_is_optional(self):
+        response = self.client.get(reverse('get_files_by_date'), {'total': 1})
+        self.assertEqual(response.json()['pagination']['estimated_total'], {'count': 25, 'exact': True})
+        response = self.client.get(reverse('get_files_by_date'))
+        self.assertNotIn('estimated_total', response.json()['pagination'])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('get_files_by_date'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_pages_follow_sort_order(self):
+        """Test search results are paged for keyed and relevance sorts"""
+        pages = self.walk(reverse('search_files'), {'sortBy': 'name_desc', 'per_page': 10})
+        names = [file['name'] for page in pages for file in page['files']]
+        self.assertEqual(names, [f'report_{i:02d}.pdf' for i in reversed(range(25))])
+
+        pages = self.walk(reverse('search_files'), {'query': 'report', 'sortBy': 'relevance', 'per_page': 10})
+        self.assertEqual(sorted(file['id'] for page in pages for file in page['files']), sorted(self.newest_first))
+
+        # A cursor from one ordering cannot be replayed against another
+        response = self.client.get(reverse('search_files'), {
+            'sortBy': 'size_asc', 'cursor': pages[0]['pagination']['next_cursor']
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class ResumableUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.session_dir = tempfile.mkdtemp()
+        storage_override = override_settings(MEDIA_ROOT=self.media_root, RESUMABLE_UPLOAD_DIR=self.session_dir)
+        storage_override.enable()
+        self.addCleanup(storage_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.session_dir, ignore_errors=True)
+
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='Scans',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.chunk_size = 1000
+        self.content = bytes(range(256)) * 10  # 2560 bytes: two full chunks and a partial one
+
+    def create_session(self, **extra):
+        response = self.client.post(reverse('create_upload_session_api'), {
+            'filename': 'scan.pdf',
+            'size': len(self.content),
+            'chunk_size': self.chunk_size,
+            'mimetype': 'application/pdf',
+            'category': self.category.name,
+            'year': '2025',
+            'month': '8',
+            'date': '21',
+            **extra,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def put_chunk(self, upload_id, index, data=None, **headers):
+        if data is None:
+            data = self.content[index * self.chunk_size:(index + 1) * self.chunk_size]
+        return self.client.put(
+            reverse('upload_chunk_api', args=[upload_id, index]),
+            data,
+            content_type='application/octet-stream',
+            headers=headers,
+        )
+
+    def test_out_of_order_chunks_assemble_into_file(self):
+        """Test chunks sent in any order are assembled into a MedicalFile on completion"""
+        session = self.create_session(checksum=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(session['chunk_count'], 3)
+
+        self.assertEqual(self.put_chunk(session['upload_id'], 2).status_code, 200)
+        chunk = self.content[:self.chunk_size]
+        response = self.put_chunk(session['upload_id'], 0, X_Chunk_SHA256=hashlib.sha256(chunk).hexdigest())
+        self.assertEqual(response.status_code, 200)
+
+        status = self.client.get(reverse('upload_session_api', args=[session['upload_id']])).json()
+        self.assertEqual(status['missing_chunks'], [1])
+        self.assertEqual(status['received_ranges'], [[0, 1000], [2000, 2560]])
+
+        self.assertEqual(self.put_chunk(session['upload_id'], 1).status_code, 200)
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        self.assertEqual(response.status_code, 201)
+
+        medical_file = MedicalFile.objects.get(pk=response.json()['file_id'])
+        self.assertEqual(medical_file.checksum, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(medical_file.size, len(self.content))
+        with medical_file.file.open('rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.file_count, 1)
+        self.assertEqual(os.listdir(self.session_dir), [])
+
+        # Completing again is idempotent
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        self.assertEqual(response.json()['file_id'], medical_file.id)
+        self.assertEqual(MedicalFile.objects.count(), 1)
+
+    def test_completed_session_of_deleted_file_is_gone(self):
+        """Test completing again after the uploaded file was deleted answers 410"""
+        session = self.create_session()
+        for index in range(3):
+            self.put_chunk(session['upload_id'], index)
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        MedicalFile.objects.get(pk=response.json()['file_id']).delete()
+
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        self.assertEqual(response.status_code, 410)
+
+    @override_settings(MAX_FILE_SIZE=2000)
+    def test_oversized_session_is_rejected(self):
+        """Test uploads over MAX_FILE_SIZE are refused before anything is allocated"""
+        response = self.client.post(reverse('create_upload_session_api'), {
+            'filename': 'scan.pdf', 'size': 2001, 'category': self.category.name,
+            'year': '2025', 'month': '8', 'date': '21',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(self.session_dir), [])
+
+    def test_session_is_not_kept_when_allocation_fails(self):
+        """Test a part file that cannot be created answers 507 and leaves no session behind"""
+        blocker = os.path.join(self.session_dir, 'not-a-directory')
+        open(blocker, 'wb').close()
+        with override_settings(RESUMABLE_UPLOAD_DIR=blocker):
+            response = self.client.post(reverse('create_upload_session_api'), {
+                'filename': 'scan.pdf', 'size': 100, 'category': self.category.name,
+                'year': '2025', 'month': '8', 'date': '21',
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 507)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_bad_chunks_are_rejected(self):
+        """Test chunks with the wrong length or checksum are not recorded"""
+        session = self.create_session()
+        self.assertEqual(self.put_chunk(session['upload_id'], 0, b'short').status_code, 400)
+        self.assertEqual(self.put_chunk(session['upload_id'], 1, X_Chunk_SHA256='0' * 64).status_code, 400)
+        self.assertEqual(self.put_chunk(session['upload_id'], 3, b'x').status_code, 400)
+
+        status = self.client.get(reverse('upload_session_api', args=[session['upload_id']])).json()
+        self.assertEqual(status['received_chunks'], [])
+
+    def test_failed_resend_unrecords_chunk(self):
+        """Test a recorded chunk whose re-send fails counts as missing again, so completion refuses"""
+        session = self.create_session()
+        for index in range(3):
+            self.put_chunk(session['upload_id'], index)
+        bad = b'x' * self.chunk_size
+        response = self.put_chunk(session['upload_id'], 1, bad, X_Chunk_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['missing_chunks'], [1])
+        self.assertFalse(MedicalFile.objects.exists())
+
+    def test_complete_with_missing_chunks_conflicts(self):
+        """Test completing an upload before every chunk arrived returns 409 and the missing chunks"""
+        session = self.create_session()
+        self.put_chunk(session['upload_id'], 0)
+
+        response = self.client.post(reverse('complete_upload_session_api', args=[session['upload_id']]))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['missing_chunks'], [1, 2])
+        self.assertFalse(MedicalFile.objects.exists())
+
+    def test_sessions_are_private(self):
+        """Test another user cannot see, write to or abort someone else's upload"""
+        session = self.create_session()
+        User.objects.create_user(username='other', password='otherpass123', department=self.department)
+        self.client.login(username='other', password='otherpass123')
+
+        self.assertEqual(self.client.get(reverse('upload_session_api', args=[session['upload_id']])).status_code, 404)
+        self.assertEqual(self.put_chunk(session['upload_id'], 0).status_code, 404)
+        self.assertEqual(self.client.delete(reverse('upload_session_api', args=[session['upload_id']])).status_code, 404)
+        self.assertTrue(UploadSession.objects.filter(pk=session['upload_id']).exists())
+
+
+class FileDownloadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='Ultrasound',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+        self.content = bytes(range(256)) * 400
+        self.medical_file = UploadService.store_stream(
+            BytesIO(self.content),
+            'scan.mp4',
+            uploaded_by=self.user,
+            file_type='VID',
+            date_folder=FolderService.get_date_folder(self.category, 2025, 8, 21),
+            category=self.category,
+        )
+        self.url = reverse('download_file', args=[self.medical_file.id])
+
+    def test_download_and_revalidate(self):
+        """Test a full download carries an ETag that later answers 304"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{self.medical_file.checksum}"')
+
+        response = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        """Test bounded, open-ended and unsatisfiable ranges"""
+        response = self.client.get(self.url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, headers={'Range': 'bytes=102000-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], str(len(self.content) - 102000))
+        self.assertEqual(b''.join(response.streaming_content), self.content[102000:])
+
+        response = self.client.get(self.url, headers={'Range': f'bytes={len(self.content)}-'})
+        self.assertEqual(response.status_code, 416)
+
+        # A stale If-Range falls back to the whole file
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_departments_are_denied(self):
+        """Test users outside the file's department cannot download it"""
+        other = Department.objects.create(code='LAB', name='Laboratory')
+        User.objects.create_user(username='labtech', password='testpass123', department=other)
+        self.client.login(username='labtech', password='testpass123')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(FILE_DOWNLOAD_OFFLOAD='nginx', FILE_DOWNLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_nginx_offload(self):
+        """Test offloaded downloads hand nginx the file instead of sending it"""
+        response = self.client.get(self.url, {'download': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.medical_file.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+
+    @override_settings(TASK_BACKEND='inline', STORAGE_COLD_BACKEND='local', STORAGE_TIER_PROMOTE_ON_READ=False)
+    def test_warm_and_cold_downloads(self):
+        """Test files in the warm and cold tiers download and serve ranges like hot ones"""
+        blob = self.medical_file.blob
+        for tier in ('warm', 'cold'):
+            with self.captureOnCommitCallbacks(execute=True):
+                TierService.move(blob, tier)
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, self.medical_file.file.name)))
+
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Length'], str(len(self.content)))
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+
+            response = self.client.get(self.url, headers={'Range': 'bytes=70000-70099'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes 70000-70099/{len(self.content)}')
+            self.assertEqual(b''.join(response.streaming_content), self.content[70000:70100])
+        self.assertEqual(Blob.objects.get().tier, 'cold')
+
+    @override_settings(TASK_BACKEND='inline', STORAGE_COLD_BACKEND='local', STORAGE_TIER_PROMOTE_ON_READ=False)
+    def test_cold_download_without_close(self):
+        """Test a cold stream without close(), like Azure's downloader, still streams to the end"""
+        class Downloader:
+            def __init__(self, content):
+                self.read = BytesIO(content).read
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TierService.move(self.medical_file.blob, 'cold')
+        with patch.object(TierService, 'open', return_value=Downloader(self.content)):
+            response = self.client.get(self.url, headers={'Range': 'bytes=70000-70099'})
+            self.assertEqual(b''.join(response.streaming_content), self.content[70000:70100])
+
+    @override_settings(TASK_BACKEND='inline', STORAGE_COLD_BACKEND='local', STORAGE_TIER_PROMOTE_ON_READ=True)
+    def test_download_promotes_to_hot(self):
+        """Test reading a cold file brings it back to the hot tier"""
+        with self.captureOnCommitCallbacks(execute=True):
+            TierService.move(self.medical_file.blob, 'cold')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.url)
+            self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        blob = Blob.objects.get()
+        self.assertEqual((blob.tier, blob.stored_name), ('hot', ''))
+        self.assertIsNotNone(blob.last_accessed)
+        with open(os.path.join(self.media_root, blob.file.name), 'rb') as handle:
+            self.assertEqual(handle.read(), self.content)
+
+
+@override_settings(RENDITION_SIZES={'thumb': 64, 'preview': 256}, RENDITION_FORMAT='JPEG')
+class FileRenditionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(RenditionService.reset_pool)
+
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='RADIOLOGY',
+            name='Radiology'
+        )
+        self.category = Category.objects.create(
+            name='X-Rays',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+        image = BytesIO()
+        Image.new('RGB', (1600, 1200), 'gray').save(image, 'JPEG')
+        image.seek(0)
+        self.medical_file = UploadService.store_stream(
+            image,
+            'chest.jpg',
+            uploaded_by=self.user,
+            file_type='IMG',
+            date_folder=FolderService.get_date_folder(self.category, 2025, 8, 21),
+            category=self.category,
+        )
+
+    def test_listing_links_cacheable_thumbnail(self):
+        """Test listings return a thumbnail URL that serves a small, long-cached image"""
+        response = self.client.get(reverse('get_files_by_date'), {'year': 2025, 'month': 8, 'date': 21})
+        thumbnail_url = response.json()['files'][0]['thumbnail_url']
+        self.assertEqual(thumbnail_url, RenditionService.url(self.medical_file))
+
+        response = self.client.get(thumbnail_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (64, 48))
+
+        response = self.client.get(thumbnail_url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_rendition_access_and_versions(self):
+        """Test renditions follow file permissions and stale versions are not served"""
+        stale_url = reverse('file_rendition', args=[self.medical_file.id, 'thumb', '0' * 16])
+        self.assertEqual(self.client.get(stale_url).status_code, 404)
+
+        other = Department.objects.create(code='LAB', name='Laboratory')
+        User.objects.create_user(username='labtech', password='testpass123', department=other)
+        self.client.login(username='labtech', password='testpass123')
+        response = self.client.get(RenditionService.url(self.medical_file))
+        self.assertEqual(response.status_code, 403)
+
+
+    def test_missing_source_is_not_found(self):
+        """Test a file whose contents are gone answers 404 instead of asking the client to retry"""
+        os.remove(os.path.join(self.media_root, self.medical_file.file.name))
+        response = self.client.get(RenditionService.url(self.medical_file))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RENDITION_TIMEOUT=0, TASK_BACKEND='inline')
+    def test_slow_render_is_finished_in_background(self):
+        """Test a render that outlives the request is queued and stored for the retry"""
+        url = RenditionService.url(self.medical_file)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertTrue(Rendition.objects.filter(checksum=self.medical_file.checksum, size='thumb').exists())
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+class ScanArtifactTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.scan_dir = tempfile.mkdtemp()
+        scan_override = override_settings(MEDIA_ROOT=self.media_root, SCAN_ARTIFACT_DIR=self.scan_dir)
+        scan_override.enable()
+        self.addCleanup(scan_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.scan_dir, ignore_errors=True)
+
+        self.client = Client()
+        self.department = Department.objects.create(
+            code='RECORDS',
+            name='Medical Records'
+        )
+        self.category = Category.objects.create(
+            name='Consent Forms',
+            department=self.department
+        )
+        self.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            department=self.department
+        )
+        self.client.login(username='testuser', password='testpass123')
+
+    def scan_page(self, color='white'):
+        """A one-page PDF artifact, as scan_document stores it"""
+        path = ScanArtifactService.temp_path('.pdf')
+        Image.new('RGB', (200, 280), color).save(path, 'PDF', resolution=100.0)
+        return ScanArtifactService.create(self.user, path, 'scan.pdf')
+
+    def test_pages_merge_by_id(self):
+        """Test finalize_scan merges pages in order into a previewable artifact of the owner only"""
+        pages = [self.scan_page(), self.scan_page('gray')]
+
+        response = self.client.post(reverse('finalize_scan'), {'artifact_ids[]': [str(page.id) for page in pages]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['page_count'], 2)
+        self.assertNotIn('image', data)
+
+        response = self.client.get(data['preview_url'])
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(len(PdfReader(BytesIO(b''.join(response.streaming_content))).pages), 2)
+
+        User.objects.create_user(username='other', password='testpass123', department=self.department)
+        self.client.login(username='other', password='testpass123')
+        self.assertEqual(self.client.get(data['preview_url']).status_code, 404)
+
+    def test_upload_consumes_scanned_pages(self):
+        """Test the upload form stores referenced pages as one PDF and removes the artifacts"""
+        pages = [self.scan_page(), self.scan_page('gray'), self.scan_page('black')]
+
+        response = self.client.post(reverse('upload'), {
+            'scan_artifact_id': [str(page.id) for page in pages],
+            'scan_file_name': 'consent.pdf',
+            'category': self.category.name,
+            'year': '2025',
+            'month': '8',
+            'date': '21',
+        })
+        self.assertContains(response, 'Successfully uploaded the file')
+
+        medical_file = MedicalFile.objects.get(name='consent.pdf')
+        self.assertEqual(medical_file.file_type, 'PDF')
+        with medical_file.file.open('rb') as handle:
+            self.assertEqual(len(PdfReader(handle).pages), 3)
+        self.assertFalse(ScanArtifact.objects.exists())
+        self.assertEqual(os.listdir(self.scan_dir), [])
+
+    def test_expired_scans_are_purged(self):
+        """Test the janitor removes expired artifacts and stale work files only"""
+        expired, kept = self.scan_page(), self.scan_page()
+        ScanArtifact.objects.filter(id=expired.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        stale = ScanArtifactService.temp_path('.jpg')
+        open(stale, 'wb').close()
+        os.utime(stale, (0, 0))
+
+        self.assertEqual(ScanArtifactService.purge_expired(), 1)
+        self.assertEqual(list(ScanArtifact.objects.values_list('id', flat=True)), [kept.id])
+        self.assertEqual(os.listdir(self.scan_dir), [str(kept.id)])
+
+
+@override_settings(
+    TASK_BACKEND='inline',
+    SCANNER_BACKEND='fake',
+    SCANNER_FAKE_OPTIONS={'devices': 1, 'busy_scans': 2, 'page_inches': (2, 3)},
+    SCANNER_BUSY_RETRY_DELAY=0,
+)
+class ScanJobTests(TestCase):
+    def setUp(self):
+        self.scan_dir = tempfile.mkdtemp()
+        scan_override = override_settings(SCAN_ARTIFACT_DIR=self.scan_dir)
+        scan_override.enable()
+        self.addCleanup(scan_override.disable)
+        self.addCleanup(shutil.rmtree, self.scan_dir, ignore_errors=True)
+        ScannerFactory.reset()
+        ScannerRegistry.reset()
+        self.addCleanup(ScannerFactory.reset)
+        self.addCleanup(ScannerRegistry.reset)
+
+        self.client = Client()
+        self.department = Department.objects.create(code='RECORDS', name='Medical Records')
+        self.user = User.objects.create_user(username='testuser', password='testpass123', department=self.department)
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_scan_runs_as_a_job(self):
+        """Test a scan is a job, retried while the scanner is busy, that ends with the page's artifact"""
+        response = self.client.post(reverse('scan_document'), {'scanner_id': '1', 'dpi': '100'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(ScanJob.objects.get(id=data['job_id']).attempts, 3)
+
+        artifact = ScanArtifact.objects.get(id=data['artifact_id'])
+        with open(ScanArtifactService.path(artifact), 'rb') as handle:
+            page = PdfReader(handle).pages[0]
+            self.assertEqual((float(page.mediabox.width), float(page.mediabox.height)), (144, 216))
+        stat = ScanPageStat.objects.get()
+        self.assertIn(stat.category, ('text', 'mixed', 'photo'))
+        self.assertGreater(stat.scanned_size, 0)
+
+        self.assertEqual(self.client.get(data['status_url']).json(), data)
+        User.objects.create_user(username='other', password='testpass123', department=self.department)
+        self.client.login(username='other', password='testpass123')
+        self.assertEqual(self.client.get(data['status_url']).status_code, 404)
+
+    def test_scan_finishing_after_timeout_stays_failed(self):
+        """Test a job failed by the timeout is not turned done by its late scan, whose artifact is discarded"""
+        job = ScanJob.objects.create(user=self.user, scanner_id='1', dpi=100)
+
+        class SlowDevice:
+            def scan(self, path, dpi, color_mode):
+                Image.new('RGB', (100, 150), 'white').save(path, 'PNG')
+                ScanJobService.fail(job.id, "Scan timed out")  # get() gave up meanwhile
+
+        ScanJobService.run(SlowDevice(), job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.artifact_id), ('failed', 'Scan timed out', None))
+        self.assertFalse(ScanArtifact.objects.exists())
+        self.assertEqual(os.listdir(self.scan_dir), [])
+
+    def test_unreachable_scanner_fails_the_job(self):
+        """Test a scan on a missing scanner is reported as a failed job"""
+        data = self.client.post(reverse('scan_document'), {'scanner_id': '3'}).json()
+        self.assertFalse(data['success'])
+        self.assertEqual(data['status'], 'failed')
+        self.assertIn('Scanner ID 3 not found', data['error'])
+        self.assertFalse(ScanArtifact.objects.exists())
+
+    def test_scanner_list_is_served_from_the_registry(self):
+        """Test get_scanners enumerates the devices once, unless asked to refresh"""
+        for _ in range(2):
+            response = self.client.get(reverse('get_scanners'))
+            self.assertEqual(response.json()['scanners'][0]['name'], 'Fake Scanner 1')
+        self.client.get(reverse('get_scanners'), {'refresh': '1'})
+        self.assertEqual(ScannerFactory.get_scanner_service().enumerations, 2)
@@ -30,6 +30,9 @@ urlpatterns = [
     path('usermanagement/', UserManagementView.as_view(), name='usermanagement'),
     path('get_scanners/', views.get_scanners, name='get_scanners'),
     path('scan_document/', views.scan_document, name='scan_document'),
+    path('finalize_scan/', views.finalize_scan, name='finalize_scan'),
+    path('scans/<uuid:artifact_id>/', views.scan_artifact, name='scan_artifact'),
+    path('scans/jobs/<uuid:job_id>/', views.scan_job, name='scan_job'),
     path('user_dashboard/', views.user_dashboard, name='user_dashboard'),
     # User browser paths - from most specific to least specific
     path('user_browser/<int:year>/<int:month>/<int:day>/', views.user_browser, name='user_browser_day'),
@@ -40,11 +43,20 @@ urlpatterns = [
     
     # API Endpoints
     path('api/upload/', upload_file_api, name='upload_file_api'),
+    path('api/upload/stream/', views.stream_upload_api, name='stream_upload_api'),
+    path('api/uploads/', views.create_upload_session_api, name='create_upload_session_api'),
+    path('api/uploads/<uuid:upload_id>/', views.upload_session_api, name='upload_session_api'),
+    path('api/uploads/<uuid:upload_id>/chunks/<int:index>/', views.upload_chunk_api, name='upload_chunk_api'),
+    path('api/uploads/<uuid:upload_id>/complete/', views.complete_upload_session_api, name='complete_upload_session_api'),
     path('api/browse/structure/', get_file_structure, name='get_file_structure'),
     path('api/browse/files/', get_files_by_date, name='get_files_by_date'),
     path('api/browse/files/<int:file_id>/', delete_file, name='delete_file'),
+    path('files/<int:file_id>/download/', views.download_file, name='download_file'),
+    path('files/<int:file_id>/renditions/<str:size>/<str:version>/', views.file_rendition, name='file_rendition'),
     path('api/user/profile/', get_user_profile, name='get_user_profile'),
     path('api/users/add/', add_user_api, name='add_user_api'),
     path('api/dashboard-stats/', dashboard_stats, name='dashboard_stats'),
+    path('api/dashboard-stats/cache/', views.dashboard_cache_stats, name='dashboard_cache_stats'),
+    path('api/storage/pool-stats/', views.storage_pool_stats, name='storage_pool_stats'),
     path('api/search-files/', views.search_files, name='search_files'),
 ]
\ No newline at end of file
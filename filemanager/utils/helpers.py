@@ -0,0 +1,45 @@
+# utils/helpers.py
+# Imported by pool worker modules (utils.pdf_text): no Django imports here.
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashingReader:
+    """Read-only stream wrapper that hashes and counts the bytes read through it.
+
+    Wrap a file before handing it to a storage backend to get its digests in
+    the same pass that uploads it. `algorithms` are hashlib names; SHA-256
+    is always included and exposed as `checksum`.
+    """
+
+    def __init__(self, stream, algorithms=('sha256',)):
+        self.stream = stream
+        self.size = 0
+        self._digests = {name: hashlib.new(name) for name in {'sha256', *algorithms}}
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        for digest in self._digests.values():
+            digest.update(data)
+        self.size += len(data)
+        return data
+
+    def tell(self):
+        return self.size
+
+    def hexdigest(self, algorithm):
+        return self._digests[algorithm].hexdigest()
+
+    @property
+    def checksum(self):
+        return self.hexdigest('sha256')
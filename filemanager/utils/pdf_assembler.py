@@ -0,0 +1,259 @@
+# utils/pdf_assembler.py
+# Writes image-only PDFs (scans) page by page. Kept free of Django imports
+# like the other worker-side utils so it can run in pool processes.
+import os
+import zlib
+from contextlib import contextmanager
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+from pypdf.generic import IndirectObject
+
+COPY_CHUNK_SIZE = 1024 * 1024
+JPEG_COLOR_SPACES = {'L': '/DeviceGray', 'RGB': '/DeviceRGB', 'CMYK': '/DeviceCMYK'}
+
+# Objects 1 and 2 are the catalog and the page tree, written by close()
+CATALOG_ID = 1
+PAGES_ID = 2
+
+
+class PdfAssembler:
+    """Streams a PDF of image pages to a binary file object.
+
+    Each page is written out as soon as it is added and only object offsets
+    are kept, so memory holds at most one page whatever the page count.
+    The output does not need to be seekable. JPEG pages are embedded as
+    they are (DCTDecode passthrough, no recompression); other images are
+    encoded once, bilevel ones losslessly and the rest as JPEG.
+
+    Pages are sized from their DPI, or fitted and centered on page_size
+    (in points) less a margin when one is given.
+    """
+
+    def __init__(self, output, jpeg_quality=85, page_size=None, margin=0):
+        self.output = output
+        self.jpeg_quality = jpeg_quality
+        self.page_size = page_size
+        self.margin = margin
+        self.page_count = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = PAGES_ID + 1
+        self._position = 0
+        self._closed = False
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def add_jpeg(self, source, dpi=None):
+        """Add a page holding a JPEG file (path or binary file object) without decoding it"""
+        with _open(source) as stream:
+            with Image.open(stream) as image:
+                if image.format != 'JPEG' or image.mode not in JPEG_COLOR_SPACES:
+                    raise ValueError(f"Not a grayscale, RGB or CMYK JPEG: {image.format} {image.mode}")
+                width, height = image.size
+                dictionary = _image_dictionary(width, height, JPEG_COLOR_SPACES[image.mode], 8, '/DCTDecode')
+                if image.mode == 'CMYK' and 'adobe' in image.info:
+                    dictionary += ' /Decode [1 0 1 0 1 0 1 0]'  # Adobe writes CMYK JPEGs inverted
+                dpi = dpi or _image_dpi(image)
+            stream.seek(0, os.SEEK_END)
+            length = stream.tell()
+            stream.seek(0)
+            image_id = self._stream(dictionary, iter(lambda: stream.read(COPY_CHUNK_SIZE), b''), length)
+        self._add_page(image_id, width, height, dpi)
+
+    def add_image(self, image, dpi=None):
+        """Add a page holding a decoded PIL image, encoded once to fit its mode"""
+        dpi = dpi or _image_dpi(image)
+        if image.mode == '1':
+            # PIL packs rows to whole bytes with 1 for white, as PDF's DeviceGray does
+            data = zlib.compress(image.tobytes())
+            dictionary = _image_dictionary(image.width, image.height, '/DeviceGray', 1, '/FlateDecode')
+        else:
+            if image.mode not in ('L', 'RGB'):
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality)
+            data = buffer.getvalue()
+            dictionary = _image_dictionary(image.width, image.height, JPEG_COLOR_SPACES[image.mode], 8, '/DCTDecode')
+        image_id = self._stream(dictionary, [data], len(data))
+        self._add_page(image_id, image.width, image.height, dpi)
+
+    def add_encoded(self, page):
+        """Add a page already compressed for PDF, such as a scan_pipeline.EncodedPage"""
+        dictionary = _image_dictionary(page.width, page.height, page.color_space, page.bits, page.filter)
+        if page.decode_parms:
+            dictionary += f' /DecodeParms {page.decode_parms}'
+        image_id = self._stream(dictionary, [page.data], len(page.data))
+        self._add_page(image_id, page.width, page.height, page.dpi)
+
+    def add_image_file(self, source, dpi=None):
+        """Add a page from an image file: JPEGs pass through, anything else is decoded once.
+
+        JPEGs with an EXIF orientation are decoded too, so the page comes out
+        upright.
+        """
+        with _open(source) as stream:
+            with Image.open(stream) as image:
+                orientation = image.getexif().get(0x0112, 1)
+                if image.format == 'JPEG' and image.mode in JPEG_COLOR_SPACES and orientation == 1:
+                    image = None
+                else:
+                    image = ImageOps.exif_transpose(image)
+                    image.load()
+            if image is None:
+                self.add_jpeg(stream, dpi)
+                return
+        self.add_image(image, dpi)
+
+    def add_pdf(self, source):
+        """Copy the pages of a scanned PDF, each of which must be a single embedded image.
+
+        JPEG, CCITT fax and Flate page images are copied without decoding;
+        pages drawn any other way raise ValueError. Returns the number of
+        pages added.
+        """
+        reader = PdfReader(source)
+        for number, page in enumerate(reader.pages, 1):
+            images = [
+                xobject.get_object()
+                for xobject in (page['/Resources'].get_object().get('/XObject') or {}).values()
+            ]
+            if len(images) != 1 or images[0].get('/Subtype') != '/Image':
+                raise ValueError(f"Page {number} is not a single scanned image")
+            image = images[0]
+            filters = image.get('/Filter')
+            filters = [filters] if isinstance(filters, str) else list(filters or [])
+            if filters[-1:] == ['/DCTDecode']:
+                # Outer filters (ASCII85 and the like) are undone, DCT data is returned as stored
+                data = image.get_data()
+            elif filters in (['/CCITTFaxDecode'], ['/FlateDecode']):
+                data = image._data  # As stored: pypdf would decode these
+            else:
+                raise ValueError(f"Page {number} image is not JPEG, CCITT fax or Flate encoded")
+            color_space = image.get('/ColorSpace')
+            if isinstance(color_space, IndirectObject):
+                color_space = color_space.get_object()
+            if color_space not in JPEG_COLOR_SPACES.values():
+                raise ValueError(f"Page {number} image uses an unsupported color space")
+
+            width, height = int(image['/Width']), int(image['/Height'])
+            dictionary = _image_dictionary(width, height, color_space, int(image.get('/BitsPerComponent', 8)), filters[-1])
+            if '/Decode' in image:
+                dictionary += f" /Decode {_pdf_value(image['/Decode'])}"
+            if '/DecodeParms' in image and len(filters) == 1:
+                dictionary += f" /DecodeParms {_pdf_value(image['/DecodeParms'])}"
+            image_id = self._stream(dictionary, [data], len(data))
+
+            box = page.mediabox
+            self._add_page(image_id, width, height, page_size=(float(box.width), float(box.height)), margin=0)
+        return len(reader.pages)
+
+    def close(self):
+        """Write the page tree, cross-reference table and trailer; the output is left open"""
+        if self._closed:
+            return
+        if not self._page_ids:
+            raise ValueError("A PDF needs at least one page")
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self._page_ids)
+        self._object(f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>', PAGES_ID)
+        self._object(f'<< /Type /Catalog /Pages {PAGES_ID} 0 R >>', CATALOG_ID)
+
+        xref_position = self._position
+        size = self._next_id
+        lines = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        lines.extend(f'{self._offsets[object_id]:010d} 00000 n \n' for object_id in range(1, size))
+        lines.append(f'trailer\n<< /Size {size} /Root {CATALOG_ID} 0 R >>\nstartxref\n{xref_position}\n%%EOF\n')
+        self._write(''.join(lines).encode('ascii'))
+        self._closed = True
+
+    def _add_page(self, image_id, width, height, dpi=None, page_size=None, margin=None):
+        page_size = page_size or self.page_size
+        margin = self.margin if margin is None else margin
+        if page_size is None:
+            dpi = dpi or 72
+            page_width, page_height = width * 72 / dpi, height * 72 / dpi
+            draw_width, draw_height, x, y = page_width, page_height, 0, 0
+        else:
+            page_width, page_height = page_size
+            scale = min((page_width - 2 * margin) / width, (page_height - 2 * margin) / height)
+            draw_width, draw_height = width * scale, height * scale
+            x, y = (page_width - draw_width) / 2, (page_height - draw_height) / 2
+
+        content = f'q {draw_width:.4f} 0 0 {draw_height:.4f} {x:.4f} {y:.4f} cm /Im0 Do Q'.encode('ascii')
+        content_id = self._stream('', [content], len(content))
+        page_id = self._object(
+            f'<< /Type /Page /Parent {PAGES_ID} 0 R /MediaBox [0 0 {page_width:.4f} {page_height:.4f}] '
+            f'/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>'
+        )
+        self._page_ids.append(page_id)
+        self.page_count += 1
+
+    def _object(self, body, object_id=None):
+        object_id = self._begin(object_id)
+        self._write(f'{body}\nendobj\n'.encode('ascii'))
+        return object_id
+
+    def _stream(self, dictionary, chunks, length):
+        object_id = self._begin()
+        self._write(f'<< {dictionary} /Length {length} >>\nstream\n'.encode('ascii'))
+        written = 0
+        for chunk in chunks:
+            self._write(chunk)
+            written += len(chunk)
+        if written != length:
+            raise ValueError(f"Stream of object {object_id} changed while being copied")
+        self._write(b'\nendstream\nendobj\n')
+        return object_id
+
+    def _begin(self, object_id=None):
+        if self._closed:
+            raise ValueError("PDF is already closed")
+        if object_id is None:
+            object_id = self._next_id
+            self._next_id += 1
+        self._offsets[object_id] = self._position
+        self._write(f'{object_id} 0 obj\n'.encode('ascii'))
+        return object_id
+
+    def _write(self, data):
+        self.output.write(data)
+        self._position += len(data)
+
+
+@contextmanager
+def _open(source):
+    """Open a path for binary reading, or use an already open file object as is"""
+    if hasattr(source, 'read'):
+        yield source
+    else:
+        with open(source, 'rb') as stream:
+            yield stream
+
+
+def _image_dictionary(width, height, color_space, bits, image_filter):
+    return (
+        f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+        f'/ColorSpace {color_space} /BitsPerComponent {bits} /Filter {image_filter}'
+    )
+
+
+def _pdf_value(value):
+    """PDF syntax of a (direct) pypdf object"""
+    buffer = BytesIO()
+    value.get_object().write_to_stream(buffer)
+    return buffer.getvalue().decode('latin-1')
+
+
+def _image_dpi(image):
+    """Horizontal DPI recorded in the image, or None"""
+    try:
+        return float(image.info['dpi'][0]) or None
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
@@ -0,0 +1,50 @@
+# utils/pdf_text.py
+# Runs inside text extraction pool processes: keep this module and utils.helpers,
+# whose file_checksum it shares, free of Django imports so workers start
+# cheaply under any multiprocessing start method.
+import logging
+
+from pypdf import PdfReader
+
+from .helpers import file_checksum
+
+logger = logging.getLogger(__name__)
+
+
+def extract_pdf_text(job, max_chars=None):
+    """Extract the text layer of one PDF unless its checksum is unchanged.
+
+    job is (file_id, path, known_checksum). Returns (file_id, checksum, text),
+    with text None when the checksum matches known_checksum, or None when the
+    file cannot be read. Unparseable PDFs (scans without a text layer,
+    encrypted files) yield an empty text so they are not retried until they
+    change.
+    """
+    file_id, path, known_checksum = job
+    try:
+        checksum = file_checksum(path)
+    except OSError as e:
+        logger.warning(f"Cannot read file {file_id} at {path}: {e}")
+        return None
+
+    if checksum == known_checksum:
+        return file_id, checksum, None
+
+    parts, length = [], 0
+    try:
+        reader = PdfReader(path)
+        for page in reader.pages:
+            # Collapse whitespace runs so layout spacing is not stored
+            page_text = ' '.join((page.extract_text() or '').split())
+            if page_text:
+                parts.append(page_text)
+                length += len(page_text) + 1
+            if max_chars and length >= max_chars:
+                break
+    except Exception as e:
+        logger.warning(f"Cannot extract text from file {file_id}: {e}")
+
+    text = ' '.join(parts)
+    if max_chars:
+        text = text[:max_chars]
+    return file_id, checksum, text
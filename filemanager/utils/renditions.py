@@ -0,0 +1,60 @@
+# utils/renditions.py
+# Runs inside rendition pool processes: keep this module free of Django
+# imports so workers start cheaply under any multiprocessing start method.
+import logging
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+
+def _first_page_image(path):
+    """Largest embedded image of a PDF's first page, or None (vector pages have none)"""
+    page = PdfReader(path).pages[0]
+    images = [image.image for image in page.images]
+    return max(images, key=lambda image: image.width * image.height, default=None)
+
+
+def _open_source(path, is_pdf, max_px):
+    if is_pdf:
+        return _first_page_image(path)
+    image = Image.open(path)
+    # JPEGs decode at a reduced DCT scale, so a 20MB scan is never fully decoded
+    image.draft('RGB', (max_px, max_px))
+    return ImageOps.exif_transpose(image)
+
+
+def render_renditions(job):
+    """Render the downscaled images of one source file.
+
+    job is (checksum, path, is_pdf, sizes, image_format, quality), sizes a list
+    of (size_name, max_px). Returns (checksum, [(size_name, data, width,
+    height)]). The list is empty when the file has nothing to show: a PDF
+    whose first page has no image, or contents that cannot be decoded (they
+    are keyed by checksum, so that will not change). Returns None when the
+    file is missing.
+    """
+    checksum, path, is_pdf, sizes, image_format, quality = job
+    try:
+        image = _open_source(path, is_pdf, max(max_px for _, max_px in sizes))
+        if image is None:
+            return checksum, []
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGB')
+
+        renditions = []
+        # Largest first, each one downscaled from the previous
+        for size_name, max_px in sorted(sizes, key=lambda size: -size[1]):
+            image.thumbnail((max_px, max_px), Image.LANCZOS, reducing_gap=3.0)
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=quality)
+            renditions.append((size_name, buffer.getvalue(), image.width, image.height))
+        return checksum, renditions
+    except FileNotFoundError as e:
+        logger.warning(f"Cannot read {path}: {e}")
+        return None
+    except Exception as e:
+        logger.warning(f"Cannot render {path}: {e}")
+        return checksum, []
@@ -0,0 +1,256 @@
+# utils/scan_pipeline.py
+# Runs inside scan processing pool processes: keep this module free of
+# Django imports so workers start cheaply under any multiprocessing start
+# method.
+import zlib
+from collections import deque, namedtuple
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps, features
+
+# A compressed page image, ready for PdfAssembler.add_encoded. category is
+# the profile an 'auto' page was classified as.
+EncodedPage = namedtuple(
+    'EncodedPage', 'data width height dpi color_space bits filter decode_parms category',
+    defaults=(None,),
+)
+
+MODES = {'color': 'RGB', 'gray': 'L', 'bilevel': '1'}
+DESKEW_SAMPLE_PX = 800  # Skew is measured on a copy this size
+CLASSIFY_SAMPLE_PX = 600  # Content is classified on a copy this size
+
+# Compression profiles of the page categories classify() tells apart, used
+# by the 'auto' mode. Text is stored black and white (CCITT G4) at full
+# resolution; pictures as JPEG, in color only when the page has color.
+PROFILES = {
+    'text': {'mode': 'bilevel', 'target_dpi': 300},
+    'mixed': {'target_dpi': 200, 'jpeg_quality': 60},
+    'photo': {'target_dpi': 200, 'jpeg_quality': 75},
+}
+
+
+def decode(source, dpi=None, target_dpi=None):
+    """Stage 1: open a page image (path, bytes or file object) and turn it upright.
+
+    JPEGs are decoded at a reduced DCT scale when target_dpi is well below
+    their resolution, which skips most of the decoding work. Returns
+    (image, dpi); dpi is the recorded one, else the dpi passed in.
+    """
+    image = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+    dpi = _image_dpi(image) or dpi
+    if image.format == 'JPEG' and dpi and target_dpi and target_dpi < dpi:
+        width = image.width
+        image.draft(image.mode, (round(image.width * target_dpi / dpi), round(image.height * target_dpi / dpi)))
+        dpi = dpi * image.width / width
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    return image, dpi
+
+
+def downsample(image, dpi, target_dpi):
+    """Stage 2: scale down to target_dpi; pages at or below it are left alone. Returns (image, dpi)"""
+    if not dpi or not target_dpi or dpi <= target_dpi * 1.01:
+        return image, dpi
+    scale = target_dpi / dpi
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS, reducing_gap=2.0), target_dpi
+
+
+def detect_skew(image, max_angle=3.0):
+    """Angle in degrees that straightens the text lines of a page, by projection profile.
+
+    Each candidate rotation of a small ink mask is squashed to one pixel
+    per row; level text gives the most uneven row profile. Pages where no
+    rotation beats the unrotated one (blank pages, say) get 0.
+    """
+    sample = image.convert('L')
+    sample.thumbnail((DESKEW_SAMPLE_PX, DESKEW_SAMPLE_PX))
+    threshold = otsu_threshold(sample.histogram())
+    ink = sample.point([255 if value <= threshold else 0 for value in range(256)])
+    scores = {}
+
+    def score(angle):
+        if angle not in scores:
+            rows = ink.rotate(angle, Image.NEAREST).reduce((ink.width, 1)).tobytes()
+            scores[angle] = sum((rows[i + 1] - rows[i]) ** 2 for i in range(len(rows) - 1))
+        return scores[angle]
+
+    coarse = max((step / 2 for step in range(int(-max_angle * 2), int(max_angle * 2) + 1)), key=score)
+    angle = max((round(coarse + step / 10, 1) for step in range(-4, 5)), key=score)
+    return angle if score(angle) > score(0.0) else 0.0
+
+
+def deskew(image, max_angle=3.0, min_angle=0.1):
+    """Stage 3: rotate the page so its text lines are level. Returns (image, angle)"""
+    angle = detect_skew(image, max_angle)
+    if abs(angle) < min_angle:
+        return image, 0.0
+    if image.mode == '1':
+        return image.rotate(angle, Image.NEAREST, fillcolor=1), angle
+    fill = 255 if len(image.getbands()) == 1 else (255,) * len(image.getbands())
+    return image.rotate(angle, Image.BILINEAR, fillcolor=fill), angle
+
+
+def classify(image):
+    """Content category of a page, 'text', 'mixed' or 'photo', and whether it has color.
+
+    Pixels that are neither paper nor ink yet sit in a flat neighbourhood
+    belong to pictures (photos, stamps, shaded figures); text strokes,
+    printed or handwritten, are all edges. A page is mixed when pictures
+    cover 0.5% of it and a photo past 30%. Returns (category, colorful).
+    """
+    sample = image.copy()
+    sample.thumbnail((CLASSIFY_SAMPLE_PX, CLASSIFY_SAMPLE_PX))
+    sample = sample.convert('RGB')
+    gray = sample.convert('L')
+    histogram = gray.histogram()
+    pixels = gray.width * gray.height
+
+    paper, seen = 255, 0
+    for value, count in enumerate(histogram):
+        seen += count
+        if seen >= pixels * 0.9:
+            paper = value  # The brightest tenth of the page is paper
+            break
+
+    local_range = ImageChops.subtract(gray.filter(ImageFilter.MaxFilter(3)), gray.filter(ImageFilter.MinFilter(3)))
+    flat = local_range.point([255 if value < 24 else 0 for value in range(256)])
+    tone = gray.point([255 if 40 <= value < paper - 40 else 0 for value in range(256)])
+    _, saturation, brightness = sample.convert('HSV').split()
+    colored = ImageChops.multiply(
+        saturation.point([255 if value > 60 else 0 for value in range(256)]),
+        brightness.point([255 if value > 60 else 0 for value in range(256)]),
+    )
+    picture = ImageChops.multiply(flat, ImageChops.lighter(tone, colored)).histogram()[255] / pixels
+    colorful = colored.histogram()[255] / pixels > 0.002
+
+    category = 'photo' if picture > 0.3 else 'mixed' if picture > 0.005 else 'text'
+    return category, colorful
+
+
+def convert(image, mode):
+    """Stage 4: 'color' (RGB), 'gray' (L) or 'bilevel' (1, Otsu thresholded)"""
+    if mode == 'bilevel':
+        if image.mode == '1':
+            return image
+        gray = image.convert('L')
+        threshold = otsu_threshold(gray.histogram())
+        return gray.point([255 if value > threshold else 0 for value in range(256)], '1')
+    return image if image.mode == MODES[mode] else image.convert(MODES[mode])
+
+
+def compress(image, dpi, jpeg_quality=75):
+    """Stage 5: encode for the PDF: CCITT G4 for bilevel pages, JPEG for the rest.
+
+    Without libtiff, bilevel pages fall back to 1-bit Flate.
+    """
+    width, height = image.size
+    if image.mode == '1':
+        if features.check('libtiff'):
+            return EncodedPage(
+                _group4(image), width, height, dpi, '/DeviceGray', 1, '/CCITTFaxDecode',
+                # libtiff codes 0 bits, black in Pillow, as white runs
+                f'<< /K -1 /Columns {width} /Rows {height} /BlackIs1 true >>',
+            )
+        return EncodedPage(zlib.compress(image.tobytes()), width, height, dpi, '/DeviceGray', 1, '/FlateDecode', None)
+
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=jpeg_quality, optimize=True, dpi=(dpi or 72, dpi or 72))
+    color_space = '/DeviceGray' if image.mode == 'L' else '/DeviceRGB'
+    return EncodedPage(buffer.getvalue(), width, height, dpi, color_space, 8, '/DCTDecode', None)
+
+
+def process_page(job):
+    """Run every stage on one page.
+
+    job is (source, options); options may hold mode ('color', 'gray',
+    'bilevel' or 'auto', default 'color'), dpi (used when the image records
+    none), target_dpi, deskew and jpeg_quality. In 'auto' mode the page is
+    classified and the settings of its entry in options['profiles']
+    (PROFILES by default) override these, with target_dpi only lowered.
+    Returns an EncodedPage.
+    """
+    source, options = job
+    mode = options.get('mode', 'color')
+    target_dpi = options.get('target_dpi')
+    jpeg_quality = options.get('jpeg_quality', 75)
+    image, dpi = decode(source, options.get('dpi'), target_dpi)
+
+    category = None
+    if mode == 'auto':
+        category, colorful = classify(image)
+        profile = options.get('profiles', PROFILES)[category]
+        mode = profile.get('mode', 'color' if colorful else 'gray')
+        if profile.get('target_dpi'):
+            target_dpi = min(target_dpi or profile['target_dpi'], profile['target_dpi'])
+        jpeg_quality = profile.get('jpeg_quality', jpeg_quality)
+
+    if mode != 'color':
+        image = convert(image, 'gray')  # The later stages then work on one channel
+    image, dpi = downsample(image, dpi, target_dpi)
+    if options.get('deskew'):
+        image, _ = deskew(image)
+    image = convert(image, mode)
+    return compress(image, dpi, jpeg_quality)._replace(category=category)
+
+
+def process_pages(jobs, executor=None, window=4):
+    """Yield the EncodedPage of each job, in order.
+
+    With an executor, up to window pages are processed ahead of the one
+    being consumed, so pages overlap across workers while memory stays
+    bounded however long the document.
+    """
+    if executor is None:
+        yield from map(process_page, jobs)
+        return
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(process_page, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def otsu_threshold(histogram):
+    """Gray level separating ink from paper, from a 256-bin histogram"""
+    histogram = histogram[:256]
+    total = sum(histogram)
+    weighted_total = sum(value * count for value, count in enumerate(histogram))
+    background = weighted = 0
+    best, best_variance = 127, -1.0
+    for value, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted += value * count
+        mean_background = weighted / background
+        mean_foreground = (weighted_total - weighted) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best, best_variance = value, variance
+    return best
+
+
+def _group4(image):
+    """Raw CCITT G4 data of a bilevel image, encoded by libtiff as one strip"""
+    buffer = BytesIO()
+    image.save(buffer, 'TIFF', compression='group4', tiffinfo={278: image.height})
+    with Image.open(BytesIO(buffer.getvalue())) as tiff:
+        offsets, counts = tiff.tag_v2[273], tiff.tag_v2[279]
+    data = buffer.getvalue()
+    return b''.join(data[offset:offset + count] for offset, count in zip(offsets, counts))
+
+
+def _image_dpi(image):
+    """Horizontal DPI recorded in the image, or None"""
+    try:
+        return float(image.info['dpi'][0]) or None
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
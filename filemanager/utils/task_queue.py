@@ -0,0 +1,195 @@
+# utils/task_queue.py
+# Persistent queue for the local task engine. Plain sqlite3 so the queue lives in
+# its own file, next to (not inside) whatever database the project uses.
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    queue TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedup_key TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_retries INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    owner INTEGER,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim_idx ON tasks (queue, status, run_at);
+-- At most one waiting task per key; a running one may have started before the
+-- change that queued the next, so it does not absorb new calls
+CREATE UNIQUE INDEX IF NOT EXISTS tasks_dedup_idx ON tasks (dedup_key)
+    WHERE dedup_key IS NOT NULL AND status = 'queued';
+"""
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # Exists but not ours, or the check is unsupported
+    return True
+
+
+class SQLiteTaskQueue:
+    """Queue of task calls stored in a SQLite file, shared by every process on the host.
+
+    Tasks are claimed atomically, so several worker processes can drain one
+    queue file, and a queue's concurrency limit counts the running tasks of
+    all of them. Finished tasks are deleted; failed ones are kept with their
+    last error.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        # sqlite3 connections are per thread
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def _connect(self):
+        return _Transaction(self._db())
+
+    def put(self, name, queue, args, kwargs, key=None, max_retries=0, delay=0):
+        """Enqueue a call; returns its id, or the id of the waiting task with the same key"""
+        now = time.time()
+        payload = json.dumps({'args': list(args), 'kwargs': kwargs})
+        with self._connect() as db:
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO tasks (name, queue, payload, dedup_key, max_retries, run_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, queue, payload, key, max_retries, now + delay, now),
+            )
+            if cursor.rowcount:
+                return cursor.lastrowid
+            row = db.execute(
+                "SELECT id FROM tasks WHERE dedup_key = ? AND status = 'queued'", (key,)
+            ).fetchone()
+            return row['id'] if row else None
+
+    def claim(self, queue, limit):
+        """Mark up to `limit` minus the queue's running tasks as running by this process and return them"""
+        with self._connect() as db:
+            running = db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE queue = ? AND status = 'running'", (queue,)
+            ).fetchone()[0]
+            if running >= limit:
+                return []
+            rows = db.execute(
+                "SELECT * FROM tasks WHERE queue = ? AND status = 'queued' AND run_at <= ? "
+                "ORDER BY run_at, id LIMIT ?",
+                (queue, time.time(), limit - running),
+            ).fetchall()
+            db.executemany(
+                "UPDATE tasks SET status = 'running', owner = ?, attempts = attempts + 1 WHERE id = ?",
+                [(os.getpid(), row['id']) for row in rows],
+            )
+        return [
+            {**dict(row), **json.loads(row['payload']), 'attempts': row['attempts'] + 1}
+            for row in rows
+        ]
+
+    def complete(self, task_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def fail(self, task_id, error, retry_delay):
+        """Requeue a failed task after retry_delay, or mark it failed once its retries are used up.
+
+        Returns True if the task will be retried.
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT attempts, max_retries FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None:
+                return False
+            retry = row['attempts'] <= row['max_retries']
+            try:
+                db.execute(
+                    "UPDATE tasks SET status = ?, run_at = ?, owner = NULL, last_error = ? WHERE id = ?",
+                    ('queued' if retry else 'failed', time.time() + retry_delay, error, task_id),
+                )
+            except sqlite3.IntegrityError:
+                # A call with the same key is already waiting and will redo the work
+                db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return retry
+
+    def recover(self):
+        """Requeue tasks left running by processes that no longer exist; returns how many.
+
+        Call it before this process starts claiming: tasks owned by its own
+        pid are taken to be from an earlier process that had the same pid.
+        """
+        pid = os.getpid()
+        with self._connect() as db:
+            rows = db.execute("SELECT id, owner FROM tasks WHERE status = 'running'").fetchall()
+            orphaned = [
+                row['id'] for row in rows
+                if not row['owner'] or row['owner'] == pid or not _process_alive(row['owner'])
+            ]
+            for task_id in orphaned:
+                try:
+                    db.execute("UPDATE tasks SET status = 'queued', owner = NULL WHERE id = ?", (task_id,))
+                except sqlite3.IntegrityError:
+                    db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return len(orphaned)
+
+    def next_run_at(self, queues):
+        """Earliest run_at of the queued tasks in `queues`, or None"""
+        placeholders = ', '.join('?' for _ in queues)
+        with self._connect() as db:
+            row = db.execute(
+                f"SELECT MIN(run_at) FROM tasks WHERE status = 'queued' AND queue IN ({placeholders})", list(queues)
+            ).fetchone()
+        return row[0]
+
+    def counts(self):
+        """{queue: {status: n}}"""
+        with self._connect() as db:
+            rows = db.execute("SELECT queue, status, COUNT(*) AS n FROM tasks GROUP BY queue, status").fetchall()
+        counts = {}
+        for row in rows:
+            counts.setdefault(row['queue'], {})[row['status']] = row['n']
+        return counts
+
+    def failed(self, limit=50):
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, name, queue, attempts, last_error FROM tasks WHERE status = 'failed' "
+                "ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT around a block, so claims never race"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
@@ -1,29 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
-import re
-import uuid
+from django.urls import reverse
 import calendar
-from django.db.models import Case, When, Value, CharField, IntegerField, F
-import win32com.client
+from django.db.models import IntegerField
 from django.contrib.auth import authenticate, login
 from django.views import View
 from django.contrib.auth.forms import AuthenticationForm
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import base64
 import binascii  
 import json
-from pypdf import PdfMerger
 from django.core.files.base import ContentFile
 import os
 from datetime import datetime
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
 from datetime import datetime
 from .models import *
 import math
-import time
 from django.views.decorators.http import require_GET
 from django.db.models import Sum
 from datetime import timedelta
@@ -35,16 +31,23 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.contrib.auth import get_user_model
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
-import pythoncom
 import base64
-from uuid import uuid4
-from PIL import Image,ImageOps
 import logging
-import tempfile
+from .services.download_service import DownloadService
+from .services.folder_service import FolderService
+from .services.pagination_service import PaginationService
+from .services.rendition_service import RenditionPending, RenditionService
+from .services.scan_artifact_service import ScanArtifactService
+from .services.scan_job_service import ScanJobService
+from .services.scanner_service import ScannerError, ScannerRegistry
+from .services.resumable_upload_service import ResumableUploadService
+from .services.search_service import SearchFactory
+from .services.stats_service import StatsService
+from .services.storage_service import StorageFactory
+from .services.upload_service import FileTooLarge, HashingFileUploadHandler, UploadService
+from .tasks import generate_renditions, promote_blob
 
 
 @login_required
@@ -64,14 +67,10 @@ def search_files(request):
             category__department=request.user.department
         ).select_related('category', 'uploaded_by')
 
-        # Apply search query
+        # Apply search query against the full-text index
+        search_service = SearchFactory.get_search_service()
         if query:
-            files = files.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(uploaded_by__username__icontains=query) |
-                Q(category__name__icontains=query)
-            )
+            files = search_service.filter(files, query, rank=(sort_by == 'relevance'))
 
         # Apply date range filter
         now = timezone.now()
@@ -92,19 +91,30 @@ def search_files(request):
         if category_id != 'all':
             files = files.filter(category_id=category_id)
 
-        # Apply sorting
-        if sort_by == 'date_desc':
-            files = files.order_by('-uploaded_at')
-        elif sort_by == 'date_asc':
-            files = files.order_by('uploaded_at')
-        elif sort_by == 'name_asc':
-            files = files.order_by('name')
-        elif sort_by == 'name_desc':
-            files = files.order_by('-name')
-        elif sort_by == 'size_desc':
-            files = files.order_by('-size')
-        elif sort_by == 'size_asc':
-            files = files.order_by('size')
+        # Sort and paginate: keyset cursors on (sort field, id), offset for relevance
+        cursor = request.GET.get('cursor')
+        per_page = PaginationService.page_size(request.GET.get('per_page'), default=50)
+        sort_keys = {
+            'date_desc': ('uploaded_at', True),
+            'date_asc': ('uploaded_at', False),
+            'name_asc': ('name', False),
+            'name_desc': ('name', True),
+            'size_desc': ('size', True),
+            'size_asc': ('size', False),
+        }
+        try:
+            if sort_by == 'relevance' and query:
+                page = PaginationService.paginate_ranked(
+                    files.order_by('-search_rank', '-uploaded_at', '-id'), cursor, per_page
+                )
+            else:
+                field, descending = sort_keys.get(sort_by, sort_keys['date_desc'])
+                page = PaginationService.paginate(files, cursor, per_page, field=field, descending=descending)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        matches, files = files, page['items']
+        highlights = search_service.highlight([file.id for file in files], query) if query else {}
 
         # Prepare response data
         files_data = [{
@@ -115,12 +125,25 @@ def search_files(request):
             'size': file.size,
             'uploaded_at': file.uploaded_at.isoformat(),
             'uploaded_by': file.uploaded_by.get_full_name() or file.uploaded_by.username,
-            'url': file.file.url
+            'url': reverse('download_file', args=[file.id]),
+            'thumbnail_url': RenditionService.url(file),
+            'highlight': highlights.get(file.id)
         } for file in files]
 
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': page['next_cursor'],
+            'previous_cursor': page['previous_cursor'],
+            'has_next': page['has_next'],
+            'has_previous': page['has_previous'],
+        }
+        if request.GET.get('total') in ('1', 'true'):
+            pagination['estimated_total'] = PaginationService.estimated_total(matches)
+
         return JsonResponse({
             'success': True,
-            'files': files_data
+            'files': files_data,
+            'pagination': pagination
         })
 
     except Exception as e:
@@ -137,72 +160,72 @@ User = get_user_model()
 @require_GET
 @csrf_exempt
 def get_scanners(request):
-    """Return list of available scanners with better error handling"""
+    """Return the list of available scanners, from the in-memory scanner registry.
+
+    Pass refresh=1 to enumerate the devices again before answering, e.g.
+    after plugging a scanner in where hot-plug events are not delivered.
+    """
+    registry = ScannerRegistry.instance()
     try:
-        pythoncom.CoInitialize()
-        
-        try:
-            wia_manager = win32com.client.Dispatch("WIA.DeviceManager")
-            if wia_manager is None:
-                return JsonResponse({
-                    'success': False, 
-                    'error': 'Failed to initialize WIA DeviceManager'
-                }, status=500)
-            
-            devices = wia_manager.DeviceInfos
-            scanners = []
-            
-            # Explicitly check for scanner devices (type 1)
-            for i in range(1, devices.Count + 1):
-                device = devices.Item(i)
-                if device.Type == 1:  # Scanner device type
-                    scanners.append({
-                        'id': i,
-                        'name': device.Properties.Item("Name").Value,
-                        'description': device.Properties.Item("Description").Value 
-                            if device.Properties.Exists("Description") else ""
-                    })
-            
-            if not scanners:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'No scanners found. Please check: 1. Scanner is powered on 2. Drivers are installed 3. Scanner is not in use by another application'
-                }, status=404)
-            
-            return JsonResponse({'success': True, 'scanners': scanners})
-            
-        except pythoncom.com_error as e:
-            return JsonResponse({
-                'success': False,
-                'error': f'WIA COM Error: {e.excepinfo[2]}',
-                'hint': 'Make sure Windows Image Acquisition service is running'
-            }, status=500)
-            
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'error': f'Unexpected error: {str(e)}'
-            }, status=500)
-            
-    finally:
-        pythoncom.CoUninitialize()
+        scanners = registry.refresh() if request.GET.get('refresh') == '1' else registry.devices()
+    except ScannerError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'hint': 'Make sure Windows Image Acquisition service is running'
+        }, status=500)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Unexpected error: {str(e)}'
+        }, status=500)
 
-TEMP_SCAN_DIR = "/path/to/temp/scan/dir" 
+    if not scanners:
+        return JsonResponse({
+            'success': False,
+            'error': 'No scanners found. Please check: 1. Scanner is powered on 2. Drivers are installed 3. Scanner is not in use by another application'
+        }, status=404)
+
+    return JsonResponse({'success': True, 'scanners': scanners})
+
+def scan_artifact_data(artifact):
+    """JSON description of a scan artifact for the scanning UI"""
+    return {
+        'artifact_id': str(artifact.id),
+        'file_name': artifact.filename,
+        'size': artifact.size,
+        'page_count': artifact.page_count,
+        'preview_url': reverse('scan_artifact', args=[artifact.id]),
+        'expires_at': artifact.expires_at.isoformat(),
+    }
+
+def scan_job_data(job):
+    """JSON status of a scan job; a finished one carries its artifact's scan_artifact_data"""
+    data = {
+        'success': job.status != 'failed',
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': reverse('scan_job', args=[job.id]),
+        'poll_interval_ms': int(settings.SCAN_JOB_POLL_INTERVAL * 1000),
+    }
+    if job.status == 'failed':
+        data['error'] = f"Scan failed: {job.error}"
+    elif job.status == 'done' and job.artifact is not None:
+        data.update(scan_artifact_data(job.artifact))
+    return data
 
-if not os.path.exists(TEMP_SCAN_DIR):
-    os.makedirs(TEMP_SCAN_DIR)
-    
 @require_POST
 @csrf_exempt
 def scan_document(request):
-    """Handle document scanning with support for multi-page scanning."""
-    pythoncom.CoInitialize()  # Initialize COM first
-    wia_manager = None
-    device = None
-    item = None
-    
-    page_id = f"page_{uuid4().hex}"
-    temp_file = os.path.join(TEMP_SCAN_DIR, f"{page_id}.pdf")
+    """Queue a scan of one page and return its job (202) without waiting for the scanner.
+
+    The scanner's worker thread scans the page into a server-side scan
+    artifact; the client polls the job's status_url until it is done, when
+    it carries the artifact's id, or failed. Pages are merged and uploaded
+    by id (finalize_scan, file_upload_view).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
 
     def safe_int(value, default):
         try:
@@ -210,99 +233,15 @@ def scan_document(request):
         except (TypeError, ValueError):
             return default
 
-    try:
-        scanner_id = safe_int(request.POST.get('scanner_id'), 1)
-        dpi = safe_int(request.POST.get('dpi'), 300)
-        color_mode = request.POST.get('color_mode', 'Color')
-        auto_deskew = request.POST.get('auto_deskew', 'false').lower() == 'true'
-
-        wia_manager = win32com.client.Dispatch("WIA.DeviceManager")
-
-        if wia_manager.DeviceInfos.Count < scanner_id:
-            return JsonResponse({
-                'success': False,
-                'error': f'Scanner ID {scanner_id} not found',
-                'available_scanners': wia_manager.DeviceInfos.Count
-            }, status=400)
-
-        device = wia_manager.DeviceInfos.Item(scanner_id).Connect()
-        item = device.Items.Item(1)
-
-        # Configure scanner settings
-        try:
-            item.Properties.Item("Horizontal Resolution").Value = dpi
-            item.Properties.Item("Vertical Resolution").Value = dpi
-
-            if color_mode == 'Grayscale':
-                item.Properties.Item("Current Intent").Value = 1
-            elif color_mode == 'BlackAndWhite':
-                item.Properties.Item("Current Intent").Value = 4
-            else:  # Color
-                item.Properties.Item("Current Intent").Value = 2
-        except Exception as config_error:
-            logger.warning(f"Scanner config error: {config_error}")
-
-        # Retry scanning if device is busy
-        max_attempts = 6
-        for attempt in range(max_attempts):
-            try:
-                image = item.Transfer()
-                break
-            except pythoncom.com_error as e:
-                error_msg = e.excepinfo[2] if e.excepinfo else str(e)
-                if "device is busy" in error_msg.lower() and attempt < max_attempts - 1:
-                    logger.warning(f"WIA device busy, retrying scan (attempt {attempt + 1})...")
-                    time.sleep(7)
-                    continue
-                else:
-                    raise
-
-        # Generate unique temp file paths
-        temp_dir = tempfile.gettempdir()
-        jpg_path = os.path.join(temp_dir, f"{uuid.uuid4()}.jpg")
-        pdf_path = os.path.join(temp_dir, f"{uuid.uuid4()}.pdf")
-
-        # Save scan to JPEG
-        image.SaveFile(jpg_path)
-
-        # Convert to PDF and optionally deskew
-        pil_image = Image.open(jpg_path)
-        if auto_deskew:
-            try:
-                pil_image = ImageOps.exif_transpose(pil_image)
-            except Exception as deskew_error:
-                logger.warning(f"Deskew failed: {deskew_error}")
-
-        pil_image.convert("RGB").save(pdf_path, "PDF", resolution=100.0)
-        pil_image.close()  # Close image to release the file handle
-
-        # Encode PDF to base64
-        with open(pdf_path, 'rb') as pdf_file:
-            pdf_data = pdf_file.read()
-            base64_pdf = base64.b64encode(pdf_data).decode('utf-8')
-
-        # Clean up temp files
-        for f in [jpg_path, pdf_path]:
-            try:
-                os.unlink(f)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp file {f}: {e}")
-
-        return JsonResponse({
-            'success': True,
-            'image': f"data:application/pdf;base64,{base64_pdf}",
-            'file_name': f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        })
-
-    except pythoncom.com_error as e:
-        err_msg = e.excepinfo[2] if e.excepinfo else str(e)
-        logger.error(f"Scanner communication error: {err_msg}")
-        return JsonResponse({
-            'success': False,
-            'error': f"Scanner communication error: {err_msg}",
-            'type': 'scanner_error'
-        }, status=500)
+    scanner_id = safe_int(request.POST.get('scanner_id'), 1)
+    dpi = safe_int(request.POST.get('dpi'), 300)
+    color_mode = request.POST.get('color_mode', 'Color')
+    deskew = request.POST.get('auto_deskew', 'false').lower() in ('1', 'true', 'on')
+    if scanner_id < 1 or not 50 <= dpi <= 1200:
+        return JsonResponse({'success': False, 'error': 'Invalid scanner or resolution'}, status=400)
 
+    try:
+        job = ScanJobService.submit(request.user, scanner_id, dpi, color_mode, deskew)
     except Exception as e:
         logger.error(f"Scan error: {str(e)}", exc_info=True)
         return JsonResponse({
@@ -310,109 +249,95 @@ def scan_document(request):
             'error': f"Scan failed: {str(e)}",
             'type': 'unexpected_error'
         }, status=500)
+    return JsonResponse(scan_job_data(job), status=200 if job.finished else 202)
 
-    finally:
-        # Release COM objects and uninitialize COM library
-        item = None
-        device = None
-        wia_manager = None
-        pythoncom.CoUninitialize()
+@require_GET
+def scan_job(request, job_id):
+    """Poll a scan job of the user"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    try:
+        job = ScanJobService.get(request.user, job_id)
+    except ScanJob.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Scan job not found'}, status=404)
+    return JsonResponse(scan_job_data(job))
         
-TEMP_SCAN_DIR = "/path/to/temp/scan/dir"  
-
 @require_POST
 @csrf_exempt
 def finalize_scan(request):
-    """Combine multiple scanned PDF pages into one PDF using pypdf."""
+    """Combine scanned pages, by artifact id and in the given order, into one PDF artifact"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    artifact_ids = request.POST.getlist('artifact_ids[]') or request.POST.getlist('page_ids[]')
+    if not artifact_ids:
+        return JsonResponse({'success': False, 'error': 'No pages provided'}, status=400)
+
     try:
-        page_ids = request.POST.getlist("page_ids[]")
-        
-        if not page_ids:
-            return JsonResponse({
-                "success": False,
-                "error": "No pages provided"
-            })
+        pages = ScanArtifactService.get_many(request.user, artifact_ids)
+    except ScanArtifact.DoesNotExist as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=404)
 
-        merger = PdfMerger()
-        temp_files = []
+    try:
+        document = ScanArtifactService.merge(
+            request.user,
+            pages,
+            request.POST.get('file_name') or f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+        )
+    except Exception as e:
+        logger.error(f"Merging scans failed: {e}", exc_info=True)
+        return JsonResponse({'success': False, 'error': f"Merging scans failed: {e}"}, status=500)
 
-        try:
-            for page_id in page_ids:
-                # Create a temporary file for each page
-                temp_file = os.path.join(TEMP_SCAN_DIR, f"{page_id}.pdf")
-                temp_files.append(temp_file)
-                
-                # Add to merger
-                merger.append(temp_file)
+    return JsonResponse({'success': True, **scan_artifact_data(document)})
 
-            # Create output PDF
-            output_filename = f"scan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            output_path = os.path.join(TEMP_SCAN_DIR, output_filename)
-            
-            # Write the combined PDF
-            with open(output_path, 'wb') as output_file:
-                merger.write(output_file)
 
-            # Read the combined PDF and convert to base64
-            with open(output_path, 'rb') as f:
-                base64_pdf = base64.b64encode(f.read()).decode('utf-8')
+@require_http_methods(["GET", "DELETE"])
+def scan_artifact(request, artifact_id):
+    """GET previews one of the user's scans inline; DELETE discards it"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
 
-            return JsonResponse({
-                "success": True,
-                "image": f"data:application/pdf;base64,{base64_pdf}",
-                "file_name": output_filename
-            })
+    try:
+        artifact = ScanArtifactService.get(request.user, artifact_id)
+    except ScanArtifact.DoesNotExist:
+        return JsonResponse({'error': 'Scan not found'}, status=404)
 
-        except Exception as e:
-            return JsonResponse({
-                "success": False,
-                "error": str(e)
-            })
+    if request.method == 'DELETE':
+        ScanArtifactService.discard(artifact)
+        return JsonResponse({'success': True})
+
+    response = FileResponse(
+        open(ScanArtifactService.path(artifact), 'rb'),
+        content_type=artifact.content_type,
+        filename=artifact.filename,
+    )
+    response['Cache-Control'] = 'private, no-store'
+    return response
 
-        finally:
-            # Clean up temporary files
-            merger.close()
-            for temp_file in temp_files:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            if os.path.exists(output_path):
-                os.remove(output_path)
 
-    except Exception as e:
-        return JsonResponse({
-            "success": False,
-            "error": str(e)
-        })
-   
-    
 @login_required
 def file_upload_view(request):
     if request.method == 'POST':
         file = None
+        scans = None
 
-        # Handle scan data
-        if 'scan_data' in request.POST and request.POST['scan_data']:
-            # Strip the prefix if it exists
-            scan_data = re.sub(r'^data:image/\w+;base64,', '', request.POST['scan_data'])
+        # Scanned pages are referenced by artifact id, in page order
+        scan_artifact_ids = [artifact_id for artifact_id in request.POST.getlist('scan_artifact_id') if artifact_id]
+        if scan_artifact_ids:
             try:
-                file_data = base64.b64decode(scan_data)
-            except Exception as e:
+                scans = ScanArtifactService.get_many(request.user, scan_artifact_ids)
+            except ScanArtifact.DoesNotExist as e:
                 return render(request, 'file_upload.html', {
-                    'error': f'Invalid scan data: {e}',
+                    'error': f'Scan unavailable, please scan again: {e}',
                     'categories': Category.objects.all(),
                     'years': list(range(datetime.now().year, datetime.now().year - 11, -1)),
                     'months': [{'value': str(i).zfill(2), 'label': datetime(1900, i, 1).strftime('%B')} for i in range(1, 13)],
                     'dates': [str(i).zfill(2) for i in range(1, 32)],
                 })
-
-            # Use the custom name from the frontend if available
-            custom_name = request.POST.get('scan_file_name') or f"scanned_{uuid4().hex}.jpg"
-            file = ContentFile(file_data, name=custom_name)
-
         else:
             file = request.FILES.get('file')
 
-        if not file:
+        if not file and not scans:
             return render(request, 'file_upload.html', {
                 'error': 'No file was uploaded.',
                 'categories': Category.objects.all(),
@@ -440,22 +365,40 @@ def file_upload_view(request):
                 'dates': [str(i).zfill(2) for i in range(1, 32)],
             })
 
-        # Create folder structure
-        year_folder, _ = YearFolder.objects.get_or_create(category=category, year=year)
-        month_folder, _ = MonthFolder.objects.get_or_create(year_folder=year_folder, month=month)
-        date_folder, _ = DateFolder.objects.get_or_create(month_folder=month_folder, date=date)
+        # Materialize the folder structure for this date
+        try:
+            date_folder = FolderService.get_date_folder(category, year, month, date)
+        except ValueError:
+            return render(request, 'file_upload.html', {
+                'error': 'Invalid date selected.',
+                'categories': Category.objects.all(),
+                'years': list(range(datetime.now().year, datetime.now().year - 11, -1)),
+                'months': [{'value': str(i).zfill(2), 'label': datetime(1900, i, 1).strftime('%B')} for i in range(1, 13)],
+                'dates': [str(i).zfill(2) for i in range(1, 32)],
+            })
 
         # Create record
-        medical_file = MedicalFile.objects.create(
-            name=file.name,
-            file=file,
-            uploaded_by=request.user,
-            file_type='PDF' if file.name.lower().endswith('.pdf') else 'OTH',
-            description=description,
-            size=file.size,
-            date_folder=date_folder,
-            category=category,
-        )
+        if scans:
+            medical_file = ScanArtifactService.upload(
+                request.user,
+                scans,
+                request.POST.get('scan_file_name') or None,
+                uploaded_by=request.user,
+                file_type='PDF',
+                description=description,
+                date_folder=date_folder,
+                category=category,
+            )
+        else:
+            medical_file = UploadService.store_stream(
+                file,
+                os.path.basename(file.name),
+                uploaded_by=request.user,
+                file_type='PDF' if file.name.lower().endswith('.pdf') else 'OTH',
+                description=description,
+                date_folder=date_folder,
+                category=category,
+            )
 
         return render(request, 'file_upload.html', {
             'success': 'Successfully uploaded the file.',
@@ -476,6 +419,7 @@ def file_upload_view(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def upload_file_api(request):
+    """JSON upload with base64 file content; the whole file is held in memory, use stream_upload_api for large files"""
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
@@ -509,70 +453,32 @@ def upload_file_api(request):
         except Exception as e:
             return JsonResponse({'error': f'Error decoding file: {str(e)}'}, status=400)
 
-        # Create file object
-        file_obj = ContentFile(file_bytes, name=data['filename'])
-
         # Determine file type
-        def get_file_type(mimetype, filename):
-            mimetype = mimetype.lower()
-            filename = filename.lower()
-            if 'pdf' in mimetype or filename.endswith('.pdf'):
-                return 'PDF'
-            elif 'word' in mimetype or filename.endswith(('.doc', '.docx')):
-                return 'DOC'
-            elif 'excel' in mimetype or filename.endswith(('.xls', '.xlsx')):
-                return 'XLS'
-            elif 'image' in mimetype or filename.endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                return 'IMG'
-            elif 'video' in mimetype or filename.endswith(('.mp4', '.mov', '.avi')):
-                return 'VID'
-            elif 'audio' in mimetype or filename.endswith(('.mp3', '.wav')):
-                return 'AUD'
-            return 'OTH'
-
-        file_type = get_file_type(data['mimetype'], data['filename'])
-
-        # Create folder structure
-        try:
-            day = int(data['date'])
-            year = int(data['year'])
-            month = int(data['month'])
+        file_type = UploadService.detect_file_type(data['mimetype'], data['filename'])
 
-            year_folder, _ = YearFolder.objects.get_or_create(
-                category=category,  # Link to category
-                year=year
-            )
-            
-            month_folder, _ = MonthFolder.objects.get_or_create(
-                year_folder=year_folder,
-                month=month
-            )
-            
-            date_folder, _ = DateFolder.objects.get_or_create(
-                month_folder=month_folder,
-                date=day
+        # Materialize the folder structure for this date
+        try:
+            date_folder = FolderService.get_date_folder(
+                category, data['year'], data['month'], data['date']
             )
         except ValueError as e:
             return JsonResponse({'error': f'Invalid date format: {str(e)}'}, status=400)
 
         # Create and save MedicalFile with category association
-        medical_file = MedicalFile(
-            name=data['filename'],
-            file=file_obj,
+        medical_file = UploadService.store_stream(
+            ContentFile(file_bytes),
+            data['filename'],
             uploaded_by=request.user,
             file_type=file_type,
             description=data.get('description', ''),
-            size=data['filesize'],
             date_folder=date_folder,
             category=category  # Direct category association
         )
 
-        medical_file.save()
-
         return JsonResponse({
             'success': True,
             'message': 'File uploaded successfully',
-            'file_url': medical_file.file.url,
+            'file_url': reverse('download_file', args=[medical_file.id]),
             'file_id': medical_file.id,
             'category': category.name  # Include category in response
         })
@@ -581,7 +487,210 @@ def upload_file_api(request):
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
-    
+
+@csrf_exempt
+@require_http_methods(["POST", "PUT"])
+def stream_upload_api(request):
+    """Upload a file without buffering it in memory.
+
+    Either send the raw file as the request body with the metadata (filename,
+    category, year, month, date, description) in the query string, or a
+    multipart form with a single 'file' part and the metadata as form fields.
+    The content is written to storage in fixed-size chunks while its size
+    and SHA-256 checksum are computed.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        multipart = request.content_type == 'multipart/form-data'
+        if multipart:
+            # Must be set before request.POST/FILES parse the body
+            request.upload_handlers = [HashingFileUploadHandler(request)]
+            params = request.POST
+            upload = request.FILES.get('file')
+            if upload is None:
+                return JsonResponse({'error': 'Missing file part'}, status=400)
+            filename = upload.name
+            mimetype = upload.content_type
+        else:
+            params = request.GET
+            filename = os.path.basename(params.get('filename', ''))
+            mimetype = request.content_type
+            if not filename:
+                return JsonResponse({'error': 'Missing required field: filename'}, status=400)
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+            if content_length <= 0:
+                return JsonResponse({'error': 'Empty request body'}, status=400)
+            if content_length > settings.MAX_FILE_SIZE:
+                return JsonResponse({'error': str(FileTooLarge(settings.MAX_FILE_SIZE))}, status=413)
+
+        for field in ('category', 'year', 'month', 'date'):
+            if not params.get(field):
+                return JsonResponse({'error': f'Missing required field: {field}'}, status=400)
+
+        try:
+            category = Category.objects.get(name=params['category'])
+        except Category.DoesNotExist:
+            return JsonResponse({'error': 'Invalid category'}, status=400)
+
+        if not request.user.is_staff and category.department != request.user.department:
+            return JsonResponse({'error': 'Permission denied for this category'}, status=403)
+
+        try:
+            date_folder = FolderService.get_date_folder(category, params['year'], params['month'], params['date'])
+        except ValueError as e:
+            return JsonResponse({'error': f'Invalid date format: {str(e)}'}, status=400)
+
+        fields = {
+            'uploaded_by': request.user,
+            'file_type': UploadService.detect_file_type(mimetype, filename),
+            'description': params.get('description', ''),
+            'date_folder': date_folder,
+            'category': category,
+        }
+        if multipart:
+            medical_file = UploadService.store_upload(upload, **fields)
+        else:
+            medical_file = UploadService.store_stream(request, filename, max_size=settings.MAX_FILE_SIZE, **fields)
+
+        return JsonResponse({
+            'success': True,
+            'message': 'File uploaded successfully',
+            'file_url': reverse('download_file', args=[medical_file.id]),
+            'file_id': medical_file.id,
+            'category': category.name,
+            'size': medical_file.size,
+            'checksum': medical_file.checksum,
+        }, status=201)
+
+    except FileTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def _get_upload_session(request, upload_id):
+    """Return the caller's upload session, or None if it does not exist or belongs to someone else"""
+    return UploadSession.objects.filter(pk=upload_id, user=request.user).first()
+
+
+@require_http_methods(["POST"])
+def create_upload_session_api(request):
+    """Start a resumable upload.
+
+    Expects JSON with filename, size, category, year, month, date and
+    optionally mimetype, description, chunk_size and the file's SHA-256
+    checksum. Chunks are then PUT to the returned chunk URL in any order.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    for field in ('filename', 'size', 'category', 'year', 'month', 'date'):
+        if not data.get(field):
+            return JsonResponse({'error': f'Missing required field: {field}'}, status=400)
+
+    try:
+        category = Category.objects.get(name=data['category'])
+    except Category.DoesNotExist:
+        return JsonResponse({'error': 'Invalid category'}, status=400)
+
+    if not request.user.is_staff and category.department != request.user.department:
+        return JsonResponse({'error': 'Permission denied for this category'}, status=403)
+
+    try:
+        folder_date = datetime(int(data['year']), int(data['month']), int(data['date'])).date()
+        session = ResumableUploadService.create_session(
+            request.user,
+            category,
+            folder_date,
+            data['filename'],
+            data['size'],
+            chunk_size=data.get('chunk_size'),
+            mimetype=data.get('mimetype', ''),
+            description=data.get('description', ''),
+            checksum=data.get('checksum', ''),
+        )
+    except (TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except OSError as e:
+        logger.error(f"Could not allocate a resumable upload of {data['size']} bytes: {e}")
+        return JsonResponse({'error': 'Not enough storage for this upload'}, status=507)
+
+    return JsonResponse(ResumableUploadService.status(session), status=201)
+
+
+@require_http_methods(["GET", "DELETE"])
+def upload_session_api(request, upload_id):
+    """GET reports which chunks have been received; DELETE abandons the upload"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    session = _get_upload_session(request, upload_id)
+    if session is None:
+        return JsonResponse({'error': 'Upload session not found'}, status=404)
+
+    if request.method == 'DELETE':
+        ResumableUploadService.abort(session)
+        return JsonResponse({'success': True})
+    return JsonResponse(ResumableUploadService.status(session))
+
+
+@require_http_methods(["PUT"])
+def upload_chunk_api(request, upload_id, index):
+    """Receive one chunk as the raw request body.
+
+    An optional X-Chunk-SHA256 header is checked against the chunk. A chunk
+    can be re-sent at any time until the upload is completed.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    session = _get_upload_session(request, upload_id)
+    if session is None:
+        return JsonResponse({'error': 'Upload session not found'}, status=404)
+
+    try:
+        ResumableUploadService.write_chunk(session, index, request, request.headers.get('X-Chunk-SHA256'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, 'index': index})
+
+
+@require_http_methods(["POST"])
+def complete_upload_session_api(request, upload_id):
+    """Assemble a fully received upload into a MedicalFile"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    session = _get_upload_session(request, upload_id)
+    if session is None:
+        return JsonResponse({'error': 'Upload session not found'}, status=404)
+
+    try:
+        medical_file = ResumableUploadService.complete(session)
+    except ValueError as e:
+        return JsonResponse({'error': str(e), **ResumableUploadService.status(session)}, status=409)
+    if medical_file is None:
+        return JsonResponse({'error': 'The uploaded file has since been deleted'}, status=410)
+
+    return JsonResponse({
+        'success': True,
+        'message': 'File uploaded successfully',
+        'file_url': reverse('download_file', args=[medical_file.id]),
+        'file_id': medical_file.id,
+        'category': medical_file.category.name,
+        'size': medical_file.size,
+        'checksum': medical_file.checksum,
+    }, status=201)
+
+
 class LoginView(View):
     def get(self, request):
         return render(request, 'registration/login.html', {'form': AuthenticationForm()})
@@ -622,38 +731,15 @@ class DashboardView(View):
             categories = Category.objects.filter(department=request.user.department)
             is_admin = False
         
-        # Prepare category stats (only for accessible categories)
-        category_stats = []
-        for category in categories:
-            file_count = MedicalFile.objects.filter(category=category).count()
-            category_stats.append({
-                'name': category.name,
-                'description': category.department.name if category.department else '',
-                'file_count': file_count
-            })
-        
-        # Get total file count (only for accessible categories)
-        total_files = MedicalFile.objects.filter(
-            category__in=categories
-        ).count()
-        
-        # Get storage used (only for accessible categories)
-        storage_used = MedicalFile.objects.filter(
-            category__in=categories
-        ).aggregate(total_size=Sum('size'))['total_size'] or 0
-        
-        # Get recent uploads (only for accessible categories)
-        recent_uploads = MedicalFile.objects.filter(
-            category__in=categories,
-            uploaded_at__gte=timezone.now() - timedelta(days=7)
-        ).order_by('-uploaded_at')[:10]
+        # Category counts, totals and recent uploads (only for accessible categories)
+        stats = StatsService.get_cached_stats(categories, StatsService.cache_scope(request.user))
         
         context = {
-            'total_files': total_files,
-            'category_count': categories.count(),
-            'storage_used': storage_used,
-            'category_stats': category_stats,
-            'recent_uploads': recent_uploads,
+            'total_files': stats['total_files'],
+            'category_count': stats['category_count'],
+            'storage_used': stats['storage_used'],
+            'category_stats': stats['category_stats'],
+            'recent_uploads': stats['recent_uploads'],
             'today_users': User.objects.filter(
                 last_login__date=timezone.now().date()
             ).count() if is_admin else None,  # Only show to admins
@@ -673,57 +759,124 @@ def dashboard_stats(request):
     else:
         categories = Category.objects.filter(department=request.user.department)
     
-    # Prepare category stats
-    category_stats = []
-    for category in categories:
-        file_count = MedicalFile.objects.filter(category=category).count()
-        category_stats.append({
-            'name': category.name,
-            'description': category.department.name if category.department else '',
-            'file_count': file_count
-        })
-    
-    # Get total file count
-    total_files = MedicalFile.objects.filter(
-        category__in=categories
-    ).count()
-    
-    # Get storage used (in bytes)
-    storage_used = MedicalFile.objects.filter(
-        category__in=categories
-    ).aggregate(total_size=Sum('size'))['total_size'] or 0
-    
-    # Format storage for display
-    formatted_storage = format_file_size(storage_used)
-    
-    # Get recent uploads (last 7 days)
-    recent_uploads = MedicalFile.objects.filter(
-        category__in=categories,
-        uploaded_at__gte=timezone.now() - timedelta(days=7)
-    ).order_by('-uploaded_at')[:10]
+    # Category counts, totals and recent uploads
+    stats = StatsService.get_cached_stats(categories, StatsService.cache_scope(request.user))
     
     recent_uploads_list = []
-    for file in recent_uploads:
+    for file in stats['recent_uploads']:
         recent_uploads_list.append({
             'name': file.name,
             'category': file.category.name if file.category else 'Uncategorized',
             'uploaded_by': file.uploaded_by.get_full_name() or file.uploaded_by.username,
             'uploaded_at': file.uploaded_at.strftime('%b %d, %Y %H:%M'),
-            'size': format_file_size(file.size)
+            'size': format_file_size(file.size),
+            'thumbnail_url': RenditionService.url(file),
         })
     
     return JsonResponse({
-        'total_files': total_files,
-        'category_count': categories.count(),
-        'storage_used': formatted_storage,
+        'total_files': stats['total_files'],
+        'category_count': stats['category_count'],
+        'storage_used': format_file_size(stats['storage_used']),
         'today_users': User.objects.filter(
             last_login__date=timezone.now().date()
         ).count(),
-        'category_stats': category_stats,
+        'category_stats': stats['category_stats'],
         'recent_uploads': recent_uploads_list,
     })
 
 
+@require_GET
+def dashboard_cache_stats(request):
+    """API endpoint exposing the dashboard stats cache hit/miss counters to staff"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    return JsonResponse(StatsService.cache_counters())
+
+
+@require_http_methods(["GET", "HEAD"])
+def download_file(request, file_id):
+    """Serve a file to users of its department (staff: any file).
+
+    Supports If-None-Match/If-Modified-Since (304), single byte ranges (206)
+    and ?download=1 for an attachment. With FILE_DOWNLOAD_OFFLOAD set the
+    bytes are sent by nginx or Apache instead of the Python worker. Files in
+    the warm or cold storage tier are read from there and, with
+    STORAGE_TIER_PROMOTE_ON_READ, moved back to hot in the background.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    medical_file = get_object_or_404(MedicalFile.objects.select_related('category', 'blob'), id=file_id)
+    if not request.user.is_staff and (
+        medical_file.category is None or medical_file.category.department_id != request.user.department_id
+    ):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    response = DownloadService.response(request, medical_file, as_attachment=request.GET.get('download') == '1')
+    blob = medical_file.blob
+    if (
+        blob is not None and blob.tier != 'hot' and response.status_code in (200, 206)
+        and getattr(settings, 'STORAGE_TIER_PROMOTE_ON_READ', False)
+    ):
+        # Files read again are likely to be read soon after: bring them back to the hot tier
+        promote_blob.apply_async((blob.checksum,), key=f'promote-blob:{blob.checksum}')
+    return response
+
+
+@require_GET
+def file_rendition(request, file_id, size, version):
+    """Serve a thumbnail or preview of an image or PDF to users who may read the file.
+
+    The URL carries the start of the file's checksum, so the image behind
+    it never changes and browsers may keep it for a year. Missing
+    renditions are rendered on demand in the rendition pool.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+
+    medical_file = get_object_or_404(MedicalFile.objects.select_related('category'), id=file_id)
+    if not request.user.is_staff and (
+        medical_file.category is None or medical_file.category.department_id != request.user.department_id
+    ):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    if size not in settings.RENDITION_SIZES or not medical_file.checksum.startswith(version):
+        return JsonResponse({'error': 'Rendition not found'}, status=404)
+
+    etag = f'"{medical_file.checksum}-{size}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        try:
+            rendition = RenditionService.get(medical_file, size)
+        except RenditionPending:
+            # Render it in the background rather than throw the work away
+            generate_renditions.apply_async(([medical_file.id],), key=f'renditions:{medical_file.checksum}')
+            response = JsonResponse({'error': 'Rendition is being generated'}, status=503)
+            response['Retry-After'] = '5'
+            return response
+        if rendition is None or not rendition.file:
+            return JsonResponse({'error': 'No rendition for this file'}, status=404)
+        content_type = 'image/jpeg' if rendition.file.name.endswith('.jpg') else f"image/{rendition.file.name.rsplit('.', 1)[-1]}"
+        response = FileResponse(rendition.file.open('rb'), content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+def storage_pool_stats(request):
+    """API endpoint exposing this process's storage client pools (occupancy, connection reuse) to staff"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    return JsonResponse(StorageFactory.pool_stats())
+
+
 @login_required
 def file_browser_view(request):
     """Render the main file browser page with user-specific categories"""
@@ -752,49 +905,7 @@ def get_file_structure(request):
         else:
             categories = Category.objects.filter(department=request.user.department)
         
-        structure = {}
-        
-        for category in categories:
-            # Get all year folders for this category
-            year_folders = YearFolder.objects.filter(category=category).annotate(
-                file_count=Count('month_folders__date_folders__files')
-            )
-            
-            if not year_folders.exists():
-                continue
-                
-            structure[category.name] = {}
-            
-            for year_folder in year_folders:
-                year_str = str(year_folder.year)
-                structure[category.name][year_str] = {}
-                
-                # Get all month folders for this year
-                month_folders = MonthFolder.objects.filter(year_folder=year_folder).annotate(
-                    file_count=Count('date_folders__files')
-                )
-                
-                for month_folder in month_folders:
-                    month_str = str(month_folder.month).zfill(2)
-                    structure[category.name][year_str][month_str] = []
-                    
-                    # Get all date folders for this month
-                    date_folders = DateFolder.objects.filter(month_folder=month_folder).annotate(
-                        file_count=Count('files')
-                    ).order_by('-date')
-                    
-                    for date_folder in date_folders:
-                        date_str = str(date_folder.date.day).zfill(2)
-                        if date_folder.file_count > 0:
-                            structure[category.name][year_str][month_str].append(date_str)
-                    
-                    # Remove empty months
-                    if not structure[category.name][year_str][month_str]:
-                        del structure[category.name][year_str][month_str]
-                
-                # Remove empty years
-                if not structure[category.name][year_str]:
-                    del structure[category.name][year_str]
+        structure = FolderService.build_tree(categories)
         
         return JsonResponse({'structure': structure})
         
@@ -831,35 +942,33 @@ def get_files_by_date(request):
         # Search functionality
         if 'search' in request.GET and request.GET['search']:
             search_term = request.GET['search']
-            files = files.filter(
-                Q(name__icontains=search_term) |
-                Q(description__icontains=search_term)
-            )
-        
-        # Pagination
-        paginator = Paginator(files.order_by('-uploaded_at'), 10)
-        page = request.GET.get('page', 1)
+            files = SearchFactory.get_search_service().filter(files, search_term)
         
+        # Keyset pagination on (uploaded_at, id), newest first
+        per_page = PaginationService.page_size(request.GET.get('per_page'))
         try:
-            page_files = paginator.page(page)
-        except PageNotAnInteger:
-            page_files = paginator.page(1)
-        except EmptyPage:
-            page_files = paginator.page(paginator.num_pages)
+            page = PaginationService.paginate(
+                files.select_related('uploaded_by', 'category', 'date_folder__month_folder__year_folder'),
+                request.GET.get('cursor'),
+                per_page
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Prepare response
         files_list = []
-        for file in page_files:
+        for file in page['items']:
             files_list.append({
                 'id': file.id,
                 'filename': file.name,
-                'filesize': file.file.size,
-                'formatted_size': format_file_size(file.file.size),
+                'filesize': file.size,
+                'formatted_size': format_file_size(file.size),
                 'mimetype': file.get_file_type_display(),
                 'created_at': file.uploaded_at.isoformat(),
                 'formatted_date': file.uploaded_at.strftime('%d/%m/%Y %I:%M %p'),
                 'description': file.description,
-                'filepath': file.file.url,
+                'filepath': reverse('download_file', args=[file.id]),
+                'thumbnail_url': RenditionService.url(file),
                 'uploaded_by': file.uploaded_by.get_full_name() or file.uploaded_by.username,
                 'can_delete': request.user.is_staff or file.uploaded_by == request.user,
                 'category': file.category.name if file.category else 'Uncategorized',
@@ -868,14 +977,19 @@ def get_files_by_date(request):
                 'day': file.date_folder.date
             })
         
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': page['next_cursor'],
+            'previous_cursor': page['previous_cursor'],
+            'has_next': page['has_next'],
+            'has_previous': page['has_previous'],
+        }
+        if request.GET.get('total') in ('1', 'true'):
+            pagination['estimated_total'] = PaginationService.estimated_total(files)
+
         return JsonResponse({
             'files': files_list,
-            'pagination': {
-                'total': paginator.count,
-                'per_page': paginator.per_page,
-                'current_page': page_files.number,
-                'total_pages': paginator.num_pages
-            }
+            'pagination': pagination
         })
         
     except Exception as e:
@@ -892,8 +1006,9 @@ def delete_file(request, file_id):
         if not request.user.is_staff and file.uploaded_by != request.user:
             return JsonResponse({'error': 'Permission denied'}, status=403)
         
-        # Delete the file
-        file.file.delete()  # Deletes the actual file from storage
+        # Delete the file; shared blob contents are released by the post_delete signal
+        if file.blob_id is None:
+            file.file.delete()  # Deletes the actual file from storage
         file.delete()       # Deletes the database record
         
         return JsonResponse({'success': True})
@@ -1159,31 +1274,15 @@ def user_dashboard(request):
             medical_files = MedicalFile.objects.filter(category__department=user_department)
         
         # Calculate statistics
-        total_files = medical_files.count()
-        category_count = categories.count()
-        storage_used = medical_files.aggregate(total_size=Sum('size'))['total_size'] or 0
-        
-        # Prepare category statistics
-        category_stats = [
-            {
-                'name': category.name,
-                
-                'file_count': medical_files.filter(category=category).count()
-            }
-            for category in categories
-        ]
-        
-        
-        # Get recent uploads (limited to 10)
-        recent_uploads = medical_files.select_related('category', 'uploaded_by').order_by('-uploaded_at')[:10]
+        stats = StatsService.get_stats(categories, recent_days=None)
         
         context = {
             'user': user,
-            'total_files': total_files,
-            'category_count': category_count,
-            'storage_used': storage_used,
-            'category_stats': category_stats,
-            'recent_uploads': recent_uploads,
+            'total_files': stats['total_files'],
+            'category_count': stats['category_count'],
+            'storage_used': stats['storage_used'],
+            'category_stats': stats['category_stats'],
+            'recent_uploads': stats['recent_uploads'],
             'user_department': user_department,
             'department_name': department_name,
             'medical_files': medical_files,
@@ -1205,47 +1304,42 @@ def user_browser(request, year=None, month=None, day=None):
     }
     
     if year is None:
-        # Show years view
-        years_data = (
+        # Show years view from the folder counters; years without folders are shown virtually
+        year_counts = (
             YearFolder.objects
             .filter(category__department=request.user.department)
             .values('year')
-            .annotate(file_count=Count('month_folders__date_folders__medical_files'))
-            .order_by('-year')
+            .annotate(file_count=Sum('file_count'))
         )
         context.update({
             'view_type': 'years',
-            'years_data': years_data
+            'years_data': FolderService.virtual_years(
+                {row['year']: row['file_count'] for row in year_counts}
+            )
         })
         
     elif month is None:
         # Show months for selected year
-        current_year = year
-        months_data = (
+        month_counts = (
             MonthFolder.objects
             .filter(
                 year_folder__year=year,
                 year_folder__category__department=request.user.department
             )
             .values('month')
-            .annotate(
-                file_count=Count('date_folders__medical_files'),
-                month_name=Case(
-                    *[When(month=i, then=Value(datetime(2000, i, 1).strftime('%B'))) for i in range(1, 13)],
-                    output_field=CharField(),
-                )
-            )
-            .order_by('month')
+            .annotate(file_count=Sum('file_count'))
         )
         context.update({
             'view_type': 'months',
             'current_year': year,
-            'months_data': months_data
+            'months_data': FolderService.virtual_months(
+                {row['month']: row['file_count'] for row in month_counts}
+            )
         })
         
     elif day is None:
         # Show days for selected year and month
-        days_data = (
+        day_counts = (
             DateFolder.objects
             .filter(
                 month_folder__month=month,
@@ -1253,11 +1347,10 @@ def user_browser(request, year=None, month=None, day=None):
                 month_folder__year_folder__category__department=request.user.department
             )
             .values('date')
-            .annotate(
-                file_count=Count('medical_files'),
-                day=F('date')
-            )
-            .order_by('date')
+            .annotate(file_count=Sum('file_count'))
+        )
+        days_data = FolderService.virtual_days(
+            year, month, {row['date']: row['file_count'] for row in day_counts}
         )
         context.update({
             'view_type': 'days',